@@ -0,0 +1,116 @@
+"""元数据过滤检索：预过滤（位图掩码进入打分阶段）与后过滤（多取候选再过滤）的召回率/延迟对比
+
+运行：python -m benchmarks.bench_filtered_search --n 200000 --dim 256
+
+后过滤取 top_k * overfetch 个候选后按元数据丢弃；召回率以“对满足条件的行精确检索”的结果为基准。
+
+参考结果（n=200000, dim=256, top_k=10, overfetch=10, ivf n_probe=16, 单线程 NumPy, 100 次查询取平均）：
+
+    filter                                       match  compile ms  method      recall@k  ms/query
+    （无过滤）                                                      exact          1.000     25.07
+    domain = sel1                                 1.0%        0.29  pre/exact      1.000      0.86
+                                                                    post/exact     0.086     27.24
+                                                                    pre/ivf        1.000      0.95
+                                                                    post/ivf       0.090      1.07
+    domain = sel10                               10.0%        0.18  pre/exact      1.000      6.64
+                                                                    post/exact     0.910     23.49
+                                                                    pre/ivf        0.851      1.52
+                                                                    post/ivf       0.718      1.05
+    domain = sel50                               49.8%        0.18  pre/exact      1.000     21.84
+                                                                    post/exact     1.000     21.91
+                                                                    pre/ivf        0.930      0.87
+                                                                    post/ivf       0.918      0.94
+    visibility != private AND domain = sel10      8.0%        0.31  pre/exact      1.000      3.97
+                                                                    post/exact     0.779     23.14
+                                                                    pre/ivf        0.859      1.18
+                                                                    post/ivf       0.663      1.01
+
+元数据索引约 133KB，过滤条件编译为掩码 < 0.5ms。选择度越低，预过滤相对后过滤的优势越大：
+1% 时后过滤几乎召回不到结果，而预过滤只对命中行打分，比无过滤检索快约 30 倍。
+"""
+import argparse
+import time
+
+import numpy as np
+
+from benchmarks.bench_vector_store import recall_at_k, synthetic_vectors
+from src.tokenizer.record import BusinessRetrievalMeta, QualityComplianceMeta, RecordMetaData
+from src.vector_store.local_vector_store import LocalVectorStore
+
+# 互斥的 domain 取值及其行占比
+_DOMAINS = (("sel1", 0.01), ("sel10", 0.10), ("sel50", 0.50))
+
+
+def synthetic_metadata(n: int, seed: int = 2):
+    rng = np.random.default_rng(seed)
+    u = rng.random(n)
+    bounds = np.cumsum([share for _, share in _DOMAINS])
+    domain_idx = np.searchsorted(bounds, u, side="right")
+    names = [name for name, _ in _DOMAINS] + ["other"]
+    private = rng.random(n) < 0.2
+    return [RecordMetaData(business=BusinessRetrievalMeta(domain=names[d]),
+                           quality=QualityComplianceMeta(visibility="private" if p else "public"))
+            for d, p in zip(domain_idx.tolist(), private.tolist())]
+
+
+def timed(fn, queries):
+    start = time.perf_counter()
+    results = [fn(q) for q in queries]
+    return results, (time.perf_counter() - start) / len(queries) * 1000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=200_000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--overfetch", type=int, default=10)
+    parser.add_argument("--n-probe", type=int, default=16)
+    args = parser.parse_args()
+    k = args.top_k
+
+    vectors = synthetic_vectors(args.n, args.dim)
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.choice(args.n, args.queries, replace=False)] \
+        + 0.3 * rng.normal(size=(args.queries, args.dim)).astype(np.float32)
+
+    store = LocalVectorStore(dim=args.dim, initial_capacity=args.n)
+    ids = [str(i) for i in range(args.n)]
+    start = time.perf_counter()
+    store.add(ids, vectors, metadata=synthetic_metadata(args.n))
+    store.metadata.optimize()
+    print(f"n={args.n} dim={args.dim} queries={args.queries} top_k={k} overfetch={args.overfetch}")
+    print(f"add with metadata: {time.perf_counter() - start:.1f}s, metadata index {store.metadata.nbytes / 1e3:.0f} KB")
+    store.build_index()
+
+    _, unfiltered_ms = timed(lambda q: store.search(q, k), queries)
+    print(f"unfiltered exact: {unfiltered_ms:.2f} ms/query")
+    print(f"{'filter':<44}{'match':>7}{'compile ms':>12}  {'method':<16}{'recall@k':>9}{'ms/query':>10}")
+
+    filters = [f"domain = {name}" for name, _ in _DOMAINS] + ["visibility != private AND domain = sel10"]
+    for expr in filters:
+        start = time.perf_counter()
+        mask = store.filter_mask(expr)
+        compile_ms = (time.perf_counter() - start) * 1000
+        match = mask.mean()
+        truth, _ = timed(lambda q: store.search(q, k, filter=mask), queries)
+
+        def post(q, mode="exact"):
+            hits = store.search(q, k * args.overfetch, mode=mode, n_probe=args.n_probe)
+            return [h for h in hits if mask[int(h.id)]][:k]
+
+        rows = [
+            ("pre/exact", lambda q: store.search(q, k, filter=expr)),
+            ("post/exact", post),
+            ("pre/ivf", lambda q: store.search(q, k, mode="ivf", n_probe=args.n_probe, filter=expr)),
+            ("post/ivf", lambda q: post(q, mode="ivf")),
+        ]
+        for i, (method, fn) in enumerate(rows):
+            results, ms = timed(fn, queries)
+            label, match_s, compile_s = (expr, f"{match:.1%}", f"{compile_ms:.2f}") if i == 0 else ("", "", "")
+            print(f"{label:<44}{match_s:>7}{compile_s:>12}  {method:<16}{recall_at_k(results, truth, k):>9.3f}{ms:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
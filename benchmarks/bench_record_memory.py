@@ -0,0 +1,77 @@
+"""Record 对象列表与 RecordBatch 列式容器的内存占用对比
+
+运行：python -m benchmarks.bench_record_memory --n 200000
+
+参考结果（n=200000，典型记录：标识 + 来源 + 处理信息，UTF-8 内容约 106 B/条）：
+
+    layout          B/record   MB per 1M
+    List[Record]        1199        1144
+    RecordBatch          293         279
+"""
+import argparse
+import gc
+import hashlib
+import time
+import tracemalloc
+import uuid
+from typing import Callable, List, Tuple
+
+from src.tokenizer.record import (IdentificationVersionMeta, ProcessingTraceMeta, Record, RecordMetaData,
+                                  SourceLocationMeta)
+from src.tokenizer.record_batch import RecordBatch
+
+_TEXT = "长江是亚洲第一长河，全长约6300公里。它发源于青藏高原，最终注入东海。"
+
+
+def typical_records(n: int) -> List[Record]:
+    """与切分流水线输出一致的典型记录：标识 + 来源 + 处理信息"""
+    records = []
+    for i in range(n):
+        record_id = uuid.uuid4().hex
+        content = f"{i}:{_TEXT}"
+        records.append(Record(id=record_id, content=content, metadata=RecordMetaData(
+            identification=IdentificationVersionMeta(id=record_id, doc_id=f"docs/{i // 50}.txt",
+                                                     chunk_id=str(i % 50)),
+            source_location=SourceLocationMeta(source="file", path=f"/corpus/docs/{i // 50}.txt"),
+            processing=ProcessingTraceMeta(splitter="SemanticSplitterNodeParser",
+                                           embed_model="BAAI/bge-large-zh-v1.5",
+                                           text_hash=hashlib.sha256(content.encode("utf-8")).hexdigest()),
+        )))
+    return records
+
+
+def measure(build: Callable[[], object]) -> Tuple[object, int, float]:
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    obj = build()
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return obj, current, elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=200_000)
+    args = parser.parse_args()
+    n = args.n
+
+    records, records_bytes, records_s = measure(lambda: typical_records(n))
+    batch, batch_bytes, batch_s = measure(lambda: RecordBatch.from_records(records))
+    content_bytes = sum(len(r.content.encode("utf-8")) for r in records)
+
+    scale = 1_000_000 / n
+    print(f"n={n}  (UTF-8 content alone: {content_bytes / n:.0f} B/record)")
+    print(f"{'layout':<16}{'B/record':>10}{'MB per 1M':>12}{'build s':>10}")
+    print(f"{'List[Record]':<16}{records_bytes / n:>10.0f}{records_bytes * scale / 2 ** 20:>12.0f}{records_s:>10.2f}")
+    print(f"{'RecordBatch':<16}{batch_bytes / n:>10.0f}{batch_bytes * scale / 2 ** 20:>12.0f}{batch_s:>10.2f}")
+
+    start = time.perf_counter()
+    assert [batch[i] for i in range(1000)] == records[:1000]
+    print(f"materialize 1000 records from batch: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""NumPy 语义切分引擎与 llama_index SemanticSplitterNodeParser 的对比
+
+两条路径使用同一个替身模型（随机 1024 维单位向量，不使用缓存），
+"overhead" 为总耗时减去模型编码耗时，即切分本身的开销。
+
+运行：python -m benchmarks.bench_semantic_splitter --sentences 1000 10000
+
+参考结果（取 3 次最优）：
+
+    sentences  impl                    total_s  overhead_s
+         1000  llama_index parser        0.329       0.303
+         1000  SemanticSplitterEngine    0.039       0.013
+        10000  llama_index parser        3.628       3.312
+        10000  SemanticSplitterEngine    0.438       0.123
+"""
+import argparse
+import time
+from typing import Callable, List
+
+import numpy as np
+from llama_index.core import Document
+
+from src.embedding.model_registry import MODEL_REGISTRY
+from src.tokenizer.llamaindex_tokenizer import LlamaIndexSemanticTokenizer
+
+_MODEL_NAME = "bench-random-model"
+_SAMPLE = ["智能手机是现代社会不可或缺的通信工具。", "它集成了电话、相机、网络浏览器等多种功能。",
+           "长江是亚洲第一长河，全长约6300公里。", "它发源于青藏高原，最终注入东海。",
+           "咖啡是世界上消费最广泛的饮品之一。"]
+
+
+class _RandomEmbeddingModel:
+    def __init__(self, dim: int = 1024, seed: int = 0):
+        self.dim = dim
+        self.rng = np.random.default_rng(seed)
+
+    def encode(self, texts, batch_size=32, normalize_embeddings=True, convert_to_numpy=True):
+        vectors = self.rng.normal(size=(len(texts), self.dim)).astype(np.float32)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def best_of(fn: Callable[[], object], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sentences", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    model = _RandomEmbeddingModel()
+    MODEL_REGISTRY.register_model(model, name=_MODEL_NAME)
+    tokenizer = LlamaIndexSemanticTokenizer(embed_model=_MODEL_NAME, use_cache=False)
+
+    print(f"{'sentences':>9}  {'impl':<22}{'total_s':>9}{'overhead_s':>12}")
+    for n in args.sentences:
+        sentences: List[str] = [_SAMPLE[i % len(_SAMPLE)] for i in range(n)]
+        text = "".join(sentences)
+        groups = tokenizer.engine.combine_sentences(tokenizer.sentence_splitter(text))
+        embed_s = best_of(lambda: model.encode(groups), args.repeat)
+
+        llama = best_of(lambda: tokenizer.splitter.get_nodes_from_documents([Document(text=text)]), args.repeat)
+        engine = best_of(lambda: tokenizer.tokenize(text), args.repeat)
+        print(f"{n:>9}  {'llama_index parser':<22}{llama:>9.3f}{llama - embed_s:>12.3f}")
+        print(f"{n:>9}  {'SemanticSplitterEngine':<22}{engine:>9.3f}{engine - embed_s:>12.3f}")
+
+    MODEL_REGISTRY.unload(_MODEL_NAME)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""单次扫描分句器与原 re.split 实现的对比
+
+运行：python -m benchmarks.bench_sentence_splitter --chars 5000000
+
+参考结果（500 万字符 / 13.8 MB，取 5 次最优）：
+
+    impl                            s     MB/s
+    legacy re.split x3          0.541     25.5
+    chinese_sentence_splitter   0.166     83.2
+    iter_sentence_spans         0.279     49.4
+"""
+import argparse
+import re
+import time
+from typing import Callable, List
+
+from src.tokenizer.sentence_splitter import chinese_sentence_splitter, iter_sentence_spans
+
+_SAMPLE = ("智能手机是现代社会不可或缺的通信工具。它集成了电话、相机、网络浏览器等多种功能！"
+           "随着技术的发展，手机的计算能力甚至超过了十年前的个人电脑？\n"
+           "长江是亚洲第一长河，全长约6300公里。它发源于青藏高原，最终注入东海。\n")
+
+
+def legacy_chinese_sentence_splitter(text: str) -> List[str]:
+    """原 llamaindex_tokenizer.chinese_sentence_splitter 实现（最多三次 re.split）"""
+    sentences = re.split(r'([。！？\n])', text)
+    sentences = ["".join(i) for i in zip(sentences[0::2], sentences[1::2])]
+    if len(sentences) * 2 < len(re.split(r'([。！？\n])', text)):
+        sentences.append(re.split(r'([。！？\n])', text)[-1])
+    return [s.strip() for s in sentences if s.strip()]
+
+
+def best_of(fn: Callable[[], object], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chars", type=int, default=5_000_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    text = (_SAMPLE * (args.chars // len(_SAMPLE) + 1))[:args.chars] + "没有结尾标点的最后一句"
+    assert chinese_sentence_splitter(text) == legacy_chinese_sentence_splitter(text)
+
+    legacy = best_of(lambda: legacy_chinese_sentence_splitter(text), args.repeat)
+    fast = best_of(lambda: chinese_sentence_splitter(text), args.repeat)
+    spans = best_of(lambda: sum(1 for _ in iter_sentence_spans(text)), args.repeat)
+    mb = len(text.encode("utf-8")) / 2 ** 20
+    print(f"chars={len(text)} ({mb:.1f} MB UTF-8), best of {args.repeat}")
+    print(f"{'impl':<28}{'s':>8}{'MB/s':>10}")
+    print(f"{'legacy re.split x3':<28}{legacy:>8.3f}{mb / legacy:>10.1f}")
+    print(f"{'chinese_sentence_splitter':<28}{fast:>8.3f}{mb / fast:>10.1f}")
+    print(f"{'iter_sentence_spans':<28}{spans:>8.3f}{mb / spans:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""向量库批量写入吞吐：批大小与在途请求数的影响
+
+运行：python -m benchmarks.bench_vector_db_sink --rows 40000 --dim 384
+
+使用进程内 InMemoryVectorDB 模拟服务端：每个请求固定延迟 --latency-ms（网络往返），
+每行附加 --per-row-us（序列化与服务端写入）。输入按流水线默认的 256 条一批送入 sink，
+计时包含 Record -> 行的转换与 close() 等待全部请求完成。
+
+参考结果（单核，40000 行 × 384 维，latency 20ms，per-row 20us）：
+
+    case                              rows/s  requests  max_in_flight
+    convert only                       41189         -              -
+    batch=256  in_flight=1              7935       157              1
+    batch=256  in_flight=4             24733       157              4
+    batch=2000 in_flight=1             24300        20              1
+    batch=2000 in_flight=4             44617        20              3
+    batch=2000 in_flight=4 fail=10%    39252        25              4
+
+逐批同步写入（batch=256, in_flight=1）受往返延迟限制；大批次减少往返，
+并发在途请求让网络等待与下一批的行转换重叠，二者叠加约 5.6 倍，此时行转换（单线程）成为上限。
+10% 请求瞬时失败时多发出 5 个重试请求，吞吐下降约 12%，没有行丢失。
+"""
+import argparse
+import time
+
+import numpy as np
+
+from src.tokenizer.record import (BusinessRetrievalMeta, IdentificationVersionMeta, QualityComplianceMeta, Record,
+                                  RecordMetaData)
+from src.vector_store.vector_db_sink import InMemoryVectorDB, InMemoryVectorDBSink, records_to_rows
+
+
+def make_records(n: int):
+    return [Record(id=f"r{i}", content=f"第{i}段：长江流域水文资料与年度报告摘要。" * 4, metadata=RecordMetaData(
+        identification=IdentificationVersionMeta(id=f"r{i}", doc_id=f"d{i // 50}", chunk_id=str(i % 50)),
+        quality=QualityComplianceMeta(score=0.8, tags=["report", "hydrology"]),
+        business=BusinessRetrievalMeta(domain="water", doc_type="report")))
+        for i in range(n)]
+
+
+def run(records, vectors, args, batch_size: int, in_flight: int, failure_rate: float = 0.0):
+    db = InMemoryVectorDB(latency_s=args.latency_ms / 1000, per_row_latency_s=args.per_row_us / 1e6,
+                          failure_rate=failure_rate, seed=1)
+    sink = InMemoryVectorDBSink(db, batch_size=batch_size, max_in_flight=in_flight, base_delay=0.01)
+    start = time.perf_counter()
+    for i in range(0, len(records), 256):
+        sink(records[i:i + 256], vectors[i:i + 256])
+    sink.close()
+    elapsed = time.perf_counter() - start
+    assert len(db) == len(records)
+    return len(records) / elapsed, db.requests, sink.stats.max_in_flight
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=40_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--per-row-us", type=float, default=20.0)
+    args = parser.parse_args()
+
+    records = make_records(args.rows)
+    vectors = np.random.default_rng(0).normal(size=(args.rows, args.dim)).astype(np.float32)
+
+    start = time.perf_counter()
+    records_to_rows(records, vectors)
+    print(f"{'case':<32}{'rows/s':>10}{'requests':>10}{'max_in_flight':>15}")
+    print(f"{'convert only':<32}{args.rows / (time.perf_counter() - start):>10.0f}{'-':>10}{'-':>15}")
+
+    cases = [
+        ("batch=256  in_flight=1", 256, 1, 0.0),
+        ("batch=256  in_flight=4", 256, 4, 0.0),
+        ("batch=2000 in_flight=1", 2000, 1, 0.0),
+        ("batch=2000 in_flight=4", 2000, 4, 0.0),
+        ("batch=2000 in_flight=4 fail=10%", 2000, 4, 0.10),
+    ]
+    for name, batch_size, in_flight, failure_rate in cases:
+        rows_per_s, requests, max_in_flight = run(records, vectors, args, batch_size, in_flight, failure_rate)
+        print(f"{name:<32}{rows_per_s:>10.0f}{requests:>10}{max_in_flight:>15}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""LocalVectorStore 精确检索与 IVF 近似检索的召回率/延迟对比
+
+运行：python -m benchmarks.bench_vector_store --n 200000 --dim 256
+
+参考结果（n=200000, dim=256, 1788 个簇, 单线程 NumPy, 200 次查询取平均）：
+
+    mode          recall@10   ms/query
+    exact             1.000     28.00
+    ivf/probe=1       0.790      0.27
+    ivf/probe=2       0.907      0.30
+    ivf/probe=4       0.929      0.37
+    ivf/probe=8       0.939      0.53
+    ivf/probe=16      0.945      0.74
+    ivf/probe=32      0.954      1.47
+    ivf/probe=64      0.963      2.62
+
+建索引耗时约 16s（10 轮 k-means，采样 10 万行）。n_probe=8~16 在召回与延迟之间较均衡。
+"""
+import argparse
+import time
+
+import numpy as np
+
+from src.vector_store.local_vector_store import LocalVectorStore
+
+
+def synthetic_vectors(n: int, dim: int, n_clusters: int = 1000, noise: float = 2.0, seed: int = 0) -> np.ndarray:
+    """带簇结构的合成向量，近似真实 embedding 的分布"""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(n_clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, n_clusters, n)
+    return centers[labels] + noise * rng.normal(size=(n, dim)).astype(np.float32)
+
+
+def recall_at_k(approx, exact, k: int) -> float:
+    return float(np.mean([len({h.id for h in a} & {h.id for h in e}) / k for a, e in zip(approx, exact)]))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=200_000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--n-lists", type=int, default=None)
+    args = parser.parse_args()
+
+    vectors = synthetic_vectors(args.n, args.dim)
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.choice(args.n, args.queries, replace=False)] \
+        + 0.3 * rng.normal(size=(args.queries, args.dim)).astype(np.float32)
+
+    store = LocalVectorStore(dim=args.dim, initial_capacity=args.n)
+    store.add([str(i) for i in range(args.n)], vectors)
+
+    start = time.perf_counter()
+    exact = [store.search(q, args.top_k) for q in queries]
+    exact_ms = (time.perf_counter() - start) / args.queries * 1000
+    print(f"n={args.n} dim={args.dim} queries={args.queries} top_k={args.top_k}")
+    print(f"{'mode':<14}{'recall@k':>10}{'ms/query':>12}")
+    print(f"{'exact':<14}{1.0:>10.3f}{exact_ms:>12.3f}")
+
+    start = time.perf_counter()
+    index = store.build_index(n_lists=args.n_lists)
+    print(f"ivf build: lists={index.n_lists} {time.perf_counter() - start:.2f}s")
+
+    for n_probe in (1, 2, 4, 8, 16, 32, 64):
+        start = time.perf_counter()
+        approx = [store.search_batch(q.reshape(1, -1), args.top_k, mode="ivf", n_probe=n_probe)[0]
+                  for q in queries]
+        ms = (time.perf_counter() - start) / args.queries * 1000
+        print(f"{'ivf/probe=' + str(n_probe):<14}{recall_at_k(approx, exact, args.top_k):>10.3f}{ms:>12.3f}")
+
+
+if __name__ == "__main__":
+    main()
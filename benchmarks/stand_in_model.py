@@ -0,0 +1,43 @@
+"""本地替身 embedding 模型：不依赖 torch / 模型文件，结果确定
+
+字符二元组哈希到固定词表，每个词项对应一个随机向量（固定 seed），句向量为词项向量的均值。
+共享词汇越多的句子余弦相似度越高，足以让语义切分在主题切换处产生断点；
+编码开销与 token 数成正比，可以衡量批处理、缓存与切分逻辑本身的吞吐。
+"""
+from typing import List
+
+import numpy as np
+
+from src.embedding.inference_backend import EmbeddingBackend
+
+
+class HashingEmbeddingModel(EmbeddingBackend):
+    name = "hashing"
+
+    def __init__(self, dim: int = 256, vocab: int = 1 << 15, seed: int = 0, max_tokens_per_batch: int = 16384):
+        super().__init__(max_tokens_per_batch)
+        self.dim = dim
+        self.vocab = vocab
+        self.table = np.random.default_rng(seed).normal(size=(vocab, dim)).astype(np.float32)
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dim
+
+    def tokenize(self, texts: List[str]) -> List[List[int]]:
+        out = []
+        for text in texts:
+            codes = np.frombuffer(text.lower().encode("utf-32-le"), dtype=np.uint32).astype(np.int64)
+            if len(codes) < 2:
+                out.append([int(codes[0]) % self.vocab] if len(codes) else [0])
+                continue
+            out.append(((codes[:-1] * 65599 + codes[1:]) % self.vocab).tolist())
+        return out
+
+    def forward(self, token_ids: List[List[int]]) -> np.ndarray:
+        lengths = np.array([len(ids) for ids in token_ids])
+        flat = np.fromiter((i for ids in token_ids for i in ids), dtype=np.int64, count=int(lengths.sum()))
+        starts = np.concatenate([[0], np.cumsum(lengths)[:-1]])
+        return np.add.reduceat(self.table[flat], starts, axis=0) / lengths[:, None]
+
+
+__all__ = ["HashingEmbeddingModel"]
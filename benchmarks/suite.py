@@ -0,0 +1,357 @@
+"""端到端基准套件：确定性语料 + 本地替身模型，结果写入 JSON，可与基线对比并在退化时失败
+
+运行：
+    python -m benchmarks.suite --output bench.json                         # 全部基准
+    python -m benchmarks.suite --only split semantic --quick               # 部分基准、小规模
+    python -m benchmarks.suite --output new.json --baseline bench.json --threshold 0.15
+
+基准（每项取 --repeat 次最优）：
+    split       chinese_sentence_splitter 分句吞吐
+    semantic    LlamaIndexSemanticTokenizer 语义切分（替身模型，不使用缓存）
+    embedding   替身模型编码吞吐，及 encode() 经磁盘缓存的未命中/命中吞吐
+    records     Record 构建吞吐与 List[Record] / RecordBatch 每条内存
+    decorators  record_time / span / retry / logger.info 的单次调用开销
+
+每个指标带方向（越大越好 / 越小越好）；对比时相对基线变差超过阈值即为退化，进程以退出码 1 结束。
+基线的 schema 或规模（docs / records / calls）与本次运行不同时拒绝对比，进程以退出码 2 结束。
+不带方向的指标（如每篇文档的片段数、缓存未命中吞吐）只记录不比较。吞吐类指标受机器影响，基线应在同一台机器上生成；
+--quick 规模太小、波动大，只用于冒烟检查，不适合作为基线。
+
+参考结果（python -m benchmarks.suite，单核）：
+
+    split.mb_per_s                    75.18 MB/s
+    split.sentences_per_s            969555 sentences/s
+    semantic.sentences_per_s           4394 sentences/s
+    semantic.chunks_per_doc            3.57 chunks
+    embedding.sentences_per_s         13069 sentences/s
+    embedding.cache_miss_per_s         6074 sentences/s
+    embedding.cache_hit_per_s         30495 sentences/s
+    records.records_per_s             50872 records/s
+    records.list_bytes_per_record      1197 B
+    records.batch_bytes_per_record      292 B
+    decorators.record_time_ns          1388 ns
+    decorators.record_time_log_ns     21329 ns
+    decorators.span_ns                 2722 ns
+    decorators.retry_ns                 588 ns
+    decorators.logger_info_ns          8701 ns
+"""
+import argparse
+import gc
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from benchmarks.stand_in_model import HashingEmbeddingModel
+from benchmarks.synthetic_corpus import synthetic_corpus
+
+SCHEMA_VERSION = 1
+# 影响指标数值的规模参数，基线与本次运行必须一致才可对比
+_COMPARABLE_CONFIG = ("docs", "records", "calls")
+_STAND_IN_NAME = "bench-suite-stand-in"
+
+
+@dataclass
+class Metric:
+    value: float
+    unit: str
+    higher_is_better: Optional[bool] = True     # None 表示只记录不比较
+
+
+@dataclass
+class SuiteConfig:
+    docs: int = 400            # 语料文档数
+    records: int = 100_000     # records 基准的记录数
+    calls: int = 100_000       # decorators 基准的调用次数
+    repeat: int = 3
+    seed: int = 0
+
+    @classmethod
+    def quick(cls) -> "SuiteConfig":
+        return cls(docs=20, records=2000, calls=2000, repeat=1)
+
+
+BenchFn = Callable[[SuiteConfig], Dict[str, Metric]]
+BENCHMARKS: Dict[str, BenchFn] = {}
+
+
+def benchmark(name: str) -> Callable[[BenchFn], BenchFn]:
+    def _register(fn: BenchFn) -> BenchFn:
+        BENCHMARKS[name] = fn
+        return fn
+    return _register
+
+
+def best_of(fn: Callable[[], object], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(max(1, repeat)):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _sentences(cfg: SuiteConfig) -> List[str]:
+    from src.tokenizer.sentence_splitter import chinese_sentence_splitter
+
+    return [s for doc in synthetic_corpus(cfg.docs, cfg.seed) for s in chinese_sentence_splitter(doc)]
+
+
+@benchmark("split")
+def bench_split(cfg: SuiteConfig) -> Dict[str, Metric]:
+    from src.tokenizer.sentence_splitter import chinese_sentence_splitter
+
+    text = "\n".join(synthetic_corpus(cfg.docs * 10, cfg.seed))
+    n_sentences = len(chinese_sentence_splitter(text))
+    seconds = best_of(lambda: chinese_sentence_splitter(text), cfg.repeat)
+    return {"mb_per_s": Metric(len(text.encode("utf-8")) / 2 ** 20 / seconds, "MB/s"),
+            "sentences_per_s": Metric(n_sentences / seconds, "sentences/s")}
+
+
+@benchmark("semantic")
+def bench_semantic(cfg: SuiteConfig) -> Dict[str, Metric]:
+    from src.tokenizer.llamaindex_tokenizer import LlamaIndexSemanticTokenizer
+    from src.tokenizer.sentence_splitter import chinese_sentence_splitter
+
+    docs = synthetic_corpus(cfg.docs, cfg.seed)
+    n_sentences = sum(len(chinese_sentence_splitter(d)) for d in docs)
+    tokenizer = LlamaIndexSemanticTokenizer(embed_model=_STAND_IN_NAME, backend=HashingEmbeddingModel(),
+                                            use_cache=False, breakpoint_percentile_threshold=80)
+    chunks: List[int] = []
+    seconds = best_of(lambda: chunks.append(len(tokenizer.tokenize_many(docs))), cfg.repeat)
+    return {"sentences_per_s": Metric(n_sentences / seconds, "sentences/s"),
+            "docs_per_s": Metric(len(docs) / seconds, "docs/s"),
+            "chunks_per_doc": Metric(chunks[-1] / len(docs), "chunks", None)}
+
+
+@benchmark("embedding")
+def bench_embedding(cfg: SuiteConfig) -> Dict[str, Metric]:
+    from src.embedding.embedding_cache import EmbeddingCache
+    from src.embedding.embedding_model import encode
+
+    sentences = _sentences(cfg)
+    model = HashingEmbeddingModel()
+    seconds = best_of(lambda: model.encode(sentences, batch_size=64), cfg.repeat)
+    unique = list(dict.fromkeys(sentences))
+    with tempfile.TemporaryDirectory() as tmp:
+        caches: List[EmbeddingCache] = []
+
+        def _cold() -> None:
+            # 每次使用新的缓存目录：全部未命中，编码后逐条落盘
+            caches.append(EmbeddingCache(os.path.join(tmp, str(len(caches)))))
+            encode(unique, model=model, model_name=_STAND_IN_NAME, batch_size=64, cache=caches[-1])
+
+        miss_s = best_of(_cold, cfg.repeat)
+        hit_s = best_of(lambda: encode(unique, model=model, model_name=_STAND_IN_NAME, cache=caches[-1]),
+                        cfg.repeat)
+    return {"sentences_per_s": Metric(len(sentences) / seconds, "sentences/s"),
+            # 未命中路径逐条写文件，主要受文件系统影响，只记录不比较
+            "cache_miss_per_s": Metric(len(unique) / miss_s, "sentences/s", None),
+            "cache_hit_per_s": Metric(len(unique) / hit_s, "sentences/s")}
+
+
+def _traced(build: Callable[[], Any]) -> Tuple[Any, int, float]:
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    obj = build()
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return obj, current, elapsed
+
+
+@benchmark("records")
+def bench_records(cfg: SuiteConfig) -> Dict[str, Metric]:
+    from benchmarks.bench_record_memory import typical_records
+    from src.tokenizer.record_batch import RecordBatch
+
+    n = cfg.records
+    build_s = best_of(lambda: typical_records(n), cfg.repeat)
+    records, list_bytes, _ = _traced(lambda: typical_records(n))
+    _, batch_bytes, _ = _traced(lambda: RecordBatch.from_records(records))
+    return {"records_per_s": Metric(n / build_s, "records/s"),
+            "list_bytes_per_record": Metric(list_bytes / n, "B", False),
+            "batch_bytes_per_record": Metric(batch_bytes / n, "B", False)}
+
+
+def _ns_per_call(fn: Callable[[int], Any], calls: int, repeat: int) -> float:
+    def _loop() -> None:
+        for i in range(calls):
+            fn(i)
+    _loop()  # 预热
+    return best_of(_loop, repeat) / calls * 1e9
+
+
+@benchmark("decorators")
+def bench_decorators(cfg: SuiteConfig) -> Dict[str, Metric]:
+    from src.libs import metrics
+    from src.libs.metrics import span
+    from src.libs.project_logger import logger
+    from src.libs.record_time import record_time
+    from src.libs.retry_tool import retry
+
+    def noop(x):
+        return x
+
+    def with_span(x):
+        with span("bench"):
+            return x
+
+    def log(x):
+        logger.info("[BENCH] value=%s", x)
+
+    timed, retried = record_time(noop), retry(retry_time=3)(noop)
+    saved = (metrics.config.enabled, metrics.config.log_calls, metrics.config.sample_every)
+    handlers = logger.handlers[:]
+    # 只计格式化与 handler 分发，不含磁盘/终端 IO
+    logger.handlers = [logging.NullHandler()]
+    try:
+        out = {}
+        metrics.configure(enabled=True, log_calls=False, sample_rate=1.0)
+        out["record_time_ns"] = _ns_per_call(timed, cfg.calls, cfg.repeat)
+        out["span_ns"] = _ns_per_call(with_span, cfg.calls, cfg.repeat)
+        metrics.configure(log_calls=True)
+        out["record_time_log_ns"] = _ns_per_call(timed, cfg.calls, cfg.repeat)
+        out["retry_ns"] = _ns_per_call(retried, cfg.calls, cfg.repeat)
+        out["logger_info_ns"] = _ns_per_call(log, cfg.calls, cfg.repeat)
+    finally:
+        metrics.configure(enabled=saved[0], log_calls=saved[1], sample_rate=1 / saved[2])
+        logger.handlers = handlers
+    return {name: Metric(value, "ns", False) for name, value in out.items()}
+
+
+def environment() -> Dict[str, Any]:
+    return {"python": platform.python_version(), "numpy": np.__version__, "platform": platform.platform(),
+            "machine": platform.machine(), "cpu_count": os.cpu_count()}
+
+
+def run_suite(names: Optional[Sequence[str]] = None, config: Optional[SuiteConfig] = None) -> Dict[str, Any]:
+    """运行基准并返回可序列化为 JSON 的结果"""
+    config = config or SuiteConfig()
+    names = list(names or BENCHMARKS)
+    unknown = [n for n in names if n not in BENCHMARKS]
+    if unknown:
+        raise ValueError(f"unknown benchmarks: {unknown}, available: {list(BENCHMARKS)}")
+    results = {}
+    for name in names:
+        start = time.perf_counter()
+        results[name] = {key: asdict(metric) for key, metric in BENCHMARKS[name](config).items()}
+        print(f"[{name}] done in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+    return {"schema": SCHEMA_VERSION, "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "environment": environment(), "config": asdict(config), "results": results}
+
+
+@dataclass
+class Comparison:
+    metric: str
+    baseline: float
+    current: float
+    change: float            # 相对变化，正数表示变好
+    regressed: bool
+
+
+def incompatibilities(current: Dict[str, Any], baseline: Dict[str, Any]) -> List[str]:
+    """两次运行不可对比的原因：schema 不同，或规模参数不同；为空表示可以对比"""
+    reasons = []
+    if baseline.get("schema") != current.get("schema"):
+        reasons.append(f"schema {baseline.get('schema')!r} != {current.get('schema')!r}")
+    base_config, config = baseline.get("config") or {}, current.get("config") or {}
+    for key in _COMPARABLE_CONFIG:
+        if base_config.get(key) != config.get(key):
+            reasons.append(f"config.{key} {base_config.get(key)!r} != {config.get(key)!r}")
+    return reasons
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float = 0.15) -> List[Comparison]:
+    """
+    逐指标对比两次运行；只比较两边都有且带方向的指标
+    :param threshold: 允许的相对退化幅度，如 0.15 表示变差超过 15% 视为退化
+    :raises ValueError: 基线的 schema 或规模参数与本次运行不同（见 incompatibilities）
+    """
+    reasons = incompatibilities(current, baseline)
+    if reasons:
+        raise ValueError(f"baseline is not comparable with this run: {'; '.join(reasons)}")
+    out = []
+    for bench, metrics_ in current["results"].items():
+        for key, metric in metrics_.items():
+            base = baseline.get("results", {}).get(bench, {}).get(key)
+            if base is None or metric["higher_is_better"] is None or not base["value"]:
+                continue
+            ratio = metric["value"] / base["value"]
+            change = ratio - 1 if metric["higher_is_better"] else 1 / ratio - 1 if ratio else float("inf")
+            out.append(Comparison(f"{bench}.{key}", base["value"], metric["value"], change, change < -threshold))
+    return out
+
+
+def format_results(report: Dict[str, Any]) -> str:
+    lines = []
+    for bench, metrics_ in report["results"].items():
+        for key, metric in metrics_.items():
+            lines.append(f"{bench + '.' + key:<34}{_fmt(metric['value']):>12} {metric['unit']}")
+    return "\n".join(lines)
+
+
+def format_comparison(comparisons: Sequence[Comparison]) -> str:
+    lines = [f"{'metric':<34}{'baseline':>12}{'current':>12}{'change':>9}"]
+    for c in comparisons:
+        lines.append(f"{c.metric:<34}{_fmt(c.baseline):>12}{_fmt(c.current):>12}{c.change:>+9.1%}"
+                     + ("  REGRESSION" if c.regressed else ""))
+    return "\n".join(lines)
+
+
+def _fmt(value: float) -> str:
+    return f"{value:.2f}" if abs(value) < 100 else f"{value:.0f}"
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS), help="只运行指定基准")
+    parser.add_argument("--quick", action="store_true", help="小规模运行（CI 冒烟）")
+    parser.add_argument("--repeat", type=int, default=None, help="每项取最优的重复次数")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="结果 JSON 路径")
+    parser.add_argument("--baseline", help="基线 JSON 路径，给出时与之对比")
+    parser.add_argument("--threshold", type=float, default=0.15, help="允许的相对退化幅度")
+    args = parser.parse_args(argv)
+
+    config = SuiteConfig.quick() if args.quick else SuiteConfig()
+    config.seed = args.seed
+    if args.repeat:
+        config.repeat = args.repeat
+    report = run_suite(args.only, config)
+    print(format_results(report))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    if not args.baseline:
+        return 0
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    reasons = incompatibilities(report, baseline)
+    if reasons:
+        print(f"\nbaseline {args.baseline} is not comparable with this run: {'; '.join(reasons)}", file=sys.stderr)
+        return 2
+    comparisons = compare(report, baseline, args.threshold)
+    print()
+    print(format_comparison(comparisons))
+    regressed = [c.metric for c in comparisons if c.regressed]
+    if regressed:
+        print(f"\n{len(regressed)} regression(s) beyond {args.threshold:.0%}: {', '.join(regressed)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
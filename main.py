@@ -1,16 +1,78 @@
-# This is a sample Python script.
+import argparse
+import json
+import sys
+from typing import List, Optional
 
-# Press Shift+F10 to execute it or replace it with your code.
-# Press Double Shift to search everywhere for classes, files, tool windows, actions, and settings.
+from src.libs.project_logger import logger
 
 
-def print_hi(name):
-    # Use a breakpoint in the code line below to debug your script.
-    print(f'Hi, {name}')  # Press Ctrl+F8 to toggle the breakpoint.
+def _build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="RAG 数据处理命令行工具")
+    sub = parser.add_subparsers(dest="command", required=True)
 
+    ingest = sub.add_parser("ingest", help="遍历目录：加载 → 分句 → 语义切分 → 向量化")
+    ingest.add_argument("root", help="语料根目录")
+    ingest.add_argument("--pattern", action="append", default=None,
+                        help="文件名通配符，可重复指定（默认 *.txt 与 *.md）")
+    ingest.add_argument("--workers", type=int, default=None, help="加载/分句进程数，默认 CPU 核数")
+    ingest.add_argument("--queue-size", type=int, default=64, help="阶段间队列容量")
+    ingest.add_argument("--batch-size", type=int, default=256, help="向量化批大小")
+    ingest.add_argument("--output", default=None, help="输出 JSON Lines 文件；不指定时只统计不落盘")
+    ingest.add_argument("--manifest", default=None,
+                        help="增量入库清单文件：跳过未变化的文件，已删除/修改的片段以 {\"deleted\": id} 行输出")
+    ingest.add_argument("--milvus-uri", default=None,
+                        help="写入 Milvus（如 http://localhost:19530），已删除/修改的片段同步删除；需安装 pymilvus")
+    ingest.add_argument("--milvus-collection", default="rag_chunks", help="Milvus 集合名，不存在时自动创建")
+    ingest.add_argument("--milvus-batch-size", type=int, default=2000, help="每个 Milvus 写入请求的行数")
+    ingest.add_argument("--metrics-out", default=None,
+                        help="结束后导出耗时指标（直方图与阶段 span）到文件或 http(s) 地址")
+    ingest.add_argument("--metrics-format", choices=("json", "prometheus"), default="json",
+                        help="指标导出格式")
+    return parser
 
-# Press the green button in the gutter to run the script.
-if __name__ == '__main__':
-    print_hi('PyCharm')
 
-# See PyCharm help at https://www.jetbrains.com/help/pycharm/
+def _ingest(args: argparse.Namespace) -> int:
+    from src.pipeline.ingestion_manifest import IngestionManifest
+    from src.pipeline.ingestion_pipeline import JsonlSink, ingest_directory
+
+    if args.milvus_uri:
+        from src.vector_store.milvus_sink import MilvusSink
+
+        sink = MilvusSink(args.milvus_collection, uri=args.milvus_uri, batch_size=args.milvus_batch_size)
+    elif args.output:
+        sink = JsonlSink(args.output)
+    else:
+        sink = lambda records, embeddings: None  # noqa: E731
+    manifest = IngestionManifest(args.manifest) if args.manifest else None
+    try:
+        report = ingest_directory(
+            args.root,
+            sink=sink,
+            patterns=tuple(args.pattern or ("*.txt", "*.md")),
+            workers=args.workers,
+            queue_size=args.queue_size,
+            batch_size=args.batch_size,
+            manifest=manifest,
+            on_tombstones=getattr(sink, "write_tombstones", None),
+        )
+    finally:
+        if hasattr(sink, "close"):
+            sink.close()
+        if args.metrics_out:
+            from src.libs.metrics import export_metrics
+
+            export_metrics(args.metrics_out, args.metrics_format)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = _build_parser().parse_args(argv)
+    if args.command == "ingest":
+        return _ingest(args)
+    logger.error("unknown command: %s", args.command)
+    return 2
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,5 +1,9 @@
 from abc import ABC, abstractmethod
-from typing import Any
+from dataclasses import dataclass
+from typing import Any, Iterator, Optional
+
+from src.tokenizer.record import SourceLocationMeta
+
 
 class BaseDataLoader(ABC):
     """数据处理抽象类，定义数据读取和预处理接口"""
@@ -19,3 +23,37 @@ class BaseDataLoader(ABC):
         返回处理后的文本数据（str）
         """
         pass
+
+
+@dataclass
+class TextSegment:
+    """流式读取得到的一段文本及其在原文件中的位置"""
+    text: str                # 片段文本（未做任何裁剪，与原文件字节一一对应）
+    offset: int              # 片段在原文件中的起始字节偏移
+    line_start: int          # 起始行号（从1开始）
+    line_end: int            # 结束行号（包含）
+
+    def to_source_location(self, path: Optional[str] = None) -> SourceLocationMeta:
+        return SourceLocationMeta(path=path, offset=self.offset,
+                                  line_start=self.line_start, line_end=self.line_end)
+
+
+class BaseStreamingDataLoader(ABC):
+    """流式数据读取抽象类：按有界大小逐段产出文本，内存占用与数据源大小无关"""
+
+    @abstractmethod
+    def iter_segments(self) -> Iterator[TextSegment]:
+        """
+        逐段产出文本片段，片段应尽量在段落/句子边界处切分
+        """
+        pass
+
+    def preprocess_segment(self, segment: TextSegment) -> TextSegment:
+        """
+        对单个片段做预处理，默认原样返回
+        """
+        return segment
+
+    def stream(self) -> Iterator[TextSegment]:
+        for segment in self.iter_segments():
+            yield self.preprocess_segment(segment)
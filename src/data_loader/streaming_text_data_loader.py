@@ -0,0 +1,75 @@
+import mmap
+import os
+from typing import Iterator
+
+from src.data_loader.base_data_loader import BaseStreamingDataLoader, TextSegment
+
+# 切分边界优先级：段落 > 句末标点 > 换行；均为 UTF-8 字节序列
+_PARAGRAPH_BREAK = b"\n\n"
+_SENTENCE_ENDS = tuple(p.encode("utf-8") for p in ("。", "！", "？", "；", "…", ". ", "! ", "? "))
+_LINE_BREAK = b"\n"
+
+
+class StreamingTextDataLoader(BaseStreamingDataLoader):
+    """基于 mmap 的流式文本读取，按段落/句子边界产出不超过 max_segment_bytes 的片段
+
+    仅支持 UTF-8 编码（边界查找直接在字节上进行）。
+    """
+
+    def __init__(self, filepath: str, max_segment_bytes: int = 64 * 1024, skip_blank: bool = True):
+        """
+        :param filepath: 文件路径
+        :param max_segment_bytes: 单个片段的最大字节数
+        :param skip_blank: 是否跳过只包含空白字符的片段
+        """
+        if max_segment_bytes < 4:
+            raise ValueError("max_segment_bytes must be >= 4")
+        self.filepath = filepath
+        self.max_segment_bytes = max_segment_bytes
+        self.skip_blank = skip_blank
+
+    def iter_segments(self) -> Iterator[TextSegment]:
+        with open(self.filepath, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size == 0:
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                pos, line = 0, 1
+                while pos < size:
+                    end = self._find_boundary(mm, pos, size)
+                    raw = mm[pos:end]
+                    newlines = raw.count(_LINE_BREAK)
+                    text = raw.decode("utf-8")
+                    if not (self.skip_blank and not text.strip()):
+                        # 以换行结尾的片段，结束行号不包含换行之后的那一行
+                        line_end = line + newlines - (1 if raw.endswith(_LINE_BREAK) else 0)
+                        yield TextSegment(text=text, offset=pos, line_start=line, line_end=max(line, line_end))
+                    line += newlines
+                    pos = end
+
+    def _find_boundary(self, mm: mmap.mmap, pos: int, size: int) -> int:
+        limit = pos + self.max_segment_bytes
+        if limit >= size:
+            return size
+
+        idx = mm.rfind(_PARAGRAPH_BREAK, pos, limit)
+        if idx > pos:
+            return idx + len(_PARAGRAPH_BREAK)
+
+        best = -1
+        for end_mark in _SENTENCE_ENDS:
+            idx = mm.rfind(end_mark, pos, limit)
+            if idx >= pos:
+                best = max(best, idx + len(end_mark))
+        if best > pos:
+            return best
+
+        idx = mm.rfind(_LINE_BREAK, pos, limit)
+        if idx >= pos:
+            return idx + 1
+
+        # 没有任何边界时硬切，并回退到 UTF-8 字符边界
+        end = limit
+        while end > pos + 1 and (mm[end] & 0xC0) == 0x80:
+            end -= 1
+        return end
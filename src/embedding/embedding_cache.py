@@ -0,0 +1,254 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import struct
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+# 缓存目录默认放在项目根目录下（src/embedding 向上两级）
+_PROJECT_ROOT = Path(__file__).resolve().parents[2]
+_DEFAULT_CACHE_DIR = _PROJECT_ROOT / "cache" / "embeddings"
+
+# 二进制条目格式：<magic:4s><dtype:B><reserved:3x><dim:I> + 向量原始字节（小端）
+_MAGIC = b"EMB1"
+_HEADER = struct.Struct("<4sB3xI")
+_DTYPES = {0: np.dtype("<f4"), 1: np.dtype("<f2")}
+_DTYPE_CODES = {v: k for k, v in _DTYPES.items()}
+_SUFFIX = ".emb"
+
+
+class EmbeddingCache:
+    """基于内容寻址的磁盘 embedding 缓存。
+
+    - 键为 (模型名, 是否归一化, 文本) 的 sha256，见 :meth:`make_key`
+    - 每条向量一个紧凑二进制文件（float32/float16），不使用 pickle
+    - 按总字节数做 LRU 淘汰，访问时刷新 mtime，使最近使用顺序在进程重启后仍然有效
+    - 多进程可共享同一目录：写入采用临时文件 + os.replace 保证原子性
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None,
+                 max_bytes: int = 2 * 1024 ** 3,
+                 dtype: str = "float32"):
+        """
+        :param cache_dir: 缓存目录，默认 <项目根>/cache/embeddings
+        :param max_bytes: 缓存总大小上限（字节），超出后按 LRU 淘汰
+        :param dtype: 落盘精度，"float32" 或 "float16"；读取时统一返回 float32
+        """
+        if max_bytes <= 0:
+            raise ValueError("max_bytes must be > 0")
+        self.cache_dir = Path(cache_dir) if cache_dir else _DEFAULT_CACHE_DIR
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.dtype = np.dtype(dtype).newbyteorder("<")
+        if self.dtype not in _DTYPE_CODES:
+            raise ValueError(f"unsupported dtype: {dtype}")
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        # key -> 文件大小；顺序即 LRU 顺序（尾部为最近使用）
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._total_bytes = 0
+        self._load_index()
+
+    @staticmethod
+    def make_key(model_name: str, normalize: bool, text: str) -> str:
+        """生成缓存键，同时作为 ProcessingTraceMeta.text_hash 写入记录"""
+        h = hashlib.sha256()
+        h.update(model_name.encode("utf-8"))
+        h.update(b"\x00")
+        h.update(b"1" if normalize else b"0")
+        h.update(b"\x00")
+        h.update(text.encode("utf-8"))
+        return h.hexdigest()
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+                self._forget(key)
+            return None
+
+        vector = self._decode(data)
+        if vector is None:
+            # 损坏或格式不符的条目直接丢弃
+            self._discard(key, path)
+            with self._lock:
+                self.misses += 1
+            return None
+
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        with self._lock:
+            self.hits += 1
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            else:
+                # 其他进程写入的条目
+                self._entries[key] = len(data)
+                self._total_bytes += len(data)
+        return vector
+
+    def put(self, key: str, vector: np.ndarray) -> None:
+        vector = np.asarray(vector).reshape(-1)
+        data = _HEADER.pack(_MAGIC, _DTYPE_CODES[self.dtype], vector.shape[0]) \
+            + vector.astype(self.dtype, copy=False).tobytes()
+
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            self._forget(key)
+            self._entries[key] = len(data)
+            self._total_bytes += len(data)
+            self._evict()
+
+    def get_many(self, keys: Sequence[str]) -> List[Optional[np.ndarray]]:
+        return [self.get(key) for key in keys]
+
+    def put_many(self, keys: Sequence[str], vectors: np.ndarray) -> None:
+        for key, vector in zip(keys, vectors):
+            self.put(key, vector)
+
+    def stats(self) -> Dict[str, float]:
+        """命中/未命中计数，用于评估缓存节省的重复计算量"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            for key in list(self._entries):
+                self._unlink(self._path(key))
+            self._entries.clear()
+            self._total_bytes = 0
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}{_SUFFIX}"
+
+    def _load_index(self) -> None:
+        found = []
+        for path in self.cache_dir.glob(f"*/*{_SUFFIX}"):
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                continue
+            found.append((st.st_mtime, path.stem, st.st_size))
+        found.sort()
+        for _, key, size in found:
+            self._entries[key] = size
+            self._total_bytes += size
+        with self._lock:
+            self._evict()
+
+    def _decode(self, data: bytes) -> Optional[np.ndarray]:
+        if len(data) < _HEADER.size:
+            return None
+        magic, code, dim = _HEADER.unpack_from(data)
+        dtype = _DTYPES.get(code)
+        if magic != _MAGIC or dtype is None or len(data) != _HEADER.size + dim * dtype.itemsize:
+            return None
+        return np.frombuffer(data, dtype=dtype, count=dim, offset=_HEADER.size).astype(np.float32)
+
+    def _forget(self, key: str) -> None:
+        size = self._entries.pop(key, None)
+        if size is not None:
+            self._total_bytes -= size
+
+    def _discard(self, key: str, path: Path) -> None:
+        self._unlink(path)
+        with self._lock:
+            self._forget(key)
+
+    def _evict(self) -> None:
+        # 调用方需持有 self._lock
+        while self._total_bytes > self.max_bytes and self._entries:
+            key, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            self.evictions += 1
+            self._unlink(self._path(key))
+
+    @staticmethod
+    def _unlink(path: Path) -> None:
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def encode_with_cache(texts: Sequence[str],
+                      encode_fn: Callable[[List[str]], np.ndarray],
+                      model_name: str,
+                      normalize: bool,
+                      cache: EmbeddingCache) -> np.ndarray:
+    """先查缓存，仅对未命中的文本调用一次 encode_fn，并将结果写回缓存
+
+    :param texts: 待编码文本
+    :param encode_fn: 批量编码函数，输入文本列表，返回 (n, dim) 矩阵
+    :param model_name: 模型名称（参与缓存键计算）
+    :param normalize: 是否归一化（参与缓存键计算）
+    :param cache: 缓存实例
+    :return: (len(texts), dim) 的 float32 矩阵
+    """
+    keys = [EmbeddingCache.make_key(model_name, normalize, t) for t in texts]
+    cached = cache.get_many(keys)
+
+    # 同一批次内的重复文本只编码一次
+    missing: Dict[str, int] = {}
+    for i, vec in enumerate(cached):
+        if vec is None and keys[i] not in missing:
+            missing[keys[i]] = i
+
+    if missing:
+        miss_idx = list(missing.values())
+        encoded = np.asarray(encode_fn([texts[i] for i in miss_idx]), dtype=np.float32)
+        cache.put_many([keys[i] for i in miss_idx], encoded)
+        fresh = dict(zip(missing.keys(), encoded))
+        cached = [vec if vec is not None else fresh[keys[i]] for i, vec in enumerate(cached)]
+
+    if not cached:
+        return np.zeros((0, 0), dtype=np.float32)
+    return np.stack(cached).astype(np.float32, copy=False)
+
+
+_default_cache: Optional[EmbeddingCache] = None
+_default_cache_lock = threading.Lock()
+
+
+def get_default_cache() -> EmbeddingCache:
+    """进程内共享的默认缓存，目录与容量可通过环境变量 RAG_EMBED_CACHE_DIR / RAG_EMBED_CACHE_MAX_BYTES 配置"""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = EmbeddingCache(
+                cache_dir=os.environ.get("RAG_EMBED_CACHE_DIR") or None,
+                max_bytes=int(os.environ.get("RAG_EMBED_CACHE_MAX_BYTES", 2 * 1024 ** 3)),
+                dtype=os.environ.get("RAG_EMBED_CACHE_DTYPE", "float32"),
+            )
+        return _default_cache
+
+
+__all__ = ["EmbeddingCache", "encode_with_cache", "get_default_cache"]
@@ -1,3 +1,59 @@
-from sentence_transformers import SentenceTransformer
+from typing import Any, List, Optional, Sequence
 
-BGE_LARGE_ZH_V1_5 = SentenceTransformer(r"E:\huggingface_cache\hub\models--BAAI--bge-large-zh-v1.5\bge-large-zh-v1.5")
\ No newline at end of file
+import numpy as np
+
+from src.embedding.embedding_cache import EmbeddingCache, encode_with_cache, get_default_cache
+from src.embedding.inference_backend import configured_cache_tag
+from src.embedding.model_registry import MODEL_REGISTRY
+
+
+def encode(sentences: Sequence[str],
+           model: Optional[Any] = None,
+           model_name: Optional[str] = None,
+           normalize_embeddings: bool = True,
+           batch_size: int = 32,
+           cache: Optional[EmbeddingCache] = None,
+           use_cache: bool = True,
+           device: Optional[str] = None,
+           dtype: Optional[str] = None) -> np.ndarray:
+    """
+    带磁盘缓存的批量编码，已见过的文本直接从缓存读取
+    :param sentences: 待编码文本
+    :param model: 推理后端或 SentenceTransformer 模型，默认从 MODEL_REGISTRY 按名称获取（首次使用时加载）
+    :param model_name: 模型名称，参与缓存键计算；默认为注册表的默认模型
+    :param normalize_embeddings: 是否归一化
+    :param batch_size: 未命中部分的编码批大小
+    :param cache: 缓存实例，默认使用进程共享的 get_default_cache()
+    :param use_cache: 为 False 时跳过缓存直接编码
+    :param device: 从注册表获取模型时使用的设备
+    :param dtype: 从注册表获取模型时使用的精度
+    :return: (n, dim) 的 float32 矩阵
+    """
+    model_name = model_name or MODEL_REGISTRY.default_name
+
+    def _encode(texts: List[str]) -> np.ndarray:
+        m = model if model is not None else MODEL_REGISTRY.get(model_name, device, dtype)
+        return m.encode(texts, batch_size=batch_size,
+                        normalize_embeddings=normalize_embeddings,
+                        convert_to_numpy=True)
+
+    if not use_cache:
+        return np.asarray(_encode(list(sentences)), dtype=np.float32)
+    return encode_with_cache(sentences, _encode, model_name + _cache_tag(model, model_name, device, dtype),
+                             normalize_embeddings, cache or get_default_cache())
+
+
+def _cache_tag(model: Optional[Any], model_name: str, device: Optional[str], dtype: Optional[str]) -> str:
+    # 量化等数值不完全一致的后端使用独立的缓存命名空间；模型未加载时按配置推断，避免仅为算缓存键而加载模型
+    if model is None and MODEL_REGISTRY.is_loaded(model_name, device, dtype):
+        model = MODEL_REGISTRY.get(model_name, device, dtype)
+    if model is not None:
+        return getattr(model, "cache_tag", "")
+    return configured_cache_tag(MODEL_REGISTRY.key(model_name, device, dtype)[2])
+
+
+def __getattr__(name: str) -> Any:
+    # 兼容旧用法：BGE_LARGE_ZH_V1_5 不再在导入时构建，而是首次访问时从注册表加载
+    if name == "BGE_LARGE_ZH_V1_5":
+        return MODEL_REGISTRY.get("BAAI/bge-large-zh-v1.5")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,223 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import Counter, deque
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.libs.project_logger import logger
+from src.libs.record_time import record_time
+from src.libs.retry_tool import retry
+
+EncodeFn = Callable[[List[str]], np.ndarray]
+
+# (文本, 结果 future, 入队时间)
+_Request = Tuple[str, "asyncio.Future[np.ndarray]", float]
+
+
+class ServiceStats:
+    """请求延迟（最近 window 个）与批大小分布统计"""
+
+    def __init__(self, window: int = 10000):
+        self.requests = 0
+        self.batches = 0
+        self.failed_batches = 0
+        self.latencies_ms: Deque[float] = deque(maxlen=window)
+        self.batch_sizes: Counter = Counter()
+
+    def observe_batch(self, size: int, ok: bool) -> None:
+        self.batches += 1
+        self.batch_sizes[size] += 1
+        if not ok:
+            self.failed_batches += 1
+
+    def observe_latency(self, latency_ms: float) -> None:
+        self.requests += 1
+        self.latencies_ms.append(latency_ms)
+
+    def as_dict(self) -> Dict[str, Any]:
+        latencies = np.asarray(self.latencies_ms, dtype=np.float64)
+        sizes = np.repeat(np.fromiter(self.batch_sizes.keys(), dtype=np.int64, count=len(self.batch_sizes)),
+                          np.fromiter(self.batch_sizes.values(), dtype=np.int64, count=len(self.batch_sizes)))
+
+        def _pct(values: np.ndarray, q: float) -> float:
+            return round(float(np.percentile(values, q)), 3) if len(values) else 0.0
+
+        return {
+            "requests": self.requests,
+            "batches": self.batches,
+            "failed_batches": self.failed_batches,
+            "latency_ms": {"p50": _pct(latencies, 50), "p99": _pct(latencies, 99),
+                           "max": round(float(latencies.max()), 3) if len(latencies) else 0.0},
+            "batch_size": {"p50": _pct(sizes, 50), "p99": _pct(sizes, 99),
+                           "mean": round(float(sizes.mean()), 3) if len(sizes) else 0.0,
+                           "histogram": dict(sorted(self.batch_sizes.items()))},
+        }
+
+
+class AsyncEmbeddingService:
+    """面向并发查询的异步 embedding 前端：把同时到达的 embed() 请求合并为微批次
+
+    - 凑满 max_batch_size 或距批次首个请求超过 max_wait_ms 时提交一批
+    - 模型在专用 executor 中运行（默认单线程），事件循环不被阻塞；
+      executor 忙时新请求继续累积，下一批自然变大
+    - 批次失败按 retry_time 重试，仍失败时该批所有请求收到同一异常
+    """
+
+    def __init__(self, encode_fn: Optional[EncodeFn] = None,
+                 model_name: Optional[str] = None,
+                 max_batch_size: int = 64,
+                 max_wait_ms: float = 5.0,
+                 executor: Optional[Executor] = None,
+                 max_in_flight: int = 1,
+                 retry_time: int = 1,
+                 latency_window: int = 10000):
+        """
+        :param encode_fn: 批量编码函数，默认使用 embedding_model.encode（查询向量不走磁盘缓存）
+        :param model_name: 默认 encode_fn 使用的模型名称
+        :param max_batch_size: 单批最大请求数
+        :param max_wait_ms: 批次首个请求的最长等待时间（毫秒）
+        :param executor: 运行模型的 executor，默认创建单线程 ThreadPoolExecutor 并在 close() 时关闭；
+                         传入 ProcessPoolExecutor 时 encode_fn 需可 pickle
+        :param max_in_flight: 同时在 executor 中执行的批次数
+        :param retry_time: 每个批次的尝试次数（含首次）
+        :param latency_window: 统计延迟分位数时保留的最近请求数
+        """
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be >= 1")
+        if encode_fn is None:
+            from src.embedding.embedding_model import encode
+
+            def encode_fn(texts: List[str]) -> np.ndarray:
+                return encode(texts, model_name=model_name, use_cache=False)
+
+        self.encode_fn = encode_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait_s = max_wait_ms / 1000
+        self.max_in_flight = max_in_flight
+        self._executor = executor or ThreadPoolExecutor(max_workers=1, thread_name_prefix="embedding-service")
+        self._owns_executor = executor is None
+        self._run_batch = retry(retry_time)(self._run_batch)
+        self._queue: Optional["asyncio.Queue[_Request]"] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._batcher: Optional["asyncio.Task[None]"] = None
+        self._tasks: set = set()
+        self.stats = ServiceStats(latency_window)
+
+    async def __aenter__(self) -> "AsyncEmbeddingService":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc: Any) -> None:
+        await self.close()
+
+    async def start(self) -> None:
+        if self._batcher is not None:
+            return
+        self._queue = asyncio.Queue()
+        self._slots = asyncio.Semaphore(self.max_in_flight)
+        self._batcher = asyncio.create_task(self._batch_loop(), name="embedding-service-batcher")
+
+    async def close(self) -> None:
+        """停止接收新批次，等待在途批次完成；未提交的请求被取消"""
+        if self._batcher is None:
+            return
+        self._batcher.cancel()
+        try:
+            await self._batcher
+        except asyncio.CancelledError:
+            pass
+        self._batcher = None
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        while not self._queue.empty():
+            _, future, _ = self._queue.get_nowait()
+            future.cancel()
+        if self._owns_executor:
+            self._executor.shutdown(wait=True)
+        logger.info("[EMBED] service closed %s", self.stats.as_dict())
+
+    async def embed(self, text: str) -> np.ndarray:
+        """编码单条文本，返回 (dim,) 向量"""
+        if self._batcher is None:
+            await self.start()
+        future: "asyncio.Future[np.ndarray]" = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((text, future, time.perf_counter()))
+        return await future
+
+    async def embed_many(self, texts: Sequence[str]) -> np.ndarray:
+        """并发提交多条文本（可能与其他调用方的请求合并），返回 (n, dim) 矩阵"""
+        vectors = await asyncio.gather(*(self.embed(t) for t in texts))
+        return np.stack(vectors) if vectors else np.zeros((0, 0), dtype=np.float32)
+
+    async def _batch_loop(self) -> None:
+        while True:
+            # executor 空闲时才开始凑批，忙碌期间的请求留在队列中并入下一批
+            await self._slots.acquire()
+            batch: List[_Request] = []
+            try:
+                await self._collect(batch)
+            except BaseException:
+                # 关闭时正在凑批的请求不会再被提交
+                for _, future, _ in batch:
+                    future.cancel()
+                self._slots.release()
+                raise
+            task = asyncio.create_task(self._dispatch(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _collect(self, batch: List[_Request]) -> None:
+        batch.append(await self._queue.get())
+        deadline = batch[0][2] + self.max_wait_s
+        while len(batch) < self.max_batch_size:
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+
+    async def _dispatch(self, batch: List[_Request]) -> None:
+        try:
+            live = [r for r in batch if not r[1].done()]
+            if not live:
+                return
+            try:
+                embeddings = await self._run_batch([text for text, _, _ in live])
+            except Exception as e:  # noqa: BLE001 - delivered to every waiting caller
+                self.stats.observe_batch(len(live), ok=False)
+                for _, future, _ in live:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+            self.stats.observe_batch(len(live), ok=True)
+            now = time.perf_counter()
+            for (_, future, enqueued), vector in zip(live, embeddings):
+                if not future.done():
+                    future.set_result(vector)
+                    self.stats.observe_latency((now - enqueued) * 1000)
+        finally:
+            self._slots.release()
+
+    async def _run_batch(self, texts: List[str]) -> np.ndarray:
+        loop = asyncio.get_running_loop()
+        embeddings = await loop.run_in_executor(self._executor, self._encode, self.encode_fn, texts)
+        if len(embeddings) != len(texts):
+            raise ValueError(f"encode_fn returned {len(embeddings)} vectors for {len(texts)} texts")
+        return embeddings
+
+    @staticmethod
+    @record_time
+    def _encode(encode_fn: EncodeFn, texts: List[str]) -> np.ndarray:
+        return np.asarray(encode_fn(texts), dtype=np.float32)
+
+
+__all__ = ["AsyncEmbeddingService", "ServiceStats"]
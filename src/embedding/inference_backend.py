@@ -0,0 +1,351 @@
+from __future__ import annotations
+
+import json
+import os
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from src.libs.project_logger import logger
+from src.libs.record_time import record_time
+
+# 导出目录中的文件名
+ONNX_MODEL_FILE = "model.onnx"
+ONNX_INT8_MODEL_FILE = "model_int8.onnx"
+ONNX_CONFIG_FILE = "rag_onnx.json"
+
+# sentence_transformers：直接使用 SentenceTransformer（默认）；torch / onnx：本模块的分桶推理后端
+BACKENDS = ("sentence_transformers", "torch", "onnx")
+
+
+def bucket_by_length(lengths: Sequence[int], max_batch_size: int = 32,
+                     max_tokens: Optional[int] = None) -> List[np.ndarray]:
+    """
+    按 token 长度分桶：排序后贪心装箱，使每批 padding 后的 token 数（批大小 × 批内最大长度）不超过 max_tokens
+    :param lengths: 每条序列的 token 数
+    :param max_batch_size: 单批条数上限
+    :param max_tokens: 单批 padding 后 token 数上限，None 时只按条数切分；超长的单条序列独占一批
+    :return: 原始下标数组的列表，批内长度相近
+    """
+    if max_batch_size < 1:
+        raise ValueError("max_batch_size must be >= 1")
+    lengths = np.asarray(lengths, dtype=np.int64)
+    order = np.argsort(lengths, kind="stable")
+    batches: List[np.ndarray] = []
+    start = 0
+    for end in range(1, len(order) + 1):
+        # 升序排列时批内最大长度就是最后一条的长度
+        size = end - start
+        if end < len(order):
+            next_size = size + 1
+            fits = next_size <= max_batch_size and (
+                max_tokens is None or next_size * int(lengths[order[end]]) <= max_tokens)
+            if fits:
+                continue
+        batches.append(order[start:end])
+        start = end
+    return batches
+
+
+def pad_batch(token_ids: Sequence[Sequence[int]], pad_id: int = 0) -> tuple:
+    """右侧补齐到批内最大长度，返回 (input_ids, attention_mask)，均为 (b, max_len) 的 int64"""
+    max_len = max(len(ids) for ids in token_ids)
+    input_ids = np.full((len(token_ids), max_len), pad_id, dtype=np.int64)
+    attention_mask = np.zeros((len(token_ids), max_len), dtype=np.int64)
+    for row, ids in enumerate(token_ids):
+        input_ids[row, :len(ids)] = ids
+        attention_mask[row, :len(ids)] = 1
+    return input_ids, attention_mask
+
+
+class EmbeddingBackend(ABC):
+    """embedding 推理后端：先整体分词，按 token 长度分桶，再逐桶前向
+
+    encode() 与 SentenceTransformer.encode 的常用参数兼容，可直接注册到 MODEL_REGISTRY。
+    分桶后每批的 padding 接近于零，同样的 token 预算下长短句混合的语料吞吐更高。
+    """
+
+    name = "base"
+
+    def __init__(self, max_tokens_per_batch: Optional[int] = 16384):
+        """
+        :param max_tokens_per_batch: 单批 padding 后 token 数上限，限制长句批次的峰值内存
+        """
+        self.max_tokens_per_batch = max_tokens_per_batch
+        self.padded_tokens = 0
+        self.real_tokens = 0
+
+    @property
+    def cache_tag(self) -> str:
+        """参与 embedding 缓存键的后缀：数值不完全一致的后端不共享缓存"""
+        return ""
+
+    @abstractmethod
+    def tokenize(self, texts: List[str]) -> List[List[int]]:
+        """分词（含特殊符号、截断），不做 padding"""
+
+    @abstractmethod
+    def forward(self, token_ids: List[List[int]]) -> np.ndarray:
+        """一个长度相近的批次前向，返回 (b, dim) 的句向量（未归一化）"""
+
+    def encode(self, sentences: Sequence[str], batch_size: int = 32, normalize_embeddings: bool = True,
+               convert_to_numpy: bool = True, **kwargs: Any) -> np.ndarray:
+        texts = [sentences] if isinstance(sentences, str) else list(sentences)
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        token_ids = self.tokenize(texts)
+        lengths = [len(ids) for ids in token_ids]
+        out: Optional[np.ndarray] = None
+        for batch in bucket_by_length(lengths, batch_size, self.max_tokens_per_batch):
+            vectors = np.asarray(self.forward([token_ids[i] for i in batch]), dtype=np.float32)
+            if out is None:
+                out = np.empty((len(texts), vectors.shape[1]), dtype=np.float32)
+            out[batch] = vectors
+            self.padded_tokens += len(batch) * max(lengths[i] for i in batch)
+        self.real_tokens += sum(lengths)
+        if normalize_embeddings:
+            out /= np.maximum(np.linalg.norm(out, axis=1, keepdims=True), 1e-12)
+        return out[0] if isinstance(sentences, str) else out
+
+
+class TorchBackend(EmbeddingBackend):
+    """PyTorch 推理：包装 SentenceTransformer，分词与 padding 由后端完成，前向复用模型自身的池化与归一化层
+
+    需通过 RAG_EMBED_BACKEND=torch 显式启用。encode() 只支持本项目用到的参数：不支持 convert_to_tensor /
+    show_progress_bar；模型自带 Normalize 层时 normalize_embeddings=False 不生效。
+    """
+
+    name = "torch"
+
+    def __init__(self, model: Any, num_threads: Optional[int] = None,
+                 max_tokens_per_batch: Optional[int] = 16384):
+        """
+        :param model: SentenceTransformer 实例
+        :param num_threads: torch intra-op 线程数（torch.set_num_threads，进程级设置）
+        """
+        super().__init__(max_tokens_per_batch)
+        import torch
+
+        self._torch = torch
+        self.model = model
+        if num_threads:
+            torch.set_num_threads(num_threads)
+        self._tokenizer = model.tokenizer
+        self._with_token_type = "token_type_ids" in getattr(self._tokenizer, "model_input_names", ())
+
+    def __getattr__(self, name: str) -> Any:
+        # 兼容直接使用 SentenceTransformer 其他方法的调用方
+        if name == "model":
+            raise AttributeError(name)
+        return getattr(self.model, name)
+
+    def tokenize(self, texts: List[str]) -> List[List[int]]:
+        return self._tokenizer(texts, truncation=True, max_length=self.model.max_seq_length)["input_ids"]
+
+    def forward(self, token_ids: List[List[int]]) -> np.ndarray:
+        torch = self._torch
+        input_ids, attention_mask = pad_batch(token_ids, self._tokenizer.pad_token_id or 0)
+        features = {"input_ids": torch.from_numpy(input_ids), "attention_mask": torch.from_numpy(attention_mask)}
+        if self._with_token_type:
+            features["token_type_ids"] = torch.zeros_like(features["input_ids"])
+        features = {k: v.to(self.model.device) for k, v in features.items()}
+        with torch.inference_mode():
+            embeddings = self.model(features)["sentence_embedding"]
+        return embeddings.float().cpu().numpy()
+
+    @property
+    def cache_tag(self) -> str:
+        # 分桶 padding 与 SentenceTransformer 的批内 padding 不同，数值只近似一致，不共享缓存
+        return "@torch-bucketed"
+
+
+class OnnxBackend(EmbeddingBackend):
+    """ONNX Runtime CPU 推理，读取 export_onnx() 导出的目录（模型、分词器与池化配置）"""
+
+    name = "onnx"
+
+    def __init__(self, model_dir: str, quantized: bool = True, num_threads: Optional[int] = None,
+                 max_tokens_per_batch: Optional[int] = 16384):
+        """
+        :param model_dir: export_onnx() 的输出目录
+        :param quantized: 使用 int8 动态量化模型（默认），否则使用 fp32 模型
+        :param num_threads: intra-op 线程数，默认由 ONNX Runtime 按物理核数决定；inter-op 固定为 1
+        """
+        super().__init__(max_tokens_per_batch)
+        try:
+            import onnxruntime as ort
+            from transformers import AutoTokenizer
+        except ImportError as e:
+            raise ImportError("OnnxBackend requires onnxruntime and transformers: "
+                              "pip install onnxruntime transformers") from e
+
+        with open(os.path.join(model_dir, ONNX_CONFIG_FILE), encoding="utf-8") as f:
+            self.config: Dict[str, Any] = json.load(f)
+        self.quantized = quantized
+        model_path = os.path.join(model_dir, ONNX_INT8_MODEL_FILE if quantized else ONNX_MODEL_FILE)
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"{model_path} not found, run export_onnx() first")
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.inter_op_num_threads = 1
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(model_path, sess_options=options, providers=["CPUExecutionProvider"])
+        self._input_names = {i.name for i in self.session.get_inputs()}
+        self._tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self.pooling = self.config.get("pooling", "cls")
+        self.max_length = int(self.config.get("max_length", 512))
+        logger.info("[MODEL] onnx session path=%s intra_op_threads=%s pooling=%s",
+                    model_path, num_threads or "auto", self.pooling)
+
+    @property
+    def cache_tag(self) -> str:
+        return "@onnx-int8" if self.quantized else "@onnx-fp32"
+
+    def tokenize(self, texts: List[str]) -> List[List[int]]:
+        return self._tokenizer(texts, truncation=True, max_length=self.max_length)["input_ids"]
+
+    def forward(self, token_ids: List[List[int]]) -> np.ndarray:
+        input_ids, attention_mask = pad_batch(token_ids, self._tokenizer.pad_token_id or 0)
+        feed = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self._input_names:
+            feed["token_type_ids"] = np.zeros_like(input_ids)
+        hidden = self.session.run(None, feed)[0]  # (b, seq, hidden)
+        if self.pooling == "cls":
+            return hidden[:, 0]
+        mask = attention_mask[:, :, None].astype(np.float32)
+        return (hidden * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+
+
+@record_time
+def export_onnx(model_path: str, output_dir: str, quantize: bool = True, opset: int = 17) -> str:
+    """
+    将 SentenceTransformer 模型导出为 ONNX，并可选生成 int8 动态量化版本
+    :param model_path: 模型名称或本地路径
+    :param output_dir: 输出目录，写入 model.onnx、model_int8.onnx、分词器与 rag_onnx.json
+    :param quantize: 是否做 int8 动态量化（权重 int8，激活按批动态量化，Linear/MatMul 走 int8 GEMM）
+    :param opset: ONNX opset 版本
+    :return: 输出目录
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    os.makedirs(output_dir, exist_ok=True)
+    st = SentenceTransformer(model_path, device="cpu")
+    transformer = st[0].auto_model.eval()
+    tokenizer = st.tokenizer
+    pooling = st[1].get_pooling_mode_str() if len(st) > 1 else "cls"
+    if pooling not in ("cls", "mean"):
+        raise ValueError(f"unsupported pooling mode for onnx export: {pooling}")
+
+    dummy = tokenizer(["导出示例句子"], return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in dummy]
+    dynamic_axes = {name: {0: "batch", 1: "seq"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "seq"}
+    fp32_path = os.path.join(output_dir, ONNX_MODEL_FILE)
+    with torch.inference_mode():
+        torch.onnx.export(transformer, tuple(dummy[name] for name in input_names), fp32_path,
+                          input_names=input_names, output_names=["last_hidden_state"],
+                          dynamic_axes=dynamic_axes, opset_version=opset, do_constant_folding=True)
+    tokenizer.save_pretrained(output_dir)
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        quantize_dynamic(fp32_path, os.path.join(output_dir, ONNX_INT8_MODEL_FILE), weight_type=QuantType.QInt8)
+    with open(os.path.join(output_dir, ONNX_CONFIG_FILE), "w", encoding="utf-8") as f:
+        json.dump({"source": model_path, "pooling": pooling, "max_length": st.max_seq_length,
+                   "dim": st.get_sentence_embedding_dimension(), "quantized": quantize}, f, ensure_ascii=False)
+    logger.info("[MODEL] exported onnx model=%s output=%s pooling=%s int8=%s", model_path, output_dir, pooling,
+                quantize)
+    return output_dir
+
+
+@dataclass
+class ParityReport:
+    min_cosine: float
+    mean_cosine: float
+    threshold: float
+
+    @property
+    def passed(self) -> bool:
+        return self.min_cosine >= self.threshold
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"min_cosine": round(self.min_cosine, 5), "mean_cosine": round(self.mean_cosine, 5),
+                "threshold": self.threshold, "passed": self.passed}
+
+
+def parity_check(reference: Any, candidate: Any, texts: Sequence[str], min_cosine: float = 0.99,
+                 batch_size: int = 32) -> ParityReport:
+    """
+    逐句比较两个后端的向量（如 PyTorch fp32 与 ONNX int8）
+    :param reference: 参考模型（任何带 encode 的对象）
+    :param candidate: 待验证的后端
+    :param texts: 校验语料，应覆盖长短句与中英文
+    :param min_cosine: 每个句子的余弦相似度下限
+    """
+    texts = list(texts)
+    expected = np.asarray(reference.encode(texts, batch_size=batch_size, normalize_embeddings=True), dtype=np.float32)
+    actual = np.asarray(candidate.encode(texts, batch_size=batch_size, normalize_embeddings=True), dtype=np.float32)
+    if expected.shape != actual.shape:
+        raise ValueError(f"shape mismatch: {expected.shape} vs {actual.shape}")
+    cosine = np.einsum("ij,ij->i", expected, actual)
+    report = ParityReport(float(cosine.min()), float(cosine.mean()), min_cosine)
+    logger.info("[MODEL] parity %s vs %s: %s", type(reference).__name__, type(candidate).__name__,
+                report.as_dict())
+    return report
+
+
+def configured_backend() -> str:
+    backend = os.environ.get("RAG_EMBED_BACKEND") or "sentence_transformers"
+    if backend not in BACKENDS:
+        raise ValueError(f"RAG_EMBED_BACKEND must be one of {BACKENDS}, got {backend!r}")
+    return backend
+
+
+def configured_cache_tag(dtype: Optional[str] = None) -> str:
+    """不加载模型时推断 cache_tag，与已加载后端的 cache_tag 一致"""
+    backend = configured_backend()
+    if backend == "torch":
+        return "@torch-bucketed"
+    if backend != "onnx":
+        return ""
+    return "@onnx-fp32" if dtype == "float32" else "@onnx-int8"
+
+
+def _num_threads() -> Optional[int]:
+    value = os.environ.get("RAG_EMBED_THREADS")
+    return int(value) if value else None
+
+
+def load_backend(path: str, device: Optional[str], dtype: Optional[str]) -> Any:
+    """
+    MODEL_REGISTRY 的默认加载函数，按环境变量选择后端；返回值只保证有兼容的 encode()，
+    默认后端下不是 EmbeddingBackend：
+    - RAG_EMBED_BACKEND：sentence_transformers（默认，返回 SentenceTransformer 本身）、torch（TorchBackend）或 onnx
+    - RAG_EMBED_THREADS：intra-op 线程数
+    - RAG_EMBED_ONNX_PATH：export_onnx() 输出目录，缺省时把 path 当作该目录；dtype="float32" 时使用未量化模型
+    """
+    backend = configured_backend()
+    if backend == "onnx":
+        if device and not device.startswith("cpu"):
+            raise ValueError(f"onnx backend only supports cpu, got device={device!r}")
+        return OnnxBackend(os.environ.get("RAG_EMBED_ONNX_PATH") or path, quantized=dtype != "float32",
+                           num_threads=_num_threads())
+
+    from src.embedding.model_registry import _load_sentence_transformer
+
+    model = _load_sentence_transformer(path, device, dtype)
+    if backend == "sentence_transformers":
+        return model
+    return TorchBackend(model, num_threads=_num_threads())
+
+
+__all__ = ["BACKENDS", "EmbeddingBackend", "TorchBackend", "OnnxBackend", "ParityReport", "bucket_by_length",
+           "pad_batch", "export_onnx", "parity_check", "load_backend", "configured_backend",
+           "configured_cache_tag"]
@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+import os
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from src.libs.project_logger import logger
+from src.libs.record_time import record_time
+
+DEFAULT_MODEL_NAME = "BAAI/bge-large-zh-v1.5"
+
+# (模型名, 设备, 精度)
+ModelKey = Tuple[str, Optional[str], Optional[str]]
+
+
+def _load_sentence_transformer(path: str, device: Optional[str], dtype: Optional[str]) -> Any:
+    # 延迟导入：仅在真正需要模型时才加载 torch / sentence_transformers
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer(path, device=device)
+    if dtype:
+        import torch
+
+        model = model.to(dtype=getattr(torch, dtype))
+    return model
+
+
+def _load_model(path: str, device: Optional[str], dtype: Optional[str]) -> Any:
+    # 默认直接加载 SentenceTransformer；RAG_EMBED_BACKEND=torch / onnx 时改用 src.embedding.inference_backend 的推理后端
+    if not os.environ.get("RAG_EMBED_BACKEND"):
+        return _load_sentence_transformer(path, device, dtype)
+    from src.embedding.inference_backend import load_backend
+
+    return load_backend(path, device, dtype)
+
+
+class ModelRegistry:
+    """进程内模型注册表：首次使用时加载，按 (名称, 设备, 精度) 共享单例，可显式卸载。
+
+    配置来源（优先级从高到低）：
+    - 调用参数
+    - configure() 设置的值
+    - 环境变量 RAG_EMBED_MODEL / RAG_EMBED_MODEL_PATH / RAG_EMBED_DEVICE / RAG_EMBED_DTYPE
+
+    默认加载 SentenceTransformer；设置 RAG_EMBED_BACKEND=torch / onnx 时加载对应的推理后端（EmbeddingBackend），
+    线程数由 RAG_EMBED_THREADS 决定。
+    """
+
+    def __init__(self, loader: Callable[[str, Optional[str], Optional[str]], Any] = _load_model):
+        self._loader = loader
+        self._models: Dict[ModelKey, Any] = {}
+        self._model_paths: Dict[str, str] = {}
+        self._default_name: Optional[str] = None
+        self._default_device: Optional[str] = None
+        self._default_dtype: Optional[str] = None
+        self._lock = threading.Lock()
+        self._key_locks: Dict[ModelKey, threading.Lock] = {}
+
+    def configure(self, default_name: Optional[str] = None,
+                  model_paths: Optional[Dict[str, str]] = None,
+                  device: Optional[str] = None,
+                  dtype: Optional[str] = None) -> None:
+        """
+        :param default_name: 默认模型名称
+        :param model_paths: 模型名称 -> 本地路径，未配置的名称直接作为路径/HuggingFace Hub ID 加载
+        :param device: 默认设备，如 "cpu"、"cuda"
+        :param dtype: 默认精度，如 "float16"、"bfloat16"
+        """
+        with self._lock:
+            if default_name is not None:
+                self._default_name = default_name
+            if model_paths:
+                self._model_paths.update(model_paths)
+            if device is not None:
+                self._default_device = device
+            if dtype is not None:
+                self._default_dtype = dtype
+
+    @property
+    def default_name(self) -> str:
+        return self._default_name or os.environ.get("RAG_EMBED_MODEL") or DEFAULT_MODEL_NAME
+
+    def resolve_path(self, name: str) -> str:
+        if name in self._model_paths:
+            return self._model_paths[name]
+        env_path = os.environ.get("RAG_EMBED_MODEL_PATH")
+        if env_path and name == self.default_name:
+            return env_path
+        return name
+
+    def key(self, name: Optional[str] = None, device: Optional[str] = None,
+            dtype: Optional[str] = None) -> ModelKey:
+        return (
+            name or self.default_name,
+            device or self._default_device or os.environ.get("RAG_EMBED_DEVICE") or None,
+            dtype or self._default_dtype or os.environ.get("RAG_EMBED_DTYPE") or None,
+        )
+
+    def get(self, name: Optional[str] = None, device: Optional[str] = None,
+            dtype: Optional[str] = None) -> Any:
+        """获取模型，未加载时加载；同一 key 并发调用只会加载一次"""
+        key = self.key(name, device, dtype)
+        model = self._models.get(key)
+        if model is not None:
+            return model
+
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            model = self._models.get(key)
+            if model is None:
+                model = self._load(key)
+                self._models[key] = model
+        return model
+
+    def register_model(self, model: Any, name: Optional[str] = None, device: Optional[str] = None,
+                       dtype: Optional[str] = None) -> None:
+        """直接注册已构建好的模型实例（如测试或基准中的替身模型）"""
+        self._models[self.key(name, device, dtype)] = model
+
+    def is_loaded(self, name: Optional[str] = None, device: Optional[str] = None,
+                  dtype: Optional[str] = None) -> bool:
+        return self.key(name, device, dtype) in self._models
+
+    def loaded(self) -> List[ModelKey]:
+        return list(self._models)
+
+    def unload(self, name: Optional[str] = None, device: Optional[str] = None,
+               dtype: Optional[str] = None) -> bool:
+        """卸载指定模型，返回是否确实卸载了模型"""
+        key = self.key(name, device, dtype)
+        with self._lock:
+            model = self._models.pop(key, None)
+        if model is None:
+            return False
+        logger.info("[MODEL] unloaded name=%s device=%s dtype=%s", *key)
+        del model
+        self._release_device_memory(key[1])
+        return True
+
+    def unload_all(self) -> None:
+        for key in self.loaded():
+            self.unload(*key)
+
+    @record_time
+    def _load(self, key: ModelKey) -> Any:
+        name, device, dtype = key
+        path = self.resolve_path(name)
+        logger.info("[MODEL] loading name=%s path=%s device=%s dtype=%s", name, path, device, dtype)
+        return self._loader(path, device, dtype)
+
+    @staticmethod
+    def _release_device_memory(device: Optional[str]) -> None:
+        if not device or not device.startswith("cuda"):
+            return
+        try:
+            import torch
+
+            torch.cuda.empty_cache()
+        except ImportError:
+            pass
+
+
+MODEL_REGISTRY = ModelRegistry()
+
+
+def get_model(name: Optional[str] = None, device: Optional[str] = None, dtype: Optional[str] = None) -> Any:
+    return MODEL_REGISTRY.get(name, device, dtype)
+
+
+def unload_model(name: Optional[str] = None, device: Optional[str] = None, dtype: Optional[str] = None) -> bool:
+    return MODEL_REGISTRY.unload(name, device, dtype)
+
+
+__all__ = ["DEFAULT_MODEL_NAME", "ModelRegistry", "MODEL_REGISTRY", "get_model", "unload_model"]
@@ -0,0 +1,338 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+import urllib.request
+from bisect import bisect_left
+from contextvars import ContextVar
+from time import perf_counter
+from typing import Any, Dict, List, Optional, Tuple
+
+from src.libs.project_logger import logger
+
+# Log-spaced latency buckets: 1us * 2^i, up to ~134s; the last bucket is +Inf.
+_BUCKETS: Tuple[float, ...] = tuple(1e-6 * 2 ** i for i in range(28))
+_KINDS = ("function", "span")
+
+
+def _env_flag(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() not in ("0", "false", "no", "off", "")
+
+
+class InstrumentationConfig:
+    """Runtime switches shared by ``record_time`` and ``span``.
+
+    Attributes
+    ----------
+    enabled : bool
+        Collect histograms (``RAG_METRICS``, default on).
+    log_calls : bool
+        Emit one ``[TIME]`` log line per timed call (``RAG_TIME_LOG``, default
+        off: formatting and dispatching the line costs ~10x the timing itself).
+    sample_every : int
+        Time only every n-th call of each decorated function
+        (derived from ``RAG_METRICS_SAMPLE_RATE``; default 1, i.e. every call).
+    active : bool
+        ``enabled or log_calls``; kept as a plain attribute so the disabled
+        path of a decorated call is a single attribute check.
+    """
+
+    __slots__ = ("enabled", "log_calls", "sample_every", "active")
+
+    def __init__(self) -> None:
+        self.enabled = _env_flag("RAG_METRICS", True)
+        self.log_calls = _env_flag("RAG_TIME_LOG", False)
+        self.sample_every = _sample_every(float(os.getenv("RAG_METRICS_SAMPLE_RATE", "1")))
+        self.active = self.enabled or self.log_calls
+
+
+def _sample_every(sample_rate: float) -> int:
+    if not 0 < sample_rate <= 1:
+        raise ValueError("sample_rate must be in (0, 1]")
+    return max(1, round(1 / sample_rate))
+
+
+config = InstrumentationConfig()
+
+
+def configure(enabled: Optional[bool] = None, log_calls: Optional[bool] = None,
+              sample_rate: Optional[float] = None) -> InstrumentationConfig:
+    """Change instrumentation switches at runtime; ``None`` keeps the current value."""
+    if enabled is not None:
+        config.enabled = enabled
+    if log_calls is not None:
+        config.log_calls = log_calls
+    if sample_rate is not None:
+        config.sample_every = _sample_every(sample_rate)
+    config.active = config.enabled or config.log_calls
+    return config
+
+
+class Histogram:
+    """Fixed log-bucket latency histogram with count, sum, min/max and error count.
+
+    Percentiles are interpolated inside the matching bucket, so they are accurate
+    to within one bucket (a factor of 2) and are clamped to the observed min/max.
+    """
+
+    __slots__ = ("count", "errors", "sum", "min", "max", "buckets", "_lock")
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self) -> None:
+        with self._lock:
+            self.count = 0
+            self.errors = 0
+            self.sum = 0.0
+            self.min = float("inf")
+            self.max = 0.0
+            self.buckets: List[int] = [0] * (len(_BUCKETS) + 1)
+
+    def observe(self, seconds: float, ok: bool = True) -> None:
+        i = bisect_left(_BUCKETS, seconds)
+        with self._lock:
+            self.count += 1
+            self.sum += seconds
+            self.buckets[i] += 1
+            if seconds < self.min:
+                self.min = seconds
+            if seconds > self.max:
+                self.max = seconds
+            if not ok:
+                self.errors += 1
+
+    def percentile(self, q: float) -> float:
+        """Estimated q-th percentile (0-100) in seconds."""
+        if self.count == 0:
+            return 0.0
+        rank = q / 100 * self.count
+        cumulative = 0
+        for i, n in enumerate(self.buckets):
+            if n and cumulative + n >= rank:
+                lower = _BUCKETS[i - 1] if i > 0 else 0.0
+                upper = _BUCKETS[i] if i < len(_BUCKETS) else self.max
+                value = lower + (upper - lower) * max(rank - cumulative, 0) / n
+                return min(max(value, self.min), self.max)
+            cumulative += n
+        return self.max
+
+    def as_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            count = self.count
+            return {
+                "count": count,
+                "errors": self.errors,
+                "sum_s": round(self.sum, 6),
+                "mean_ms": round(self.sum / count * 1000, 4) if count else 0.0,
+                "min_ms": round(self.min * 1000, 4) if count else 0.0,
+                "max_ms": round(self.max * 1000, 4),
+                "p50_ms": round(self.percentile(50) * 1000, 4),
+                "p90_ms": round(self.percentile(90) * 1000, 4),
+                "p99_ms": round(self.percentile(99) * 1000, 4),
+            }
+
+
+class MetricsRegistry:
+    """In-memory histograms keyed by kind (``function`` or ``span``) and name."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._histograms: Dict[Tuple[str, str], Histogram] = {}
+
+    def histogram(self, kind: str, name: str) -> Histogram:
+        key = (kind, name)
+        hist = self._histograms.get(key)
+        if hist is None:
+            if kind not in _KINDS:
+                raise ValueError(f"kind must be one of {_KINDS}")
+            with self._lock:
+                hist = self._histograms.setdefault(key, Histogram())
+        return hist
+
+    def reset(self) -> None:
+        """Zero all histograms (decorated functions keep their histogram objects)."""
+        with self._lock:
+            histograms = list(self._histograms.values())
+        for hist in histograms:
+            hist.clear()
+
+    def snapshot(self) -> Dict[str, Dict[str, Dict[str, Any]]]:
+        with self._lock:
+            items = sorted(self._histograms.items())
+        out: Dict[str, Dict[str, Dict[str, Any]]] = {f"{kind}s": {} for kind in _KINDS}
+        for (kind, name), hist in items:
+            if hist.count:
+                out[f"{kind}s"][name] = hist.as_dict()
+        return out
+
+    def to_json(self) -> str:
+        return json.dumps(self.snapshot(), ensure_ascii=False, indent=2)
+
+    def to_prometheus(self) -> str:
+        """Prometheus text exposition format (one histogram family per kind)."""
+        with self._lock:
+            items = sorted(self._histograms.items())
+        lines: List[str] = []
+        for kind in _KINDS:
+            family = f"rag_{kind}_duration_seconds"
+            selected = [(name, hist) for (k, name), hist in items if k == kind and hist.count]
+            if not selected:
+                continue
+            lines.append(f"# HELP {family} Duration of instrumented {kind}s.")
+            lines.append(f"# TYPE {family} histogram")
+            for name, hist in selected:
+                label = f'{kind}="{_escape_label(name)}"'
+                with hist._lock:
+                    buckets, count, total = list(hist.buckets), hist.count, hist.sum
+                cumulative = 0
+                for bound, n in zip(_BUCKETS, buckets):
+                    cumulative += n
+                    lines.append(f'{family}_bucket{{{label},le="{bound:.6g}"}} {cumulative}')
+                lines.append(f'{family}_bucket{{{label},le="+Inf"}} {count}')
+                lines.append(f"{family}_sum{{{label}}} {total:.9g}")
+                lines.append(f"{family}_count{{{label}}} {count}")
+            lines.append(f"# TYPE rag_{kind}_errors_total counter")
+            for name, hist in selected:
+                lines.append(f'rag_{kind}_errors_total{{{kind}="{_escape_label(name)}"}} {hist.errors}')
+        return "\n".join(lines) + "\n"
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+registry = MetricsRegistry()
+
+_SPAN_PATH: ContextVar[str] = ContextVar("rag_span_path", default="")
+
+
+class _Span:
+    __slots__ = ("name", "_token", "_start")
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+
+    def __enter__(self) -> "_Span":
+        parent = _SPAN_PATH.get()
+        self._token = _SPAN_PATH.set(f"{parent}/{self.name}" if parent else self.name)
+        self._start = perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        duration = perf_counter() - self._start
+        path = _SPAN_PATH.get()
+        _SPAN_PATH.reset(self._token)
+        registry.histogram("span", path).observe(duration, ok=exc_type is None)
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def span(name: str):
+    """Time a block as a nested span.
+
+    Spans opened inside another span (in the same thread or task) are recorded
+    under the joined path, e.g. ``retrieve/dense``. Returns a shared no-op
+    context manager when metrics are disabled.
+
+    Examples
+    --------
+    >>> with span("retrieve"):
+    ...     with span("dense"):
+    ...         pass
+    """
+    if not config.enabled:
+        return _NOOP_SPAN
+    return _Span(name)
+
+
+def export_metrics(target: str, fmt: str = "json", timeout_s: float = 5.0) -> None:
+    """Dump the current metrics to a local file or POST them to an HTTP endpoint.
+
+    Parameters
+    ----------
+    target : str
+        File path (written atomically) or ``http(s)://`` URL, e.g. a Prometheus
+        Pushgateway job URL.
+    fmt : str
+        ``"json"`` or ``"prometheus"``.
+    timeout_s : float
+        HTTP timeout.
+    """
+    if fmt == "json":
+        body, content_type = registry.to_json(), "application/json"
+    elif fmt == "prometheus":
+        body, content_type = registry.to_prometheus(), "text/plain; version=0.0.4"
+    else:
+        raise ValueError("fmt must be 'json' or 'prometheus'")
+
+    if target.startswith(("http://", "https://")):
+        request = urllib.request.Request(target, data=body.encode("utf-8"), method="POST",
+                                         headers={"Content-Type": content_type})
+        with urllib.request.urlopen(request, timeout=timeout_s) as response:
+            response.read()
+        return
+    os.makedirs(os.path.dirname(os.path.abspath(target)), exist_ok=True)
+    tmp = f"{target}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(body)
+    os.replace(tmp, target)
+
+
+class MetricsExporter:
+    """Background thread that calls ``export_metrics`` every ``interval_s`` seconds.
+
+    Export errors are logged and do not stop the thread; ``stop()`` performs a
+    final export.
+    """
+
+    def __init__(self, target: str, fmt: str = "json", interval_s: float = 60.0) -> None:
+        self.target = target
+        self.fmt = fmt
+        self.interval_s = interval_s
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def export(self) -> None:
+        try:
+            export_metrics(self.target, self.fmt)
+        except Exception as e:  # noqa: BLE001 - exporting must never break the host process
+            logger.warning("[METRICS] export to %s failed: %r", self.target, e)
+
+    def start(self) -> "MetricsExporter":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="metrics-exporter", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        self.export()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval_s):
+            self.export()
+
+
+__all__ = ["InstrumentationConfig", "Histogram", "MetricsRegistry", "MetricsExporter",
+           "config", "configure", "registry", "span", "export_metrics"]
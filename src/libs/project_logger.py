@@ -1,38 +1,314 @@
+"""Project-wide logger.
+
+Two modes, selected with ``RAG_LOG_MODE``:
+
+- ``queue`` (default): ``logger`` only carries a ``QueueHandler``; a listener
+  thread in the main process drains the queue in batches and does all file and
+  console I/O, flushing once per batch. That queue is an in-process
+  ``queue.SimpleQueue``. Worker processes log through a separate cross-process
+  queue created lazily by ``get_log_queue()`` (just before the first fork, or
+  explicitly); a forwarder thread moves its records onto the listener queue.
+  Forked workers switch to it automatically, and spawned workers join it with
+  ``configure_worker(get_log_queue())`` as a pool initializer. Only the main
+  process ever writes (and rotates) the log file.
+- ``sync``: handlers are attached directly and write inline (previous behaviour).
+
+The log file (``RAG_LOG_DIR``/``RAG_LOG_FILE``, default ``rag.log``) is rotated
+when it exceeds ``RAG_LOG_MAX_BYTES`` or is older than ``RAG_LOG_ROTATE_S``
+seconds, keeping ``RAG_LOG_BACKUP_COUNT`` numbered backups. ``RAG_LOG_FORMAT=json``
+writes one JSON object per line instead of text.
+"""
+from __future__ import annotations
+
+import atexit
+import json
 import logging
-from pathlib import Path
+import logging.handlers
+import multiprocessing
+import os
+import queue
+import re
+import threading
+import time
 from datetime import datetime
+from pathlib import Path
+from typing import Any, List, Optional
+
+# Project root: two levels up from this file (<root>/src/libs/project_logger.py)
+_PROJECT_ROOT = Path(__file__).resolve().parents[2]
+_LOG_DIR = Path(os.getenv("RAG_LOG_DIR", str(_PROJECT_ROOT / "log")))
+
+_TEXT_FORMAT = "%(asctime)s [%(levelname)s] %(name)s (%(filename)s:%(funcName)s:%(lineno)d) - %(message)s"
+_DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+_TAG_RE = re.compile(r"^\[([A-Z_]+)\]\s*")
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; a leading ``[TAG]`` in the message becomes the ``tag`` field."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        message = record.getMessage()
+        data = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(timespec="microseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "file": record.filename,
+            "func": record.funcName,
+            "line": record.lineno,
+            "process": record.process,
+            "thread": record.threadName,
+        }
+        tag = _TAG_RE.match(message)
+        if tag:
+            data["tag"] = tag.group(1)
+            message = message[tag.end():]
+        data["msg"] = message
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data["exc"] = record.exc_text
+        return json.dumps(data, ensure_ascii=False)
+
+
+class SizeTimeRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """Rotate on size or age, whichever comes first, keeping numbered backups.
+
+    The written size is tracked in memory instead of seeking the file on every
+    record, and with ``batched=True`` the stream is only flushed when ``flush()``
+    is called (the queue listener does so once per batch).
+    """
+
+    def __init__(self, filename: str, max_bytes: int = 0, backup_count: int = 0,
+                 rotate_interval_s: float = 0, batched: bool = False, encoding: str = "utf-8"):
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count, encoding=encoding, delay=True)
+        self.rotate_interval_s = rotate_interval_s
+        self.batched = batched
+        self._size = os.path.getsize(filename) if os.path.exists(filename) else 0
+        created = os.path.getmtime(filename) if self._size else time.time()
+        self._next_rollover = created + rotate_interval_s if rotate_interval_s > 0 else float("inf")
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            msg = self.format(record) + self.terminator
+            size = len(msg.encode(self.encoding or "utf-8"))
+            if (self.maxBytes > 0 and self._size and self._size + size > self.maxBytes) \
+                    or time.time() >= self._next_rollover:
+                self.doRollover()
+            if self.stream is None:
+                self.stream = self._open()
+            self.stream.write(msg)
+            self._size += size
+            if not self.batched:
+                self.stream.flush()
+        except Exception:  # noqa: BLE001 - logging must not raise
+            self.handleError(record)
+
+    def doRollover(self) -> None:
+        super().doRollover()
+        self._size = 0
+        if self.rotate_interval_s > 0:
+            self._next_rollover = time.time() + self.rotate_interval_s
+
+
+class BatchQueueListener:
+    """Drain a log queue on a background thread and dispatch records in batches.
+
+    After each batch (up to ``batch_size`` records already waiting in the queue)
+    every handler is flushed once, so under load many records share one write
+    syscall while a lone record is still written immediately.
+    """
+
+    _SENTINEL = None
+
+    def __init__(self, log_queue: Any, handlers: List[logging.Handler], batch_size: int = 512):
+        self.queue = log_queue
+        self.handlers = handlers
+        self.batch_size = batch_size
+        self._thread: Optional[threading.Thread] = None
+        self._pid = os.getpid()
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="log-listener", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Write everything already queued, then stop (no-op in forked children)."""
+        if self._thread is None or os.getpid() != self._pid:
+            return
+        self.queue.put(self._SENTINEL)
+        self._thread.join()
+        self._thread = None
 
-# Compute project root (three levels up from this file: src/libs/log)
-_PROJECT_ROOT = Path(__file__).resolve().parents[3]
-_LOG_DIR = _PROJECT_ROOT / "log"
-_LOG_DIR.mkdir(parents=True, exist_ok=True)
+    def _run(self) -> None:
+        while True:
+            record = self.queue.get()
+            stopping = record is self._SENTINEL
+            batch = [] if stopping else [record]
+            while not stopping and len(batch) < self.batch_size:
+                try:
+                    record = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if record is self._SENTINEL:
+                    stopping = True
+                else:
+                    batch.append(record)
+            for record in batch:
+                for handler in self.handlers:
+                    if record.levelno >= handler.level:
+                        handler.handle(record)
+            for handler in self.handlers:
+                try:
+                    handler.flush()
+                except Exception:  # noqa: BLE001 - e.g. a console stream closed by the host
+                    pass
+            if stopping:
+                return
+
+
+def _env_int(name: str, default: int) -> int:
+    return int(os.getenv(name, str(default)))
+
+
+def build_handlers(log_file: Optional[Path], fmt: str = "text", console: bool = True, batched: bool = False,
+                   max_bytes: int = 50 << 20, backup_count: int = 10,
+                   rotate_interval_s: float = 86400) -> List[logging.Handler]:
+    """File (rotating) and console handlers sharing one formatter."""
+    formatter = JsonFormatter() if fmt == "json" else logging.Formatter(fmt=_TEXT_FORMAT, datefmt=_DATE_FORMAT)
+    handlers: List[logging.Handler] = []
+    if log_file is not None:
+        log_file.parent.mkdir(parents=True, exist_ok=True)
+        handlers.append(SizeTimeRotatingFileHandler(str(log_file), max_bytes=max_bytes, backup_count=backup_count,
+                                                    rotate_interval_s=rotate_interval_s, batched=batched))
+    if console:
+        handlers.append(logging.StreamHandler())
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    return handlers
 
-# Log filename with current timestamp: yyyymmddhhmmss.log
-_LOG_FILE = _LOG_DIR / f"{datetime.now().strftime('%Y%m%d%H%M%S')}.log"
 
 # Create a module-level logger
 logger = logging.getLogger("project_logger")
-logger.setLevel(logging.INFO)
+logger.setLevel(os.getenv("RAG_LOG_LEVEL", "INFO").upper())
 logger.propagate = False  # avoid duplicate messages if root logger has handlers
 
-# Attach handlers only once
-if not logger.handlers:
-    file_handler = logging.FileHandler(_LOG_FILE, encoding="utf-8")
-    file_handler.setLevel(logging.INFO)
+_listener: Optional[BatchQueueListener] = None
+_process_queue: Any = None
+_forwarder: Optional[threading.Thread] = None
+
 
-    # Include filename, function name, and line number
-    formatter = logging.Formatter(
-        fmt="%(asctime)s [%(levelname)s] %(name)s (%(filename)s:%(funcName)s:%(lineno)d) - %(message)s",
-        datefmt="%Y-%m-%d %H:%M:%S",
+class _LocalQueueHandler(logging.handlers.QueueHandler):
+    """In-process queue handler: merges msg and args on the caller's thread (so later
+    mutation of the arguments cannot change the line) but skips the copy and
+    pickling-oriented cleanup of ``QueueHandler.prepare``."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+def setup_logger(log_file: Optional[Path] = None, mode: Optional[str] = None, fmt: Optional[str] = None,
+                 console: Optional[bool] = None) -> None:
+    """(Re)configure ``logger``; arguments default to the ``RAG_LOG_*`` environment variables."""
+    global _listener
+    shutdown_logging()
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+        handler.close()
+
+    mode = mode or os.getenv("RAG_LOG_MODE", "queue")
+    if mode not in ("queue", "sync"):
+        raise ValueError("RAG_LOG_MODE must be 'queue' or 'sync'")
+    handlers = build_handlers(
+        log_file if log_file is not None else _LOG_DIR / os.getenv("RAG_LOG_FILE", "rag.log"),
+        fmt=fmt or os.getenv("RAG_LOG_FORMAT", "text"),
+        console=console if console is not None else os.getenv("RAG_LOG_CONSOLE", "1") != "0",
+        batched=mode == "queue",
+        max_bytes=_env_int("RAG_LOG_MAX_BYTES", 50 << 20),
+        backup_count=_env_int("RAG_LOG_BACKUP_COUNT", 10),
+        rotate_interval_s=float(os.getenv("RAG_LOG_ROTATE_S", "86400")),
     )
-    file_handler.setFormatter(formatter)
+    if mode == "sync":
+        for handler in handlers:
+            logger.addHandler(handler)
+        return
+    _listener = BatchQueueListener(queue.SimpleQueue(), handlers)
+    _listener.start()
+    logger.addHandler(_LocalQueueHandler(_listener.queue))
+
+
+def shutdown_logging() -> None:
+    """Flush and stop the queue listener (registered with atexit)."""
+    global _listener, _forwarder
+    if _forwarder is not None and _listener is not None and os.getpid() == _listener._pid:
+        _process_queue.put(None)
+        _forwarder.join()
+        _forwarder = None
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
 
-    logger.addHandler(file_handler)
 
-    # Also log to console
-    stream_handler = logging.StreamHandler()
-    stream_handler.setLevel(logging.INFO)
-    stream_handler.setFormatter(formatter)
-    logger.addHandler(stream_handler)
+def _forward(process_queue: Any, local_queue: Any) -> None:
+    while True:
+        record = process_queue.get()
+        if record is None:
+            return
+        local_queue.put(record)
+
+
+def get_log_queue() -> Any:
+    """Cross-process queue feeding the main-process listener (``None`` in sync mode).
+
+    Created on first use together with a thread that forwards its records to the
+    listener, so single-process programs never pay for pickling.
+    """
+    global _process_queue, _forwarder
+    if _listener is None:
+        return None
+    if _forwarder is None and os.getpid() == _listener._pid:
+        # A spawn-context queue can be inherited by forked children and passed to spawn pools as initargs.
+        _process_queue = multiprocessing.get_context("spawn").Queue()
+        _forwarder = threading.Thread(target=_forward, args=(_process_queue, _listener.queue),
+                                      name="log-forwarder", daemon=True)
+        _forwarder.start()
+    return _process_queue
+
+
+def configure_worker(log_queue: Any) -> None:
+    """Process-pool initializer: route this process's records to the main process's listener.
+
+    With ``log_queue=None`` (sync mode) the worker keeps its inherited handlers.
+    """
+    if log_queue is None:
+        return
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+    logger.addHandler(logging.handlers.QueueHandler(log_queue))
+
+
+def _after_fork_in_child() -> None:
+    # The listener thread does not exist in a forked child; switch to the process queue.
+    if _listener is not None:
+        configure_worker(_process_queue)
+
+
+# Attach handlers only once. A spawned worker re-imports this module: it must not
+# open the shared log file, so it logs to stderr until configure_worker() runs.
+if not logger.handlers:
+    if multiprocessing.parent_process() is None:
+        setup_logger()
+        atexit.register(shutdown_logging)
+        # Windows has no fork (and no os.register_at_fork); spawned workers use configure_worker().
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(before=get_log_queue, after_in_child=_after_fork_in_child)
+    else:
+        _stream = logging.StreamHandler()
+        _stream.setFormatter(logging.Formatter(fmt=_TEXT_FORMAT, datefmt=_DATE_FORMAT))
+        logger.addHandler(_stream)
 
-__all__ = ["logger"]
+__all__ = ["logger", "setup_logger", "shutdown_logging", "get_log_queue", "configure_worker",
+           "JsonFormatter", "SizeTimeRotatingFileHandler", "BatchQueueListener", "build_handlers"]
@@ -2,35 +2,71 @@ from __future__ import annotations
 
 import asyncio
 import inspect
+import logging
 from datetime import datetime
 from functools import wraps
 from pathlib import Path
-from time import perf_counter
+from time import perf_counter, time
 
+from src.libs import metrics
 from src.libs.project_logger import logger
 
 
-def _format_dt(dt: datetime) -> str:
+def _format_dt(timestamp: float) -> str:
     # e.g. 2025-09-03 10:30:45.123456
-    return dt.strftime("%Y-%m-%d %H:%M:%S.%f")
+    return datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S.%f")
+
+
+def _finish(file_name: str, func_name: str, hist: metrics.Histogram, start: float, ok: bool) -> None:
+    duration = perf_counter() - start
+    config = metrics.config
+    if config.enabled:
+        hist.observe(duration, ok)
+    if config.log_calls and logger.isEnabledFor(logging.INFO):
+        end_ts = time()
+        logger.info(
+            "[TIME] file=%s func=%s start=%s end=%s duration_s=%.6f status=%s",
+            file_name,
+            func_name,
+            _format_dt(end_ts - duration),
+            _format_dt(end_ts),
+            duration,
+            "ok" if ok else "error",
+        )
 
 
 def record_time(func):
-    """Decorator to record and log execution time for a function.
+    """Decorator to record execution time for a function.
 
-    Log format (single line):
+    Each timed call is observed into the ``function`` histogram
+    ``<filename>:<qualname>`` of ``src.libs.metrics.registry`` and, with
+    ``RAG_TIME_LOG=1``, logged as a single line:
       [TIME] file=<filename> func=<qualname> start=<YYYY-mm-dd HH:MM:SS.ffffff> end=<...> duration_s=<seconds>
 
+    Wall-clock timestamps are derived from one ``time()`` call and formatted only
+    when the line is actually logged. With ``RAG_METRICS_SAMPLE_RATE=r`` only
+    every ``round(1/r)``-th call is timed; with both metrics and logging disabled
+    the wrapper only checks one flag before calling through.
+
     Works for both sync and async functions.
     """
 
     file_name = Path(inspect.getfile(func)).name
     func_name = func.__qualname__
+    hist = metrics.registry.histogram("function", f"{file_name}:{func_name}")
+    config = metrics.config
+    calls = 0
 
     if asyncio.iscoroutinefunction(func):
         @wraps(func)
         async def _async_wrapped(*args, **kwargs):
-            start_dt = datetime.now()
+            nonlocal calls
+            if not config.active:
+                return await func(*args, **kwargs)
+            if config.sample_every > 1:
+                calls += 1
+                if calls % config.sample_every:
+                    return await func(*args, **kwargs)
             start = perf_counter()
             ok = False
             try:
@@ -38,23 +74,19 @@ def record_time(func):
                 ok = True
                 return result
             finally:
-                end_dt = datetime.now()
-                duration = perf_counter() - start
-                logger.info(
-                    "[TIME] file=%s func=%s start=%s end=%s duration_s=%.6f status=%s",
-                    file_name,
-                    func_name,
-                    _format_dt(start_dt),
-                    _format_dt(end_dt),
-                    duration,
-                    "ok" if ok else "error",
-                )
+                _finish(file_name, func_name, hist, start, ok)
 
         return _async_wrapped
 
     @wraps(func)
     def _wrapped(*args, **kwargs):
-        start_dt = datetime.now()
+        nonlocal calls
+        if not config.active:
+            return func(*args, **kwargs)
+        if config.sample_every > 1:
+            calls += 1
+            if calls % config.sample_every:
+                return func(*args, **kwargs)
         start = perf_counter()
         ok = False
         try:
@@ -62,17 +94,7 @@ def record_time(func):
             ok = True
             return result
         finally:
-            end_dt = datetime.now()
-            duration = perf_counter() - start
-            logger.info(
-                "[TIME] file=%s func=%s start=%s end=%s duration_s=%.6f status=%s",
-                file_name,
-                func_name,
-                _format_dt(start_dt),
-                _format_dt(end_dt),
-                duration,
-                "ok" if ok else "error",
-            )
+            _finish(file_name, func_name, hist, start, ok)
 
     return _wrapped
 
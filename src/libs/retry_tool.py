@@ -2,87 +2,328 @@ from __future__ import annotations
 
 import asyncio
 import inspect
+import random
+import threading
+import time
+from collections import deque
 from functools import wraps
 from pathlib import Path
-from typing import Callable, TypeVar, Any
+from typing import Any, Callable, Deque, Optional, Tuple, Type, TypeVar, Union
 
 from src.libs.project_logger import logger
 
 T = TypeVar("T")
 
+ExceptionTypes = Union[Type[BaseException], Tuple[Type[BaseException], ...]]
 
-def retry(retry_time: int = 3) -> Callable[[Callable[..., T]], Callable[..., T]]:
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a dependency whose circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """Fail fast once a dependency's recent error rate crosses a threshold.
+
+    Share one instance between all callers of the same dependency (e.g. one per
+    vector DB endpoint) and pass it to ``retry(circuit_breaker=...)``, use it as
+    a decorator, or call ``before_call`` / ``record_success`` / ``record_failure``
+    directly.
+
+    Parameters
+    ----------
+    name : str
+        Used in log lines.
+    failure_threshold : float
+        Open when the failure rate over the last ``window`` calls reaches this
+        value (0-1) ...
+    min_calls : int
+        ... and at least this many calls were observed in the window.
+    window : int
+        Number of most recent outcomes considered.
+    reset_timeout_s : float
+        How long the circuit stays open before letting trial calls through.
+    half_open_max_calls : int
+        Concurrent trial calls allowed while half-open; one success closes the
+        circuit, one failure opens it again.
+    clock : callable
+        Monotonic time source, for tests.
+
+    Notes
+    -----
+    Log format example:
+      [CIRCUIT] name=milvus state=closed->open failure_rate=0.60 calls=10
+    """
+
+    def __init__(self, name: str = "default", failure_threshold: float = 0.5, min_calls: int = 10,
+                 window: int = 50, reset_timeout_s: float = 30.0, half_open_max_calls: int = 1,
+                 clock: Callable[[], float] = time.monotonic):
+        if not 0 < failure_threshold <= 1:
+            raise ValueError("failure_threshold must be in (0, 1]")
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.min_calls = min_calls
+        self.reset_timeout_s = reset_timeout_s
+        self.half_open_max_calls = half_open_max_calls
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._outcomes: Deque[bool] = deque(maxlen=window)
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._trials = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._maybe_half_open()
+            return self._state
+
+    def before_call(self) -> None:
+        """Raise ``CircuitOpenError`` if the call must not be attempted."""
+        with self._lock:
+            self._maybe_half_open()
+            if self._state == OPEN:
+                raise CircuitOpenError(f"circuit {self.name!r} is open")
+            if self._state == HALF_OPEN:
+                if self._trials >= self.half_open_max_calls:
+                    raise CircuitOpenError(f"circuit {self.name!r} is half-open, trial call in progress")
+                self._trials += 1
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._transition(CLOSED)
+            self._outcomes.append(True)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._transition(OPEN)
+                return
+            self._outcomes.append(False)
+            calls = len(self._outcomes)
+            if self._state == CLOSED and calls >= self.min_calls:
+                failure_rate = self._outcomes.count(False) / calls
+                if failure_rate >= self.failure_threshold:
+                    self._transition(OPEN, failure_rate)
+
+    def record_ignored(self) -> None:
+        """The call failed for a reason unrelated to the dependency's health; only frees a trial slot."""
+        with self._lock:
+            if self._state == HALF_OPEN and self._trials > 0:
+                self._trials -= 1
+
+    def reset(self) -> None:
+        with self._lock:
+            self._transition(CLOSED)
+
+    def __call__(self, func: Callable[..., T]) -> Callable[..., T]:
+        """Use the breaker as a decorator (sync or async)."""
+        if asyncio.iscoroutinefunction(func):
+            @wraps(func)
+            async def _async_wrapper(*args: Any, **kwargs: Any) -> T:
+                self.before_call()
+                try:
+                    result = await func(*args, **kwargs)
+                except Exception:
+                    self.record_failure()
+                    raise
+                except BaseException:
+                    # cancelled / interrupted: says nothing about the dependency, but frees the trial slot
+                    self.record_ignored()
+                    raise
+                self.record_success()
+                return result
+
+            return _async_wrapper
+
+        @wraps(func)
+        def _wrapper(*args: Any, **kwargs: Any) -> T:
+            self.before_call()
+            try:
+                result = func(*args, **kwargs)
+            except Exception:
+                self.record_failure()
+                raise
+            except BaseException:
+                self.record_ignored()
+                raise
+            self.record_success()
+            return result
+
+        return _wrapper
+
+    def _maybe_half_open(self) -> None:
+        if self._state == OPEN and self.clock() - self._opened_at >= self.reset_timeout_s:
+            self._transition(HALF_OPEN)
+
+    def _transition(self, state: str, failure_rate: Optional[float] = None) -> None:
+        if state == self._state:
+            return
+        logger.warning("[CIRCUIT] name=%s state=%s->%s failure_rate=%s calls=%d",
+                       self.name, self._state, state,
+                       "n/a" if failure_rate is None else f"{failure_rate:.2f}", len(self._outcomes))
+        self._state = state
+        self._trials = 0
+        if state == OPEN:
+            self._opened_at = self.clock()
+        elif state == CLOSED:
+            self._outcomes.clear()
+
+
+def backoff_delay(attempt: int, base_delay: float, max_delay: float, multiplier: float = 2.0,
+                  jitter: bool = True) -> float:
+    """Delay before retry number ``attempt`` (1-based).
+
+    Exponential cap ``min(max_delay, base_delay * multiplier ** (attempt - 1))``;
+    with ``jitter`` the delay is drawn uniformly from ``[0, cap]`` ("full jitter"),
+    which spreads out retries from many clients failing at the same moment.
+    """
+    cap = min(max_delay, base_delay * multiplier ** (attempt - 1))
+    return random.uniform(0, cap) if jitter else cap
+
+
+def retry(retry_time: int = 3, base_delay: float = 0.1, max_delay: float = 10.0, multiplier: float = 2.0,
+          jitter: bool = True, deadline_s: Optional[float] = None,
+          retry_on: ExceptionTypes = Exception,
+          retry_if: Optional[Callable[[BaseException], bool]] = None,
+          circuit_breaker: Optional[CircuitBreaker] = None) -> Callable[[Callable[..., T]], Callable[..., T]]:
     """A decorator to retry a function when an exception occurs.
 
     Parameters
     ----------
     retry_time : int
         Number of attempts (including the first call). Must be >= 1.
+    base_delay, max_delay, multiplier : float
+        Exponential backoff between attempts, see ``backoff_delay``. ``base_delay=0``
+        retries immediately.
+    jitter : bool
+        Use full jitter (uniform in ``[0, backoff]``).
+    deadline_s : float, optional
+        Overall time budget across all attempts and sleeps. No retry is started
+        (or slept for) past the deadline; async attempts are additionally
+        cancelled with ``asyncio.TimeoutError`` when the budget runs out.
+    retry_on : exception type or tuple
+        Only these exceptions are retried; anything else is raised immediately.
+    retry_if : callable, optional
+        Extra predicate on the exception (e.g. retry only HTTP 5xx/429).
+    circuit_breaker : CircuitBreaker, optional
+        Checked before every attempt; an open circuit raises ``CircuitOpenError``
+        without calling the function. Retryable failures and successes are
+        recorded on it; non-retryable errors and cancellation only release a
+        half-open trial slot.
 
     Notes
     -----
     - Works for both sync and async functions.
     - Logs each failed attempt and the final failure using the shared logger.
     - Message format example:
-      [RETRY] file=foo.py func=MyClass.method attempt=2/3 error=ValueError('msg')
+      [RETRY] file=foo.py func=MyClass.method attempt=2/3 error=ValueError('msg') delay_s=0.137
     """
     if retry_time < 1:
         raise ValueError("retry_time must be >= 1")
+    if base_delay < 0 or max_delay < 0:
+        raise ValueError("delays must be >= 0")
+
+    def _retryable(e: BaseException) -> bool:
+        return isinstance(e, retry_on) and (retry_if is None or retry_if(e))
 
     def _decorator(func: Callable[..., T]) -> Callable[..., T]:
         file_name = Path(inspect.getfile(func)).name
         func_name = func.__qualname__
 
+        def _next_delay(attempt: int, e: BaseException, started: float) -> Optional[float]:
+            """Delay before the next attempt, or None to give up and re-raise ``e``."""
+            if not _retryable(e):
+                if circuit_breaker is not None:
+                    circuit_breaker.record_ignored()
+                logger.error("[RETRY] file=%s func=%s attempt=%d/%d error=%r not retryable; raising",
+                             file_name, func_name, attempt, retry_time, e)
+                return None
+            if circuit_breaker is not None:
+                circuit_breaker.record_failure()
+            delay = backoff_delay(attempt, base_delay, max_delay, multiplier, jitter) if attempt < retry_time else 0.0
+            logger.warning(
+                "[RETRY] file=%s func=%s attempt=%d/%d error=%r delay_s=%.3f",
+                file_name,
+                func_name,
+                attempt,
+                retry_time,
+                e,
+                delay,
+            )
+            if attempt >= retry_time:
+                logger.error(
+                    "[RETRY] file=%s func=%s exhausted attempts=%d; raising",
+                    file_name,
+                    func_name,
+                    retry_time,
+                )
+                return None
+            if deadline_s is not None and time.monotonic() + delay - started >= deadline_s:
+                logger.error("[RETRY] file=%s func=%s deadline_s=%.3f exceeded after attempts=%d; raising",
+                             file_name, func_name, deadline_s, attempt)
+                return None
+            return delay
+
         if asyncio.iscoroutinefunction(func):
             @wraps(func)
             async def _async_wrapper(*args: Any, **kwargs: Any) -> T:
+                started = time.monotonic()
                 for attempt in range(1, retry_time + 1):
+                    if circuit_breaker is not None:
+                        circuit_breaker.before_call()
                     try:
-                        return await func(*args, **kwargs)
-                    except Exception as e:  # noqa: BLE001 - intentionally catch to retry
-                        logger.warning(
-                            "[RETRY] file=%s func=%s attempt=%d/%d error=%r",
-                            file_name,
-                            func_name,
-                            attempt,
-                            retry_time,
-                            e,
-                        )
-                        if attempt >= retry_time:
-                            logger.error(
-                                "[RETRY] file=%s func=%s exhausted attempts=%d; raising",
-                                file_name,
-                                func_name,
-                                retry_time,
-                            )
+                        if deadline_s is None:
+                            result = await func(*args, **kwargs)
+                        else:
+                            remaining = deadline_s - (time.monotonic() - started)
+                            result = await asyncio.wait_for(func(*args, **kwargs), max(remaining, 0))
+                    except Exception as e:  # noqa: BLE001 - filtered by retry_on / retry_if
+                        delay = _next_delay(attempt, e, started)
+                        if delay is None:
                             raise
-                        # small yield to event loop before next attempt
-                        await asyncio.sleep(0)
+                        # always yield to the event loop, even with zero delay
+                        await asyncio.sleep(delay)
+                        continue
+                    except BaseException:
+                        # cancellation (including an outer wait_for) must not leave a half-open trial slot taken
+                        if circuit_breaker is not None:
+                            circuit_breaker.record_ignored()
+                        raise
+                    if circuit_breaker is not None:
+                        circuit_breaker.record_success()
+                    return result
+                # Unreachable, but satisfies type checkers
+                raise RuntimeError("Retry wrapper exited unexpectedly")
 
             return _async_wrapper
 
         @wraps(func)
         def _wrapper(*args: Any, **kwargs: Any) -> T:
+            started = time.monotonic()
             for attempt in range(1, retry_time + 1):
+                if circuit_breaker is not None:
+                    circuit_breaker.before_call()
                 try:
-                    return func(*args, **kwargs)
-                except Exception as e:  # noqa: BLE001 - intentionally catch to retry
-                    logger.warning(
-                        "[RETRY] file=%s func=%s attempt=%d/%d error=%r",
-                        file_name,
-                        func_name,
-                        attempt,
-                        retry_time,
-                        e,
-                    )
-                    if attempt >= retry_time:
-                        logger.error(
-                            "[RETRY] file=%s func=%s exhausted attempts=%d; raising",
-                            file_name,
-                            func_name,
-                            retry_time,
-                        )
+                    result = func(*args, **kwargs)
+                except Exception as e:  # noqa: BLE001 - filtered by retry_on / retry_if
+                    delay = _next_delay(attempt, e, started)
+                    if delay is None:
                         raise
+                    if delay > 0:
+                        time.sleep(delay)
+                    continue
+                except BaseException:
+                    if circuit_breaker is not None:
+                        circuit_breaker.record_ignored()
+                    raise
+                if circuit_breaker is not None:
+                    circuit_breaker.record_success()
+                return result
             # Unreachable, but satisfies type checkers
             raise RuntimeError("Retry wrapper exited unexpectedly")
 
@@ -91,4 +332,4 @@ def retry(retry_time: int = 3) -> Callable[[Callable[..., T]], Callable[..., T]]
     return _decorator
 
 
-__all__ = ["retry"]
+__all__ = ["retry", "backoff_delay", "CircuitBreaker", "CircuitOpenError", "CLOSED", "OPEN", "HALF_OPEN"]
@@ -0,0 +1,197 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import mmap
+import os
+import threading
+from dataclasses import asdict, dataclass, field
+from typing import Dict, Iterable, List, Optional
+
+from src.tokenizer.record import IdentificationVersionMeta, ProcessingTraceMeta, Record
+
+NEW = "new"
+MODIFIED = "modified"
+UNCHANGED = "unchanged"
+
+
+def file_sha256(path: str) -> str:
+    """以 mmap 方式计算文件 sha256，内存占用与文件大小无关"""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return h.hexdigest()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            h.update(mm)
+    return h.hexdigest()
+
+
+def text_sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class ChunkEntry:
+    record_id: str
+    chunk_id: Optional[str]
+    text_hash: str
+
+
+@dataclass
+class DocumentEntry:
+    doc_id: str
+    path: str
+    file_hash: str
+    mtime_ns: int
+    size: int
+    version: int = 1
+    chunks: List[ChunkEntry] = field(default_factory=list)
+
+
+@dataclass
+class Tombstone:
+    """已不存在的片段，下游存储应据此删除对应记录"""
+    record_id: str
+    doc_id: str
+    reason: str          # "deleted"（源文件已删除）或 "modified"（文件修改后该片段不再存在）
+
+
+class IngestionManifest:
+    """增量入库清单：记录每个文档的文件哈希、mtime 与片段哈希
+
+    - check()：按 (size, mtime) 快速判断文件是否可能变化，未变化的文件直接跳过
+    - is_content_unchanged()：mtime 变化但内容哈希相同（如 touch）时同样跳过
+    - update_document()：文本哈希未变的片段沿用原 record_id，消失的片段生成墓碑
+    - remove_missing()：为已删除文件的全部片段生成墓碑
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._docs: Dict[str, DocumentEntry] = {}
+        if os.path.exists(path):
+            self._load()
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self._docs
+
+    def get(self, doc_id: str) -> Optional[DocumentEntry]:
+        return self._docs.get(doc_id)
+
+    def check(self, doc_id: str, path: str) -> str:
+        """返回 NEW / MODIFIED / UNCHANGED；MODIFIED 表示 size 或 mtime 有变化，内容可能相同"""
+        entry = self._docs.get(doc_id)
+        if entry is None:
+            return NEW
+        st = os.stat(path)
+        if st.st_size == entry.size and st.st_mtime_ns == entry.mtime_ns:
+            return UNCHANGED
+        return MODIFIED
+
+    def is_content_unchanged(self, doc_id: str, file_hash: str, path: Optional[str] = None) -> bool:
+        """内容哈希未变时返回 True，并刷新记录的 mtime/size，下次可走快速路径"""
+        with self._lock:
+            entry = self._docs.get(doc_id)
+            if entry is None or entry.file_hash != file_hash:
+                return False
+            if path is not None:
+                st = os.stat(path)
+                entry.mtime_ns, entry.size = st.st_mtime_ns, st.st_size
+            return True
+
+    def update_document(self, doc_id: str, path: str, file_hash: str, records: List[Record],
+                        mtime_ns: Optional[int] = None, size: Optional[int] = None) -> List[Tombstone]:
+        """
+        登记文档的新切分结果：填充 identification.hash/version 与 processing.text_hash，
+        文本未变的片段沿用旧 record_id（relations 中指向这些片段的 prev/next/parent 同步改写），返回需要删除的旧片段
+        :param mtime_ns: 读取文件前记录的 mtime，默认重新 stat（读取期间文件被修改时下次仍会重新处理）
+        :param size: 读取文件前记录的大小
+        """
+        if mtime_ns is None or size is None:
+            st = os.stat(path)
+            mtime_ns, size = st.st_mtime_ns, st.st_size
+        with self._lock:
+            old = self._docs.get(doc_id)
+            reusable: Dict[str, List[ChunkEntry]] = {}
+            if old is not None:
+                for chunk in old.chunks:
+                    reusable.setdefault(chunk.text_hash, []).append(chunk)
+            version = old.version + 1 if old is not None else 1
+
+            chunks: List[ChunkEntry] = []
+            renamed: Dict[str, str] = {}
+            for record in records:
+                text_hash = self._text_hash(record)
+                candidates = reusable.get(text_hash)
+                if candidates:
+                    reused = candidates.pop(0).record_id
+                    renamed[record.id] = reused
+                    record.id = reused
+                ident = record.metadata.identification or IdentificationVersionMeta()
+                ident.id, ident.doc_id = record.id, ident.doc_id or doc_id
+                ident.hash, ident.version = file_hash, str(version)
+                record.metadata.identification = ident
+                chunks.append(ChunkEntry(record_id=record.id, chunk_id=ident.chunk_id, text_hash=text_hash))
+
+            if renamed:
+                self._remap_relations(records, renamed)
+
+            tombstones = [Tombstone(c.record_id, doc_id, "modified")
+                          for remaining in reusable.values() for c in remaining]
+            self._docs[doc_id] = DocumentEntry(doc_id=doc_id, path=path, file_hash=file_hash,
+                                               mtime_ns=mtime_ns, size=size, version=version, chunks=chunks)
+            return tombstones
+
+    def remove_missing(self, seen_doc_ids: Iterable[str]) -> List[Tombstone]:
+        """删除本次未出现的文档，返回其全部片段的墓碑"""
+        seen = set(seen_doc_ids)
+        with self._lock:
+            missing = [doc_id for doc_id in self._docs if doc_id not in seen]
+            tombstones: List[Tombstone] = []
+            for doc_id in missing:
+                entry = self._docs.pop(doc_id)
+                tombstones.extend(Tombstone(c.record_id, doc_id, "deleted") for c in entry.chunks)
+            return tombstones
+
+    def save(self) -> None:
+        with self._lock:
+            data = {"documents": [asdict(e) for e in self._docs.values()]}
+        tmp = f"{self.path}.tmp"
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
+
+    def _load(self) -> None:
+        with open(self.path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        for doc in data.get("documents", []):
+            chunks = [ChunkEntry(**c) for c in doc.pop("chunks", [])]
+            self._docs[doc["doc_id"]] = DocumentEntry(chunks=chunks, **doc)
+
+    @staticmethod
+    def _remap_relations(records: List[Record], renamed: Dict[str, str]) -> None:
+        # 切分时 link_chunks 用的是新生成的 id，沿用旧 id 后邻接关系需指向实际写入的 id
+        for record in records:
+            relations = record.metadata.relations
+            if relations is None:
+                continue
+            relations.prev_id = renamed.get(relations.prev_id, relations.prev_id)
+            relations.next_id = renamed.get(relations.next_id, relations.next_id)
+            relations.parent_id = renamed.get(relations.parent_id, relations.parent_id)
+
+    @staticmethod
+    def _text_hash(record: Record) -> str:
+        processing = record.metadata.processing
+        if processing is None:
+            processing = record.metadata.processing = ProcessingTraceMeta()
+        if not processing.text_hash:
+            processing.text_hash = text_sha256(record.content)
+        return processing.text_hash
+
+
+__all__ = ["IngestionManifest", "DocumentEntry", "ChunkEntry", "Tombstone",
+           "NEW", "MODIFIED", "UNCHANGED", "file_sha256", "text_sha256"]
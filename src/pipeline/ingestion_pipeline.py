@@ -0,0 +1,434 @@
+from __future__ import annotations
+
+import contextvars
+import fnmatch
+import json
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.data_loader.streaming_text_data_loader import StreamingTextDataLoader
+from src.libs.metrics import span
+from src.libs.project_logger import configure_worker, get_log_queue, logger
+from src.pipeline.ingestion_manifest import UNCHANGED, IngestionManifest, Tombstone, file_sha256
+from src.tokenizer.record import DocumentInfoMeta, Record, SourceLocationMeta, record_to_dict
+from src.tokenizer.sentence_splitter import chinese_sentence_splitter
+
+SentenceSplitter = Callable[[str], List[str]]
+EmbedFn = Callable[[List[str]], np.ndarray]
+Sink = Callable[[List[Record], np.ndarray], None]
+TombstoneSink = Callable[[List[Tombstone]], None]
+
+_DONE = object()
+
+
+@dataclass
+class _Tombstones:
+    """输出队列中的删除指令，与 (records, embeddings) 批次按顺序交给调用线程"""
+    tombstones: List[Tombstone]
+
+
+@dataclass
+class SplitDocument:
+    """加载+分句阶段（子进程）的输出"""
+    doc_id: str
+    path: str
+    size_bytes: int
+    sentences: List[str]
+    elapsed_s: float
+    file_hash: Optional[str] = None
+    mtime_ns: Optional[int] = None
+
+
+@dataclass
+class StageStats:
+    """单个阶段的吞吐与下游队列深度统计"""
+    name: str
+    items: int = 0
+    failed: int = 0
+    busy_s: float = 0.0
+    queue_max: int = 0
+    _queue_sum: int = field(default=0, repr=False)
+    _queue_samples: int = field(default=0, repr=False)
+
+    def observe_queue(self, depth: int) -> None:
+        self.queue_max = max(self.queue_max, depth)
+        self._queue_sum += depth
+        self._queue_samples += 1
+
+    def as_dict(self, elapsed_s: float) -> Dict[str, Any]:
+        return {
+            "items": self.items,
+            "failed": self.failed,
+            "busy_s": round(self.busy_s, 6),
+            "items_per_s": round(self.items / elapsed_s, 3) if elapsed_s > 0 else 0.0,
+            "queue_max": self.queue_max,
+            "queue_mean": round(self._queue_sum / self._queue_samples, 3) if self._queue_samples else 0.0,
+        }
+
+
+def discover_files(root: str, patterns: Sequence[str] = ("*.txt", "*.md")) -> Iterator[str]:
+    """惰性遍历目录树，按文件名通配符过滤，结果按路径排序以保证可复现"""
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for name in sorted(filenames):
+            if any(fnmatch.fnmatch(name, p) for p in patterns):
+                yield os.path.join(dirpath, name)
+
+
+def _split_file(path: str, doc_id: str, max_segment_bytes: int,
+                sentence_splitter: SentenceSplitter, with_hash: bool = False) -> SplitDocument:
+    start = time.perf_counter()
+    # 先 stat 再读取：读取期间文件被修改时，清单中记录的是旧 mtime，下次运行会重新处理
+    st = os.stat(path)
+    file_hash = file_sha256(path) if with_hash else None
+    sentences: List[str] = []
+    for segment in StreamingTextDataLoader(path, max_segment_bytes=max_segment_bytes).iter_segments():
+        sentences.extend(sentence_splitter(segment.text))
+    return SplitDocument(doc_id=doc_id, path=path, size_bytes=st.st_size, sentences=sentences,
+                         elapsed_s=time.perf_counter() - start, file_hash=file_hash, mtime_ns=st.st_mtime_ns)
+
+
+class IngestionPipeline:
+    """目录入库流水线：加载 → 分句（进程池） → 语义切分+向量化（单个批处理消费者） → sink
+
+    阶段之间使用有界队列，下游变慢时上游自动阻塞（背压），内存占用与语料规模无关。
+    提供 manifest 时为增量模式：未变化的文件直接跳过，修改过的文件重新切分，
+    不再存在的片段以墓碑形式交给 on_tombstones。
+    """
+
+    def __init__(self, sink: Sink,
+                 tokenizer: Optional[Any] = None,
+                 embed_fn: Optional[EmbedFn] = None,
+                 sentence_splitter: SentenceSplitter = chinese_sentence_splitter,
+                 workers: Optional[int] = None,
+                 queue_size: int = 64,
+                 batch_size: int = 256,
+                 max_segment_bytes: int = 64 * 1024,
+                 report_interval_s: float = 10.0,
+                 manifest: Optional[IngestionManifest] = None,
+                 on_tombstones: Optional[TombstoneSink] = None):
+        """
+        :param sink: 接收 (records, embeddings) 的回调，在调用 run 的线程中执行
+        :param tokenizer: 提供 iter_tokenize_sentences 的切分器，默认 LlamaIndexSemanticTokenizer
+        :param embed_fn: 批量编码函数，默认 src.embedding.embedding_model.encode
+        :param sentence_splitter: 子进程中使用的分句函数（需可 pickle），默认中文分句
+        :param workers: 加载/分句进程数，默认 CPU 核数
+        :param queue_size: 各阶段之间队列的容量
+        :param batch_size: 向量化批大小（片段数）
+        :param max_segment_bytes: 流式读取的片段大小上限
+        :param report_interval_s: 运行中输出阶段统计的间隔（秒）
+        :param manifest: 增量入库清单；运行成功结束后保存
+        :param on_tombstones: 接收需删除片段的回调，在调用 run 的线程中、对应文档的新片段之前执行
+        """
+        if tokenizer is None:
+            from src.tokenizer.llamaindex_tokenizer import LlamaIndexSemanticTokenizer
+            tokenizer = LlamaIndexSemanticTokenizer()
+        if embed_fn is None:
+            from src.embedding.embedding_model import encode
+            embed_fn = encode
+
+        self.sink = sink
+        self.tokenizer = tokenizer
+        self.embed_fn = embed_fn
+        self.sentence_splitter = sentence_splitter
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.max_segment_bytes = max_segment_bytes
+        self.report_interval_s = report_interval_s
+        self.manifest = manifest
+        self.on_tombstones = on_tombstones
+
+    def run(self, paths: Iterable[str], root: Optional[str] = None,
+            prune_missing: bool = False) -> Dict[str, Any]:
+        """
+        处理给定文件，返回各阶段统计
+        :param paths: 文件路径（可为惰性迭代器）
+        :param root: 用于计算 doc_id（相对路径）的根目录
+        :param prune_missing: 增量模式下，将清单中本次未出现的文档视为已删除并生成墓碑；
+                              paths 必须覆盖完整语料时才应开启
+        """
+        stats = {name: StageStats(name) for name in ("skip", "split", "embed", "sink", "delete")}
+        split_queue: "queue.Queue" = queue.Queue(maxsize=self.queue_size)
+        out_queue: "queue.Queue" = queue.Queue(maxsize=self.queue_size)
+        stop = threading.Event()
+        errors: List[BaseException] = []
+        seen: List[str] = []
+        started = time.perf_counter()
+
+        with span("ingest"):
+            # 子进程的日志经队列交给主进程写入，避免多进程同时写同一个日志文件
+            with ProcessPoolExecutor(max_workers=self.workers, initializer=configure_worker,
+                                     initargs=(get_log_queue(),)) as pool:
+                producer = threading.Thread(
+                    target=self._produce, name="ingest-producer",
+                    args=(pool, paths, root, split_queue, stats, stop, errors, seen), daemon=True)
+                # 在当前上下文中运行，embed 阶段的 span 记录在 ingest/ 之下
+                embedder = threading.Thread(
+                    target=contextvars.copy_context().run, name="ingest-embedder",
+                    args=(self._embed, split_queue, out_queue, stats, stop, errors), daemon=True)
+                producer.start()
+                embedder.start()
+
+                try:
+                    self._drain(out_queue, embedder, stats, started)
+                except BaseException:
+                    stop.set()
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    raise
+                finally:
+                    stop.set()
+                    producer.join()
+                    embedder.join()
+
+            if errors:
+                raise errors[0]
+            if self.manifest is not None:
+                if prune_missing:
+                    self._emit_tombstones(self.manifest.remove_missing(seen), stats)
+                self.manifest.save()
+        report = self._report(stats, time.perf_counter() - started)
+        logger.info("[INGEST] finished %s", report)
+        return report
+
+    def _produce(self, pool: ProcessPoolExecutor, paths: Iterable[str], root: Optional[str],
+                 split_queue: "queue.Queue", stats: Dict[str, StageStats], stop: threading.Event,
+                 errors: List[BaseException], seen: List[str]) -> None:
+        incremental = self.manifest is not None
+        try:
+            for path in paths:
+                if stop.is_set():
+                    break
+                doc_id = os.path.relpath(path, root) if root else path
+                seen.append(doc_id)
+                if incremental and self.manifest.check(doc_id, path) == UNCHANGED:
+                    stats["skip"].items += 1
+                    continue
+                future = pool.submit(_split_file, path, doc_id, self.max_segment_bytes, self.sentence_splitter,
+                                     incremental)
+                # 队列已满时阻塞：限制在途文件数
+                self._put(split_queue, (path, future), stop)
+                stats["split"].observe_queue(split_queue.qsize())
+        except BaseException as e:  # noqa: BLE001 - surfaced to caller in run()
+            errors.append(e)
+        finally:
+            self._put(split_queue, _DONE, stop)
+
+    def _iter_split_docs(self, split_queue: "queue.Queue", stats: Dict[str, StageStats],
+                         stop: threading.Event, doc_info: "OrderedDict[str, SplitDocument]") -> Iterator[Tuple[str, List[str]]]:
+        while True:
+            item = self._get(split_queue, stop)
+            if item is _DONE:
+                return
+            path, future = item  # type: Tuple[str, Future]
+            try:
+                doc = future.result()
+            except Exception as e:  # noqa: BLE001 - skip unreadable files, keep the pipeline running
+                stats["split"].failed += 1
+                logger.warning("[INGEST] split failed path=%s error=%r", path, e)
+                continue
+            stats["split"].items += 1
+            stats["split"].busy_s += doc.elapsed_s
+            # mtime 变化但内容未变（如 touch、重新拷贝）：刷新清单后跳过
+            manifest = self.manifest
+            if manifest is not None and manifest.is_content_unchanged(doc.doc_id, doc.file_hash, doc.path):
+                stats["skip"].items += 1
+                continue
+            doc_info[doc.doc_id] = doc
+            yield doc.doc_id, doc.sentences
+
+    def _embed(self, split_queue: "queue.Queue", out_queue: "queue.Queue", stats: Dict[str, StageStats],
+               stop: threading.Event, errors: List[BaseException]) -> None:
+        doc_info: "OrderedDict[str, SplitDocument]" = OrderedDict()
+        batch: List[Record] = []
+        pending: List[Record] = []
+        try:
+            docs = self._iter_split_docs(split_queue, stats, stop, doc_info)
+            for record in self.tokenizer.iter_tokenize_sentences(docs, batch_size=self.batch_size):
+                if stop.is_set():
+                    break
+                if not record.content.strip():
+                    continue
+                if self.manifest is not None:
+                    # 增量模式下按文档整体登记清单，文档的全部片段到齐后才进入向量化批次
+                    doc_id = record.metadata.identification.doc_id
+                    if pending and pending[0].metadata.identification.doc_id != doc_id:
+                        batch.extend(self._finish_document(pending, doc_info, out_queue, stop))
+                        pending = []
+                    pending.append(record)
+                else:
+                    self._attach_source(record, doc_info)
+                    batch.append(record)
+                if len(batch) >= self.batch_size:
+                    self._embed_batch(batch, out_queue, stats, stop)
+                    batch = []
+            if self.manifest is not None and not stop.is_set():
+                batch.extend(self._finish_document(pending, doc_info, out_queue, stop, final=True))
+            if batch:
+                self._embed_batch(batch, out_queue, stats, stop)
+        except BaseException as e:  # noqa: BLE001 - surfaced to caller in run()
+            errors.append(e)
+            stop.set()
+        finally:
+            self._put(out_queue, _DONE, stop)
+
+    def _finish_document(self, records: List[Record], doc_info: "OrderedDict[str, SplitDocument]",
+                         out_queue: "queue.Queue", stop: threading.Event, final: bool = False) -> List[Record]:
+        """
+        登记一个已完整产出的文档，以及排在它之前、没有产出任何片段的文档
+        墓碑先于新片段进入输出队列；返回补全了来源与版本信息的片段
+        """
+        doc_id = records[0].metadata.identification.doc_id if records else None
+        tombstones: List[Tombstone] = []
+
+        def _register_empty(until: Optional[str]) -> None:
+            while doc_info and next(iter(doc_info)) != until:
+                empty = doc_info.popitem(last=False)[1]
+                tombstones.extend(self.manifest.update_document(
+                    empty.doc_id, empty.path, empty.file_hash, [], empty.mtime_ns, empty.size_bytes))
+
+        _register_empty(doc_id)
+        if records:
+            doc = doc_info.pop(doc_id)
+            for record in records:
+                self._set_source(record, doc)
+            tombstones.extend(self.manifest.update_document(
+                doc.doc_id, doc.path, doc.file_hash, records, doc.mtime_ns, doc.size_bytes))
+        if final:
+            _register_empty(None)
+        if tombstones:
+            self._put(out_queue, _Tombstones(tombstones), stop)
+        return records
+
+    @staticmethod
+    def _attach_source(record: Record, doc_info: "OrderedDict[str, SplitDocument]") -> None:
+        doc_id = record.metadata.identification.doc_id
+        # 切分器按文档顺序产出，当前文档之前的文档信息已不再需要
+        while doc_info and next(iter(doc_info)) != doc_id:
+            doc_info.popitem(last=False)
+        doc = doc_info.get(doc_id)
+        if doc is not None:
+            IngestionPipeline._set_source(record, doc)
+
+    @staticmethod
+    def _set_source(record: Record, doc: SplitDocument) -> None:
+        record.metadata.source_location = SourceLocationMeta(source="file", path=doc.path)
+        record.metadata.document_info = DocumentInfoMeta(size_bytes=doc.size_bytes)
+
+    def _embed_batch(self, batch: List[Record], out_queue: "queue.Queue", stats: Dict[str, StageStats],
+                     stop: threading.Event) -> None:
+        start = time.perf_counter()
+        with span("embed"):
+            embeddings = np.asarray(self.embed_fn([r.content for r in batch]), dtype=np.float32)
+        stats["embed"].busy_s += time.perf_counter() - start
+        stats["embed"].items += len(batch)
+        self._put(out_queue, (batch, embeddings), stop)
+        stats["embed"].observe_queue(out_queue.qsize())
+
+    def _drain(self, out_queue: "queue.Queue", embedder: threading.Thread,
+               stats: Dict[str, StageStats], started: float) -> None:
+        last_report = time.perf_counter()
+        while True:
+            try:
+                item = out_queue.get(timeout=0.1)
+            except queue.Empty:
+                if not embedder.is_alive() and out_queue.empty():
+                    return
+                continue
+            if item is _DONE:
+                return
+            if isinstance(item, _Tombstones):
+                self._emit_tombstones(item.tombstones, stats)
+                continue
+            records, embeddings = item
+            start = time.perf_counter()
+            with span("sink"):
+                self.sink(records, embeddings)
+            stats["sink"].busy_s += time.perf_counter() - start
+            stats["sink"].items += len(records)
+
+            now = time.perf_counter()
+            if now - last_report >= self.report_interval_s:
+                logger.info("[INGEST] progress %s", self._report(stats, now - started))
+                last_report = now
+
+    def _emit_tombstones(self, tombstones: List[Tombstone], stats: Dict[str, StageStats]) -> None:
+        if not tombstones:
+            return
+        start = time.perf_counter()
+        with span("delete"):
+            if self.on_tombstones is not None:
+                self.on_tombstones(tombstones)
+            else:
+                logger.warning("[INGEST] %d tombstones dropped: no on_tombstones callback", len(tombstones))
+        stats["delete"].busy_s += time.perf_counter() - start
+        stats["delete"].items += len(tombstones)
+
+    @staticmethod
+    def _put(q: "queue.Queue", item: Any, stop: threading.Event) -> None:
+        # 带超时地阻塞写入，以便在其他阶段异常退出时及时停止
+        while True:
+            try:
+                q.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                if stop.is_set():
+                    return
+
+    @staticmethod
+    def _get(q: "queue.Queue", stop: threading.Event) -> Any:
+        while True:
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                if stop.is_set():
+                    return _DONE
+
+    @staticmethod
+    def _report(stats: Dict[str, StageStats], elapsed_s: float) -> Dict[str, Any]:
+        return {
+            "elapsed_s": round(elapsed_s, 6),
+            "stages": {name: s.as_dict(elapsed_s) for name, s in stats.items()},
+        }
+
+
+class JsonlSink:
+    """将 Record 与向量逐行写入 JSON Lines 文件（开发调试用）"""
+
+    def __init__(self, path: str):
+        self._file = open(path, "w", encoding="utf-8")
+
+    def __call__(self, records: List[Record], embeddings: np.ndarray) -> None:
+        for record, vector in zip(records, embeddings):
+            row = record_to_dict(record)
+            row["embedding"] = vector.tolist()
+            self._file.write(json.dumps(row, ensure_ascii=False))
+            self._file.write("\n")
+
+    def write_tombstones(self, tombstones: List[Tombstone]) -> None:
+        """以 {"deleted": id} 行记录需删除的片段，可直接作为 on_tombstones 回调"""
+        for t in tombstones:
+            self._file.write(json.dumps({"deleted": t.record_id, "doc_id": t.doc_id, "reason": t.reason},
+                                        ensure_ascii=False))
+            self._file.write("\n")
+
+    def close(self) -> None:
+        self._file.close()
+
+
+def ingest_directory(root: str, sink: Sink, patterns: Sequence[str] = ("*.txt", "*.md"),
+                     **kwargs: Any) -> Dict[str, Any]:
+    """遍历目录并入库，kwargs 透传给 IngestionPipeline；提供 manifest 时目录中已删除的文件会生成墓碑"""
+    pipeline = IngestionPipeline(sink=sink, **kwargs)
+    return pipeline.run(discover_files(root, patterns), root=root, prune_missing=pipeline.manifest is not None)
+
+
+__all__ = ["IngestionPipeline", "JsonlSink", "SplitDocument", "StageStats", "discover_files", "ingest_directory"]
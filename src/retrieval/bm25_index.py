@@ -0,0 +1,300 @@
+from __future__ import annotations
+
+import threading
+from collections import Counter
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.libs.project_logger import logger
+from src.libs.record_time import record_time
+from src.retrieval.text_analyzer import Analyzer, make_analyzer
+from src.tokenizer.record import Record
+from src.vector_store.base_vector_store import SearchHit
+
+# 查询词项：(倒排起点, 倒排终点, idf * 查询词频, 得分上界)
+_QueryTerm = Tuple[int, int, float, float]
+# 候选数不超过该值时总是走剪枝路径
+_SPARSE_MIN = 4096
+# add() 按该文档数分块去重计数，限制临时数组大小
+_ADD_CHUNK = 65536
+
+
+def record_lexical_text(record: Record) -> str:
+    """参与词法索引的文本：内容 + business.keywords + quality.tags"""
+    parts = [record.content]
+    business, quality = record.metadata.business, record.metadata.quality
+    if business is not None and business.keywords:
+        parts.extend(business.keywords)
+    if quality is not None and quality.tags:
+        parts.extend(quality.tags)
+    return "\n".join(parts)
+
+
+class BM25Index:
+    """内存 BM25 倒排索引
+
+    - 倒排表为 CSR 结构：term_offsets[t]:term_offsets[t+1] 是词项 t 的 (文档行号, 预计算的 tf 权重)
+    - 新增文档先进入待合并区，commit()（或下一次检索）时一次性向量化合并
+    - 检索时按 MaxScore 只为稀有词项的倒排项打分，必要时退化为稠密数组累加，argpartition 取 top-k
+    - 删除只标记（检索时过滤），下一次 commit() 时从倒排表中移除
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75, analyzer: Optional[Analyzer] = None):
+        """
+        :param k1: 词频饱和参数
+        :param b: 文档长度归一化参数
+        :param analyzer: 文本 -> 词项列表，默认 make_analyzer()（jieba 可用时分词，否则字符二元组）
+        """
+        self.k1 = k1
+        self.b = b
+        self.analyzer = analyzer or make_analyzer()
+        self.version = 0
+        self._lock = threading.RLock()
+        self._vocab: Dict[str, int] = {}
+        self._ids: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._alive = np.zeros(0, dtype=bool)
+        self._doc_len = np.zeros(0, dtype=np.float32)
+        self._term_offsets = np.zeros(1, dtype=np.int64)
+        self._post_docs = np.zeros(0, dtype=np.int32)
+        self._post_tf = np.zeros(0, dtype=np.uint16)
+        self._post_weight = np.zeros(0, dtype=np.float32)
+        self._idf = np.zeros(0, dtype=np.float32)
+        self._term_max_weight = np.zeros(0, dtype=np.float32)
+        # 待合并的 (文档行号, 词项, 词频) 倒排项，每次 add 的每个分块一组
+        self._pending: List[Tuple[np.ndarray, np.ndarray, np.ndarray]] = []
+        self._pending_rows: List[np.ndarray] = []
+        self._pending_lens: List[np.ndarray] = []
+        self._dirty = False
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    @property
+    def row_ids(self) -> List[str]:
+        """行号 -> id（含已删除/被覆盖的行），与 search(allowed=...) 的掩码下标一致"""
+        return self._ids
+
+    def add(self, ids: Sequence[str], texts: Sequence[str]) -> None:
+        """写入文档；已存在的 id 会被覆盖。写入在下一次 commit()/检索时生效，version 立即递增"""
+        if len(ids) != len(texts):
+            raise ValueError("ids and texts must have the same length")
+        with self._lock:
+            for begin in range(0, len(ids), _ADD_CHUNK):
+                self._add_chunk(ids[begin:begin + _ADD_CHUNK], texts[begin:begin + _ADD_CHUNK])
+            self._dirty = True
+            # 检索结果已随之变化（检索前会先 commit），依赖 version 的缓存需要立即失效
+            if len(ids):
+                self.version += 1
+
+    def _add_chunk(self, ids: Sequence[str], texts: Sequence[str]) -> None:
+        vocab = self._vocab
+        token_ids: List[int] = []
+        lens: List[int] = []
+        for text in texts:
+            tokens = self.analyzer(text)
+            token_ids.extend([vocab.setdefault(t, len(vocab)) for t in tokens])
+            lens.append(len(tokens))
+
+        rows = np.arange(len(self._ids), len(self._ids) + len(ids), dtype=np.int32)
+        for record_id, row in zip(ids, rows.tolist()):
+            old = self._rows.get(record_id)
+            if old is not None and old < len(self._alive):
+                self._alive[old] = False
+            self._ids.append(record_id)
+            self._rows[record_id] = row
+
+        # 按 (文档, 词项) 去重计数；结果以文档为主序，commit() 时按词项稳定排序即可
+        n_terms = max(len(vocab), 1)
+        keys = np.repeat(np.arange(len(ids), dtype=np.int64), lens) * n_terms \
+            + np.asarray(token_ids, dtype=np.int64)
+        keys, tf = np.unique(keys, return_counts=True)
+        self._pending.append((rows[keys // n_terms], (keys % n_terms).astype(np.int32),
+                              np.minimum(tf, np.iinfo(np.uint16).max).astype(np.uint16)))
+        self._pending_rows.append(rows)
+        self._pending_lens.append(np.asarray(lens, dtype=np.float32))
+
+    def add_records(self, records: Sequence[Record], include_keywords: bool = True) -> None:
+        texts = [record_lexical_text(r) if include_keywords else r.content for r in records]
+        self.add([r.id for r in records], texts)
+
+    def delete(self, ids: Sequence[str]) -> int:
+        with self._lock:
+            deleted = 0
+            for record_id in ids:
+                row = self._rows.pop(record_id, None)
+                if row is not None:
+                    if row < len(self._alive):
+                        self._alive[row] = False
+                    deleted += 1
+            # 已提交的行只在检索时过滤，倒排项留到下一次 commit() 再移除
+            if deleted:
+                self.version += 1
+            return deleted
+
+    @record_time
+    def commit(self) -> None:
+        """合并待写入文档、移除已删除文档的倒排项，并重算 tf 权重与 idf"""
+        with self._lock:
+            if not self._dirty:
+                return
+            n_rows = len(self._ids)
+            n_terms = len(self._vocab)
+            alive = np.zeros(n_rows, dtype=bool)
+            alive[:len(self._alive)] = self._alive
+            doc_len = np.zeros(n_rows, dtype=np.float32)
+            doc_len[:len(self._doc_len)] = self._doc_len
+
+            # 现有倒排项按 (term, doc) 有序，新文档行号更大：拼接后按 term 稳定排序即得 (term, doc) 有序
+            old_terms = np.repeat(np.arange(len(self._term_offsets) - 1, dtype=np.int32),
+                                  np.diff(self._term_offsets))
+            if self._pending:
+                rows = np.concatenate(self._pending_rows)
+                doc_len[rows] = np.concatenate(self._pending_lens)
+                # 被覆盖的行 alive 已置 False；新行只要 id 仍指向它就存活
+                alive[rows] = [self._rows.get(self._ids[r]) == r for r in rows.tolist()]
+                new_docs = np.concatenate([p[0] for p in self._pending])
+                new_terms = np.concatenate([p[1] for p in self._pending])
+                new_tf = np.concatenate([p[2] for p in self._pending])
+            else:
+                new_terms = new_docs = np.zeros(0, np.int32)
+                new_tf = np.zeros(0, np.uint16)
+
+            terms = np.concatenate([old_terms, new_terms])
+            docs = np.concatenate([self._post_docs, new_docs])
+            tf = np.concatenate([self._post_tf, new_tf])
+            del old_terms, new_terms, new_docs, new_tf
+            keep = alive[docs]
+            if not keep.all():
+                terms, docs, tf = terms[keep], docs[keep], tf[keep]
+            del keep
+            order = np.argsort(terms, kind="stable")
+            terms, docs, tf = terms[order], docs[order], tf[order]
+            del order
+
+            offsets = np.zeros(n_terms + 1, dtype=np.int64)
+            np.cumsum(np.bincount(terms, minlength=n_terms), out=offsets[1:])
+            n_docs = int(alive.sum())
+            avgdl = float(doc_len[alive].mean()) if n_docs else 1.0
+            tf32 = tf.astype(np.float32)
+            norm = self.k1 * (1 - self.b + self.b * doc_len[docs] / max(avgdl, 1e-6))
+            df = np.diff(offsets).astype(np.float64)
+
+            self._alive = alive
+            self._doc_len = doc_len
+            self._term_offsets = offsets
+            self._post_docs = docs
+            self._post_tf = tf
+            self._post_weight = (tf32 * (self.k1 + 1) / (tf32 + norm)).astype(np.float32)
+            self._idf = np.log1p((n_docs - df + 0.5) / (df + 0.5)).astype(np.float32)
+            self._term_max_weight = np.zeros(n_terms, dtype=np.float32)
+            nonempty = np.flatnonzero(df > 0)
+            if len(nonempty):
+                self._term_max_weight[nonempty] = np.maximum.reduceat(self._post_weight, offsets[nonempty])
+            self._pending, self._pending_rows, self._pending_lens = [], [], []
+            self._dirty = False
+            self.version += 1
+            logger.info("[LEXICAL] committed docs=%d terms=%d postings=%d", n_docs, n_terms, len(docs))
+
+    def search(self, query: str, top_k: int = 10, allowed: Optional[np.ndarray] = None) -> List[SearchHit]:
+        """
+        MaxScore 剪枝的精确 BM25 检索：
+        词项按得分上界降序排列，只对前缀（稀有词项）的倒排项求并集作为候选，
+        其余词项的得分通过二分查找补全；当剩余词项上界之和不超过当前第 k 名得分时，
+        候选之外的文档不可能进入 top-k，直接返回。剪枝无效时退化为稠密累加。
+        :param allowed: 按行号（见 row_ids）的布尔掩码，取 top-k 之前排除掩码为 False 的文档（预过滤）；
+                        超出掩码长度的行视为不允许
+        """
+        if self._dirty:
+            self.commit()
+        alive = self._alive
+        if allowed is not None:
+            n = min(len(allowed), len(alive))
+            alive = np.zeros(len(alive), dtype=bool)
+            alive[:n] = self._alive[:n] & np.asarray(allowed[:n], dtype=bool)
+        offsets = self._term_offsets
+        counts = Counter(self._vocab[t] for t in self.analyzer(query) if t in self._vocab)
+        terms: List[_QueryTerm] = []
+        for term, qtf in counts.items():
+            if term + 1 >= len(offsets):
+                continue        # 检索期间新写入、尚未提交的词项
+            start, end = int(offsets[term]), int(offsets[term + 1])
+            if start < end:
+                weight = float(self._idf[term]) * qtf
+                terms.append((start, end, weight, weight * float(self._term_max_weight[term])))
+        if not terms or top_k < 1:
+            return []
+
+        terms.sort(key=lambda t: -t[3])
+        rest_bound = np.concatenate((np.cumsum([t[3] for t in terms][::-1])[::-1], [0.0]))
+        total = sum(end - start for start, end, _, _ in terms)
+        essential = 0
+        for split, (start, end, _, _) in enumerate(terms, start=1):
+            essential += end - start
+            # 候选逐个二分查找的代价超过稠密累加时放弃剪枝
+            if essential > _SPARSE_MIN and essential * len(terms) * 8 > total:
+                break
+            candidates = np.unique(np.concatenate([self._post_docs[s:e] for s, e, _, _ in terms[:split]]))
+            candidates = candidates[alive[candidates]]
+            values = self._score_candidates(candidates, terms)
+            best = self._top(values, top_k)
+            if split == len(terms) or (len(best) >= top_k and rest_bound[split] <= values[best[-1]]):
+                return [SearchHit(id=self._ids[candidates[i]], score=float(values[i])) for i in best]
+        return self._search_dense(terms, top_k, alive)
+
+    def _score_candidates(self, candidates: np.ndarray, terms: List[_QueryTerm]) -> np.ndarray:
+        values = np.zeros(len(candidates), dtype=np.float32)
+        for start, end, weight, _ in terms:
+            docs = self._post_docs[start:end]
+            pos = np.minimum(np.searchsorted(docs, candidates), len(docs) - 1)
+            hit = docs[pos] == candidates
+            values[hit] += weight * self._post_weight[start + pos[hit]]
+        return values
+
+    @staticmethod
+    def _top(values: np.ndarray, top_k: int) -> np.ndarray:
+        if len(values) > top_k:
+            part = np.argpartition(-values, top_k - 1)[:top_k]
+        else:
+            part = np.arange(len(values))
+        return part[np.argsort(-values[part], kind="stable")]
+
+    def _search_dense(self, terms: List[_QueryTerm], top_k: int, alive: np.ndarray) -> List[SearchHit]:
+        scores = np.zeros(len(alive), dtype=np.float32)
+        slices = []
+        for start, end, weight, _ in terms:
+            docs = self._post_docs[start:end]
+            # 同一词项的倒排项文档互不重复，可直接使用花式索引累加
+            scores[docs] += weight * self._post_weight[start:end]
+            slices.append(docs)
+
+        # 候选含重复（一个文档最多出现 len(slices) 次），取前 top_k * len(slices) 个后去重即可，无需排序去重
+        candidates = np.concatenate(slices) if len(slices) > 1 else slices[0]
+        values = scores[candidates]
+        values[~alive[candidates]] = -np.inf
+        order = self._top(values, top_k * len(slices))
+
+        hits: List[SearchHit] = []
+        seen = set()
+        for i in order.tolist():
+            row = int(candidates[i])
+            if values[i] == -np.inf or len(hits) >= top_k:
+                break
+            if row not in seen:
+                seen.add(row)
+                hits.append(SearchHit(id=self._ids[row], score=float(values[i])))
+        return hits
+
+    def search_batch(self, queries: Sequence[str], top_k: int = 10,
+                     allowed: Optional[np.ndarray] = None) -> List[List[SearchHit]]:
+        return [self.search(q, top_k, allowed) for q in queries]
+
+    @property
+    def nbytes(self) -> int:
+        """倒排表与文档列占用的字节数（不含词表与 id 字符串）"""
+        return sum(a.nbytes for a in (self._term_offsets, self._post_docs, self._post_tf, self._post_weight,
+                                      self._idf, self._term_max_weight, self._alive, self._doc_len))
+
+
+__all__ = ["BM25Index", "record_lexical_text"]
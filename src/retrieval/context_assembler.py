@@ -0,0 +1,321 @@
+from __future__ import annotations
+
+import itertools
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.libs.metrics import span
+from src.tokenizer.record import Record
+from src.vector_store.base_vector_store import SearchHit
+
+# 批量取回片段内容：ids -> 与 ids 等长的文本列表（如一次 Milvus query / 一次 SegmentStore 读取）
+FetchFn = Callable[[Sequence[str]], Sequence[str]]
+
+MODES = ("neighbors", "parent")
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估计 LLM token 数：每个汉字（及其他 3 字节字符）1 个，ASCII 字符每 4 个 1 个
+
+    由 UTF-8 字节数推算非 ASCII 字符数，不做逐字符扫描，百万片段建图时开销可忽略。
+    """
+    n = len(text)
+    wide = (len(text.encode("utf-8")) - n) // 2
+    return wide + (n - wide + 3) // 4
+
+
+@dataclass
+class ContextBlock:
+    record_ids: List[str]            # 按原文顺序排列的片段ID
+    text: str                        # 片段内容按原文顺序拼接
+    score: float                     # 块内命中片段的最高分
+    tokens: int                      # 估计的 token 数
+    hit_ids: List[str] = field(default_factory=list)   # 块内的检索命中
+    parent_id: Optional[str] = None
+
+
+@dataclass
+class _Window:
+    __slots__ = ("lo", "hi", "score", "best", "hits", "tokens")
+    lo: int              # 布局位置区间 [lo, hi)
+    hi: int
+    score: float         # 区间内命中的最高分
+    best: int            # 最高分命中的位置
+    hits: List[int]      # 命中位置（去重）
+    tokens: int          # 区间的 token 数
+
+
+def _first_of_runs(sorted_values: np.ndarray) -> np.ndarray:
+    """有序数组中每段相同值的首个元素的掩码（即 np.unique 排序后的去重步骤，省去其额外开销）"""
+    mask = np.ones(len(sorted_values), dtype=bool)
+    mask[1:] = sorted_values[1:] != sorted_values[:-1]
+    return mask
+
+
+class ChunkGraph:
+    """片段邻接数组
+
+    所有片段按 prev_id / next_id 链接排成一条线性布局，同一文档的片段占据连续的位置区间，
+    于是 ±N 扩展、区间合并与 token 计数都是整数数组上的运算：
+    - chain_start / chain_end：每个位置所在文档链的 [起点, 终点)
+    - parent_pos：parent_id 指向图中片段时为其位置，否则为 -1（parent_id 为文档ID时扩展为整条文档链）
+    - token_prefix：token 数的前缀和，任意区间的 token 数 O(1)
+
+    构建后只读；入库新增片段后重新构建。
+    """
+
+    def __init__(self, records: Iterable[Record], count_tokens: Callable[[str], int] = estimate_tokens,
+                 keep_content: bool = True):
+        """
+        :param records: 片段，relations 由切分器填充（见 src.tokenizer.base_tokenizer.link_chunks）
+        :param count_tokens: token 计数函数，用于预算装箱
+        :param keep_content: 是否在内存中保留内容；为 False 时组装上下文需要提供 fetch 函数
+        """
+        ids: List[str] = []
+        links: List[Tuple[Optional[str], Optional[str], Optional[str]]] = []
+        tokens: List[int] = []
+        contents: List[str] = []
+        for record in records:
+            relations = record.metadata.relations if record.metadata is not None else None
+            ids.append(record.id)
+            links.append((relations.prev_id, relations.next_id, relations.parent_id) if relations is not None
+                         else (None, None, None))
+            tokens.append(count_tokens(record.content))
+            if keep_content:
+                contents.append(record.content)
+
+        n = len(ids)
+        row_of = {record_id: row for row, record_id in enumerate(ids)}
+        prev_row = np.array([row_of.get(p, -1) if p is not None else -1 for p, _, _ in links], dtype=np.int64)
+        next_row = np.array([row_of.get(nx, -1) if nx is not None else -1 for _, nx, _ in links], dtype=np.int64)
+
+        # 只沿双向一致的链接前进；链头为没有上一个片段、或上一个片段的 next 不指回自己的位置
+        # （片段被过滤或链接不一致时在该处断开）
+        layout = np.empty(n, dtype=np.int64)
+        chain_start = np.empty(n, dtype=np.int64)
+        chain_end = np.empty(n, dtype=np.int64)
+        visited = np.zeros(n, dtype=bool)
+        is_head = (prev_row < 0) | (next_row[np.maximum(prev_row, 0)] != np.arange(n))
+        pos = 0
+        for head in np.concatenate([np.flatnonzero(is_head), np.arange(n)]):
+            if visited[head]:
+                continue
+            start, row = pos, int(head)
+            while row >= 0 and not visited[row]:
+                visited[row] = True
+                layout[pos] = row
+                pos += 1
+                nxt = int(next_row[row])
+                row = nxt if nxt >= 0 and prev_row[nxt] == row else -1
+            chain_start[start:pos] = start
+            chain_end[start:pos] = pos
+
+        self.ids: List[str] = [ids[row] for row in layout]
+        self.pos_of: Dict[str, int] = {record_id: p for p, record_id in enumerate(self.ids)}
+        self.parent_ids: List[Optional[str]] = [links[row][2] for row in layout]
+        self.parent_pos = np.array([self.pos_of.get(parent, -1) if parent is not None else -1
+                                    for parent in self.parent_ids], dtype=np.int64)
+        self.chain_start = chain_start
+        self.chain_end = chain_end
+        self.token_counts = np.asarray(tokens, dtype=np.int64)[layout] if n else np.zeros(0, dtype=np.int64)
+        self.token_prefix = np.concatenate([[0], np.cumsum(self.token_counts)])
+        self.contents: Optional[List[str]] = [contents[row] for row in layout] if keep_content else None
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def positions(self, ids: Sequence[str]) -> np.ndarray:
+        """ID -> 布局位置，未知 ID 为 -1"""
+        return np.fromiter(map(self.pos_of.get, ids, itertools.repeat(-1, len(ids))), dtype=np.int64,
+                           count=len(ids))
+
+    def window_tokens(self, lo: int, hi: int) -> int:
+        return int(self.token_prefix[hi] - self.token_prefix[lo])
+
+
+class ContextAssembler:
+    """检索结果 -> LLM 上下文
+
+    1. 每个命中按 mode 扩展为位置区间：neighbors 为同一文档内 ±window 个片段；parent 为父片段，
+       父节点不是片段（如文档ID）时为整条文档链
+    2. 同一文档内重叠或相邻的区间合并，命中去重
+    3. 按块内最高分降序装入 token 预算，超出时围绕最高分命中向两侧收缩
+    4. 所有查询需要的片段一次性取回内容
+    """
+
+    def __init__(self, graph: ChunkGraph, window: int = 1, token_budget: int = 2048, mode: str = "neighbors",
+                 fetch: Optional[FetchFn] = None, separator: str = "\n", order: str = "score"):
+        """
+        :param graph: 片段邻接数组
+        :param window: neighbors 模式下每个命中前后扩展的片段数
+        :param token_budget: 每个查询的上下文 token 上限
+        :param mode: neighbors / parent
+        :param fetch: 批量取回内容的函数；graph 保留了内容时可省略
+        :param separator: 块内片段之间的分隔符
+        :param order: 块的输出顺序，score 为按分数降序，document 为按原文位置
+        """
+        if mode not in MODES:
+            raise ValueError(f"mode must be one of {MODES}")
+        if order not in ("score", "document"):
+            raise ValueError("order must be 'score' or 'document'")
+        if window < 0:
+            raise ValueError("window must be >= 0")
+        if fetch is None and graph.contents is None:
+            raise ValueError("fetch is required when the graph does not keep content")
+        self.graph = graph
+        self.window = window
+        self.token_budget = token_budget
+        self.mode = mode
+        self.fetch = fetch
+        self.separator = separator
+        self.order = order
+
+    def assemble(self, hits: Sequence[SearchHit], token_budget: Optional[int] = None) -> List[ContextBlock]:
+        return self.assemble_batch([hits], token_budget)[0]
+
+    def assemble_batch(self, hits_per_query: Sequence[Sequence[SearchHit]],
+                       token_budget: Optional[int] = None) -> List[List[ContextBlock]]:
+        """
+        :param hits_per_query: 每个查询的检索结果（按分数降序）
+        :param token_budget: 覆盖构造时的 token 预算
+        :return: 每个查询的上下文块列表
+        """
+        budget = self.token_budget if token_budget is None else token_budget
+        with span("assemble_context"):
+            merged = self._merge_batch(hits_per_query)
+            packed = [self._pack(windows, budget) for windows in merged]
+            flat = [w for windows in packed for w in windows]
+            lo = np.fromiter((w.lo for w in flat), dtype=np.int64, count=len(flat))
+            hi = np.fromiter((w.hi for w in flat), dtype=np.int64, count=len(flat))
+            # 各窗口位置区间首尾相连展开（等价于逐窗口 arange 再拼接），去重后一次取回
+            lengths = hi - lo
+            positions = np.sort(np.repeat(lo - lengths.cumsum() + lengths, lengths) + np.arange(lengths.sum()))
+            positions = positions[_first_of_runs(positions)]
+            texts = self._fetch(positions)
+            # 每个窗口的内容在 texts 中是一段连续切片
+            starts = iter((lo if texts is None else np.searchsorted(positions, lo)).tolist())
+            return [[self._block(w, texts, next(starts)) for w in windows] for windows in packed]
+
+    def _intervals(self, hit_pos: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        g = self.graph
+        if self.mode == "neighbors":
+            lo = np.maximum(hit_pos - self.window, g.chain_start[hit_pos])
+            hi = np.minimum(hit_pos + self.window + 1, g.chain_end[hit_pos])
+            return lo, hi
+        parent = g.parent_pos[hit_pos]
+        has_parent = parent >= 0
+        lo = np.where(has_parent, parent, g.chain_start[hit_pos])
+        hi = np.where(has_parent, parent + 1, g.chain_end[hit_pos])
+        return lo, hi
+
+    def _merge_batch(self, hits_per_query: Sequence[Sequence[SearchHit]]) -> List[List[_Window]]:
+        """整批查询的区间一次排序、合并：按 (查询, 起点, 终点) 排序后，
+        起点超过此前区间终点的累积最大值（或恰好相接但跨文档链）处开始新窗口"""
+        g = self.graph
+        merged: List[List[_Window]] = [[] for _ in hits_per_query]
+        hit_pos = g.positions([h.id for hits in hits_per_query for h in hits])
+        scores = np.fromiter((h.score for hits in hits_per_query for h in hits), dtype=np.float64,
+                             count=len(hit_pos))
+        query = np.repeat(np.arange(len(hits_per_query)), [len(hits) for hits in hits_per_query])
+        known = hit_pos >= 0
+        if not known.all():
+            query, hit_pos, scores = query[known], hit_pos[known], scores[known]
+        if not len(hit_pos):
+            return merged
+        lo, hi = self._intervals(hit_pos)
+        head = g.chain_start[lo] == lo
+        # 每个查询的位置平移到互不相交的范围，排序与累积最大值都不会跨查询
+        stride = len(g) + 1
+        lo, hi = lo + query * stride, hi + query * stride
+        # parent 模式下命中可能不在自身区间内（父片段），统一按区间起点排序后合并
+        order = np.lexsort((hi, lo))
+        lo, hi, scores, hit_pos, head = lo[order], hi[order], scores[order], hit_pos[order], head[order]
+
+        reach = np.maximum.accumulate(hi)
+        # 重叠，或在同一文档链内首尾相接（起点不是链头）时并入上一个窗口
+        new = np.empty(len(lo), dtype=bool)
+        new[0] = True
+        new[1:] = (lo[1:] > reach[:-1]) | ((lo[1:] == reach[:-1]) & head[1:])
+        starts = new.nonzero()[0]
+        group_query = query[order][starts]
+        group_lo = lo[starts] - group_query * stride
+        group_hi = np.maximum.reduceat(hi, starts) - group_query * stride
+        tokens = g.token_prefix[group_hi] - g.token_prefix[group_lo]
+        # 组内分数最高的命中，同分取排序靠前者
+        best = np.lexsort((-scores, new.cumsum()))[starts]
+
+        hit_list = hit_pos.tolist()
+        bounds = starts.tolist() + [len(hit_list)]
+        for i, (q, l, h, s, b, t) in enumerate(zip(group_query.tolist(), group_lo.tolist(), group_hi.tolist(),
+                                                   scores[best].tolist(), hit_pos[best].tolist(), tokens.tolist())):
+            # 组内命中去重，保留首次出现的顺序
+            merged[q].append(_Window(l, h, s, b, list(dict.fromkeys(hit_list[bounds[i]:bounds[i + 1]])), t))
+        return merged
+
+    def _pack(self, merged: List[_Window], budget: int) -> List[_Window]:
+        g = self.graph
+        remaining = budget
+        packed = []
+        for window in sorted(merged, key=lambda w: -w.score):
+            if remaining <= 0:
+                break
+            if window.tokens > remaining:
+                lo, hi = self._shrink(window, remaining)
+                if hi <= lo:
+                    continue
+                # 收缩后落在区间外的命中不再计入（parent 模式的命中本就在区间外，保持不变）
+                inside = [p for p in window.hits if lo <= p < hi]
+                window = _Window(lo, hi, window.score, window.best, inside or window.hits, g.window_tokens(lo, hi))
+            remaining -= window.tokens
+            packed.append(window)
+        if self.order == "document":
+            packed.sort(key=lambda w: w.lo)
+        return packed
+
+    def _shrink(self, window: _Window, budget: int) -> Tuple[int, int]:
+        """从块内分数最高的命中向两侧交替扩展，直到预算用完；返回空区间表示放不下"""
+        g = self.graph
+        centre = window.best if window.lo <= window.best < window.hi else window.lo
+        if g.token_counts[centre] > budget:
+            return centre, centre
+        left, right = centre, centre + 1
+        grew = True
+        while grew:
+            grew = False
+            if right < window.hi and g.window_tokens(left, right + 1) <= budget:
+                right += 1
+                grew = True
+            if left > window.lo and g.window_tokens(left - 1, right) <= budget:
+                left -= 1
+                grew = True
+        return left, right
+
+    def _fetch(self, positions: np.ndarray) -> Optional[List[str]]:
+        """按升序位置取回内容；graph 保留了内容时返回 None，直接按布局位置切片"""
+        g = self.graph
+        if g.contents is not None:
+            return None
+        if not len(positions):
+            return []
+        return list(self.fetch(list(map(g.ids.__getitem__, positions.tolist()))))
+
+    def _block(self, window: _Window, texts: Optional[List[str]], start: int) -> ContextBlock:
+        """:param start: 窗口首个片段在 texts（为 None 时为 graph.contents）中的下标"""
+        g = self.graph
+        contents = g.contents if texts is None else texts
+        return ContextBlock(record_ids=g.ids[window.lo:window.hi],
+                            text=self.separator.join(contents[start:start + window.hi - window.lo]),
+                            score=window.score,
+                            tokens=window.tokens,
+                            hit_ids=[g.ids[p] for p in window.hits],
+                            parent_id=g.parent_ids[window.lo])
+
+
+def format_context(blocks: Sequence[ContextBlock], separator: str = "\n\n") -> str:
+    """把上下文块拼接为 prompt 中的参考资料段落"""
+    return separator.join(block.text for block in blocks)
+
+
+__all__ = ["ChunkGraph", "ContextAssembler", "ContextBlock", "estimate_tokens", "format_context"]
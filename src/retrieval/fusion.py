@@ -0,0 +1,35 @@
+from typing import Dict, List, Optional, Sequence
+
+from src.vector_store.base_vector_store import SearchHit
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[SearchHit]],
+                           k: float = 60.0,
+                           weights: Optional[Sequence[float]] = None,
+                           top_k: Optional[int] = None) -> List[SearchHit]:
+    """
+    倒数排名融合（RRF）：score(d) = Σ weight_i / (k + rank_i(d))，rank 从 1 开始
+    只依赖排名，不同检索路的分数无需归一化
+    :param rankings: 各检索路按相关度降序排列的结果
+    :param k: 平滑常数，越大排名靠后的结果权重衰减越慢
+    :param weights: 各检索路的权重，默认均为 1
+    :param top_k: 返回数量，默认返回全部
+    :return: 按融合分数降序排列的结果，score 为融合分数
+    """
+    if weights is None:
+        weights = [1.0] * len(rankings)
+    if len(weights) != len(rankings):
+        raise ValueError("weights must match rankings")
+
+    fused: Dict[str, float] = {}
+    for hits, weight in zip(rankings, weights):
+        for rank, hit in enumerate(hits, start=1):
+            fused[hit.id] = fused.get(hit.id, 0.0) + weight / (k + rank)
+    # 分数相同时保持首次出现的顺序（dict 插入顺序 + 稳定排序）
+    ordered = sorted(fused.items(), key=lambda item: -item[1])
+    if top_k is not None:
+        ordered = ordered[:top_k]
+    return [SearchHit(id=record_id, score=score) for record_id, score in ordered]
+
+
+__all__ = ["reciprocal_rank_fusion"]
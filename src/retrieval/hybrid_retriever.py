@@ -0,0 +1,84 @@
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.libs.metrics import span
+from src.retrieval.bm25_index import BM25Index
+from src.retrieval.fusion import reciprocal_rank_fusion
+from src.vector_store.base_vector_store import BaseVectorStore, SearchHit
+
+QueryEmbedFn = Callable[[List[str]], np.ndarray]
+
+
+class HybridRetriever:
+    """词法（BM25）+ 向量两路召回，按 RRF 融合
+
+    产品编号等精确词项主要依赖词法一路命中，语义相近的表述依赖向量一路命中。
+    """
+
+    def __init__(self, vector_store: BaseVectorStore, lexical_index: BM25Index,
+                 embed_fn: Optional[QueryEmbedFn] = None,
+                 candidate_k: int = 50,
+                 rrf_k: float = 60.0,
+                 weights: Sequence[float] = (1.0, 1.0)):
+        """
+        :param vector_store: 向量存储
+        :param lexical_index: BM25 倒排索引
+        :param embed_fn: 查询编码函数，默认使用 embedding_model.encode（不走磁盘缓存）
+        :param candidate_k: 每一路召回的候选数
+        :param rrf_k: RRF 平滑常数
+        :param weights: (向量, 词法) 两路的融合权重
+        """
+        if embed_fn is None:
+            from src.embedding.embedding_model import encode
+
+            def embed_fn(texts: List[str]) -> np.ndarray:
+                return encode(texts, use_cache=False)
+
+        self.vector_store = vector_store
+        self.lexical_index = lexical_index
+        self.embed_fn = embed_fn
+        self.candidate_k = candidate_k
+        self.rrf_k = rrf_k
+        self.weights = tuple(weights)
+        # 词法行号 -> 向量存储行号（-1 表示不在向量存储中），两边索引版本变化时重建
+        self._row_map: Optional[np.ndarray] = None
+        self._row_map_key: Optional[Tuple[int, int, int]] = None
+
+    def search(self, query: str, top_k: int = 10,
+               query_vector: Optional[np.ndarray] = None,
+               filter: Optional[Any] = None) -> List[SearchHit]:
+        """
+        :param query: 查询文本
+        :param top_k: 返回数量
+        :param query_vector: 已编码的查询向量，缺省时调用 embed_fn
+        :param filter: 元数据过滤条件（需 vector_store 为 LocalVectorStore）；
+                       两路都在取 top-k 之前预过滤，词法一路使用向量存储元数据索引映射出的行掩码
+        """
+        with span("retrieve"):
+            if query_vector is None:
+                with span("embed_query"):
+                    query_vector = np.asarray(self.embed_fn([query]))[0]
+            with span("dense"):
+                if filter is None:
+                    dense = self.vector_store.search(query_vector, self.candidate_k)
+                else:
+                    dense = self.vector_store.search(query_vector, self.candidate_k, filter=filter)
+            with span("lexical"):
+                allowed = None if filter is None else self._lexical_mask(filter)
+                lexical = self.lexical_index.search(query, self.candidate_k, allowed=allowed)
+            return reciprocal_rank_fusion([dense, lexical], k=self.rrf_k, weights=self.weights, top_k=top_k)
+
+    def _lexical_mask(self, filter: Any) -> np.ndarray:
+        """过滤条件在向量存储上编译为行掩码，再经行号映射转换为词法索引的行掩码"""
+        index = self.lexical_index
+        key = (index.version, len(index.row_ids), self.vector_store.version)
+        if self._row_map_key != key:
+            self._row_map = self.vector_store.rows_of(index.row_ids)
+            self._row_map_key = key
+        mask = self.vector_store.filter_mask(filter)
+        rows = self._row_map
+        return (rows >= 0) & mask[np.maximum(rows, 0)] if len(mask) else np.zeros(len(rows), dtype=bool)
+
+
+__all__ = ["HybridRetriever"]
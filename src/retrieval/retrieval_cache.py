@@ -0,0 +1,286 @@
+from __future__ import annotations
+
+import hashlib
+import re
+import sys
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+
+from src.libs.project_logger import logger
+from src.vector_store.base_vector_store import SearchHit
+from src.vector_store.metadata_index import FilterExpr, parse_filter
+
+# (规范化查询, 过滤条件, top_k)
+CacheKey = Tuple[str, str, int]
+
+_SPACE_RE = re.compile(r"\s+")
+# 末尾的标点不影响检索结果：“怎么退款？”与“怎么退款”视为同一查询
+_TRAILING_PUNCT = "?？!！.。,，;；~～ "
+# SearchHit 对象与列表槽位的近似开销（字节）
+_HIT_OVERHEAD = 120
+
+
+def normalize_query(text: str) -> str:
+    """NFKC 归一化（全角转半角）、转小写、合并空白并去掉末尾标点"""
+    text = unicodedata.normalize("NFKC", text).lower()
+    return _SPACE_RE.sub(" ", text).strip().rstrip(_TRAILING_PUNCT)
+
+
+def filter_key(filter: Any) -> str:
+    """过滤条件的规范化表示；表达式文本先解析，空白与写法差异不影响命中"""
+    if filter is None:
+        return ""
+    if isinstance(filter, str):
+        return repr(parse_filter(filter))
+    if isinstance(filter, FilterExpr):
+        return repr(filter)
+    mask = np.asarray(filter, dtype=bool)
+    return f"mask:{len(mask)}:{hashlib.sha1(np.packbits(mask).tobytes()).hexdigest()}"
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    semantic_hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expirations: int = 0
+    invalidations: int = 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        lookups = self.hits + self.semantic_hits + self.misses
+        data["hit_rate"] = round((self.hits + self.semantic_hits) / lookups, 4) if lookups else 0.0
+        return data
+
+
+@dataclass
+class _Entry:
+    hits: List[SearchHit]
+    expires_at: float
+    nbytes: int
+    slot: int = -1                     # 语义模式下查询向量所在的行，-1 表示未登记
+
+
+class RetrievalCache:
+    """检索结果缓存：按条数与字节数双重上限做 LRU 淘汰，条目带 TTL
+
+    - 键为 (规范化查询, 规范化过滤条件, top_k)
+    - 每次读写携带当前索引版本（如 LocalVectorStore.version 与 BM25Index.version 组成的元组），
+      版本变化时清空全部条目，不会返回写入/删除之前的结果
+    - semantic_threshold 非空时启用语义命中：查询向量与已缓存查询的余弦相似度不低于阈值即复用结果
+    """
+
+    def __init__(self, max_entries: int = 10000,
+                 max_bytes: int = 64 << 20,
+                 ttl_s: Optional[float] = 300.0,
+                 semantic_threshold: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        """
+        :param max_entries: 最大条目数
+        :param max_bytes: 条目估算占用的字节上限
+        :param ttl_s: 条目有效期（秒），None 表示不过期
+        :param semantic_threshold: 语义命中的余弦相似度阈值（如 0.95），None 表示关闭
+        :param clock: 时钟函数，便于测试
+        """
+        if max_entries < 1 or max_bytes < 1:
+            raise ValueError("max_entries and max_bytes must be >= 1")
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl_s = ttl_s
+        self.semantic_threshold = semantic_threshold
+        self.clock = clock
+        self.stats = CacheStats()
+        self.nbytes = 0
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[CacheKey, _Entry]" = OrderedDict()
+        self._version: Hashable = None
+        # 语义模式：已缓存查询的单位向量矩阵，行号 -> 键（空闲行为 None）
+        self._vectors: Optional[np.ndarray] = None
+        self._slot_keys: List[Optional[CacheKey]] = []
+        self._free_slots: List[int] = []
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def semantic(self) -> bool:
+        return self.semantic_threshold is not None
+
+    @staticmethod
+    def make_key(query: str, top_k: int, filter: Any = None) -> CacheKey:
+        return normalize_query(query), filter_key(filter), top_k
+
+    def get(self, query: str, top_k: int, filter: Any = None, version: Hashable = None) -> Optional[List[SearchHit]]:
+        """按规范化查询精确命中；未命中时不计入 misses（调用方可能继续尝试语义命中）"""
+        key = self.make_key(query, top_k, filter)
+        with self._lock:
+            self._check_version(version)
+            entry = self._live_entry(key)
+            if entry is None:
+                return None
+            self.stats.hits += 1
+            return list(entry.hits)
+
+    def get_similar(self, query_vector: np.ndarray, top_k: int, filter: Any = None,
+                    version: Hashable = None) -> Optional[List[SearchHit]]:
+        """语义命中：同一过滤条件与 top_k 下，相似度最高且不低于阈值的已缓存查询"""
+        if not self.semantic:
+            return None
+        fkey = filter_key(filter)
+        unit = self._unit(query_vector)
+        with self._lock:
+            self._check_version(version)
+            if self._vectors is None or not self._entries:
+                return None
+            sims = self._vectors[:len(self._slot_keys)] @ unit
+            for slot in np.argsort(-sims):
+                if sims[slot] < self.semantic_threshold:
+                    break
+                key = self._slot_keys[slot]
+                if key is None or key[1] != fkey or key[2] != top_k:
+                    continue
+                entry = self._live_entry(key)
+                if entry is not None:
+                    self.stats.semantic_hits += 1
+                    return list(entry.hits)
+            return None
+
+    def record_miss(self) -> None:
+        with self._lock:
+            self.stats.misses += 1
+
+    def put(self, query: str, top_k: int, hits: List[SearchHit], filter: Any = None,
+            version: Hashable = None, query_vector: Optional[np.ndarray] = None) -> None:
+        """
+        写入检索结果
+        :param version: 产生该结果时的索引版本
+        :param query_vector: 查询向量，语义模式下登记后可被相似查询命中
+        """
+        key = self.make_key(query, top_k, filter)
+        hits = list(hits)
+        nbytes = sys.getsizeof(key[0]) + sys.getsizeof(key[1]) \
+            + sum(_HIT_OVERHEAD + sys.getsizeof(h.id) for h in hits)
+        unit = self._unit(query_vector) if self.semantic and query_vector is not None else None
+        if unit is not None:
+            nbytes += unit.nbytes
+        if nbytes > self.max_bytes:
+            return
+        with self._lock:
+            self._check_version(version)
+            self._remove(key)
+            entry = _Entry(hits=hits, nbytes=nbytes,
+                           expires_at=self.clock() + self.ttl_s if self.ttl_s is not None else float("inf"))
+            if unit is not None:
+                entry.slot = self._assign_slot(key, unit)
+            self._entries[key] = entry
+            self.nbytes += nbytes
+            while len(self._entries) > self.max_entries or self.nbytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.stats.evictions += 1
+
+    def invalidate(self) -> None:
+        """清空全部条目"""
+        with self._lock:
+            self._clear()
+
+    def _check_version(self, version: Hashable) -> None:
+        if version != self._version:
+            if self._entries:
+                logger.info("[CACHE] index version %r -> %r, dropped %d entries",
+                            self._version, version, len(self._entries))
+            self._clear()
+            self._version = version
+
+    def _clear(self) -> None:
+        self.stats.invalidations += len(self._entries)
+        self._entries.clear()
+        self._slot_keys = []
+        self._free_slots = []
+        self.nbytes = 0
+
+    def _live_entry(self, key: CacheKey) -> Optional[_Entry]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at <= self.clock():
+            self._remove(key)
+            self.stats.expirations += 1
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _remove(self, key: CacheKey) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self.nbytes -= entry.nbytes
+        if entry.slot >= 0:
+            self._slot_keys[entry.slot] = None
+            self._vectors[entry.slot] = 0
+            self._free_slots.append(entry.slot)
+
+    def _assign_slot(self, key: CacheKey, unit: np.ndarray) -> int:
+        if self._free_slots:
+            slot = self._free_slots.pop()
+            self._slot_keys[slot] = key
+        else:
+            slot = len(self._slot_keys)
+            self._slot_keys.append(key)
+        if self._vectors is None or self._vectors.shape[1] != len(unit):
+            self._vectors = np.zeros((max(16, slot + 1), len(unit)), dtype=np.float32)
+        elif slot >= len(self._vectors):
+            grown = np.zeros((2 * len(self._vectors), len(unit)), dtype=np.float32)
+            grown[:len(self._vectors)] = self._vectors
+            self._vectors = grown
+        self._vectors[slot] = unit
+        return slot
+
+    @staticmethod
+    def _unit(vector: np.ndarray) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32).reshape(-1)
+        return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+
+class CachedRetriever:
+    """在 HybridRetriever 前加一层 RetrievalCache：精确命中时连查询编码都省去"""
+
+    def __init__(self, retriever, cache: Optional[RetrievalCache] = None):
+        """
+        :param retriever: HybridRetriever（需提供 embed_fn、vector_store、lexical_index）
+        :param cache: 结果缓存，默认 RetrievalCache()
+        """
+        self.retriever = retriever
+        self.cache = cache if cache is not None else RetrievalCache()
+
+    def index_version(self) -> Tuple[Any, Any]:
+        return (getattr(self.retriever.vector_store, "version", None),
+                getattr(self.retriever.lexical_index, "version", None))
+
+    def search(self, query: str, top_k: int = 10, filter: Any = None) -> List[SearchHit]:
+        version = self.index_version()
+        hits = self.cache.get(query, top_k, filter, version)
+        if hits is not None:
+            return hits
+        query_vector = np.asarray(self.retriever.embed_fn([query]))[0]
+        hits = self.cache.get_similar(query_vector, top_k, filter, version)
+        if hits is not None:
+            return hits
+        self.cache.record_miss()
+        if filter is None:
+            hits = self.retriever.search(query, top_k, query_vector=query_vector)
+        else:
+            hits = self.retriever.search(query, top_k, query_vector=query_vector, filter=filter)
+        # 检索期间索引发生变化（含 BM25 的延迟 commit）时，结果对应的版本不确定，不写入缓存
+        if self.index_version() == version:
+            self.cache.put(query, top_k, hits, filter, version, query_vector=query_vector)
+        return list(hits)
+
+
+__all__ = ["RetrievalCache", "CachedRetriever", "CacheStats", "normalize_query", "filter_key"]
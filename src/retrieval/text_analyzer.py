@@ -0,0 +1,54 @@
+# 说明：
+# 本文件提供词法检索使用的分析器：将文本切分为可索引的词项。
+# - 中文等 CJK 字符：有 jieba 时使用搜索引擎模式分词，否则使用字符二元组（单字串退化为单字）
+# - 字母/数字：转为小写，产品编号等带连接符的串（如 AB-1234、v2.0）整体作为一个词项，同时保留各组成部分
+
+import re
+from typing import Callable, List, Optional
+
+Analyzer = Callable[[str], List[str]]
+
+_TOKEN_RE = re.compile(r"[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+|[0-9a-z]+(?:[-_./][0-9a-z]+)*")
+_PART_RE = re.compile(r"[0-9a-z]+")
+
+
+def cjk_bigrams(run: str) -> List[str]:
+    if len(run) == 1:
+        return [run]
+    return [run[i:i + 2] for i in range(len(run) - 1)]
+
+
+def _load_jieba() -> Optional[Callable[[str], List[str]]]:
+    try:
+        import jieba
+    except ImportError:
+        return None
+    jieba.setLogLevel(60)
+    return jieba.lcut_for_search
+
+
+def make_analyzer(use_jieba: Optional[bool] = None) -> Analyzer:
+    """
+    构建分析器
+    :param use_jieba: None 时按 jieba 是否可用自动选择；False 强制使用字符二元组
+    """
+    jieba_cut = _load_jieba() if use_jieba is not False else None
+    if use_jieba and jieba_cut is None:
+        raise ImportError("jieba is not installed")
+    cjk = (lambda run: [t for t in jieba_cut(run) if t.strip()]) if jieba_cut else cjk_bigrams
+
+    def analyze(text: str) -> List[str]:
+        tokens: List[str] = []
+        for token in _TOKEN_RE.findall(text.lower()):
+            if not token.isascii():
+                tokens.extend(cjk(token))
+            else:
+                tokens.append(token)
+                if len(token) > 1 and not token.isalnum():
+                    tokens.extend(_PART_RE.findall(token))
+        return tokens
+
+    return analyze
+
+
+__all__ = ["Analyzer", "make_analyzer", "cjk_bigrams"]
@@ -1,6 +1,7 @@
 from abc import ABC, abstractmethod
+from typing import Optional, Sequence
 
-from src.tokenizer.record import Record
+from src.tokenizer.record import Record, RecordMetaData, RelationStructureMeta
 
 
 class BaseTokenizer(ABC):
@@ -14,3 +15,22 @@ class BaseTokenizer(ABC):
         :return: Record(tokens=..., metadata=...)
         """
         pass
+
+
+def link_chunks(records: Sequence[Record], parent_id: Optional[str] = None) -> Sequence[Record]:
+    """
+    按顺序为同一文档的片段填充 relations：prev_id / next_id 指向相邻片段，parent_id 指向所属文档或聚合节点
+    检索时据此在邻接数组中展开上下文（见 src.retrieval.context_assembler），无需再次查询存储
+    :param records: 同一文档内按原文顺序排列的片段
+    :param parent_id: 父节点ID，通常为 doc_id
+    :return: records 本身（原地修改）
+    """
+    for i, record in enumerate(records):
+        if record.metadata is None:
+            record.metadata = RecordMetaData()
+        record.metadata.relations = RelationStructureMeta(
+            parent_id=parent_id,
+            prev_id=records[i - 1].id if i > 0 else None,
+            next_id=records[i + 1].id if i + 1 < len(records) else None,
+        )
+    return records
@@ -1,60 +1,234 @@
 import uuid
-import re
-from typing import List, Optional, Callable
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Tuple
 
-from llama_index.core import Document
+import numpy as np
+from llama_index.core.base.embeddings.base import BaseEmbedding, Embedding
+from llama_index.core.bridge.pydantic import PrivateAttr
 from llama_index.core.node_parser import SemanticSplitterNodeParser, SentenceSplitter
-from llama_index.embeddings.huggingface import HuggingFaceEmbedding
 
-from src.tokenizer.base_tokenizer import BaseTokenizer
-from src.tokenizer.record import Record, RecordMetaData
+from src.embedding.embedding_cache import EmbeddingCache, get_default_cache
+from src.embedding.embedding_model import encode
+from src.tokenizer.base_tokenizer import BaseTokenizer, link_chunks
+from src.tokenizer.record import Record, RecordMetaData, ProcessingTraceMeta, IdentificationVersionMeta
+from src.tokenizer.semantic_engine import SemanticSplitterEngine
+from src.tokenizer.sentence_splitter import chinese_sentence_splitter
 
 
-# 定义一个能够处理中文标点的句子分割函数
-def chinese_sentence_splitter(text: str) -> List[str]:
-    # 使用正则表达式按中文标点符号分割句子
-    sentences = re.split(r'([。！？\n])', text)
-    # 将标点符号重新附加到句子末尾
-    sentences = ["".join(i) for i in zip(sentences[0::2], sentences[1::2])]
-    # 如果有遗留的最后一句（没有结尾标点），则添加
-    if len(sentences) * 2 < len(re.split(r'([。！？\n])', text)):
-        sentences.append(re.split(r'([。！？\n])', text)[-1])
+_MISSING = object()
 
-    # 过滤掉空字符串
-    return [s.strip() for s in sentences if s.strip()]
+
+def _pair_doc_ids(texts: Iterable[str], doc_ids: Optional[Iterable[str]]) -> Iterator[Tuple[str, str]]:
+    """逐个产出 (doc_id, text)；doc_ids 缺省时自动生成，两者都可以是惰性的可迭代对象"""
+    if doc_ids is None:
+        for text in texts:
+            yield uuid.uuid4().hex, text
+        return
+    id_iter = iter(doc_ids)
+    for text in texts:
+        doc_id = next(id_iter, _MISSING)
+        if doc_id is _MISSING:
+            raise ValueError("doc_ids and texts differ in length")
+        yield doc_id, text
+    if next(id_iter, _MISSING) is not _MISSING:
+        raise ValueError("doc_ids and texts differ in length")
+
+
+class RegistryEmbedding(BaseEmbedding):
+    """从 MODEL_REGISTRY 获取推理后端的 llama_index embedding 适配器。
+
+    与 src.embedding.embedding_model.encode 共享同一份模型权重和磁盘缓存，进程内只保留一份模型；
+    传入 backend 时改用该后端（如 OnnxBackend）编码。
+    """
+
+    normalize: bool = True
+    device: Optional[str] = None
+    use_cache: bool = True
+    _cache: Optional[EmbeddingCache] = PrivateAttr(default=None)
+    _backend: Optional[Any] = PrivateAttr(default=None)
+
+    def __init__(self, model_name: str, device: Optional[str] = None, normalize: bool = True,
+                 cache: Optional[EmbeddingCache] = None, use_cache: bool = True,
+                 backend: Optional[Any] = None, **kwargs: Any):
+        super().__init__(model_name=model_name, device=device, normalize=normalize,
+                         use_cache=use_cache, **kwargs)
+        self._cache = cache
+        self._backend = backend
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "RegistryEmbedding"
+
+    @property
+    def cache(self) -> Optional[EmbeddingCache]:
+        if self.use_cache and self._cache is None:
+            self._cache = get_default_cache()
+        return self._cache
+
+    def _encode(self, texts: List[str], use_cache: bool) -> np.ndarray:
+        return encode(texts, model=self._backend, model_name=self.model_name, normalize_embeddings=self.normalize,
+                      batch_size=self.embed_batch_size, cache=self.cache if use_cache else None,
+                      use_cache=use_cache, device=self.device)
+
+    def embed_matrix(self, texts: List[str], batch_size: Optional[int] = None) -> np.ndarray:
+        """批量编码并直接返回 (n, dim) 矩阵，避免转换为 Python 列表"""
+        return encode(texts, model=self._backend, model_name=self.model_name, normalize_embeddings=self.normalize,
+                      batch_size=batch_size or self.embed_batch_size, cache=self.cache,
+                      use_cache=self.use_cache, device=self.device)
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[Embedding]:
+        return self._encode(texts, self.use_cache).tolist()
+
+    def _get_text_embedding(self, text: str) -> Embedding:
+        return self._get_text_embeddings([text])[0]
+
+    async def _aget_text_embedding(self, text: str) -> Embedding:
+        return self._get_text_embedding(text)
+
+    def _get_query_embedding(self, query: str) -> Embedding:
+        return self._encode([query], use_cache=False)[0].tolist()
+
+    async def _aget_query_embedding(self, query: str) -> Embedding:
+        return self._get_query_embedding(query)
 
 
 class LlamaIndexSemanticTokenizer(BaseTokenizer):
     def __init__(self, embed_model: str = "BAAI/bge-large-zh-v1.5",
                  breakpoint_percentile_threshold: int = 95,
                  device: Optional[str] = None,
-                 sentence_splitter: Optional[Callable[[str], List[str]]] = chinese_sentence_splitter):
+                 sentence_splitter: Optional[Callable[[str], List[str]]] = chinese_sentence_splitter,
+                 cache: Optional[EmbeddingCache] = None,
+                 use_cache: bool = True,
+                 backend: Optional[Any] = None):
         """
-        :param embed_model: 使用的 HuggingFace embedding 模型名称
+        :param embed_model: embedding 模型名称或路径，通过 MODEL_REGISTRY 加载
         :param breakpoint_percentile_threshold: 分割断点的百分比阈值。
         :param device: 计算设备, 如 "cpu", "cuda"。如果为 None, 则自动检测。
         :param sentence_splitter: 用于将文本分割成句子的函数。默认为中文优化版。
+        :param cache: 句子 embedding 磁盘缓存，默认使用进程共享的 get_default_cache()
+        :param use_cache: 为 False 时不使用缓存
+        :param backend: embedding 推理后端实例（如 OnnxBackend），默认由 MODEL_REGISTRY 加载（SentenceTransformer，或 RAG_EMBED_BACKEND 指定的后端）
         """
-        self.embed_model = HuggingFaceEmbedding(
+        self.embed_model_name = embed_model
+        self.normalize = True
+        # 模型权重由 MODEL_REGISTRY 统一管理，首次编码时才加载
+        self.embed_model = RegistryEmbedding(
             model_name=embed_model,
-            device=device
+            device=device,
+            normalize=self.normalize,
+            cache=cache,
+            use_cache=use_cache,
+            backend=backend
         )
+        self.embedding_cache = self.embed_model.cache
 
+        self.sentence_splitter = sentence_splitter or chinese_sentence_splitter
+        # 切分由 NumPy 引擎完成；llama_index 解析器保留给需要 Node 对象的调用方
+        self.engine = SemanticSplitterEngine(
+            embed_fn=self.embed_model.embed_matrix,
+            breakpoint_percentile_threshold=breakpoint_percentile_threshold
+        )
         self.splitter = SemanticSplitterNodeParser(
             embed_model=self.embed_model,
             breakpoint_percentile_threshold=breakpoint_percentile_threshold,
-            sentence_splitter=sentence_splitter
+            sentence_splitter=self.sentence_splitter
         )
 
     def tokenize(self, text: str) -> List[Record]:
-        documents = [Document(text=text)]
-        nodes = self.splitter.get_nodes_from_documents(documents)
-
-        records = []
-        for node in nodes:
-            records.append(Record(
-                id=uuid.uuid4().hex,
-                content=node.get_content(),
-                metadata=RecordMetaData()
-            ))
-        return records
\ No newline at end of file
+        chunks = self.engine.split(self.sentence_splitter(text))
+        return list(link_chunks([Record(id=uuid.uuid4().hex, content=chunk, metadata=self._build_metadata(chunk))
+                                 for chunk in chunks]))
+
+    def tokenize_many(self, texts: Iterable[str],
+                      doc_ids: Optional[Iterable[str]] = None,
+                      batch_size: int = 256,
+                      pool_size: Optional[int] = None,
+                      sort_by_length: bool = True) -> List[Record]:
+        """
+        批量切分多篇文档：跨文档汇集句子组，按固定大小的大批次统一编码，再按文档还原断点
+        :param texts: 文档文本，可以是任意可迭代对象
+        :param doc_ids: 与 texts 一一对应的文档ID，缺省时自动生成
+        :param batch_size: 每次编码的句子组数量
+        :param pool_size: 累计多少句子组后触发一次编码，默认 batch_size * 8；用于限制内存
+        :param sort_by_length: 是否按长度排序后再分批，减少 padding 浪费
+        :return: 按文档顺序排列的 Record 列表，identification 中填充 doc_id/chunk_id
+        """
+        return list(self.iter_tokenize_many(texts, doc_ids, batch_size, pool_size, sort_by_length))
+
+    def iter_tokenize_many(self, texts: Iterable[str],
+                           doc_ids: Optional[Iterable[str]] = None,
+                           batch_size: int = 256,
+                           pool_size: Optional[int] = None,
+                           sort_by_length: bool = True) -> Iterator[Record]:
+        """tokenize_many 的生成器版本，逐个文档产出 Record；doc_ids 与 texts 长度不一致时抛出 ValueError"""
+        docs = ((doc_id, self.sentence_splitter(text)) for doc_id, text in _pair_doc_ids(texts, doc_ids))
+        return self.iter_tokenize_sentences(docs, batch_size, pool_size, sort_by_length)
+
+    def iter_tokenize_sentences(self, docs: Iterable[Tuple[str, List[str]]],
+                                batch_size: int = 256,
+                                pool_size: Optional[int] = None,
+                                sort_by_length: bool = True) -> Iterator[Record]:
+        """
+        对已分好句的文档做语义切分（供句子切分在其他进程完成的流水线使用）
+        :param docs: (doc_id, 句子列表) 的可迭代对象
+        """
+        if batch_size < 1:
+            raise ValueError("batch_size must be >= 1")
+        pool_size = pool_size or batch_size * 8
+
+        pending: List[Tuple[str, List[str], List[str]]] = []
+        pending_groups = 0
+        for doc_id, sentences in docs:
+            groups = self.engine.combine_sentences(sentences)
+            pending.append((doc_id, sentences, groups))
+            pending_groups += len(groups)
+            if pending_groups >= pool_size:
+                yield from self._flush_pool(pending, batch_size, sort_by_length)
+                pending, pending_groups = [], 0
+        if pending:
+            yield from self._flush_pool(pending, batch_size, sort_by_length)
+
+    def _flush_pool(self, pending: List[Tuple[str, List[str], List[str]]], batch_size: int,
+                    sort_by_length: bool) -> Iterator[Record]:
+        combined = [g for _, _, groups in pending for g in groups]
+        embeddings = self._embed_pooled(combined, batch_size, sort_by_length)
+
+        start = 0
+        for doc_id, sentences, groups in pending:
+            doc_embeddings = embeddings[start:start + len(groups)]
+            start += len(groups)
+            chunks = self.engine.build_chunks(sentences, self.engine.distances(doc_embeddings))
+            records = []
+            for chunk_idx, chunk in enumerate(chunks):
+                record_id = uuid.uuid4().hex
+                records.append(Record(
+                    id=record_id,
+                    content=chunk,
+                    metadata=self._build_metadata(chunk, IdentificationVersionMeta(
+                        id=record_id, doc_id=doc_id, chunk_id=str(chunk_idx)))
+                ))
+            yield from link_chunks(records, parent_id=doc_id)
+
+    def _embed_pooled(self, texts: List[str], batch_size: int, sort_by_length: bool) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i])) if sort_by_length \
+            else list(range(len(texts)))
+
+        parts = []
+        for i in range(0, len(order), batch_size):
+            batch = [texts[j] for j in order[i:i + batch_size]]
+            parts.append(self.embed_model.embed_matrix(batch, batch_size=batch_size))
+        sorted_embeddings = np.concatenate(parts, axis=0)
+
+        # 按原始顺序还原
+        embeddings = np.empty_like(sorted_embeddings)
+        embeddings[np.asarray(order)] = sorted_embeddings
+        return embeddings
+
+    def _build_metadata(self, content: str,
+                        identification: Optional[IdentificationVersionMeta] = None) -> RecordMetaData:
+        return RecordMetaData(identification=identification, processing=ProcessingTraceMeta(
+            splitter=type(self.engine).__name__,
+            embed_model=self.embed_model_name,
+            text_hash=EmbeddingCache.make_key(self.embed_model_name, self.normalize, content),
+        ))
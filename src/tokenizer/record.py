@@ -2,8 +2,8 @@
 # 本文件定义 RAG 记录的元数据模型，将常见 metadata 划分为7类，
 # 便于结构化表达、类型检查与后续扩展。
 
-from dataclasses import dataclass
-from typing import Optional, List
+from dataclasses import dataclass, fields
+from typing import Any, Dict, Optional, List
 
 # 标识与版本：用于唯一定位记录与版本追踪
 @dataclass
@@ -98,3 +98,50 @@ class Record:
     id: str                        # 记录ID（通常与 identification.id 保持一致或镜像）
     content: str                   # 文本内容（用于索引/检索/生成）
     metadata: RecordMetaData       # 元数据（7类聚合）
+
+
+# 序列化：嵌套 dataclass <-> dict，省略值为 None 的字段以减小体积
+_META_FIELD_TYPES = {
+    "identification": IdentificationVersionMeta,
+    "source_location": SourceLocationMeta,
+    "document_info": DocumentInfoMeta,
+    "processing": ProcessingTraceMeta,
+    "relations": RelationStructureMeta,
+    "quality": QualityComplianceMeta,
+    "business": BusinessRetrievalMeta,
+}
+
+
+# 各分组的字段名；用 getattr 读取而不是 vars()，避免为每个实例物化 __dict__
+_META_FIELD_NAMES = {name: tuple(f.name for f in fields(cls)) for name, cls in _META_FIELD_TYPES.items()}
+
+
+def metadata_to_dict(metadata: RecordMetaData) -> Dict[str, Dict[str, Any]]:
+    out: Dict[str, Dict[str, Any]] = {}
+    for name, field_names in _META_FIELD_NAMES.items():
+        group = getattr(metadata, name)
+        if group is None:
+            continue
+        values = {}
+        for field_name in field_names:
+            value = getattr(group, field_name)
+            if value is not None:
+                values[field_name] = value
+        out[name] = values
+    return out
+
+
+def metadata_from_dict(data: Dict[str, Dict[str, Any]]) -> RecordMetaData:
+    return RecordMetaData(**{
+        name: _META_FIELD_TYPES[name](**values)
+        for name, values in data.items() if name in _META_FIELD_TYPES
+    })
+
+
+def record_to_dict(record: Record) -> Dict[str, Any]:
+    return {"id": record.id, "content": record.content, "metadata": metadata_to_dict(record.metadata)}
+
+
+def record_from_dict(data: Dict[str, Any]) -> Record:
+    return Record(id=data["id"], content=data["content"],
+                  metadata=metadata_from_dict(data.get("metadata") or {}))
@@ -0,0 +1,227 @@
+# 说明：
+# 本文件提供 Record 的列式容器 RecordBatch，用于百万级片段场景下降低内存占用。
+# id、内容与常用元数据字段按列存储在 NumPy 数组中，仅在访问时才物化为 Record。
+
+from __future__ import annotations
+
+import json
+from typing import Any, Dict, Iterator, List, Sequence, Tuple
+
+import numpy as np
+
+from src.tokenizer.record import Record, metadata_from_dict, metadata_to_dict
+
+# 字典编码的字符串列：(列名, 元数据分组, 字段名)
+CATEGORICAL_FIELDS: Tuple[Tuple[str, str, str], ...] = (
+    ("doc_id", "identification", "doc_id"),
+    ("chunk_id", "identification", "chunk_id"),
+    ("dataset", "identification", "dataset"),
+    ("version", "identification", "version"),
+    ("source", "source_location", "source"),
+    ("path", "source_location", "path"),
+    ("lang", "document_info", "lang"),
+    ("splitter", "processing", "splitter"),
+    ("embed_model", "processing", "embed_model"),
+    ("visibility", "quality", "visibility"),
+    ("doc_type", "business", "doc_type"),
+    ("domain", "business", "domain"),
+    ("product", "business", "product"),
+)
+
+# 整型列，-1 表示 None：(列名, 元数据分组, 字段名)
+INT_FIELDS: Tuple[Tuple[str, str, str], ...] = (
+    ("offset", "source_location", "offset"),
+    ("line_start", "source_location", "line_start"),
+    ("line_end", "source_location", "line_end"),
+)
+
+# 布尔列，-1 表示 None
+BOOL_FIELDS: Tuple[Tuple[str, str, str], ...] = (
+    ("pii", "quality", "pii"),
+)
+
+# 哈希/ID 类定长 ASCII 列，空字节串表示 None；非 ASCII 的值退回 extras
+FIXED_FIELDS: Tuple[Tuple[str, str, str], ...] = (
+    ("hash", "identification", "hash"),
+    ("text_hash", "processing", "text_hash"),
+    ("parent_id", "relations", "parent_id"),
+    ("prev_id", "relations", "prev_id"),
+    ("next_id", "relations", "next_id"),
+)
+
+
+class RecordView:
+    """RecordBatch 中单行的轻量视图（__slots__），按需读取字段"""
+
+    __slots__ = ("_batch", "_row")
+
+    def __init__(self, batch: "RecordBatch", row: int):
+        self._batch = batch
+        self._row = row
+
+    @property
+    def id(self) -> str:
+        return self._batch.id_at(self._row)
+
+    @property
+    def content(self) -> str:
+        return self._batch.content_at(self._row)
+
+    @property
+    def metadata(self):
+        return self._batch[self._row].metadata
+
+    def get(self, column: str) -> Any:
+        return self._batch.value_at(column, self._row)
+
+    def to_record(self) -> Record:
+        return self._batch[self._row]
+
+
+class RecordBatch:
+    """Record 的列式容器
+
+    - ids：定长字节数组（uuid4 hex 为 32 字节/行，无 Python 对象开销）
+    - content：单个 UTF-8 缓冲区 + int64 偏移
+    - 常用元数据：字典编码的 int32 列 / int64 / int8 列
+    - 其余元数据：仅对存在额外字段的行保存 JSON
+    """
+
+    def __init__(self, ids: np.ndarray, content: bytes, content_offsets: np.ndarray,
+                 categorical: Dict[str, Tuple[np.ndarray, List[str]]],
+                 ints: Dict[str, np.ndarray], bools: Dict[str, np.ndarray],
+                 fixed: Dict[str, np.ndarray], id_mirrored: np.ndarray,
+                 extras: Dict[int, str]):
+        self.ids = ids
+        self.content = content
+        self.content_offsets = content_offsets
+        self.categorical = categorical      # 列名 -> (codes, 字典)，code = -1 表示 None
+        self.ints = ints
+        self.bools = bools
+        self.fixed = fixed
+        self.id_mirrored = id_mirrored      # identification.id 是否与 Record.id 相同（相同则不单独存储）
+        self.extras = extras                # 行号 -> 剩余元数据 JSON
+
+    @classmethod
+    def from_records(cls, records: Sequence[Record]) -> "RecordBatch":
+        n = len(records)
+        encoded_ids = [r.id.encode("utf-8") for r in records]
+        ids = np.array(encoded_ids, dtype=f"S{max((len(b) for b in encoded_ids), default=1)}")
+
+        encoded_content = [r.content.encode("utf-8") for r in records]
+        content_offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded_content], out=content_offsets[1:])
+
+        categorical = {name: (np.full(n, -1, dtype=np.int32), []) for name, _, _ in CATEGORICAL_FIELDS}
+        lookups: Dict[str, Dict[str, int]] = {name: {} for name, _, _ in CATEGORICAL_FIELDS}
+        ints = {name: np.full(n, -1, dtype=np.int64) for name, _, _ in INT_FIELDS}
+        bools = {name: np.full(n, -1, dtype=np.int8) for name, _, _ in BOOL_FIELDS}
+        fixed_values: Dict[str, List[bytes]] = {name: [b""] * n for name, _, _ in FIXED_FIELDS}
+        id_mirrored = np.zeros(n, dtype=bool)
+        extras: Dict[int, str] = {}
+
+        for row, record in enumerate(records):
+            meta = metadata_to_dict(record.metadata)
+            empty_groups = [group for group, values in meta.items() if not values]
+            if meta.get("identification", {}).get("id") == record.id:
+                del meta["identification"]["id"]
+                id_mirrored[row] = True
+            for name, group, field in CATEGORICAL_FIELDS:
+                value = meta.get(group, {}).pop(field, None)
+                if value is not None:
+                    codes, values = categorical[name]
+                    code = lookups[name].get(value)
+                    if code is None:
+                        code = lookups[name][value] = len(values)
+                        values.append(value)
+                    codes[row] = code
+            for name, group, field in INT_FIELDS:
+                value = meta.get(group, {}).pop(field, None)
+                if value is not None:
+                    ints[name][row] = value
+            for name, group, field in BOOL_FIELDS:
+                value = meta.get(group, {}).pop(field, None)
+                if value is not None:
+                    bools[name][row] = int(value)
+            for name, group, field in FIXED_FIELDS:
+                value = meta.get(group, {}).get(field)
+                if value and value.isascii():
+                    fixed_values[name][row] = value.encode("ascii")
+                    del meta[group][field]
+            # 只保留未列化的字段；原本就为空的分组也要保留，保证往返一致
+            residual = {group: values for group, values in meta.items() if values or group in empty_groups}
+            if residual:
+                extras[row] = json.dumps(residual, ensure_ascii=False, separators=(",", ":"))
+
+        fixed = {name: np.array(values, dtype=f"S{max(1, max(len(v) for v in values) if values else 1)}")
+                  for name, values in fixed_values.items()}
+        return cls(ids, b"".join(encoded_content), content_offsets, categorical, ints, bools, fixed,
+                   id_mirrored, extras)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __getitem__(self, row: int) -> Record:
+        if row < 0:
+            row += len(self)
+        meta: Dict[str, Dict[str, Any]] = json.loads(self.extras[row]) if row in self.extras else {}
+        for name, group, field in CATEGORICAL_FIELDS:
+            codes, values = self.categorical[name]
+            if codes[row] >= 0:
+                meta.setdefault(group, {})[field] = values[codes[row]]
+        for name, group, field in INT_FIELDS:
+            if self.ints[name][row] >= 0:
+                meta.setdefault(group, {})[field] = int(self.ints[name][row])
+        for name, group, field in BOOL_FIELDS:
+            if self.bools[name][row] >= 0:
+                meta.setdefault(group, {})[field] = bool(self.bools[name][row])
+        for name, group, field in FIXED_FIELDS:
+            if self.fixed[name][row]:
+                meta.setdefault(group, {})[field] = self.fixed[name][row].decode("ascii")
+        if self.id_mirrored[row]:
+            meta.setdefault("identification", {})["id"] = self.id_at(row)
+        return Record(id=self.id_at(row), content=self.content_at(row), metadata=metadata_from_dict(meta))
+
+    def __iter__(self) -> Iterator[Record]:
+        for row in range(len(self)):
+            yield self[row]
+
+    def view(self, row: int) -> RecordView:
+        return RecordView(self, row)
+
+    def to_records(self) -> List[Record]:
+        return list(self)
+
+    def id_at(self, row: int) -> str:
+        return self.ids[row].decode("utf-8")
+
+    def content_at(self, row: int) -> str:
+        return self.content[self.content_offsets[row]:self.content_offsets[row + 1]].decode("utf-8")
+
+    def value_at(self, column: str, row: int) -> Any:
+        if column in self.categorical:
+            codes, values = self.categorical[column]
+            return values[codes[row]] if codes[row] >= 0 else None
+        if column in self.ints:
+            return int(self.ints[column][row]) if self.ints[column][row] >= 0 else None
+        if column in self.bools:
+            return bool(self.bools[column][row]) if self.bools[column][row] >= 0 else None
+        if column in self.fixed:
+            return self.fixed[column][row].decode("ascii") or None
+        raise KeyError(column)
+
+    def codes(self, column: str) -> Tuple[np.ndarray, List[str]]:
+        """字典编码列的 (codes, 字典)，便于向量化过滤"""
+        return self.categorical[column]
+
+    @property
+    def nbytes(self) -> int:
+        """列数据占用的字节数（不含 extras 中的 JSON 字符串）"""
+        total = self.ids.nbytes + len(self.content) + self.content_offsets.nbytes
+        total += sum(codes.nbytes for codes, _ in self.categorical.values())
+        total += sum(a.nbytes for a in self.ints.values()) + sum(a.nbytes for a in self.bools.values())
+        total += sum(a.nbytes for a in self.fixed.values()) + self.id_mirrored.nbytes
+        return total
+
+
+__all__ = ["RecordBatch", "RecordView", "CATEGORICAL_FIELDS", "INT_FIELDS", "BOOL_FIELDS", "FIXED_FIELDS"]
@@ -0,0 +1,87 @@
+# 说明：
+# 本文件提供纯 NumPy 实现的语义切分引擎，算法与 llama_index 的 SemanticSplitterNodeParser 一致：
+# 1. 每个句子与前后 buffer_size 个句子拼接为句子组并编码
+# 2. 计算相邻句子组的余弦距离
+# 3. 距离大于 breakpoint_percentile_threshold 分位数的位置作为断点
+# 句子组与片段均通过前缀偏移对整段文本切片得到，距离与断点各为一次向量化运算。
+
+from typing import Callable, List, Sequence, Tuple
+
+import numpy as np
+
+EmbedMatrixFn = Callable[[List[str]], np.ndarray]
+
+
+class SemanticSplitterEngine:
+    """基于句子组向量矩阵的语义切分引擎，不构建 Document / Node 对象"""
+
+    def __init__(self, embed_fn: EmbedMatrixFn,
+                 breakpoint_percentile_threshold: float = 95,
+                 buffer_size: int = 1):
+        """
+        :param embed_fn: 批量编码函数，输入文本列表，返回 (n, dim) 矩阵
+        :param breakpoint_percentile_threshold: 分割断点的百分比阈值
+        :param buffer_size: 句子组包含的前后句子数
+        """
+        if buffer_size < 0:
+            raise ValueError("buffer_size must be >= 0")
+        self.embed_fn = embed_fn
+        self.breakpoint_percentile_threshold = breakpoint_percentile_threshold
+        self.buffer_size = buffer_size
+
+    @staticmethod
+    def _offsets(sentences: Sequence[str]) -> np.ndarray:
+        offsets = np.zeros(len(sentences) + 1, dtype=np.int64)
+        np.cumsum([len(s) for s in sentences], out=offsets[1:])
+        return offsets
+
+    def combine_sentences(self, sentences: Sequence[str]) -> List[str]:
+        """第 i 个句子组为 sentences[i - buffer_size : i + buffer_size + 1] 的拼接"""
+        n = len(sentences)
+        if n == 0:
+            return []
+        text = "".join(sentences)
+        offsets = self._offsets(sentences)
+        idx = np.arange(n)
+        starts = offsets[np.maximum(idx - self.buffer_size, 0)].tolist()
+        ends = offsets[np.minimum(idx + self.buffer_size + 1, n)].tolist()
+        return [text[s:e] for s, e in zip(starts, ends)]
+
+    @staticmethod
+    def distances(embeddings: np.ndarray) -> np.ndarray:
+        """相邻句子组的余弦距离 1 - cos(e[i], e[i+1])，以 float64 计算"""
+        embeddings = np.asarray(embeddings, dtype=np.float64)
+        if len(embeddings) < 2:
+            return np.zeros(0, dtype=np.float64)
+        cur, nxt = embeddings[:-1], embeddings[1:]
+        norms = np.linalg.norm(cur, axis=1) * np.linalg.norm(nxt, axis=1)
+        return 1 - np.einsum("ij,ij->i", cur, nxt) / norms
+
+    def breakpoints(self, distances: np.ndarray) -> np.ndarray:
+        """距离严格大于分位数阈值的位置；断点 i 表示片段在第 i 个句子之后结束"""
+        if len(distances) == 0:
+            return np.zeros(0, dtype=np.int64)
+        threshold = np.percentile(distances, self.breakpoint_percentile_threshold)
+        return np.flatnonzero(distances > threshold)
+
+    def chunk_spans(self, n_sentences: int, distances: np.ndarray) -> List[Tuple[int, int]]:
+        """片段对应的句子区间 [start, end)"""
+        bounds = np.concatenate(([0], self.breakpoints(distances) + 1, [n_sentences]))
+        return list(zip(bounds[:-1].tolist(), bounds[1:].tolist()))
+
+    def build_chunks(self, sentences: Sequence[str], distances: np.ndarray) -> List[str]:
+        if len(distances) == 0:
+            # 与 SemanticSplitterNodeParser 一致：句子不足两个时整体作为一个片段
+            return [" ".join(sentences)]
+        text = "".join(sentences)
+        offsets = self._offsets(sentences).tolist()
+        return [text[offsets[s]:offsets[e]] for s, e in self.chunk_spans(len(sentences), distances)]
+
+    def split(self, sentences: Sequence[str]) -> List[str]:
+        """对单篇文档的句子列表做语义切分，返回片段文本"""
+        groups = self.combine_sentences(sentences)
+        embeddings = self.embed_fn(groups) if len(groups) > 1 else np.zeros((len(groups), 0))
+        return self.build_chunks(sentences, self.distances(embeddings))
+
+
+__all__ = ["SemanticSplitterEngine", "EmbedMatrixFn"]
@@ -0,0 +1,34 @@
+import re
+from typing import Iterator, List, Tuple
+
+# 句末标点（可连续出现，如 "？！"、"……"），其后紧跟的右引号/右括号归入同一句
+_TERMINATORS = "。！？；…"
+_CLOSERS = "”’\"'」』）)】]》〉"
+
+# 一次扫描：句子从首个非空白字符开始，延伸到终止标点串（含其后的右引号/括号）或换行之前；
+# 行首孤立的终止标点单独成句。匹配之间的空白由 finditer 直接跳过
+_SENTENCE_RE = re.compile(
+    rf"[^\s{_TERMINATORS}][^{_TERMINATORS}\n]*(?:[{_TERMINATORS}]+[{re.escape(_CLOSERS)}]*)?"
+    rf"|[{_TERMINATORS}]+[{re.escape(_CLOSERS)}]*"
+)
+
+
+def iter_sentence_spans(text: str) -> Iterator[Tuple[int, int]]:
+    """
+    单次线性扫描，逐个产出句子在原文中的 (start, end) 区间（已去除首尾空白，跳过空句）
+    :param text: 原始文本
+    """
+    for match in _SENTENCE_RE.finditer(text):
+        start, end = match.span()
+        # 匹配不以空白开头，只有换行前的句子可能带尾随空白
+        if text[end - 1].isspace():
+            end = start + len(match.group().rstrip())
+        yield start, end
+
+
+def chinese_sentence_splitter(text: str) -> List[str]:
+    """按中文句末标点（。！？；…）与换行切分句子，右引号/右括号保留在句末"""
+    return [sentence.rstrip() for sentence in _SENTENCE_RE.findall(text)]
+
+
+__all__ = ["chinese_sentence_splitter", "iter_sentence_spans"]
@@ -0,0 +1,52 @@
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import List, Sequence
+
+import numpy as np
+
+from src.tokenizer.record import Record
+
+
+@dataclass
+class SearchHit:
+    id: str          # Record.id
+    score: float     # 相似度（越大越相似）
+
+
+class BaseVectorStore(ABC):
+    """向量存储抽象类，按 Record.id 管理向量并提供 top-k 检索"""
+
+    @abstractmethod
+    def add(self, ids: Sequence[str], vectors: np.ndarray) -> None:
+        """
+        写入向量；已存在的 id 会被覆盖
+        :param ids: 与 vectors 行一一对应的 Record.id
+        :param vectors: (n, dim) 矩阵
+        """
+        pass
+
+    @abstractmethod
+    def delete(self, ids: Sequence[str]) -> int:
+        """
+        删除向量，返回实际删除的数量
+        """
+        pass
+
+    @abstractmethod
+    def search_batch(self, queries: np.ndarray, top_k: int = 10) -> List[List[SearchHit]]:
+        """
+        批量检索
+        :param queries: (q, dim) 查询矩阵
+        :param top_k: 每个查询返回的结果数
+        """
+        pass
+
+    @abstractmethod
+    def __len__(self) -> int:
+        pass
+
+    def search(self, query: np.ndarray, top_k: int = 10) -> List[SearchHit]:
+        return self.search_batch(np.asarray(query).reshape(1, -1), top_k)[0]
+
+    def add_records(self, records: Sequence[Record], vectors: np.ndarray) -> None:
+        self.add([r.id for r in records], vectors)
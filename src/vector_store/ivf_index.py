@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+from typing import Optional
+
+import numpy as np
+
+# 分块计算打分矩阵时单块的元素上限，控制临时内存（约 64MB float32）
+_BLOCK_ELEMENTS = 1 << 24
+
+
+def _argmax_dot(x: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """按内积把每行分配到最近的中心，分块计算避免构造 n*k 的大矩阵"""
+    block = max(1, _BLOCK_ELEMENTS // max(1, len(centroids)))
+    out = np.empty(len(x), dtype=np.int32)
+    for start in range(0, len(x), block):
+        out[start:start + block] = np.argmax(x[start:start + block] @ centroids.T, axis=1)
+    return out
+
+
+class IvfIndex:
+    """倒排文件（IVF）近似索引：球面 k-means 聚类 + 查询时只扫描最近的 n_probe 个簇
+
+    倒排表以 CSR 形式存储：``order`` 为按簇排序的行号，``offsets[i]:offsets[i+1]`` 为第 i 个簇的范围。
+    """
+
+    def __init__(self, n_lists: int, n_iter: int = 10, seed: int = 0):
+        if n_lists < 1:
+            raise ValueError("n_lists must be >= 1")
+        self.n_lists = n_lists
+        self.n_iter = n_iter
+        self.seed = seed
+        self.centroids: Optional[np.ndarray] = None
+        self.order = np.zeros(0, dtype=np.int64)
+        self.offsets = np.zeros(n_lists + 1, dtype=np.int64)
+        self.size = 0               # 建索引时覆盖的行数，之后追加的行由调用方精确扫描
+
+    def train(self, vectors: np.ndarray) -> None:
+        rng = np.random.default_rng(self.seed)
+        n_lists = min(self.n_lists, len(vectors))
+        centroids = vectors[rng.choice(len(vectors), n_lists, replace=False)].astype(np.float32)
+
+        for _ in range(self.n_iter):
+            assign = _argmax_dot(vectors, centroids)
+            counts = np.bincount(assign, minlength=n_lists)
+            # 按簇排序后用 reduceat 分段求和，比 np.add.at 快一个数量级
+            order = np.argsort(assign, kind="stable")
+            starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+            sums = np.zeros_like(centroids)
+            non_empty = counts > 0
+            sums[non_empty] = np.add.reduceat(vectors[order], starts[non_empty], axis=0)
+            empty = counts == 0
+            if empty.any():
+                # 空簇重新随机初始化
+                sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()), replace=False)]
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            centroids = sums / np.maximum(norms, 1e-12)
+
+        self.n_lists = n_lists
+        self.centroids = centroids.astype(np.float32)
+
+    def build(self, vectors: np.ndarray) -> None:
+        """对 vectors 的全部行建立倒排表（需先 train）"""
+        self.build_from_assignments(self.assign(vectors))
+
+    def assign(self, vectors: np.ndarray) -> np.ndarray:
+        """每行所属的簇编号"""
+        if self.centroids is None:
+            raise RuntimeError("IvfIndex.train must be called before assign")
+        return _argmax_dot(vectors, self.centroids)
+
+    def build_from_assignments(self, assign: np.ndarray) -> None:
+        """由各行的簇编号建立倒排表（向量以压缩形式保存时，调用方可分块解码后再 assign）"""
+        self.order = np.argsort(assign, kind="stable").astype(np.int64)
+        self.offsets = np.searchsorted(assign[self.order], np.arange(self.n_lists + 1)).astype(np.int64)
+        self.size = len(assign)
+
+    def probe(self, queries: np.ndarray, n_probe: int) -> np.ndarray:
+        """返回每个查询最近的 n_probe 个簇编号，形状 (q, min(n_probe, n_lists))"""
+        if n_probe < 1:
+            raise ValueError("n_probe must be >= 1")
+        n_probe = min(n_probe, self.n_lists)
+        scores = queries @ self.centroids.T
+        if n_probe == self.n_lists:
+            return np.tile(np.arange(self.n_lists), (len(queries), 1))
+        return np.argpartition(-scores, n_probe - 1, axis=1)[:, :n_probe]
+
+    def candidates(self, lists: np.ndarray) -> np.ndarray:
+        """给定簇编号，返回这些簇内的全部行号"""
+        return np.concatenate([self.order[self.offsets[i]:self.offsets[i + 1]] for i in lists])
@@ -0,0 +1,358 @@
+from __future__ import annotations
+
+import math
+from typing import Dict, List, Optional, Sequence, Union
+
+import numpy as np
+
+from src.libs.project_logger import logger
+from src.libs.record_time import record_time
+from src.vector_store.base_vector_store import BaseVectorStore, SearchHit
+from src.tokenizer.record import Record, RecordMetaData
+from src.vector_store.ivf_index import IvfIndex
+from src.vector_store.metadata_index import FilterExpr, MetadataIndex, compile_filter
+from src.vector_store.quantization import Float32Codec, FullPrecisionFile, VectorCodec, make_codec
+
+Filter = Union[str, FilterExpr, np.ndarray]
+
+_METRICS = ("cosine", "ip")
+# 精确检索时单块打分矩阵的元素上限（约 64MB float32）
+_BLOCK_ELEMENTS = 1 << 24
+# 过滤后行数占比低于该值时只取出命中行打分，否则对全部行打分后屏蔽未命中行
+_GATHER_RATIO = 0.25
+# ivf 模式下命中行数不超过“未过滤时单次查询打分行数”的该倍数时，改为对命中行精确检索
+_FILTER_EXACT_FACTOR = 8
+
+
+def top_k_indices(scores: np.ndarray, top_k: int) -> np.ndarray:
+    """对 (q, n) 打分矩阵逐行取 top-k（降序），argpartition + 局部排序，复杂度 O(n + k log k)"""
+    n = scores.shape[1]
+    if top_k >= n:
+        return np.argsort(-scores, axis=1)
+    part = np.argpartition(-scores, top_k - 1, axis=1)[:, :top_k]
+    part_scores = np.take_along_axis(scores, part, axis=1)
+    return np.take_along_axis(part, np.argsort(-part_scores, axis=1), axis=1)
+
+
+class LocalVectorStore(BaseVectorStore):
+    """进程内向量存储（NumPy），适用于开发、CI 与小规模部署
+
+    - exact：矩阵乘法暴力检索 + argpartition 取 top-k
+    - ivf：调用 build_index() 后可用，只扫描最近的 n_probe 个簇；建索引之后新增的行始终精确扫描
+    - 元数据过滤：add_records() 写入的元数据按行建立位图索引，search_batch(filter=...)
+      先编译为行掩码，再在打分阶段排除未命中的行（预过滤，不会因过滤丢失 top-k）
+    - 压缩存储：向量以 codec 编码保存（float16 / int8 / pq，见 quantization.py），直接在编码上打分；
+      指定 full_precision_path 时原始向量另存磁盘，search_batch(rerank=n) 用其对前 n 个候选精确重排
+    """
+
+    def __init__(self, dim: int, metric: str = "cosine", initial_capacity: int = 1024,
+                 metadata_index: Optional[MetadataIndex] = None, codec: Optional[VectorCodec] = None,
+                 full_precision_path: Optional[str] = None):
+        """
+        :param dim: 向量维度
+        :param metric: "cosine"（写入与查询时归一化）或 "ip"（内积）
+        :param initial_capacity: 初始容量，之后按倍数扩容
+        :param metadata_index: 元数据索引（可自定义索引字段），默认索引 DEFAULT_FIELDS
+        :param codec: 向量编码，默认 float32 不压缩；需要训练的编码（int8 / pq）须已 fit，
+                      也可先以 float32 写入，再调用 quantize() 训练并转换
+        :param full_precision_path: 原始 float32 向量的磁盘文件，供重排使用
+        """
+        if metric not in _METRICS:
+            raise ValueError(f"metric must be one of {_METRICS}")
+        codec = codec if codec is not None else Float32Codec(dim)
+        if codec.dim != dim or not codec.trained:
+            raise ValueError("codec must match dim and be trained (or use quantize() after loading)")
+        self.dim = dim
+        self.metric = metric
+        self.codec = codec
+        self.version = 0                            # 每次写入/删除递增，供缓存失效使用
+        self._vectors = np.empty((max(1, initial_capacity),) + codec.code_shape, dtype=codec.dtype)
+        self._full = FullPrecisionFile(full_precision_path, dim) if full_precision_path else None
+        self._alive = np.zeros(len(self._vectors), dtype=bool)
+        self._ids: List[Optional[str]] = []         # 行号 -> id（已删除行为 None）
+        self._rows: Dict[str, int] = {}             # id -> 行号
+        self._index: Optional[IvfIndex] = None
+        self.metadata = metadata_index if metadata_index is not None else MetadataIndex()
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    @property
+    def size(self) -> int:
+        """已占用的行数（包含已删除的行）"""
+        return len(self._ids)
+
+    @property
+    def vector_nbytes(self) -> int:
+        """内存中向量（编码）占用的字节数，含码本，不含预留容量"""
+        return self.size * self.codec.bytes_per_vector + self.codec.nbytes
+
+    def add(self, ids: Sequence[str], vectors: np.ndarray,
+            metadata: Optional[Sequence[Optional[RecordMetaData]]] = None) -> None:
+        """
+        :param metadata: 与 ids 一一对应的元数据，写入元数据索引供过滤检索使用
+        """
+        vectors = self._prepare(vectors)
+        if len(ids) != len(vectors):
+            raise ValueError("ids and vectors must have the same length")
+        if metadata is not None and len(metadata) != len(ids):
+            raise ValueError("ids and metadata must have the same length")
+        if len(set(ids)) != len(ids):
+            # 同一批内的重复 id 与跨批覆盖写语义一致：只保留最后一次出现
+            last = {record_id: i for i, record_id in enumerate(ids)}
+            keep = sorted(last.values())
+            ids = [ids[i] for i in keep]
+            vectors = vectors[keep]
+            if metadata is not None:
+                metadata = [metadata[i] for i in keep]
+        # 覆盖写：旧行标记删除后追加新行，保证 IVF 倒排表不会指向过期向量
+        self.delete([i for i in ids if i in self._rows])
+
+        start = self.size
+        self._reserve(start + len(ids))
+        self._vectors[start:start + len(ids)] = self.codec.encode(vectors)
+        if self._full is not None:
+            self._full.append(vectors)
+        self._alive[start:start + len(ids)] = True
+        for offset, record_id in enumerate(ids):
+            self._rows[record_id] = start + offset
+        self._ids.extend(ids)
+        self.metadata.add(start, metadata if metadata is not None else [None] * len(ids))
+        self.version += 1
+
+    def add_records(self, records: Sequence[Record], vectors: np.ndarray) -> None:
+        self.add([r.id for r in records], vectors, metadata=[r.metadata for r in records])
+
+    def delete(self, ids: Sequence[str]) -> int:
+        deleted = 0
+        for record_id in ids:
+            row = self._rows.pop(record_id, None)
+            if row is not None:
+                self._alive[row] = False
+                self._ids[row] = None
+                deleted += 1
+        if deleted:
+            self.version += 1
+        return deleted
+
+    def filter_mask(self, filter: Filter) -> np.ndarray:
+        """将过滤条件编译为行掩码（已与 alive 取交集）"""
+        n = self.size
+        return compile_filter(filter, self.metadata, n) & self._alive[:n]
+
+    def rows_of(self, ids: Sequence[str]) -> np.ndarray:
+        """id -> 行号（不在存储中的 id 为 -1），用于把过滤掩码映射到其他召回通道的行号"""
+        rows = self._rows
+        return np.fromiter((rows.get(i, -1) for i in ids), dtype=np.int64, count=len(ids))
+
+    def filter_ids(self, ids: Sequence[str], filter: Filter) -> List[str]:
+        """保留满足过滤条件的 id（不在存储中的 id 视为不满足），用于过滤其他召回通道的结果"""
+        mask = self.filter_mask(filter)
+        return [i for i in ids if i in self._rows and mask[self._rows[i]]]
+
+    def get_vector(self, record_id: str) -> Optional[np.ndarray]:
+        """返回（归一化后的）向量；压缩存储时为解码后的近似值"""
+        row = self._rows.get(record_id)
+        return None if row is None else np.array(self.codec.decode(self._vectors[row:row + 1])[0])
+
+    @record_time
+    def quantize(self, codec: Union[str, VectorCodec], full_precision_path: Optional[str] = None,
+                 sample_size: int = 100_000, seed: int = 0, **params) -> VectorCodec:
+        """
+        将已写入的向量转换为压缩存储，之后写入的向量也按新编码保存
+        :param codec: 编码名（"float16" / "int8" / "pq"，params 透传，如 m=64）或编码实例；未训练时在当前向量的采样上训练
+        :param full_precision_path: 同时把原始向量写入该文件供重排使用（当前须为 float32 存储）
+        :param sample_size: 训练采样行数
+        :param seed: 随机种子
+        """
+        if isinstance(codec, str):
+            codec = make_codec(codec, self.dim, **params)
+        if codec.dim != self.dim:
+            raise ValueError(f"codec dim {codec.dim} != store dim {self.dim}")
+        if full_precision_path and not isinstance(self.codec, Float32Codec):
+            raise ValueError("full precision vectors are only available when converting from float32 storage")
+        n = self.size
+        if not codec.trained:
+            if n == 0:
+                raise ValueError("cannot train codec on an empty store")
+            rows = np.arange(n) if n <= sample_size \
+                else np.sort(np.random.default_rng(seed).choice(n, sample_size, replace=False))
+            codec.fit(self.codec.decode(self._vectors[rows]))
+
+        codes = np.empty((len(self._vectors),) + codec.code_shape, dtype=codec.dtype)
+        full = FullPrecisionFile(full_precision_path, self.dim) if full_precision_path else None
+        block = max(1, _BLOCK_ELEMENTS // self.dim)
+        for start in range(0, n, block):
+            vectors = self.codec.decode(self._vectors[start:min(n, start + block)])
+            codes[start:start + len(vectors)] = codec.encode(vectors)
+            if full is not None:
+                full.append(vectors)
+        if full is not None:
+            if self._full is not None:
+                self._full.close()
+            self._full = full
+        self._vectors, self.codec = codes, codec
+        self.version += 1
+        logger.info("[VECTOR] quantized rows=%d storage=%s bytes_per_vector=%d vector_mb=%.1f",
+                    n, codec.name, codec.bytes_per_vector, self.vector_nbytes / 2 ** 20)
+        return codec
+
+    def close(self) -> None:
+        if self._full is not None:
+            self._full.close()
+            self._full = None
+
+    @record_time
+    def build_index(self, n_lists: Optional[int] = None, n_iter: int = 10,
+                    sample_size: int = 100_000, seed: int = 0) -> IvfIndex:
+        """
+        训练并构建 IVF 索引
+        :param n_lists: 簇数量，默认 4 * sqrt(n)
+        :param n_iter: k-means 迭代次数
+        :param sample_size: 训练时的采样行数
+        :param seed: 随机种子
+        """
+        n = self.size
+        if n == 0:
+            raise ValueError("cannot build index on an empty store")
+        n_lists = n_lists or max(1, int(4 * math.sqrt(n)))
+        rng = np.random.default_rng(seed)
+        sample = np.arange(n) if n <= sample_size else np.sort(rng.choice(n, sample_size, replace=False))
+
+        index = IvfIndex(n_lists, n_iter=n_iter, seed=seed)
+        index.train(self.codec.decode(self._vectors[sample]))
+        # 分块解码后分配簇，压缩存储时不会整体还原为 float32
+        block = max(1, _BLOCK_ELEMENTS // self.dim)
+        index.build_from_assignments(np.concatenate([
+            index.assign(self.codec.decode(self._vectors[start:min(n, start + block)]))
+            for start in range(0, n, block)]))
+        self._index = index
+        logger.info("[VECTOR] built ivf index rows=%d lists=%d", n, index.n_lists)
+        return index
+
+    def search(self, query: np.ndarray, top_k: int = 10, **kwargs) -> List[SearchHit]:
+        return self.search_batch(np.asarray(query).reshape(1, -1), top_k, **kwargs)[0]
+
+    def search_batch(self, queries: np.ndarray, top_k: int = 10, mode: str = "exact",
+                     n_probe: int = 8, filter: Optional[Filter] = None, rerank: int = 0) -> List[List[SearchHit]]:
+        """
+        :param queries: (q, dim) 查询矩阵
+        :param top_k: 每个查询返回的结果数
+        :param mode: "exact" 精确检索；"ivf" 近似检索（未建索引时退化为精确检索）
+        :param n_probe: ivf 模式下每个查询扫描的簇数，越大召回越高、延迟越大
+        :param filter: 元数据过滤条件：表达式文本（如 "visibility != private AND domain = finance"）、
+                       FilterExpr 或长度为 size 的布尔行掩码
+        :param rerank: 压缩存储时，先按编码打分取前 max(rerank, top_k) 个候选，
+                       再用磁盘上的原始向量精确打分取 top_k（需 full_precision_path）；0 表示不重排
+        """
+        if mode not in ("exact", "ivf"):
+            raise ValueError("mode must be 'exact' or 'ivf'")
+        if n_probe < 1:
+            raise ValueError("n_probe must be >= 1")
+        queries = self._prepare(queries)
+        if top_k < 1 or len(self) == 0:
+            return [[] for _ in range(len(queries))]
+        if rerank and not isinstance(self.codec, Float32Codec):
+            if self._full is None:
+                raise ValueError("rerank requires full_precision_path")
+            results = self._search(queries, max(rerank, top_k), mode, n_probe, filter)
+            return [self._rerank(q, hits, top_k) for q, hits in zip(queries, results)]
+        return self._search(queries, top_k, mode, n_probe, filter)
+
+    def _search(self, queries: np.ndarray, top_k: int, mode: str, n_probe: int,
+                filter: Optional[Filter]) -> List[List[SearchHit]]:
+        if filter is None:
+            if mode == "ivf" and self._index is not None:
+                return [self._search_ivf(q, top_k, n_probe) for q in queries]
+            return self._search_exact(queries, top_k)
+
+        mask = self.filter_mask(filter)
+        n_match = int(np.count_nonzero(mask))
+        if n_match == 0:
+            return [[] for _ in range(len(queries))]
+        index = self._index
+        if mode == "ivf" and index is not None \
+                and n_match > _FILTER_EXACT_FACTOR * n_probe * self.size / index.n_lists:
+            # 按命中比例放大 n_probe，使过滤后的候选数与未过滤时相当，召回不随选择度下降
+            probe = min(index.n_lists, math.ceil(n_probe * len(self) / n_match))
+            return [self._search_ivf(q, top_k, probe, mask) for q in queries]
+        # 过滤条件足够严格时，对命中行精确检索比近似检索更快且召回完整
+        if n_match < _GATHER_RATIO * self.size:
+            return self._search_exact(queries, top_k, rows=np.flatnonzero(mask))
+        return self._search_exact(queries, top_k, mask=mask)
+
+    def _search_exact(self, queries: np.ndarray, top_k: int, rows: Optional[np.ndarray] = None,
+                      mask: Optional[np.ndarray] = None) -> List[List[SearchHit]]:
+        """
+        :param rows: 只对这些行打分（先取出子矩阵）
+        :param mask: 对全部行打分后屏蔽 mask 为 False 的行（已包含 alive）
+        """
+        n = self.size
+        if rows is not None:
+            codes, n_valid = self._vectors[rows], len(rows)
+        else:
+            codes = self._vectors[:n]
+            if mask is None and len(self._rows) < n:
+                mask = self._alive[:n]
+            n_valid = len(self) if mask is None else int(np.count_nonzero(mask))
+        block = max(1, _BLOCK_ELEMENTS // len(codes))
+
+        results: List[List[SearchHit]] = []
+        for start in range(0, len(queries), block):
+            scores = self.codec.score(queries[start:start + block], codes)
+            if mask is not None:
+                scores[:, ~mask] = -np.inf
+            top = top_k_indices(scores, min(top_k, n_valid))
+            for q_scores, q_top in zip(scores, top):
+                results.append(self._hits(q_top if rows is None else rows[q_top], q_scores[q_top]))
+        return results
+
+    def _search_ivf(self, query: np.ndarray, top_k: int, n_probe: int,
+                    mask: Optional[np.ndarray] = None) -> List[SearchHit]:
+        index = self._index
+        lists = index.probe(query.reshape(1, -1), n_probe)[0]
+        rows = index.candidates(lists)
+        if self.size > index.size:
+            rows = np.concatenate([rows, np.arange(index.size, self.size)])
+        rows = rows[(self._alive if mask is None else mask)[rows]]
+        if len(rows) == 0:
+            return []
+        scores = self.codec.score(query.reshape(1, -1), self._vectors[rows])[0]
+        top = top_k_indices(scores.reshape(1, -1), min(top_k, len(rows)))[0]
+        return self._hits(rows[top], scores[top])
+
+    def _rerank(self, query: np.ndarray, hits: List[SearchHit], top_k: int) -> List[SearchHit]:
+        """用磁盘上的原始向量对候选精确打分（按行号排序读取，减少随机 IO）"""
+        if not hits:
+            return hits
+        rows = np.sort(np.fromiter((self._rows[h.id] for h in hits), dtype=np.int64, count=len(hits)))
+        scores = self._full.take(rows) @ query
+        top = top_k_indices(scores.reshape(1, -1), min(top_k, len(rows)))[0]
+        return self._hits(rows[top], scores[top])
+
+    def _hits(self, rows: np.ndarray, scores: np.ndarray) -> List[SearchHit]:
+        return [SearchHit(id=self._ids[r], score=float(s))
+                for r, s in zip(rows, scores) if np.isfinite(s)]
+
+    def _prepare(self, vectors: np.ndarray) -> np.ndarray:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim == 1:
+            vectors = vectors.reshape(1, -1)
+        if vectors.shape[1] != self.dim:
+            raise ValueError(f"expected dim {self.dim}, got {vectors.shape[1]}")
+        if self.metric == "cosine":
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            vectors = vectors / np.maximum(norms, 1e-12)
+        return vectors
+
+    def _reserve(self, rows: int) -> None:
+        capacity = len(self._vectors)
+        if rows <= capacity:
+            return
+        while capacity < rows:
+            capacity *= 2
+        vectors = np.empty((capacity,) + self.codec.code_shape, dtype=self.codec.dtype)
+        vectors[:self.size] = self._vectors[:self.size]
+        alive = np.zeros(capacity, dtype=bool)
+        alive[:self.size] = self._alive[:self.size]
+        self._vectors, self._alive = vectors, alive
@@ -0,0 +1,411 @@
+from __future__ import annotations
+
+import re
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from src.tokenizer.record import RecordMetaData
+
+# 默认建立索引的字段：字段名 -> (元数据分组, 属性名)；tags/keywords 为多值字段
+DEFAULT_FIELDS: Dict[str, Tuple[str, str]] = {
+    "dataset": ("identification", "dataset"),
+    "doc_id": ("identification", "doc_id"),
+    "lang": ("document_info", "lang"),
+    "doc_type": ("business", "doc_type"),
+    "domain": ("business", "domain"),
+    "product": ("business", "product"),
+    "keywords": ("business", "keywords"),
+    "visibility": ("quality", "visibility"),
+    "pii": ("quality", "pii"),
+    "sensitive": ("quality", "sensitive"),
+    "tags": ("quality", "tags"),
+}
+
+# 行数占比超过 1/32 时改用位图（每行 1 bit），否则用有序行号数组（每行 4 字节）
+_DENSE_RATIO = 32
+# 待写入行号超过总行数的 1/8 时在写入路径上合并
+_PENDING_RATIO = 8
+
+
+class RowSet:
+    """单个取值对应的行集合（roaring 风格）：稀疏时为有序 int32 行号，稠密时为压缩位图"""
+
+    __slots__ = ("_pending", "_rows", "_bits", "count")
+
+    def __init__(self):
+        self._pending: List[int] = []
+        self._rows = np.zeros(0, dtype=np.int32)
+        self._bits: Optional[np.ndarray] = None
+        self.count = 0
+
+    def add(self, row: int) -> None:
+        """追加行号（必须大于已有行号）；在 optimize() 之前 mask() 也能看到这些行"""
+        self._pending.append(row)
+        self.count += 1
+
+    def optimize(self, n_rows: int) -> None:
+        """合并待写入行号，并按密度选择容器（写操作，由 MetadataIndex 在锁内调用）
+
+        新容器构造完成后再替换属性、最后清空待写入行号，无锁的 mask() 任何时刻都不会漏行。
+        """
+        n_pending = len(self._pending)
+        if n_pending:
+            pending = np.asarray(self._pending[:n_pending], dtype=np.int32)
+            if self._bits is not None:
+                mask = np.unpackbits(self._grow_bits(self._bits, n_rows), count=n_rows).astype(bool)
+                mask[pending] = True
+                self._bits = np.packbits(mask)
+            else:
+                self._rows = np.concatenate([self._rows, pending])
+            del self._pending[:n_pending]
+        if self._bits is None and self.count * _DENSE_RATIO > n_rows:
+            mask = np.zeros(n_rows, dtype=bool)
+            mask[self._rows] = True
+            self._bits = np.packbits(mask)
+            self._rows = np.zeros(0, dtype=np.int32)
+
+    def mask(self, n_rows: int) -> np.ndarray:
+        """只读：不修改容器，尚未 optimize 的行号直接叠加到结果上"""
+        # 读取顺序与 optimize() 的写入顺序相反（待写入 -> 行号 -> 位图），保证并发写时不漏行
+        pending = self._pending[:]
+        rows = self._rows
+        bits = self._bits
+        if bits is not None:
+            mask = np.unpackbits(self._grow_bits(bits, n_rows), count=n_rows).astype(bool)
+        else:
+            mask = np.zeros(n_rows, dtype=bool)
+            mask[rows[rows < n_rows]] = True
+        if pending:
+            pending = np.asarray(pending, dtype=np.int32)
+            mask[pending[pending < n_rows]] = True
+        return mask
+
+    @property
+    def needs_optimize(self) -> bool:
+        """待写入行号占比达到 1/8 时需要合并；按比例触发使逐条写入的总合并代价为线性"""
+        return len(self._pending) * _PENDING_RATIO >= self.count
+
+    @property
+    def nbytes(self) -> int:
+        return self._rows.nbytes + (self._bits.nbytes if self._bits is not None else 0) + 4 * len(self._pending)
+
+    @staticmethod
+    def _grow_bits(bits: np.ndarray, n_rows: int) -> np.ndarray:
+        needed = (n_rows + 7) // 8
+        if len(bits) >= needed:
+            return bits
+        return np.concatenate([bits, np.zeros(needed - len(bits), dtype=np.uint8)])
+
+
+class MetadataIndex:
+    """按行号对齐向量存储的元数据倒排索引：字段 -> 取值 -> RowSet
+
+    行号由调用方分配（与 LocalVectorStore 的行一致），需按递增顺序写入；
+    删除与覆盖由向量存储的 alive 掩码处理，索引本身只追加。
+    """
+
+    def __init__(self, fields: Optional[Dict[str, Union[Tuple[str, str], Callable[[RecordMetaData], Any]]]] = None):
+        """
+        :param fields: 字段名 -> (元数据分组, 属性名) 或 自定义取值函数，默认 DEFAULT_FIELDS
+        """
+        self.fields = dict(DEFAULT_FIELDS if fields is None else fields)
+        self._sets: Dict[str, Dict[Any, RowSet]] = {name: {} for name in self.fields}
+        self.n_rows = 0
+        # 写操作（add/optimize）与读取取值字典的操作互斥；RowSet.mask 本身只读
+        self._lock = threading.RLock()
+
+    def add(self, start_row: int, metadata: Sequence[Optional[RecordMetaData]]) -> None:
+        """登记从 start_row 开始的连续若干行的元数据"""
+        with self._lock:
+            self._add(start_row, metadata)
+
+    def _add(self, start_row: int, metadata: Sequence[Optional[RecordMetaData]]) -> None:
+        if start_row < self.n_rows:
+            raise ValueError("rows must be appended in increasing order")
+        touched: Dict[int, RowSet] = {}
+        for offset, meta in enumerate(metadata):
+            if meta is None:
+                continue
+            row = start_row + offset
+            for name, spec in self.fields.items():
+                value = spec(meta) if callable(spec) else getattr(getattr(meta, spec[0]) or (), spec[1], None)
+                if value is None:
+                    continue
+                sets = self._sets[name]
+                for v in (value if isinstance(value, (list, tuple, set)) else (value,)):
+                    row_set = sets.get(v)
+                    if row_set is None:
+                        row_set = sets[v] = RowSet()
+                    row_set.add(row)
+                    touched[id(row_set)] = row_set
+        self.n_rows = max(self.n_rows, start_row + len(metadata))
+        # 合并与容器转换只在写入路径（锁内）进行，读取时不改动行集合
+        for row_set in touched.values():
+            if row_set.needs_optimize:
+                row_set.optimize(self.n_rows)
+
+    def values(self, field: str) -> List[Any]:
+        with self._lock:
+            return list(self._field(field))
+
+    def count(self, field: str, value: Any) -> int:
+        with self._lock:
+            row_set = self._field(field).get(value)
+        return row_set.count if row_set is not None else 0
+
+    def mask(self, field: str, value: Any, n_rows: Optional[int] = None) -> np.ndarray:
+        with self._lock:
+            n_rows = self.n_rows if n_rows is None else n_rows
+            row_set = self._field(field).get(value)
+        return row_set.mask(n_rows) if row_set is not None else np.zeros(n_rows, dtype=bool)
+
+    def has_value(self, field: str, n_rows: Optional[int] = None) -> np.ndarray:
+        """字段存在任意取值的行"""
+        with self._lock:
+            n_rows = self.n_rows if n_rows is None else n_rows
+            row_sets = list(self._field(field).values())
+        mask = np.zeros(n_rows, dtype=bool)
+        for row_set in row_sets:
+            mask |= row_set.mask(n_rows)
+        return mask
+
+    def optimize(self) -> None:
+        with self._lock:
+            for sets in self._sets.values():
+                for row_set in sets.values():
+                    row_set.optimize(self.n_rows)
+
+    @property
+    def nbytes(self) -> int:
+        with self._lock:
+            return sum(row_set.nbytes for sets in self._sets.values() for row_set in sets.values())
+
+    def _field(self, field: str) -> Dict[Any, RowSet]:
+        if field not in self._sets:
+            raise KeyError(f"field {field!r} is not indexed")
+        return self._sets[field]
+
+
+class FilterExpr:
+    """过滤表达式基类，支持 & | ~ 组合；evaluate 返回长度为 n_rows 的布尔掩码"""
+
+    def evaluate(self, index: MetadataIndex, n_rows: int) -> np.ndarray:
+        raise NotImplementedError
+
+    def __and__(self, other: "FilterExpr") -> "FilterExpr":
+        return _And(self, other)
+
+    def __or__(self, other: "FilterExpr") -> "FilterExpr":
+        return _Or(self, other)
+
+    def __invert__(self) -> "FilterExpr":
+        return _Not(self)
+
+
+class Field:
+    """过滤表达式构造器：Field("domain") == "finance"、Field("tags").contains("faq")"""
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __eq__(self, value: Any) -> FilterExpr:  # type: ignore[override]
+        return _In(self.name, (value,))
+
+    def __ne__(self, value: Any) -> FilterExpr:  # type: ignore[override]
+        return _Not(_In(self.name, (value,)))
+
+    def isin(self, values: Iterable[Any]) -> FilterExpr:
+        return _In(self.name, tuple(values))
+
+    def contains(self, value: Any) -> FilterExpr:
+        """多值字段（tags/keywords）包含某个取值"""
+        return _In(self.name, (value,))
+
+    def exists(self) -> FilterExpr:
+        return _Exists(self.name)
+
+    __hash__ = None  # type: ignore[assignment]
+
+
+class _In(FilterExpr):
+    def __init__(self, field: str, values: Tuple[Any, ...]):
+        self.field, self.values = field, values
+
+    def evaluate(self, index: MetadataIndex, n_rows: int) -> np.ndarray:
+        mask = np.zeros(n_rows, dtype=bool)
+        for value in self.values:
+            mask |= index.mask(self.field, value, n_rows)
+        return mask
+
+    def __repr__(self) -> str:
+        return f"{self.field} IN {self.values!r}"
+
+
+class _Exists(FilterExpr):
+    def __init__(self, field: str):
+        self.field = field
+
+    def evaluate(self, index: MetadataIndex, n_rows: int) -> np.ndarray:
+        return index.has_value(self.field, n_rows)
+
+    def __repr__(self) -> str:
+        return f"{self.field} EXISTS"
+
+
+class _And(FilterExpr):
+    def __init__(self, left: FilterExpr, right: FilterExpr):
+        self.left, self.right = left, right
+
+    def evaluate(self, index: MetadataIndex, n_rows: int) -> np.ndarray:
+        return self.left.evaluate(index, n_rows) & self.right.evaluate(index, n_rows)
+
+    def __repr__(self) -> str:
+        return f"({self.left!r} AND {self.right!r})"
+
+
+class _Or(FilterExpr):
+    def __init__(self, left: FilterExpr, right: FilterExpr):
+        self.left, self.right = left, right
+
+    def evaluate(self, index: MetadataIndex, n_rows: int) -> np.ndarray:
+        return self.left.evaluate(index, n_rows) | self.right.evaluate(index, n_rows)
+
+    def __repr__(self) -> str:
+        return f"({self.left!r} OR {self.right!r})"
+
+
+class _Not(FilterExpr):
+    def __init__(self, inner: FilterExpr):
+        self.inner = inner
+
+    def evaluate(self, index: MetadataIndex, n_rows: int) -> np.ndarray:
+        return ~self.inner.evaluate(index, n_rows)
+
+    def __repr__(self) -> str:
+        return f"NOT {self.inner!r}"
+
+
+_TOKEN_RE = re.compile(r"\s*(?:(\()|(\))|(,)|(!=|=)|'([^']*)'|\"([^\"]*)\"|([^\s()=!,'\"]+))")
+
+
+def parse_filter(text: str) -> FilterExpr:
+    """
+    解析文本过滤表达式，例如：
+        visibility != private AND domain = finance
+        lang IN (zh, en) AND NOT (tags = draft OR pii = true)
+    取值可加引号；true/false 解析为布尔值。!= 为 = 的补集（字段缺失的行也满足）
+    """
+    tokens: List[Tuple[str, Any]] = []
+    pos = 0
+    text = text.strip()
+    while pos < len(text):
+        m = _TOKEN_RE.match(text, pos)
+        if m is None or m.end() == pos:
+            raise ValueError(f"cannot parse filter at position {pos}: {text[pos:]!r}")
+        pos = m.end()
+        lparen, rparen, comma, op, sq, dq, word = m.groups()
+        if lparen or rparen or comma:
+            tokens.append(("punct", lparen or rparen or comma))
+        elif op:
+            tokens.append(("op", op))
+        elif sq is not None or dq is not None:
+            tokens.append(("value", sq if sq is not None else dq))
+        elif word.upper() in ("AND", "OR", "NOT", "IN"):
+            tokens.append(("kw", word.upper()))
+        else:
+            tokens.append(("word", word))
+    parser = _FilterParser(tokens)
+    expr = parser.parse_or()
+    if parser.pos != len(tokens):
+        raise ValueError(f"unexpected token {tokens[parser.pos][1]!r}")
+    return expr
+
+
+class _FilterParser:
+    def __init__(self, tokens: List[Tuple[str, Any]]):
+        self.tokens = tokens
+        self.pos = 0
+
+    def _peek(self) -> Tuple[Optional[str], Any]:
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else (None, None)
+
+    def _take(self, kind: str, value: Any = None) -> Any:
+        tok_kind, tok_value = self._peek()
+        if tok_kind != kind or (value is not None and tok_value != value):
+            raise ValueError(f"expected {value or kind}, got {tok_value!r}")
+        self.pos += 1
+        return tok_value
+
+    def parse_or(self) -> FilterExpr:
+        expr = self.parse_and()
+        while self._peek() == ("kw", "OR"):
+            self.pos += 1
+            expr = expr | self.parse_and()
+        return expr
+
+    def parse_and(self) -> FilterExpr:
+        expr = self.parse_not()
+        while self._peek() == ("kw", "AND"):
+            self.pos += 1
+            expr = expr & self.parse_not()
+        return expr
+
+    def parse_not(self) -> FilterExpr:
+        if self._peek() == ("kw", "NOT"):
+            self.pos += 1
+            return ~self.parse_not()
+        if self._peek() == ("punct", "("):
+            self.pos += 1
+            expr = self.parse_or()
+            self._take("punct", ")")
+            return expr
+        return self.parse_comparison()
+
+    def parse_comparison(self) -> FilterExpr:
+        field = Field(self._take("word"))
+        kind, value = self._peek()
+        if kind == "op":
+            self.pos += 1
+            literal = self._value()
+            return field == literal if value == "=" else field != literal
+        if (kind, value) == ("kw", "IN"):
+            self.pos += 1
+            self._take("punct", "(")
+            values = [self._value()]
+            while self._peek() == ("punct", ","):
+                self.pos += 1
+                values.append(self._value())
+            self._take("punct", ")")
+            return field.isin(values)
+        raise ValueError(f"expected comparison after {field.name!r}")
+
+    def _value(self) -> Any:
+        kind, value = self._peek()
+        if kind == "value":
+            self.pos += 1
+            return value
+        if kind == "word":
+            self.pos += 1
+            lowered = value.lower()
+            return {"true": True, "false": False}.get(lowered, value)
+        raise ValueError(f"expected value, got {value!r}")
+
+
+def compile_filter(expr: Union[str, FilterExpr, np.ndarray, None], index: MetadataIndex,
+                   n_rows: int) -> Optional[np.ndarray]:
+    """将过滤条件编译为布尔掩码；接受表达式文本、FilterExpr 或已有的掩码"""
+    if expr is None:
+        return None
+    if isinstance(expr, str):
+        expr = parse_filter(expr)
+    if isinstance(expr, FilterExpr):
+        return expr.evaluate(index, n_rows)
+    mask = np.asarray(expr, dtype=bool)
+    if len(mask) != n_rows:
+        raise ValueError(f"filter mask must have {n_rows} rows, got {len(mask)}")
+    return mask
+
+
+__all__ = ["DEFAULT_FIELDS", "RowSet", "MetadataIndex", "FilterExpr", "Field", "parse_filter", "compile_filter"]
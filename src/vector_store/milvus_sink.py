@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+from typing import Any, Dict, List, Optional
+
+from src.libs.project_logger import logger
+from src.vector_store.vector_db_sink import (BOOL, FLOAT, INT, METADATA_COLUMNS, STR, STR_LIST, RowLimits,
+                                             VectorDBSink)
+
+try:  # pymilvus 为可选依赖，只有实际连接 Milvus 时才需要
+    from pymilvus import DataType, MilvusClient
+    from pymilvus.exceptions import ConnectError, ErrorCode, MilvusException, MilvusUnavailableException
+except ImportError:  # pragma: no cover - 未安装时在构造 MilvusSink 时报错
+    MilvusClient = None
+
+
+class MilvusSink(VectorDBSink):
+    """
+    批量写入 Milvus 集合（pymilvus MilvusClient）。集合不存在时按 METADATA_COLUMNS 建表：
+    id 为 VARCHAR 主键，vector 为 FLOAT_VECTOR，元数据展开为 VARCHAR / INT64 / DOUBLE / BOOL / ARRAY<VARCHAR> 标量列。
+    元数据列均为可空列（nullable，需要 Milvus 2.4+），缺失值写为 null；
+    列长度由 row_limits 决定，建表与写入前的逐行检查使用同一组上限。
+    """
+
+    def __init__(self, collection: str, uri: str = "http://localhost:19530", token: str = "", db_name: str = "",
+                 create_collection: bool = True, index_type: str = "HNSW", metric_type: str = "COSINE",
+                 index_params: Optional[Dict[str, Any]] = None, upsert: bool = True, timeout_s: float = 30.0,
+                 row_limits: Optional[RowLimits] = None, **kwargs: Any):
+        """
+        :param collection: 集合名
+        :param uri: Milvus 地址（或 Milvus Lite 的本地 .db 文件）
+        :param token: 认证 token（"user:password" 或 API key）
+        :param db_name: 数据库名
+        :param create_collection: 集合不存在时是否自动创建
+        :param index_type: 自动建表时向量索引类型
+        :param metric_type: 自动建表时向量度量（COSINE / IP / L2）
+        :param index_params: 索引构建参数，默认 HNSW M=16 efConstruction=200
+        :param upsert: 按主键覆盖写入；为 False 时使用 insert（重复 id 会产生重复行）
+        :param timeout_s: 单次 RPC 超时
+        :param row_limits: 列长度上限（VARCHAR max_length、ARRAY max_capacity），默认 RowLimits()；
+                           超出上限的记录在写入时以 ValueError 拒绝，不会使整批请求失败
+        :param kwargs: 透传给 VectorDBSink（batch_size、max_in_flight、重试参数等）
+        """
+        if MilvusClient is None:
+            raise ImportError("MilvusSink requires pymilvus: pip install pymilvus")
+        self.collection = collection
+        self.uri = uri
+        self.token = token
+        self.db_name = db_name
+        self.create_collection = create_collection
+        self.index_type = index_type
+        self.metric_type = metric_type
+        self.index_params = index_params if index_params is not None else {"M": 16, "efConstruction": 200}
+        self.upsert = upsert
+        self.timeout_s = timeout_s
+        super().__init__(row_limits=row_limits or RowLimits(), **kwargs)
+
+    def _connect(self) -> Any:
+        return MilvusClient(uri=self.uri, token=self.token, db_name=self.db_name, timeout=self.timeout_s)
+
+    def _close_connection(self, conn: Any) -> None:
+        conn.close()
+
+    def _is_transient(self, error: BaseException) -> bool:
+        if isinstance(error, (ConnectError, MilvusUnavailableException)):
+            return True
+        if isinstance(error, MilvusException):
+            return error.code == ErrorCode.RATE_LIMIT
+        return super()._is_transient(error)
+
+    def _prepare(self, conn: Any, dim: int) -> None:
+        if conn.has_collection(self.collection, timeout=self.timeout_s):
+            return
+        if not self.create_collection:
+            raise ValueError(f"Milvus collection {self.collection!r} does not exist")
+        conn.create_collection(self.collection, schema=self._schema(dim), index_params=self._index(conn),
+                               timeout=self.timeout_s)
+        logger.info("[VECTOR] created Milvus collection %s dim=%d index=%s metric=%s",
+                    self.collection, dim, self.index_type, self.metric_type)
+
+    def _schema(self, dim: int) -> Any:
+        schema = MilvusClient.create_schema(auto_id=False, enable_dynamic_field=False)
+        limits = self.row_limits
+        schema.add_field("id", DataType.VARCHAR, is_primary=True, max_length=limits.id_length)
+        schema.add_field("vector", DataType.FLOAT_VECTOR, dim=dim)
+        schema.add_field("content", DataType.VARCHAR, max_length=limits.content_length)
+        for column in METADATA_COLUMNS:
+            if column.kind == STR:
+                schema.add_field(column.name, DataType.VARCHAR, max_length=limits.string_length, nullable=True)
+            elif column.kind == INT:
+                schema.add_field(column.name, DataType.INT64, nullable=True)
+            elif column.kind == FLOAT:
+                schema.add_field(column.name, DataType.DOUBLE, nullable=True)
+            elif column.kind == BOOL:
+                schema.add_field(column.name, DataType.BOOL, nullable=True)
+            elif column.kind == STR_LIST:
+                schema.add_field(column.name, DataType.ARRAY, element_type=DataType.VARCHAR, nullable=True,
+                                 max_capacity=limits.list_capacity, max_length=limits.list_item_length)
+        return schema
+
+    def _index(self, conn: Any) -> Any:
+        index = conn.prepare_index_params()
+        index.add_index(field_name="vector", index_type=self.index_type, metric_type=self.metric_type,
+                        params=self.index_params)
+        return index
+
+    def _write_rows(self, conn: Any, rows: List[Dict[str, Any]]) -> None:
+        data = [{**row, "vector": row["vector"].tolist()} for row in rows]
+        if self.upsert:
+            conn.upsert(self.collection, data=data, timeout=self.timeout_s)
+        else:
+            conn.insert(self.collection, data=data, timeout=self.timeout_s)
+
+    def _delete_ids(self, conn: Any, ids: List[str]) -> None:
+        conn.delete(self.collection, ids=ids, timeout=self.timeout_s)
+
+
+__all__ = ["MilvusSink"]
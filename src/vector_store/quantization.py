@@ -0,0 +1,319 @@
+from __future__ import annotations
+
+import os
+from abc import ABC, abstractmethod
+from typing import Optional, Tuple
+
+import numpy as np
+
+# 训练/编码时单块的元素上限（约 64MB float32）
+_BLOCK_ELEMENTS = 1 << 24
+# 打分时逐块还原为 float32 的元素上限（约 1MB）：还原结果留在缓存中直接参与矩阵乘法，
+# 压缩存储在打分时不会整体还原为 float32
+_SCORE_BLOCK_ELEMENTS = 1 << 18
+# PQ 查表打分（ADC）每块的行数
+_ADC_BLOCK = 1024
+
+
+class VectorCodec(ABC):
+    """向量编码：LocalVectorStore 以 codes 形式保存向量，检索时直接在 codes 上打分（非对称距离）
+
+    查询保持 float32，只有库内向量被压缩；score() 的结果是查询与解码后向量的内积，
+    因而 top-k 可以再用全精度向量重排。
+    """
+
+    name = "base"
+
+    def __init__(self, dim: int):
+        self.dim = dim
+
+    @property
+    def trained(self) -> bool:
+        return True
+
+    @property
+    @abstractmethod
+    def code_shape(self) -> Tuple[int, ...]:
+        """单个向量编码的形状"""
+
+    @property
+    @abstractmethod
+    def dtype(self) -> np.dtype:
+        pass
+
+    @property
+    def bytes_per_vector(self) -> int:
+        return int(np.prod(self.code_shape)) * np.dtype(self.dtype).itemsize
+
+    @property
+    def nbytes(self) -> int:
+        """码本等与行数无关的固定开销"""
+        return 0
+
+    def fit(self, sample: np.ndarray) -> "VectorCodec":
+        """在样本上训练（无需训练的编码直接返回）"""
+        return self
+
+    @abstractmethod
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        pass
+
+    @abstractmethod
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        pass
+
+    def score(self, queries: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        """(q, dim) 查询与 (n, ...) 编码的内积，返回 (q, n)；默认按行块解码后做矩阵乘法"""
+        out = np.empty((len(queries), len(codes)), dtype=np.float32)
+        block = max(1, _SCORE_BLOCK_ELEMENTS // self.dim)
+        for start in range(0, len(codes), block):
+            out[:, start:start + block] = queries @ self.decode(codes[start:start + block]).T
+        return out
+
+
+class Float32Codec(VectorCodec):
+    """不压缩（默认）"""
+
+    name = "float32"
+
+    @property
+    def code_shape(self) -> Tuple[int, ...]:
+        return (self.dim,)
+
+    @property
+    def dtype(self) -> np.dtype:
+        return np.dtype(np.float32)
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        return np.asarray(vectors, dtype=np.float32)
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        return codes
+
+    def score(self, queries: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        return queries @ codes.T
+
+
+class Float16Codec(VectorCodec):
+    """半精度存储：内存减半，归一化向量的相对误差约 1e-3"""
+
+    name = "float16"
+
+    @property
+    def code_shape(self) -> Tuple[int, ...]:
+        return (self.dim,)
+
+    @property
+    def dtype(self) -> np.dtype:
+        return np.dtype(np.float16)
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        return np.asarray(vectors, dtype=np.float16)
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        return codes.astype(np.float32)
+
+
+class Int8Codec(VectorCodec):
+    """逐维标量量化：每一维按训练样本的 [min, max] 线性映射到 int8
+
+    x ≈ center + scale * code，于是 q·x ≈ q·center + (q * scale)·code：
+    查询先乘以逐维 scale，再与 int8 编码做矩阵乘法，不需要还原向量。
+    """
+
+    name = "int8"
+
+    def __init__(self, dim: int):
+        super().__init__(dim)
+        self.scale: Optional[np.ndarray] = None     # (dim,)
+        self.center: Optional[np.ndarray] = None    # (dim,)，code=0 对应的值
+
+    @property
+    def trained(self) -> bool:
+        return self.scale is not None
+
+    @property
+    def code_shape(self) -> Tuple[int, ...]:
+        return (self.dim,)
+
+    @property
+    def dtype(self) -> np.dtype:
+        return np.dtype(np.int8)
+
+    @property
+    def nbytes(self) -> int:
+        return 0 if self.scale is None else self.scale.nbytes + self.center.nbytes
+
+    def fit(self, sample: np.ndarray) -> "Int8Codec":
+        sample = np.asarray(sample, dtype=np.float32)
+        low, high = sample.min(axis=0), sample.max(axis=0)
+        self.scale = (np.maximum(high - low, 1e-12) / 255).astype(np.float32)
+        self.center = (low + 128 * self.scale).astype(np.float32)
+        return self
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        codes = np.rint((np.asarray(vectors, dtype=np.float32) - self.center) / self.scale)
+        return np.clip(codes, -128, 127).astype(np.int8)
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        return self.center + codes.astype(np.float32) * self.scale
+
+    def score(self, queries: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        scaled = queries * self.scale
+        bias = (queries @ self.center)[:, None]
+        out = np.empty((len(queries), len(codes)), dtype=np.float32)
+        block = max(1, _SCORE_BLOCK_ELEMENTS // self.dim)
+        for start in range(0, len(codes), block):
+            out[:, start:start + block] = scaled @ codes[start:start + block].astype(np.float32).T
+        out += bias
+        return out
+
+
+def _kmeans(x: np.ndarray, k: int, n_iter: int, rng: np.random.Generator) -> np.ndarray:
+    """欧氏距离 k-means（Lloyd），返回 (k, d) 中心"""
+    centroids = x[rng.choice(len(x), k, replace=len(x) < k)].copy()
+    for _ in range(n_iter):
+        assign = _nearest(x, centroids)
+        counts = np.bincount(assign, minlength=k)
+        # 同 IvfIndex.train：按簇排序后 reduceat 分段求和
+        order = np.argsort(assign, kind="stable")
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        empty = counts == 0
+        centroids[~empty] = np.add.reduceat(x[order], starts[~empty], axis=0) / counts[~empty, None]
+        if empty.any():
+            centroids[empty] = x[rng.choice(len(x), int(empty.sum()))]
+    return centroids
+
+
+def _nearest(x: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    # argmin ||x - c||^2 = argmax (x·c - ||c||^2 / 2)
+    half_norms = 0.5 * np.einsum("ij,ij->i", centroids, centroids)
+    out = np.empty(len(x), dtype=np.int64)
+    block = max(1, _BLOCK_ELEMENTS // len(centroids))
+    for start in range(0, len(x), block):
+        out[start:start + block] = np.argmax(x[start:start + block] @ centroids.T - half_norms, axis=1)
+    return out
+
+
+class PQCodec(VectorCodec):
+    """乘积量化（PQ）：向量切成 m 个子空间，每个子空间用 256 个中心（1 字节）编码
+
+    每个向量只占 m 字节。打分有两条路径：
+    - 查询很少（q * m < dim）时为每个查询计算 (m, 256) 的内积查找表，库内向量的得分为 m 次查表之和（ADC）
+    - 批量查询时按块解码（码本的一次扁平 take）再做矩阵乘法：解码代价由整批查询分摊，速度接近 float32
+    """
+
+    name = "pq"
+
+    def __init__(self, dim: int, m: Optional[int] = None, n_iter: int = 15, seed: int = 0):
+        """
+        :param m: 子空间数（须整除 dim），默认每 8 维一个子空间
+        :param n_iter: 每个子空间 k-means 迭代次数
+        """
+        super().__init__(dim)
+        m = m or max(1, dim // 8)
+        if dim % m:
+            raise ValueError(f"m={m} must divide dim={dim}")
+        self.m = m
+        self.sub_dim = dim // m
+        self.n_iter = n_iter
+        self.seed = seed
+        self.codebooks: Optional[np.ndarray] = None     # (m, 256, sub_dim)
+        # 子空间 j 的编码 c 对应扁平码本 (m * 256, ...) 的第 j * 256 + c 行
+        self._offsets = np.arange(m, dtype=np.intp) * 256
+
+    @property
+    def trained(self) -> bool:
+        return self.codebooks is not None
+
+    @property
+    def code_shape(self) -> Tuple[int, ...]:
+        return (self.m,)
+
+    @property
+    def dtype(self) -> np.dtype:
+        return np.dtype(np.uint8)
+
+    @property
+    def nbytes(self) -> int:
+        return 0 if self.codebooks is None else self.codebooks.nbytes
+
+    def fit(self, sample: np.ndarray) -> "PQCodec":
+        sample = np.asarray(sample, dtype=np.float32)
+        rng = np.random.default_rng(self.seed)
+        self.codebooks = np.stack([
+            _kmeans(np.ascontiguousarray(sample[:, j * self.sub_dim:(j + 1) * self.sub_dim]), 256, self.n_iter, rng)
+            for j in range(self.m)
+        ]).astype(np.float32)
+        return self
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        codes = np.empty((len(vectors), self.m), dtype=np.uint8)
+        for j in range(self.m):
+            codes[:, j] = _nearest(vectors[:, j * self.sub_dim:(j + 1) * self.sub_dim], self.codebooks[j])
+        return codes
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        flat = self.codebooks.reshape(self.m * 256, self.sub_dim)
+        return flat.take(codes + self._offsets, axis=0).reshape(len(codes), self.dim)
+
+    def score(self, queries: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        # 解码每行约 dim 次读取、由整批查询分摊；ADC 每个查询每行 m 次查表
+        if len(queries) * self.m >= self.dim:
+            return super().score(queries, codes)
+        # 扁平查找表 (q, m * 256)：每个子空间内查询与各中心的内积
+        tables = np.einsum("qmd,mkd->qmk", queries.reshape(len(queries), self.m, self.sub_dim),
+                           self.codebooks).reshape(len(queries), self.m * 256)
+        out = np.empty((len(queries), len(codes)), dtype=np.float32)
+        for start in range(0, len(codes), _ADC_BLOCK):
+            index = codes[start:start + _ADC_BLOCK] + self._offsets
+            for i, table in enumerate(tables):
+                out[i, start:start + _ADC_BLOCK] = table.take(index).sum(axis=1)
+        return out
+
+
+CODECS = {"float32": Float32Codec, "float16": Float16Codec, "int8": Int8Codec, "pq": PQCodec}
+
+
+def make_codec(storage: str, dim: int, **params) -> VectorCodec:
+    """按名称创建编码：float32 / float16 / int8 / pq（params 透传，如 pq 的 m）"""
+    if storage not in CODECS:
+        raise ValueError(f"storage must be one of {tuple(CODECS)}")
+    return CODECS[storage](dim, **params)
+
+
+class FullPrecisionFile:
+    """追加写入的 float32 原始向量文件，行号与向量存储一致；检索时按行读取（mmap）用于重排
+
+    压缩存储只在内存中保留编码，原始向量留在磁盘上，重排时只有候选行会被换页读入。
+    """
+
+    def __init__(self, path: str, dim: int):
+        self.path = path
+        self.dim = dim
+        self.rows = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._file = open(path, "w+b")
+        self._map: Optional[np.memmap] = None
+
+    def append(self, vectors: np.ndarray) -> None:
+        self._file.seek(0, os.SEEK_END)
+        self._file.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+        self.rows += len(vectors)
+        self._map = None
+
+    def take(self, rows: np.ndarray) -> np.ndarray:
+        if self._map is None:
+            self._file.flush()
+            self._map = np.memmap(self.path, dtype=np.float32, mode="r", shape=(self.rows, self.dim)) \
+                if self.rows else np.zeros((0, self.dim), dtype=np.float32)
+        return np.asarray(self._map[rows])
+
+    def close(self) -> None:
+        self._map = None
+        self._file.close()
+
+
+__all__ = ["VectorCodec", "Float32Codec", "Float16Codec", "Int8Codec", "PQCodec", "CODECS", "make_codec",
+           "FullPrecisionFile"]
@@ -0,0 +1,477 @@
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import threading
+from contextlib import ExitStack
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.libs.project_logger import logger
+from src.libs.record_time import record_time
+from src.tokenizer.record import Record, RecordMetaData, metadata_from_dict, metadata_to_dict
+
+_MANIFEST = "MANIFEST.json"
+_EMBEDDINGS = "embeddings.npy"
+# 变长列：<name>.bin 为拼接后的 UTF-8 字节，<name>.idx.npy 为 n+1 个 int64 偏移
+_COLUMNS = ("ids", "content", "meta")
+# id 索引：按字节序排序的定长 id 键（numpy S 类型）与对应行号，查找时在 mmap 上二分
+_ID_KEYS = "ids.sorted.npy"
+_ID_ORDER = "ids.order.npy"
+# compact() 每次复制的行数，限制合并时的内存占用
+_COPY_ROWS = 8192
+
+
+def _id_keys(ids: Sequence[str]) -> np.ndarray:
+    return np.array([record_id.encode("utf-8") for record_id in ids], dtype=np.bytes_)
+
+
+def _write_id_index(directory: Path, keys: np.ndarray) -> None:
+    # 稳定排序：同一段内重复的 id，排在最后的即最后写入的行
+    order = np.argsort(keys, kind="stable")
+    np.save(directory / _ID_ORDER, order.astype(np.int64))
+    np.save(directory / _ID_KEYS, keys[order])
+
+
+def _write_column(directory: Path, name: str, values: Sequence[str]) -> None:
+    encoded = [v.encode("utf-8") for v in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    with open(directory / f"{name}.bin", "wb") as f:
+        for b in encoded:
+            f.write(b)
+    np.save(directory / f"{name}.idx.npy", offsets)
+
+
+class _Column:
+    """按偏移索引读取的变长字符串列，数据通过 mmap 按需换页"""
+
+    def __init__(self, directory: Path, name: str):
+        self.offsets = np.load(directory / f"{name}.idx.npy", mmap_mode="r")
+        path = directory / f"{name}.bin"
+        self.data = np.memmap(path, dtype=np.uint8, mode="r") if path.stat().st_size else np.zeros(0, np.uint8)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        return self.data[self.offsets[i]:self.offsets[i + 1]].tobytes().decode("utf-8")
+
+    def copy_rows(self, rows: np.ndarray, out, offsets: np.ndarray, pos: int) -> None:
+        """把 rows（升序）的原始字节追加写入 out，新偏移写入 offsets[pos + 1:]；连续的行整段复制，不解码"""
+        lengths = self.offsets[rows + 1] - self.offsets[rows]
+        offsets[pos + 1:pos + 1 + len(rows)] = offsets[pos] + np.cumsum(lengths)
+        for run in np.split(rows, np.flatnonzero(np.diff(rows) != 1) + 1):
+            if len(run):
+                out.write(self.data[self.offsets[run[0]]:self.offsets[run[-1] + 1]])
+
+
+@dataclass
+class SegmentInfo:
+    name: str
+    seq: int        # 写入序号；墓碑只作用于 seq 不大于删除时刻的段
+    rows: int
+
+
+class Segment:
+    """单个只读段：embedding 矩阵为可 mmap 的 .npy，内容/元数据为偏移索引的侧文件"""
+
+    def __init__(self, directory: Path, info: SegmentInfo):
+        self.directory = directory
+        self.info = info
+        self.embeddings = np.load(directory / _EMBEDDINGS, mmap_mode="r")
+        self.ids = _Column(directory, "ids")
+        self.content = _Column(directory, "content")
+        self.meta = _Column(directory, "meta")
+        if not (directory / _ID_KEYS).exists() or not (directory / _ID_ORDER).exists():
+            # 没有 id 索引的旧段：补建一次并保存
+            _write_id_index(directory, _id_keys([self.ids[row] for row in range(len(self.ids))]))
+        self.id_keys = np.load(directory / _ID_KEYS, mmap_mode="r")
+        self.id_order = np.load(directory / _ID_ORDER, mmap_mode="r")
+
+    def __len__(self) -> int:
+        return self.info.rows
+
+    def close(self) -> None:
+        """释放 mmap（Windows 上映射未释放的文件无法删除）；之后不可再读取"""
+        self.embeddings = self.id_keys = self.id_order = None
+        self.ids = self.content = self.meta = None
+
+    def find(self, keys: np.ndarray) -> np.ndarray:
+        """id 键 -> 本段行号（同一 id 有多行时取最后一行），不存在为 -1"""
+        rows = np.full(len(keys), -1, dtype=np.int64)
+        if not len(self.id_keys) or not len(keys):
+            return rows
+        width = self.id_keys.dtype.itemsize
+        candidates = np.flatnonzero(np.char.str_len(keys) <= width) if keys.dtype.itemsize > width \
+            else np.arange(len(keys))
+        probe = keys[candidates].astype(self.id_keys.dtype)
+        i = np.searchsorted(self.id_keys, probe, side="right") - 1
+        hit = (i >= 0) & (self.id_keys[np.maximum(i, 0)] == probe)
+        rows[candidates[hit]] = self.id_order[i[hit]]
+        return rows
+
+    def row_keys(self) -> np.ndarray:
+        """按行号排列的 id 键"""
+        keys = np.empty_like(self.id_keys)
+        keys[self.id_order] = self.id_keys
+        return keys
+
+    def record(self, row: int) -> Record:
+        return Record(id=self.ids[row], content=self.content[row],
+                      metadata=metadata_from_dict(json.loads(self.meta[row])))
+
+    @staticmethod
+    def write(directory: Path, records: Sequence[Record], embeddings: np.ndarray) -> None:
+        directory.mkdir(parents=True)
+        np.save(directory / _EMBEDDINGS, np.ascontiguousarray(embeddings, dtype=np.float32))
+        _write_column(directory, "ids", [r.id for r in records])
+        _write_column(directory, "content", [r.content for r in records])
+        _write_column(directory, "meta", [json.dumps(metadata_to_dict(r.metadata), ensure_ascii=False)
+                                          for r in records])
+        _write_id_index(directory, _id_keys([r.id for r in records]))
+
+    @staticmethod
+    def write_merged(directory: Path, segments: Sequence["Segment"], masks: Sequence[np.ndarray], dim: int) -> int:
+        """
+        按段流式合并 masks 选中的行：embedding 写入预分配的 .npy 内存映射，变长列按字节区间原样复制，
+        不构造 Record；内存占用与单个复制批次和 id 键的大小成正比。返回行数
+        """
+        directory.mkdir(parents=True)
+        rows = int(sum(int(mask.sum()) for mask in masks))
+        embeddings = np.lib.format.open_memmap(directory / _EMBEDDINGS, mode="w+", dtype=np.float32,
+                                               shape=(rows, dim))
+        offsets = {name: np.lib.format.open_memmap(directory / f"{name}.idx.npy", mode="w+", dtype=np.int64,
+                                                   shape=(rows + 1,)) for name in _COLUMNS}
+        keys = []
+        pos = 0
+        with ExitStack() as stack:
+            files = {name: stack.enter_context(open(directory / f"{name}.bin", "wb")) for name in _COLUMNS}
+            for segment, mask in zip(segments, masks):
+                selected = np.flatnonzero(mask)
+                keys.append(segment.row_keys()[selected])
+                for start in range(0, len(selected), _COPY_ROWS):
+                    chunk = selected[start:start + _COPY_ROWS]
+                    embeddings[pos:pos + len(chunk)] = segment.embeddings[chunk]
+                    for name in _COLUMNS:
+                        getattr(segment, name).copy_rows(chunk, files[name], offsets[name], pos)
+                    pos += len(chunk)
+        embeddings.flush()
+        for column_offsets in offsets.values():
+            column_offsets.flush()
+        del embeddings, offsets, column_offsets  # 释放映射，Windows 上映射未关闭的目录无法重命名
+        _write_id_index(directory, np.concatenate(keys) if keys else _id_keys([]))
+        return rows
+
+
+class SegmentStore:
+    """Record + embedding 的段式持久化存储
+
+    - 每次 append 写入一个新的不可变段（先写临时目录再原子重命名，最后原子替换 MANIFEST）
+    - 打开时只读取 MANIFEST 与各列的偏移数组（mmap），数据按需换页，百万级片段也能毫秒级打开
+    - 每个段持久化按 id 排序的键数组，get() 从新到旧在各段上二分查找，不需要解码全部 id；
+      可见行数随 append/delete 增量维护并写入 MANIFEST，len() 为 O(1)
+    - 删除记为墓碑；同一 id 多次写入时以最新段为准
+    - compact() 将现有段流式合并为一个并丢弃被删除/被覆盖的行（按字节区间复制，不构造 Record），
+      可通过 compact_async() 在后台执行
+    - get()/遍历期间持有所读段的引用；compact() 换下的旧段记入 MANIFEST 的回收列表，
+      最后一个读者释放后（或下次打开时）才删除目录，删除失败时记录日志并保留在列表中重试
+    """
+
+    def __init__(self, root: str, dim: Optional[int] = None):
+        """
+        :param root: 存储目录，不存在时创建
+        :param dim: 向量维度；已有存储时以 MANIFEST 为准
+        """
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.RLock()
+        self._compact_lock = threading.Lock()
+        self._segments: List[Segment] = []
+        self._tombstones: Dict[str, int] = {}
+        self._next_seq = 1
+        self._live: Optional[int] = 0                   # 可见行数；旧版本 MANIFEST 没有记录时为 None
+        self._refs: Dict[str, int] = {}                # 段名 -> 正在读取该段的读者数
+        self._trash: Dict[str, Optional[Segment]] = {}  # 已换下、待删除的段
+        self.dim = dim
+        self.version = 0
+        self._load_manifest()
+        self._purge_trash()
+
+    def __len__(self) -> int:
+        with self._lock:
+            if self._live is None:
+                self._live = int(sum(self._visible_mask(i, self._segments, self._tombstones).sum()
+                                     for i in range(len(self._segments))))
+            return self._live
+
+    @property
+    def segments(self) -> List[SegmentInfo]:
+        return [s.info for s in self._segments]
+
+    @record_time
+    def append(self, records: Sequence[Record], embeddings: np.ndarray) -> Optional[SegmentInfo]:
+        """写入一个新段，返回段信息；records 为空时不写入"""
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        if len(records) != len(embeddings):
+            raise ValueError("records and embeddings must have the same length")
+        if not records:
+            return None
+        if self.dim is None:
+            self.dim = embeddings.shape[1]
+        elif embeddings.shape[1] != self.dim:
+            raise ValueError(f"expected dim {self.dim}, got {embeddings.shape[1]}")
+
+        # 写段期间持锁，保证 delete 记录的序号不会覆盖尚未提交的段
+        with self._lock:
+            new_ids = list(dict.fromkeys(r.id for r in records))
+            visible = self._count_visible(new_ids) if self._live is not None else 0
+            seq = self._next_seq
+            self._next_seq += 1
+            info = SegmentInfo(name=f"seg-{seq:08d}", seq=seq, rows=len(records))
+            self._write_segment(info, records, embeddings)
+            self._segments.append(Segment(self.root / info.name, info))
+            if self._live is not None:
+                self._live += len(new_ids) - visible
+            self._commit()
+        return info
+
+    def delete(self, ids: Sequence[str]) -> None:
+        with self._lock:
+            if self._live is not None:
+                self._live -= self._count_visible(list(dict.fromkeys(ids)))
+            seq = self._next_seq - 1
+            for record_id in ids:
+                self._tombstones[record_id] = seq
+            self._commit()
+
+    def get(self, record_id: str) -> Optional[Tuple[Record, np.ndarray]]:
+        with self._lock:
+            segments = self._acquire()
+            tombstones = {record_id: self._tombstones.get(record_id, 0)}
+        try:
+            loc = self._locate([record_id], segments, tombstones)[0]
+            if loc is None:
+                return None
+            segment = segments[loc[0]]
+            # 返回副本，调用方不持有段文件的映射
+            return segment.record(loc[1]), np.array(segment.embeddings[loc[1]])
+        finally:
+            self._release(segments)
+
+    def iter_visible(self) -> Iterator[Tuple[Segment, int]]:
+        """按写入顺序遍历可见行（未删除、未被更新段覆盖）；遍历结束或迭代器被回收前，所读的段不会被删除"""
+        with self._lock:
+            segments = self._acquire()
+            tombstones = dict(self._tombstones)
+        try:
+            for seg_idx, segment in enumerate(segments):
+                for row in np.flatnonzero(self._visible_mask(seg_idx, segments, tombstones)).tolist():
+                    yield segment, row
+        finally:
+            self._release(segments)
+
+    def iter_records(self) -> Iterator[Tuple[Record, np.ndarray]]:
+        for segment, row in self.iter_visible():
+            yield segment.record(row), np.array(segment.embeddings[row])
+
+    def load_vectors(self, store, batch_size: int = 65536, with_metadata: bool = False) -> int:
+        """
+        将可见向量按批写入向量存储（如 LocalVectorStore），返回写入数量
+        :param with_metadata: 同时读取记录元数据写入存储的元数据索引（供过滤检索使用）
+        """
+        ids: List[str] = []
+        rows: List[np.ndarray] = []
+        metas: List[RecordMetaData] = []
+        total = 0
+
+        def _flush() -> None:
+            if with_metadata:
+                store.add(ids, np.stack(rows), metadata=metas)
+            else:
+                store.add(ids, np.stack(rows))
+
+        for segment, row in self.iter_visible():
+            ids.append(segment.ids[row])
+            rows.append(segment.embeddings[row])
+            if with_metadata:
+                metas.append(segment.record(row).metadata)
+            if len(ids) >= batch_size:
+                _flush()
+                total += len(ids)
+                ids, rows, metas = [], [], []
+        if ids:
+            _flush()
+            total += len(ids)
+        return total
+
+    @record_time
+    def compact(self) -> Optional[SegmentInfo]:
+        """合并当前所有段，丢弃已删除和被覆盖的行；少于两个段且无墓碑时不做任何事"""
+        with self._compact_lock:
+            with self._lock:
+                snapshot = self._acquire()
+                tombstones = dict(self._tombstones)
+            try:
+                if not snapshot or (len(snapshot) == 1 and not tombstones):
+                    return None
+                # 在快照上计算可见行（新段覆盖旧段），逐段流式写入合并段
+                masks = [self._visible_mask(i, snapshot, tombstones) for i in range(len(snapshot))]
+                merged_seq = snapshot[-1].info.seq
+                name = f"seg-{merged_seq:08d}-c{len(snapshot)}-{os.getpid()}"
+                tmp = self.root / f".{name}.tmp"
+                shutil.rmtree(tmp, ignore_errors=True)
+                rows = Segment.write_merged(tmp, snapshot, masks, self.dim or snapshot[0].embeddings.shape[1])
+                os.replace(tmp, self.root / name)
+                merged = SegmentInfo(name=name, seq=merged_seq, rows=rows)
+
+                with self._lock:
+                    appended = self._segments[len(snapshot):]
+                    self._segments = [Segment(self.root / merged.name, merged)] + appended
+                    # 已在合并中生效且期间未变化的墓碑可以移除
+                    for record_id, seq in tombstones.items():
+                        if self._tombstones.get(record_id) == seq and seq <= merged_seq:
+                            del self._tombstones[record_id]
+                    # 旧段可能仍有读者（迭代器、并发 get），先记入回收列表，无人读取时再删除
+                    self._trash.update((segment.info.name, segment) for segment in snapshot)
+                    self._commit()
+            finally:
+                self._release(snapshot)
+            logger.info("[SEGMENT] compacted segments=%d rows=%d", len(snapshot), merged.rows)
+            return merged
+
+    def compact_async(self) -> threading.Thread:
+        thread = threading.Thread(target=self.compact, name="segment-compaction", daemon=True)
+        thread.start()
+        return thread
+
+    def _write_segment(self, info: SegmentInfo, records: Sequence[Record], embeddings: np.ndarray) -> None:
+        tmp = self.root / f".{info.name}.tmp"
+        shutil.rmtree(tmp, ignore_errors=True)
+        Segment.write(tmp, records, embeddings)
+        os.replace(tmp, self.root / info.name)
+
+    def _acquire(self) -> List[Segment]:
+        """登记为当前段列表的读者并返回其副本；调用方需持有 self._lock，读取结束后调用 _release(段列表)
+
+        compact() 可能随时替换 self._segments，调用方必须用同一副本解析位置
+        """
+        for segment in self._segments:
+            self._refs[segment.info.name] = self._refs.get(segment.info.name, 0) + 1
+        return list(self._segments)
+
+    @staticmethod
+    def _visible_mask(seg_idx: int, segments: Sequence[Segment], tombstones: Mapping[str, int]) -> np.ndarray:
+        """segments[seg_idx] 中可见的行：段内同一 id 的最后一行，且没有更新的段写过该 id，也没有被墓碑隐藏"""
+        segment = segments[seg_idx]
+        mask = np.ones(len(segment), dtype=bool)
+        sorted_keys = segment.id_keys
+        if len(sorted_keys) > 1:
+            mask[segment.id_order[:-1][sorted_keys[:-1] == sorted_keys[1:]]] = False
+        keys = segment.row_keys()
+        for newer in segments[seg_idx + 1:]:
+            alive = np.flatnonzero(mask)
+            mask[alive[newer.find(keys[alive]) >= 0]] = False
+        # 墓碑隐藏删除时刻及之前写入的所有副本
+        dead = [record_id for record_id, seq in tombstones.items() if seq >= segment.info.seq]
+        if dead:
+            mask &= ~np.isin(keys, _id_keys(dead))
+        return mask
+
+    @staticmethod
+    def _locate(ids: Sequence[str], segments: Sequence[Segment],
+                tombstones: Mapping[str, int]) -> List[Optional[Tuple[int, int]]]:
+        """各 id 的可见位置 (段下标, 行号)：从最新的段向前二分查找，最新副本被墓碑隐藏时为 None"""
+        keys = _id_keys(ids)
+        seg_of = np.full(len(ids), -1, dtype=np.int64)
+        row_of = np.full(len(ids), -1, dtype=np.int64)
+        pending = np.arange(len(ids))
+        for seg_idx in range(len(segments) - 1, -1, -1):
+            if not len(pending):
+                break
+            rows = segments[seg_idx].find(keys[pending])
+            hit = rows >= 0
+            seg_of[pending[hit]] = seg_idx
+            row_of[pending[hit]] = rows[hit]
+            pending = pending[~hit]
+        return [(s, r) if s >= 0 and tombstones.get(record_id, 0) < segments[s].info.seq else None
+                for record_id, s, r in zip(ids, seg_of.tolist(), row_of.tolist())]
+
+    def _count_visible(self, ids: Sequence[str]) -> int:
+        # 调用方需持有 self._lock；ids 不含重复
+        return sum(loc is not None for loc in self._locate(ids, self._segments, self._tombstones))
+
+    def _release(self, segments: List[Segment]) -> None:
+        with self._lock:
+            for segment in segments:
+                name = segment.info.name
+                self._refs[name] -= 1
+                if not self._refs[name]:
+                    del self._refs[name]
+            idle = any(name in self._trash for name in (s.info.name for s in segments))
+        if idle:
+            self._purge_trash()
+
+    def _purge_trash(self) -> None:
+        """删除无人读取的旧段目录；失败时记录日志，保留在回收列表中等待下次释放或打开时重试"""
+        with self._lock:
+            idle = [(name, segment) for name, segment in self._trash.items() if name not in self._refs]
+        if not idle:
+            return
+        removed = []
+        for name, segment in idle:
+            if segment is not None:
+                segment.close()
+            try:
+                if (self.root / name).exists():
+                    shutil.rmtree(self.root / name)
+                removed.append(name)
+            except OSError as e:
+                logger.warning("[SEGMENT] failed to remove compacted segment %s, will retry: %r", name, e)
+        if removed:
+            with self._lock:
+                for name in removed:
+                    self._trash.pop(name, None)
+                self._write_manifest()
+
+    def _load_manifest(self) -> None:
+        path = self.root / _MANIFEST
+        if not path.exists():
+            return
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        self.dim = manifest.get("dim", self.dim)
+        self.version = manifest.get("version", 0)
+        self._next_seq = manifest.get("next_seq", 1)
+        self._tombstones = manifest.get("tombstones", {})
+        self._live = manifest.get("live")
+        self._segments = [Segment(self.root / s["name"], SegmentInfo(**s)) for s in manifest["segments"]]
+        self._trash = dict.fromkeys(manifest.get("trash", []))
+
+    def _commit(self) -> None:
+        # 调用方需持有 self._lock
+        self.version += 1
+        self._write_manifest()
+
+    def _write_manifest(self) -> None:
+        # 调用方需持有 self._lock
+        manifest = {
+            "version": self.version,
+            "dim": self.dim,
+            "next_seq": self._next_seq,
+            "segments": [vars(s.info) for s in self._segments],
+            "tombstones": self._tombstones,
+            "live": self._live,
+            "trash": list(self._trash),
+        }
+        tmp = self.root / f"{_MANIFEST}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False)
+        os.replace(tmp, self.root / _MANIFEST)
+
+
+__all__ = ["Segment", "SegmentInfo", "SegmentStore"]
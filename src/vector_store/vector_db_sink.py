@@ -0,0 +1,506 @@
+from __future__ import annotations
+
+import queue
+import random
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from operator import attrgetter
+from dataclasses import dataclass, fields
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Set, Tuple, get_args, get_type_hints
+
+import numpy as np
+
+from src.libs.metrics import span
+from src.libs.project_logger import logger
+from src.libs.retry_tool import CircuitBreaker, retry
+from src.pipeline.ingestion_manifest import Tombstone
+from src.tokenizer.record import Record, RecordMetaData
+
+# 标量列类型
+STR = "str"
+INT = "int"
+FLOAT = "float"
+BOOL = "bool"
+STR_LIST = "str_list"
+
+_KIND_BY_TYPE = {str: STR, int: INT, float: FLOAT, bool: BOOL, List[str]: STR_LIST}
+
+
+@dataclass(frozen=True)
+class Column:
+    name: str      # 列名，即 RecordMetaData 分组内的字段名（各分组间不重名）
+    group: str     # 所属分组，如 "quality"
+    kind: str      # STR / INT / FLOAT / BOOL / STR_LIST
+
+
+def _optional_inner(hint: Any) -> Any:
+    return [t for t in get_args(hint) if t is not type(None)][0]  # Optional[X] -> X
+
+
+# RecordMetaData 的分组名 -> 分组 dataclass
+_GROUP_TYPES = {name: _optional_inner(hint) for name, hint in get_type_hints(RecordMetaData).items()}
+
+
+def _metadata_columns() -> Tuple[Column, ...]:
+    columns = []
+    for group, cls in _GROUP_TYPES.items():
+        hints = get_type_hints(cls)
+        for f in fields(cls):
+            if group == "identification" and f.name == "id":
+                continue  # 与主键 Record.id 重复
+            columns.append(Column(f.name, group, _KIND_BY_TYPE[_optional_inner(hints[f.name])]))
+    return tuple(columns)
+
+
+# 入库行的列：id（主键）、vector、content，以及按下列顺序展开的元数据标量列
+METADATA_COLUMNS: Tuple[Column, ...] = _metadata_columns()
+_COLUMNS_BY_GROUP = [(group, [c for c in METADATA_COLUMNS if c.group == group]) for group in _GROUP_TYPES]
+# 每个分组：(分组名, 一次取出全部字段的 attrgetter, 列名)
+_GROUP_READERS = [
+    (group, attrgetter(*[c.name for c in columns]), tuple(c.name for c in columns))
+    for group, columns in _COLUMNS_BY_GROUP
+]
+
+
+def record_to_row(record: Record, embedding: np.ndarray) -> Dict[str, Any]:
+    """
+    将 Record 与其向量转换为一行入库数据：元数据 7 个分组展开为扁平的标量列
+    缺失的值（字段为 None 或分组为 None）写为 None，对应向量库中的可空列；
+    不以 ""、-1、False 等默认值代替，否则“未知”与真实的 False / -1 / "" 无法区分
+
+    :param record: 待入库记录
+    :param embedding: (dim,) 向量
+    :return: {"id", "vector", "content", <METADATA_COLUMNS...>}
+    """
+    row: Dict[str, Any] = {"id": record.id, "vector": embedding, "content": record.content}
+    metadata = record.metadata
+    for group_name, getter, names in _GROUP_READERS:
+        group = getattr(metadata, group_name) if metadata is not None else None
+        if group is None:
+            row.update(dict.fromkeys(names))
+        else:
+            values = getter(group)
+            row.update(zip(names, (values,) if len(names) == 1 else values))
+    return row
+
+
+def records_to_rows(records: Sequence[Record], embeddings: np.ndarray) -> List[Dict[str, Any]]:
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    if len(records) != len(embeddings):
+        raise ValueError("records and embeddings must have the same length")
+    return [record_to_row(record, vector) for record, vector in zip(records, embeddings)]
+
+
+def row_to_record(row: Dict[str, Any]) -> Tuple[Record, np.ndarray]:
+    """record_to_row 的逆变换；为 None 的列还原为 None，全部字段为 None 的分组还原为 None"""
+    groups = {}
+    for group_name, columns in _COLUMNS_BY_GROUP:
+        values = {}
+        for column in columns:
+            value = row.get(column.name)
+            if value is not None:
+                values[column.name] = list(value) if column.kind == STR_LIST else value
+        if group_name == "identification":
+            values["id"] = row["id"]
+        if values:
+            groups[group_name] = _GROUP_TYPES[group_name](**values)
+    record = Record(id=row["id"], content=row["content"], metadata=RecordMetaData(**groups))
+    return record, np.asarray(row["vector"], dtype=np.float32)
+
+
+@dataclass(frozen=True)
+class RowLimits:
+    """向量库列的长度上限；字符串按 UTF-8 字节数计（Milvus VARCHAR 的 max_length 即字节数）"""
+    id_length: int = 128
+    content_length: int = 65535
+    string_length: int = 2048         # 其他 STR 列
+    list_capacity: int = 64           # STR_LIST 列的元素个数
+    list_item_length: int = 256       # STR_LIST 列每个元素
+
+
+def _utf8_len(value: str) -> int:
+    return len(value.encode("utf-8"))
+
+
+def check_row_limits(row: Dict[str, Any], limits: RowLimits) -> None:
+    """
+    检查一行是否超出列长度上限，超出时抛出 ValueError 并指明记录 id 与列名
+    在行进入批次之前调用：超长的行会被服务端整批拒绝，且属于不可重试的错误
+    """
+    problems = []
+    if _utf8_len(row["id"]) > limits.id_length:
+        problems.append(f"id is {_utf8_len(row['id'])} bytes > {limits.id_length}")
+    if _utf8_len(row["content"]) > limits.content_length:
+        problems.append(f"content is {_utf8_len(row['content'])} bytes > {limits.content_length}")
+    for column in METADATA_COLUMNS:
+        value = row.get(column.name)
+        if value is None:
+            continue
+        if column.kind == STR and _utf8_len(value) > limits.string_length:
+            problems.append(f"{column.name} is {_utf8_len(value)} bytes > {limits.string_length}")
+        elif column.kind == STR_LIST:
+            if len(value) > limits.list_capacity:
+                problems.append(f"{column.name} has {len(value)} items > {limits.list_capacity}")
+            longest = max((_utf8_len(item) for item in value), default=0)
+            if longest > limits.list_item_length:
+                problems.append(f"{column.name} has an item of {longest} bytes > {limits.list_item_length}")
+    if problems:
+        raise ValueError(f"record {row['id']!r} exceeds column limits: {'; '.join(problems)}")
+
+
+class VectorDBWriteError(RuntimeError):
+    """后台写入请求在重试耗尽后仍然失败"""
+
+
+class ConnectionPool:
+    """
+    上限固定的连接池：连接按需创建、用完归还；请求出错时连接被丢弃（下次重新创建），
+    避免复用已断开的连接
+    """
+
+    def __init__(self, factory: Callable[[], Any], size: int, close: Optional[Callable[[Any], None]] = None):
+        if size < 1:
+            raise ValueError("size must be >= 1")
+        self.factory = factory
+        self.size = size
+        self._close = close
+        self._idle: "queue.LifoQueue[Any]" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._all: List[Any] = []
+        self.created = 0
+
+    @contextmanager
+    def connection(self) -> Iterator[Any]:
+        self._slots.acquire()
+        try:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = self.factory()
+                with self._lock:
+                    self._all.append(conn)
+                    self.created += 1
+            try:
+                yield conn
+            except BaseException:
+                self._discard(conn)
+                raise
+            self._idle.put(conn)
+        finally:
+            self._slots.release()
+
+    def _discard(self, conn: Any) -> None:
+        with self._lock:
+            if conn in self._all:
+                self._all.remove(conn)
+        if self._close is not None:
+            try:
+                self._close(conn)
+            except Exception as e:  # noqa: BLE001 - 连接已不可用，关闭失败无需处理
+                logger.debug("[VECTOR] close broken connection failed: %r", e)
+
+    def close(self) -> None:
+        with self._lock:
+            connections, self._all = self._all, []
+        while True:
+            try:
+                self._idle.get_nowait()
+            except queue.Empty:
+                break
+        if self._close is not None:
+            for conn in connections:
+                self._close(conn)
+
+
+@dataclass
+class SinkStats:
+    rows_written: int = 0
+    rows_deleted: int = 0
+    requests: int = 0
+    failed_requests: int = 0
+    max_in_flight: int = 0
+    request_seconds: float = 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "rows_written": self.rows_written,
+            "rows_deleted": self.rows_deleted,
+            "requests": self.requests,
+            "failed_requests": self.failed_requests,
+            "max_in_flight": self.max_in_flight,
+            "mean_request_ms": round(self.request_seconds / self.requests * 1000, 3) if self.requests else 0.0,
+        }
+
+
+class VectorDBSink(ABC):
+    """
+    向量数据库批量写入器，可直接作为 IngestionPipeline 的 sink，write_tombstones 作为 on_tombstones
+
+    - 行在内存中累积到 batch_size 后作为一个写入请求提交，请求由后台线程发送；
+    - 同时在途的请求不超过 max_in_flight，达到上限时调用方阻塞（对流水线形成背压）；
+    - 每个请求从连接池取连接，瞬时错误（_is_transient）按指数退避重试，
+      所有请求共享一个熔断器，服务持续不可用时快速失败；
+    - 重试耗尽的失败在下一次调用 / flush / close 时以 VectorDBWriteError 抛出。
+
+    墓碑删除与写入并发发送：增量入库中墓碑 id 不会出现在同一次运行写入的行里，无需排序。
+    子类实现 _connect / _write_rows / _delete_ids（可选 _close_connection / _prepare）。
+    """
+
+    def __init__(self, batch_size: int = 2000, max_in_flight: int = 4, pool_size: Optional[int] = None,
+                 retry_time: int = 5, base_delay: float = 0.2, max_delay: float = 10.0,
+                 deadline_s: Optional[float] = 120.0, circuit_breaker: Optional[CircuitBreaker] = None,
+                 row_limits: Optional[RowLimits] = None):
+        """
+        :param batch_size: 每个写入请求的行数
+        :param max_in_flight: 同时在途的请求数上限（即后台写线程数）
+        :param pool_size: 连接池大小，默认等于 max_in_flight
+        :param retry_time: 每个请求的最多尝试次数（含首次）
+        :param base_delay: 重试退避的初始延迟（秒）
+        :param max_delay: 重试退避的最大延迟（秒）
+        :param deadline_s: 单个请求（含全部重试）的总时限
+        :param circuit_breaker: 熔断器，默认每个 sink 一个
+        :param row_limits: 列长度上限，写入时逐行检查，超出的记录以 ValueError 拒绝（不进入批次）；None 为不检查
+        """
+        if batch_size < 1 or max_in_flight < 1:
+            raise ValueError("batch_size and max_in_flight must be >= 1")
+        self.batch_size = batch_size
+        self.max_in_flight = max_in_flight
+        self.row_limits = row_limits
+        self.pool = ConnectionPool(self._connect, pool_size or max_in_flight, close=self._close_connection)
+        self.circuit_breaker = circuit_breaker or CircuitBreaker(name=type(self).__name__)
+        self.stats = SinkStats()
+        self._send = retry(retry_time=retry_time, base_delay=base_delay, max_delay=max_delay,
+                           deadline_s=deadline_s, retry_if=self._is_transient,
+                           circuit_breaker=self.circuit_breaker)(self._send_once)
+        self._executor = ThreadPoolExecutor(max_in_flight, thread_name_prefix="vdb-writer")
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._lock = threading.Lock()
+        self._buffer: List[Dict[str, Any]] = []
+        self._pending: Set[Future] = set()
+        self._in_flight = 0
+        self._error: Optional[BaseException] = None
+        self._prepared = False
+        self._closed = False
+
+    # ---- 子类扩展点 ----
+    @abstractmethod
+    def _connect(self) -> Any:
+        """创建一个连接（客户端）"""
+
+    @abstractmethod
+    def _write_rows(self, conn: Any, rows: List[Dict[str, Any]]) -> None:
+        """写入一批行（按主键覆盖）"""
+
+    @abstractmethod
+    def _delete_ids(self, conn: Any, ids: List[str]) -> None:
+        """按主键删除"""
+
+    def _close_connection(self, conn: Any) -> None:
+        pass
+
+    def _prepare(self, conn: Any, dim: int) -> None:
+        """首次写入前调用一次，例如按向量维度建表"""
+
+    def _is_transient(self, error: BaseException) -> bool:
+        """是否为可重试的瞬时错误（网络中断、超时、限流等）"""
+        return isinstance(error, (ConnectionError, TimeoutError))
+
+    # ---- Sink 接口 ----
+    def __call__(self, records: List[Record], embeddings: np.ndarray) -> None:
+        self._check()
+        if not records:
+            return
+        rows = records_to_rows(records, embeddings)
+        if self.row_limits is not None:
+            for row in rows:
+                check_row_limits(row, self.row_limits)
+        if not self._prepared:
+            with self.pool.connection() as conn:
+                self._prepare(conn, len(rows[0]["vector"]))
+            self._prepared = True
+        self._buffer.extend(rows)
+        while len(self._buffer) >= self.batch_size:
+            batch, self._buffer = self._buffer[:self.batch_size], self._buffer[self.batch_size:]
+            self._submit("write", batch)
+
+    def write_tombstones(self, tombstones: List[Tombstone]) -> None:
+        self._check()
+        ids = [t.record_id for t in tombstones]
+        for start in range(0, len(ids), self.batch_size):
+            self._submit("delete", ids[start:start + self.batch_size])
+
+    def flush(self) -> None:
+        """发送缓冲区中的剩余行并等待所有在途请求完成"""
+        if self._buffer:
+            batch, self._buffer = self._buffer, []
+            self._submit("write", batch)
+        with self._lock:
+            pending = list(self._pending)
+        for future in pending:
+            future.result()
+        self._check()
+
+    def close(self) -> None:
+        if self._closed:
+            return
+        try:
+            self.flush()
+        finally:
+            self._closed = True
+            self._executor.shutdown(wait=True)
+            self.pool.close()
+            logger.info("[VECTOR] %s closed %s", type(self).__name__, self.stats.as_dict())
+
+    def __enter__(self) -> "VectorDBSink":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+    # ---- 内部实现 ----
+    def _check(self) -> None:
+        if self._closed:
+            raise RuntimeError("sink is closed")
+        if self._error is not None:
+            raise VectorDBWriteError(f"background write failed: {self._error!r}") from self._error
+
+    def _submit(self, op: str, payload: List[Any]) -> None:
+        self._slots.acquire()
+        with self._lock:
+            self._in_flight += 1
+            self.stats.max_in_flight = max(self.stats.max_in_flight, self._in_flight)
+            future = self._executor.submit(self._run, op, payload)
+            self._pending.add(future)
+        future.add_done_callback(self._done)
+
+    def _done(self, future: Future) -> None:
+        with self._lock:
+            self._in_flight -= 1
+            self._pending.discard(future)
+        self._slots.release()
+
+    def _run(self, op: str, payload: List[Any]) -> None:
+        start = time.perf_counter()
+        try:
+            with span(f"vdb_{op}"):
+                self._send(op, payload)
+        except Exception as e:  # noqa: BLE001 - 保存后在调用方线程抛出
+            with self._lock:
+                self.stats.failed_requests += 1
+                if self._error is None:
+                    self._error = e
+            logger.error("[VECTOR] %s %s of %d items failed: %r", type(self).__name__, op, len(payload), e)
+            return
+        with self._lock:
+            self.stats.requests += 1
+            self.stats.request_seconds += time.perf_counter() - start
+            if op == "write":
+                self.stats.rows_written += len(payload)
+            else:
+                self.stats.rows_deleted += len(payload)
+
+    def _send_once(self, op: str, payload: List[Any]) -> None:
+        with self.pool.connection() as conn:
+            if op == "write":
+                self._write_rows(conn, payload)
+            else:
+                self._delete_ids(conn, payload)
+
+
+class InMemoryVectorDB:
+    """
+    进程内的向量库替身：按主键保存行，可模拟网络延迟与随机瞬时故障，
+    供测试与基准在没有 Milvus 服务时运行完整入库流程
+    """
+
+    def __init__(self, latency_s: float = 0.0, per_row_latency_s: float = 0.0, failure_rate: float = 0.0,
+                 seed: int = 0):
+        """
+        :param latency_s: 每个请求的固定延迟（模拟网络往返）
+        :param per_row_latency_s: 每行的附加延迟（模拟序列化与服务端写入）
+        :param failure_rate: 请求以 ConnectionError 失败的概率
+        """
+        self.latency_s = latency_s
+        self.per_row_latency_s = per_row_latency_s
+        self.failure_rate = failure_rate
+        self.rows: Dict[str, Dict[str, Any]] = {}
+        self.dim: Optional[int] = None
+        self.connections = 0
+        self.requests = 0
+        self.max_concurrent = 0
+        self._concurrent = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def connect(self) -> "InMemoryVectorDB":
+        with self._lock:
+            self.connections += 1
+        return self
+
+    def get(self, record_id: str) -> Tuple[Record, np.ndarray]:
+        return row_to_record(self.rows[record_id])
+
+    def _request(self, n_items: int, apply: Callable[[], None]) -> None:
+        with self._lock:
+            self.requests += 1
+            self._concurrent += 1
+            self.max_concurrent = max(self.max_concurrent, self._concurrent)
+            fail = self.failure_rate > 0 and self._rng.random() < self.failure_rate
+        try:
+            delay = self.latency_s + self.per_row_latency_s * n_items
+            if delay > 0:
+                time.sleep(delay)
+            if fail:
+                raise ConnectionError("simulated transient failure")
+            with self._lock:
+                apply()
+        finally:
+            with self._lock:
+                self._concurrent -= 1
+
+    def upsert(self, rows: List[Dict[str, Any]]) -> None:
+        def _apply() -> None:
+            for row in rows:
+                self.rows[row["id"]] = row
+        self._request(len(rows), _apply)
+
+    def delete(self, ids: List[str]) -> None:
+        def _apply() -> None:
+            for record_id in ids:
+                self.rows.pop(record_id, None)
+        self._request(len(ids), _apply)
+
+
+class InMemoryVectorDBSink(VectorDBSink):
+    """写入 InMemoryVectorDB 的 VectorDBSink，与 MilvusSink 共用批量、并发、连接池与重试逻辑"""
+
+    def __init__(self, db: Optional[InMemoryVectorDB] = None, **kwargs: Any):
+        self.db = db if db is not None else InMemoryVectorDB()
+        super().__init__(**kwargs)
+
+    def _connect(self) -> InMemoryVectorDB:
+        return self.db.connect()
+
+    def _prepare(self, conn: InMemoryVectorDB, dim: int) -> None:
+        if conn.dim is not None and conn.dim != dim:
+            raise ValueError(f"dim mismatch: collection has {conn.dim}, got {dim}")
+        conn.dim = dim
+
+    def _write_rows(self, conn: InMemoryVectorDB, rows: List[Dict[str, Any]]) -> None:
+        conn.upsert(rows)
+
+    def _delete_ids(self, conn: InMemoryVectorDB, ids: List[str]) -> None:
+        conn.delete(ids)
+
+
+__all__ = ["Column", "METADATA_COLUMNS", "STR", "INT", "FLOAT", "BOOL", "STR_LIST",
+           "record_to_row", "records_to_rows", "row_to_record", "RowLimits", "check_row_limits",
+           "ConnectionPool", "SinkStats", "VectorDBSink", "VectorDBWriteError",
+           "InMemoryVectorDB", "InMemoryVectorDBSink"]
@@ -0,0 +1,70 @@
+import json
+from dataclasses import asdict
+
+import pytest
+
+from benchmarks.stand_in_model import HashingEmbeddingModel
+from benchmarks.suite import SCHEMA_VERSION, SuiteConfig, compare, main, run_suite
+from benchmarks.synthetic_corpus import synthetic_corpus
+
+_TINY = SuiteConfig(docs=2, records=200, calls=200, repeat=1)
+
+
+def _report(config=_TINY, **values):
+    return {"schema": SCHEMA_VERSION, "config": asdict(config), "results": {"b": {name: {"value": value, "unit": "x", "higher_is_better": direction}
+                              for name, (value, direction) in values.items()}}}
+
+
+def test_corpus_is_deterministic():
+    docs = synthetic_corpus(5, seed=3)
+    assert docs == synthetic_corpus(5, seed=3)
+    assert docs != synthetic_corpus(5, seed=4)
+    assert any("。" in d for d in docs) and any(". " in d for d in docs)
+
+
+def test_stand_in_model_separates_topics():
+    model = HashingEmbeddingModel(dim=64)
+    a, b, c = model.encode(["长江流域的洪水与大坝。", "长江的大坝影响流域洪水。", "咖啡豆的烘焙与萃取风味。"])
+    assert a @ b > a @ c
+    assert model.encode(["长江"]).shape == (1, 64)
+
+
+def test_compare_flags_regressions_by_direction():
+    baseline = _report(rate=(100.0, True), latency=(10.0, False), info=(3.0, None), gone=(1.0, True))
+    current = _report(rate=(80.0, True), latency=(10.5, False), info=(9.0, None), new=(1.0, True))
+    result = {c.metric: c for c in compare(current, baseline, threshold=0.15)}
+
+    assert set(result) == {"b.rate", "b.latency"}
+    assert result["b.rate"].regressed and round(result["b.rate"].change, 2) == -0.2
+    assert not result["b.latency"].regressed and result["b.latency"].change < 0
+
+
+def test_compare_refuses_incompatible_baseline():
+    current = _report(rate=(100.0, True))
+    # repeat / seed 不影响可比性
+    assert compare(current, _report(SuiteConfig(docs=2, records=200, calls=200, repeat=5, seed=1),
+                                    rate=(100.0, True)))
+    with pytest.raises(ValueError, match="config.docs 400 != 2"):
+        compare(current, _report(SuiteConfig(), rate=(100.0, True)))
+    old_schema = dict(_report(rate=(100.0, True)), schema=SCHEMA_VERSION - 1)
+    with pytest.raises(ValueError, match="schema"):
+        compare(current, old_schema)
+
+
+def test_run_suite_and_cli(tmp_path, monkeypatch):
+    report = run_suite(["split", "records"], _TINY)
+    assert set(report["results"]) == {"split", "records"}
+    assert report["results"]["records"]["batch_bytes_per_record"]["higher_is_better"] is False
+    json.dumps(report)
+
+    monkeypatch.setattr(SuiteConfig, "quick", classmethod(lambda cls: SuiteConfig(**vars(_TINY))))
+    output, baseline = tmp_path / "out.json", tmp_path / "base.json"
+    assert main(["--only", "split", "--quick", "--output", str(output)]) == 0
+    data = json.loads(output.read_text(encoding="utf-8"))
+    data["results"]["split"]["mb_per_s"]["value"] *= 100
+    baseline.write_text(json.dumps(data), encoding="utf-8")
+    assert main(["--only", "split", "--quick", "--baseline", str(baseline)]) == 1
+
+    data["config"]["docs"] += 1
+    baseline.write_text(json.dumps(data), encoding="utf-8")
+    assert main(["--only", "split", "--quick", "--baseline", str(baseline)]) == 2
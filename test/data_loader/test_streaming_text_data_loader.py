@@ -0,0 +1,50 @@
+from src.data_loader.streaming_text_data_loader import StreamingTextDataLoader
+
+
+def _write(tmp_path, text):
+    path = tmp_path / "corpus.txt"
+    path.write_bytes(text.encode("utf-8"))
+    return str(path)
+
+
+def test_segments_cover_file_with_offsets_and_lines(tmp_path):
+    text = ("长江是亚洲第一长河。它发源于青藏高原！\n最终注入东海？\n\n"
+            "智能手机是现代社会不可或缺的通信工具。\n" * 20)
+    path = _write(tmp_path, text)
+    raw = text.encode("utf-8")
+
+    segments = list(StreamingTextDataLoader(path, max_segment_bytes=100, skip_blank=False).iter_segments())
+
+    assert "".join(s.text for s in segments) == text
+    for seg in segments:
+        seg_bytes = seg.text.encode("utf-8")
+        assert len(seg_bytes) <= 100
+        assert raw[seg.offset:seg.offset + len(seg_bytes)] == seg_bytes
+        assert seg.line_start == raw[:seg.offset].count(b"\n") + 1
+        assert seg.line_end == seg.line_start + seg.text.count("\n") - seg.text.endswith("\n")
+
+
+def test_prefers_paragraph_then_sentence_boundaries(tmp_path):
+    text = "第一段第一句。第一段第二句。\n\n第二段很长很长很长。"
+    path = _write(tmp_path, text)
+
+    segments = list(StreamingTextDataLoader(path, max_segment_bytes=60).iter_segments())
+    assert segments[0].text == "第一段第一句。第一段第二句。\n\n"
+    assert segments[1].text == "第二段很长很长很长。"
+
+    segments = list(StreamingTextDataLoader(path, max_segment_bytes=30).iter_segments())
+    assert segments[0].text == "第一段第一句。"
+    assert segments[0].to_source_location(path).offset == 0
+
+
+def test_hard_cut_keeps_utf8_characters_intact(tmp_path):
+    text = "没有任何标点的长句子" * 10
+    path = _write(tmp_path, text)
+
+    segments = list(StreamingTextDataLoader(path, max_segment_bytes=16).iter_segments())
+    assert "".join(s.text for s in segments) == text
+    assert all(len(s.text.encode("utf-8")) <= 16 for s in segments)
+
+
+def test_empty_file(tmp_path):
+    assert list(StreamingTextDataLoader(_write(tmp_path, "")).iter_segments()) == []
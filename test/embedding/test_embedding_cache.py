@@ -0,0 +1,64 @@
+import numpy as np
+
+from src.embedding.embedding_cache import EmbeddingCache, encode_with_cache
+
+
+def _fake_encoder(calls):
+    def _encode(texts):
+        calls.append(list(texts))
+        return np.array([[len(t), 1.0, 2.0, 3.0] for t in texts], dtype=np.float32)
+    return _encode
+
+
+def test_encode_with_cache_hits_and_misses(tmp_path):
+    cache = EmbeddingCache(str(tmp_path))
+    calls = []
+
+    first = encode_with_cache(["人工智能", "机器学习", "人工智能"], _fake_encoder(calls), "m", True, cache)
+    assert first.shape == (3, 4)
+    assert calls == [["人工智能", "机器学习"]]
+
+    second = encode_with_cache(["机器学习", "长江"], _fake_encoder(calls), "m", True, cache)
+    assert calls[-1] == ["长江"]
+    np.testing.assert_array_equal(second[0], first[1])
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["entries"] == 3
+
+
+def test_key_depends_on_model_and_normalize(tmp_path):
+    keys = {
+        EmbeddingCache.make_key("a", True, "text"),
+        EmbeddingCache.make_key("b", True, "text"),
+        EmbeddingCache.make_key("a", False, "text"),
+    }
+    assert len(keys) == 3
+
+
+def test_float16_layout_and_persistence(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), dtype="float16")
+    vec = np.linspace(-1, 1, 1024, dtype=np.float32)
+    cache.put("k" * 64, vec)
+
+    path = tmp_path / "kk" / ("k" * 64 + ".emb")
+    assert path.stat().st_size == 12 + 1024 * 2
+
+    reopened = EmbeddingCache(str(tmp_path))
+    loaded = reopened.get("k" * 64)
+    assert loaded.dtype == np.float32
+    np.testing.assert_allclose(loaded, vec, atol=1e-3)
+
+
+def test_lru_eviction_by_size(tmp_path):
+    entry_size = 12 + 4 * 4
+    cache = EmbeddingCache(str(tmp_path), max_bytes=entry_size * 2)
+    vec = np.ones(4, dtype=np.float32)
+    cache.put("a" * 64, vec)
+    cache.put("b" * 64, vec)
+    assert cache.get("a" * 64) is not None  # "a" becomes most recently used
+    cache.put("c" * 64, vec)
+
+    assert cache.get("b" * 64) is None
+    assert cache.get("a" * 64) is not None
+    assert cache.stats()["evictions"] == 1
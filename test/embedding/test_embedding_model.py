@@ -1,14 +1,18 @@
+import pytest
+
+pytest.importorskip("sentence_transformers")
+
 from sentence_transformers import util
 
-from src.embedding.embedding_model import BGE_LARGE_ZH_V1_5
+from src.embedding.model_registry import get_model
 from src.libs.project_logger import logger
 from src.libs.record_time import record_time
 
 
 @record_time
 def test_sentence_to_embedding():
-    # 加载模型（第一次会自动下载到本地缓存）
-    model = BGE_LARGE_ZH_V1_5
+    # 加载模型（第一次会自动下载到本地缓存；本地路径可通过 RAG_EMBED_MODEL_PATH 指定）
+    model = get_model("BAAI/bge-large-zh-v1.5")
 
     sentences = ["人工智能正在改变世界", "我喜欢机器学习"]
     embeddings = model.encode(sentences, normalize_embeddings=True)  # 建议归一化
@@ -18,10 +22,10 @@ def test_sentence_to_embedding():
 
 
 def test_similarity():
-    model = BGE_LARGE_ZH_V1_5
+    model = get_model("BAAI/bge-large-zh-v1.5")
 
     sentences = ["人工智能正在改变世界", "我喜欢机器学习"]
     embeddings = model.encode(sentences, normalize_embeddings=True)
 
     cos_sim = util.cos_sim(embeddings[0], embeddings[1])
-    logger.info("句子相似度:", cos_sim.item())
\ No newline at end of file
+    logger.info("句子相似度: %s", cos_sim.item())
@@ -0,0 +1,69 @@
+import asyncio
+import threading
+
+import numpy as np
+import pytest
+
+from src.embedding.embedding_service import AsyncEmbeddingService
+
+
+class _RecordingEncoder:
+    def __init__(self, delay_s=0.0, fail_times=0):
+        self.batches = []
+        self.threads = set()
+        self.delay_s = delay_s
+        self.fail_times = fail_times
+
+    def __call__(self, texts):
+        self.threads.add(threading.current_thread().name)
+        if self.fail_times:
+            self.fail_times -= 1
+            raise RuntimeError("encoder down")
+        self.batches.append(list(texts))
+        if self.delay_s:
+            threading.Event().wait(self.delay_s)
+        return np.array([[len(t), i] for i, t in enumerate(texts)], dtype=np.float32)
+
+
+async def test_concurrent_requests_are_micro_batched():
+    encoder = _RecordingEncoder(delay_s=0.01)
+    async with AsyncEmbeddingService(encoder, max_batch_size=16, max_wait_ms=5) as service:
+        texts = ["x" * (i + 1) for i in range(100)]
+        vectors = await asyncio.gather(*(service.embed(t) for t in texts))
+        stats = service.stats.as_dict()
+
+    assert [v[0] for v in vectors] == [len(t) for t in texts]
+    assert sum(len(b) for b in encoder.batches) == 100
+    assert max(len(b) for b in encoder.batches) <= 16
+    assert len(encoder.batches) < 100
+    assert encoder.threads and all(name.startswith("embedding-service") for name in encoder.threads)
+    assert stats["requests"] == 100
+    assert stats["batches"] == len(encoder.batches)
+    assert sum(stats["batch_size"]["histogram"].values()) == len(encoder.batches)
+    assert 0 < stats["latency_ms"]["p50"] <= stats["latency_ms"]["p99"]
+
+
+async def test_single_request_flushed_after_max_wait():
+    encoder = _RecordingEncoder()
+    async with AsyncEmbeddingService(encoder, max_batch_size=64, max_wait_ms=1) as service:
+        vector = await asyncio.wait_for(service.embed("abc"), timeout=1)
+        matrix = await service.embed_many(["a", "bb"])
+    assert vector[0] == 3
+    assert matrix[:, 0].tolist() == [1, 2]
+
+
+async def test_batch_failure_is_retried_then_raised():
+    encoder = _RecordingEncoder(fail_times=1)
+    async with AsyncEmbeddingService(encoder, retry_time=2) as service:
+        assert (await service.embed("ok"))[0] == 2
+
+    encoder = _RecordingEncoder(fail_times=5)
+    async with AsyncEmbeddingService(encoder, retry_time=2) as service:
+        results = await asyncio.gather(service.embed("a"), service.embed("b"), return_exceptions=True)
+        assert all(isinstance(r, RuntimeError) for r in results)
+        assert service.stats.as_dict()["failed_batches"] == 1
+
+
+def test_rejects_invalid_batch_size():
+    with pytest.raises(ValueError):
+        AsyncEmbeddingService(_RecordingEncoder(), max_batch_size=0)
@@ -0,0 +1,140 @@
+import importlib.util
+
+import numpy as np
+import pytest
+
+from src.embedding.embedding_cache import EmbeddingCache
+from src.embedding.embedding_model import encode
+from src.embedding import model_registry
+from src.embedding.inference_backend import (EmbeddingBackend, TorchBackend, bucket_by_length, configured_cache_tag,
+                                             load_backend, pad_batch, parity_check)
+from src.tokenizer.llamaindex_tokenizer import LlamaIndexSemanticTokenizer
+
+
+class _CharBackend(EmbeddingBackend):
+    """逐字分词的替身后端：向量只取决于文本本身，与批内 padding 无关"""
+
+    def __init__(self, max_tokens_per_batch=None, noise=0.0, tag=""):
+        super().__init__(max_tokens_per_batch)
+        self.batches = []
+        self.noise = noise
+        self.tag = tag
+
+    @property
+    def cache_tag(self):
+        return self.tag
+
+    def tokenize(self, texts):
+        return [[ord(c) % 1000 + 1 for c in t] or [1] for t in texts]
+
+    def forward(self, token_ids):
+        self.batches.append([len(ids) for ids in token_ids])
+        input_ids, mask = pad_batch(token_ids)
+        vectors = np.stack([np.bincount(row[m == 1] % 16, minlength=16) for row, m in zip(input_ids, mask)])
+        vectors = vectors.astype(np.float32) + 0.1
+        if self.noise:
+            vectors += self.noise * np.random.default_rng(0).normal(size=vectors.shape).astype(np.float32)
+        return vectors
+
+
+TEXTS = ["短句。", "这是一句稍微长一些的中文句子，用于测试分桶。", "Mixed English and 中文 sentence.",
+         "长" * 60, "a", "手机电池耐用。" * 5, "长江流入东海。", "x" * 7]
+
+
+@pytest.mark.parametrize("max_batch_size,max_tokens", [(1, None), (3, None), (8, 40), (4, 25)])
+def test_bucket_by_length(max_batch_size, max_tokens):
+    lengths = [len(t) for t in TEXTS]
+    batches = bucket_by_length(lengths, max_batch_size, max_tokens)
+
+    assert sorted(np.concatenate(batches).tolist()) == list(range(len(TEXTS)))
+    for batch in batches:
+        assert len(batch) <= max_batch_size
+        if max_tokens is not None and len(batch) > 1:
+            assert len(batch) * max(lengths[i] for i in batch) <= max_tokens
+    # 按长度升序装箱：后一批的最短序列不短于前一批的最长序列
+    for prev, cur in zip(batches, batches[1:]):
+        assert max(lengths[i] for i in prev) <= min(lengths[i] for i in cur)
+    assert bucket_by_length([], 4) == []
+
+
+def test_encode_restores_order_and_reduces_padding():
+    backend = _CharBackend(max_tokens_per_batch=64)
+    vectors = backend.encode(TEXTS, batch_size=4)
+
+    single = np.stack([_CharBackend().encode([t])[0] for t in TEXTS])
+    np.testing.assert_allclose(vectors, single, rtol=1e-6)
+    np.testing.assert_allclose(np.linalg.norm(vectors, axis=1), 1.0, rtol=1e-6)
+    assert all(len(b) * max(b) <= 64 or len(b) == 1 for b in backend.batches)
+
+    unsorted_padding = sum(len(TEXTS[i:i + 4]) * max(map(len, TEXTS[i:i + 4])) for i in range(0, len(TEXTS), 4))
+    assert backend.real_tokens <= backend.padded_tokens < unsorted_padding
+    assert backend.encode("单句").shape == (16,)
+
+
+def test_parity_check():
+    reference = _CharBackend()
+    assert parity_check(reference, _CharBackend(max_tokens_per_batch=16), TEXTS).passed
+
+    report = parity_check(reference, _CharBackend(noise=2.0), TEXTS)
+    assert not report.passed and report.min_cosine < 0.99
+    assert report.as_dict()["passed"] is False
+
+
+def test_backend_cache_namespace(tmp_path):
+    cache = EmbeddingCache(str(tmp_path))
+    encode(["同一句话"], model=_CharBackend(), model_name="m", cache=cache)
+    encode(["同一句话"], model=_CharBackend(tag="@onnx-int8"), model_name="m", cache=cache)
+    assert cache.misses == 2
+
+    encode(["同一句话"], model=_CharBackend(tag="@onnx-int8"), model_name="m", cache=cache)
+    assert cache.hits == 1
+
+
+def test_backend_selection(monkeypatch):
+    monkeypatch.setenv("RAG_EMBED_BACKEND", "tensorrt")
+    with pytest.raises(ValueError):
+        load_backend("/models/bge", None, None)
+
+    monkeypatch.setenv("RAG_EMBED_BACKEND", "onnx")
+    assert configured_cache_tag() == "@onnx-int8" and configured_cache_tag("float32") == "@onnx-fp32"
+    with pytest.raises(ValueError):
+        load_backend("/models/bge", "cuda", None)
+    if importlib.util.find_spec("onnxruntime") is None:
+        with pytest.raises(ImportError):
+            load_backend("/models/bge", "cpu", None)
+
+    monkeypatch.setenv("RAG_EMBED_BACKEND", "torch")
+    assert configured_cache_tag() == "@torch-bucketed"
+    assert TorchBackend.cache_tag.fget(object.__new__(TorchBackend)) == "@torch-bucketed"
+
+    monkeypatch.delenv("RAG_EMBED_BACKEND")
+    assert configured_cache_tag() == ""
+
+
+def test_default_loader_returns_plain_sentence_transformer(monkeypatch):
+    model = object()
+    monkeypatch.setattr(model_registry, "_load_sentence_transformer", lambda path, device, dtype: model)
+    monkeypatch.delenv("RAG_EMBED_BACKEND", raising=False)
+    assert model_registry._load_model("/models/bge", None, None) is model
+    monkeypatch.setenv("RAG_EMBED_BACKEND", "sentence_transformers")
+    assert model_registry._load_model("/models/bge", None, None) is model
+
+
+def test_torch_backend_matches_sentence_transformer():
+    # 需要真实模型：本地路径通过 RAG_EMBED_MODEL_PATH 指定，否则按 HuggingFace Hub ID 加载
+    pytest.importorskip("sentence_transformers")
+    model = model_registry._load_sentence_transformer(model_registry.MODEL_REGISTRY.resolve_path(
+        model_registry.DEFAULT_MODEL_NAME), "cpu", None)
+    texts = ["手机", "长江是亚洲第一长河，全长约6300公里。", "RAG pipeline " * 40, "咖啡豆的烘焙与萃取。"] * 5
+    report = parity_check(model, TorchBackend(model), texts, min_cosine=0.99)
+    assert report.passed, report.as_dict()
+
+
+def test_tokenizer_uses_given_backend(tmp_path):
+    backend = _CharBackend()
+    tokenizer = LlamaIndexSemanticTokenizer(embed_model="char-backend-model", backend=backend,
+                                            cache=EmbeddingCache(str(tmp_path)))
+    records = tokenizer.tokenize("手机很好用。手机拍照清晰。长江很长。长江流入东海。")
+
+    assert records and backend.batches
+    assert "".join(r.content for r in records).replace(" ", "") == "手机很好用。手机拍照清晰。长江很长。长江流入东海。"
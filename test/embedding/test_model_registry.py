@@ -0,0 +1,66 @@
+import threading
+
+from src.embedding.model_registry import ModelRegistry
+
+
+def test_lazy_load_and_singleton():
+    loads = []
+
+    def loader(path, device, dtype):
+        loads.append((path, device, dtype))
+        return object()
+
+    registry = ModelRegistry(loader=loader)
+    registry.configure(model_paths={"bge": "/models/bge"})
+    assert loads == []
+
+    first = registry.get("bge", device="cpu")
+    assert registry.get("bge", device="cpu") is first
+    assert loads == [("/models/bge", "cpu", None)]
+
+    # 不同设备/精度视为不同实例
+    assert registry.get("bge", device="cpu", dtype="float16") is not first
+    assert len(loads) == 2
+
+
+def test_concurrent_get_loads_once():
+    loads = []
+    barrier = threading.Barrier(8)
+
+    def loader(path, device, dtype):
+        loads.append(path)
+        return object()
+
+    registry = ModelRegistry(loader=loader)
+    results = []
+
+    def worker():
+        barrier.wait()
+        results.append(registry.get("m"))
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert loads == ["m"]
+    assert len({id(r) for r in results}) == 1
+
+
+def test_unload_and_env_config(monkeypatch):
+    monkeypatch.setenv("RAG_EMBED_MODEL", "bge")
+    monkeypatch.setenv("RAG_EMBED_MODEL_PATH", "/env/bge")
+    loads = []
+    registry = ModelRegistry(loader=lambda path, device, dtype: loads.append(path) or object())
+
+    registry.get()
+    assert loads == ["/env/bge"]
+    assert registry.is_loaded("bge")
+
+    assert registry.unload("bge") is True
+    assert registry.unload("bge") is False
+    assert registry.loaded() == []
+
+    registry.get()
+    assert loads == ["/env/bge", "/env/bge"]
@@ -0,0 +1,88 @@
+import asyncio
+import json
+
+import pytest
+
+from src.libs import metrics
+from src.libs.metrics import Histogram, export_metrics, span
+from src.libs.record_time import record_time
+
+
+@pytest.fixture(autouse=True)
+def _metrics_config():
+    saved = (metrics.config.enabled, metrics.config.log_calls, metrics.config.sample_every)
+    metrics.configure(enabled=True, log_calls=False, sample_rate=1.0)
+    metrics.registry.reset()
+    yield
+    metrics.configure(enabled=saved[0], log_calls=saved[1], sample_rate=1 / saved[2])
+
+
+def test_histogram_percentiles():
+    hist = Histogram()
+    for ms in range(1, 101):
+        hist.observe(ms / 1000, ok=ms != 100)
+    stats = hist.as_dict()
+    assert stats["count"] == 100 and stats["errors"] == 1
+    assert stats["min_ms"] == 1 and stats["max_ms"] == 100
+    # 桶宽为 2 倍，分位数误差在一个桶以内
+    assert 25 <= stats["p50_ms"] <= 100 and 50 <= stats["p99_ms"] <= 100
+    assert abs(stats["mean_ms"] - 50.5) < 1e-6
+
+
+def test_record_time_histogram_sampling_and_disable():
+    @record_time
+    def work(x):
+        return x * 2
+
+    @record_time
+    async def async_work():
+        return 1
+
+    name = "test_metrics.py:test_record_time_histogram_sampling_and_disable.<locals>.work"
+    assert [work(i) for i in range(10)][-1] == 18
+    assert asyncio.run(async_work()) == 1
+    snapshot = metrics.registry.snapshot()["functions"]
+    assert snapshot[name]["count"] == 10
+    assert any(k.endswith("async_work") for k in snapshot)
+
+    metrics.configure(sample_rate=0.25)
+    for i in range(40):
+        work(i)
+    assert metrics.registry.snapshot()["functions"][name]["count"] == 20
+
+    metrics.configure(enabled=False)
+    work(1)
+    assert metrics.registry.histogram("function", name).count == 20
+    with span("ignored"):
+        pass
+    assert "ignored" not in metrics.registry.snapshot()["spans"]
+
+
+def test_nested_spans_and_export(tmp_path):
+    with span("retrieve"):
+        with span("dense"):
+            pass
+        with pytest.raises(ValueError):
+            with span("lexical"):
+                raise ValueError("boom")
+    spans = metrics.registry.snapshot()["spans"]
+    assert set(spans) == {"retrieve", "retrieve/dense", "retrieve/lexical"}
+    assert spans["retrieve/lexical"]["errors"] == 1
+
+    export_metrics(str(tmp_path / "m.json"))
+    assert json.loads((tmp_path / "m.json").read_text())["spans"]["retrieve"]["count"] == 1
+    export_metrics(str(tmp_path / "m.prom"), fmt="prometheus")
+    text = (tmp_path / "m.prom").read_text()
+    assert "# TYPE rag_span_duration_seconds histogram" in text
+    assert 'rag_span_duration_seconds_count{span="retrieve/dense"} 1' in text
+    assert 'rag_span_duration_seconds_bucket{span="retrieve",le="+Inf"} 1' in text
+    assert 'rag_span_errors_total{span="retrieve/lexical"} 1' in text
+
+
+def test_default_config_does_not_log_each_call(monkeypatch):
+    for name in ("RAG_METRICS", "RAG_TIME_LOG", "RAG_METRICS_SAMPLE_RATE"):
+        monkeypatch.delenv(name, raising=False)
+    default = metrics.InstrumentationConfig()
+    assert default.enabled and not default.log_calls and default.sample_every == 1
+    monkeypatch.setenv("RAG_TIME_LOG", "1")
+    assert metrics.InstrumentationConfig().log_calls
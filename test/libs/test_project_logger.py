@@ -0,0 +1,92 @@
+import json
+import logging
+import multiprocessing
+import os
+import subprocess
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+from src.libs import project_logger
+from src.libs.project_logger import (JsonFormatter, SizeTimeRotatingFileHandler, configure_worker, get_log_queue,
+                                     logger, setup_logger, shutdown_logging)
+
+
+def _record(msg, *args):
+    return logging.LogRecord("project_logger", logging.INFO, __file__, 1, msg, args, None)
+
+
+def _log_from_worker(i):
+    logger.info("[TEST] worker %d", i)
+    return i
+
+
+@pytest.fixture
+def log_file(tmp_path):
+    path = tmp_path / "rag.log"
+    setup_logger(log_file=path, mode="queue", console=False)
+    yield path
+    setup_logger()
+
+
+def test_size_and_time_rotation(tmp_path, monkeypatch):
+    path = tmp_path / "a.log"
+    handler = SizeTimeRotatingFileHandler(str(path), max_bytes=100, backup_count=2)
+    for i in range(10):
+        handler.emit(_record("x" * 40 + str(i)))
+    handler.close()
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["a.log", "a.log.1", "a.log.2"]
+    assert path.read_text().endswith("9\n")
+
+    clock = [1000.0]
+    monkeypatch.setattr(project_logger.time, "time", lambda: clock[0])
+    timed = SizeTimeRotatingFileHandler(str(tmp_path / "b.log"), rotate_interval_s=60, backup_count=1)
+    timed.emit(_record("first"))
+    clock[0] += 61
+    timed.emit(_record("second"))
+    timed.close()
+    assert (tmp_path / "b.log").read_text() == "second\n"
+    assert (tmp_path / "b.log.1").read_text() == "first\n"
+
+
+def test_json_formatter():
+    line = JsonFormatter().format(_record("[RETRY] attempt=%d", 2))
+    data = json.loads(line)
+    assert data["tag"] == "RETRY" and data["msg"] == "attempt=2" and data["level"] == "INFO"
+
+
+def test_queue_mode_writes_from_threads_and_processes(log_file):
+    args = {"n": 1}
+    logger.info("[TEST] main %s", args)
+    args["n"] = 2                           # 入队时已合并参数，之后修改不影响日志内容
+
+    spawn = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(2, mp_context=spawn, initializer=configure_worker,
+                             initargs=(get_log_queue(),)) as pool:
+        assert list(pool.map(_log_from_worker, range(3))) == [0, 1, 2]
+    fork = multiprocessing.get_context("fork")
+    with ProcessPoolExecutor(1, mp_context=fork) as pool:
+        assert list(pool.map(_log_from_worker, range(3, 5))) == [3, 4]
+
+    shutdown_logging()
+    text = log_file.read_text()
+    assert "[TEST] main {'n': 1}" in text
+    assert all(f"[TEST] worker {i}" in text for i in range(5))
+
+
+def test_default_log_dir_is_inside_repo():
+    root = project_logger._PROJECT_ROOT
+    assert (root / "src" / "libs" / "project_logger.py").is_file()
+
+
+def test_import_without_register_at_fork(tmp_path):
+    # 模拟 Windows：os 没有 register_at_fork 时模块仍可导入、可写日志
+    code = ("import os; del os.register_at_fork; "
+            "from src.libs.project_logger import logger, shutdown_logging; "
+            "logger.info('[TEST] spawn platform'); shutdown_logging()")
+    env = dict(os.environ, RAG_LOG_DIR=str(tmp_path), RAG_LOG_CONSOLE="0")
+    result = subprocess.run([sys.executable, "-c", code], cwd=project_logger._PROJECT_ROOT, env=env,
+                            capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    assert "[TEST] spawn platform" in (tmp_path / "rag.log").read_text()
@@ -1,7 +1,12 @@
+import asyncio
 import logging
+import time
+import types
+
 import pytest
 
-from src.libs.retry_tool import retry
+from src.libs import retry_tool
+from src.libs.retry_tool import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError, backoff_delay, retry
 from src.libs.project_logger import logger
 
 
@@ -96,3 +101,186 @@ async def test_retry_success_async():
         assert any("attempt=2/3" in m for m in warn_msgs)
     finally:
         _detach_list_handler(handler, prev_level)
+
+
+def test_backoff_delay_full_jitter():
+    assert backoff_delay(1, 0.1, 10, jitter=False) == pytest.approx(0.1)
+    assert backoff_delay(4, 0.1, 10, jitter=False) == pytest.approx(0.8)
+    assert backoff_delay(20, 0.1, 10, jitter=False) == 10
+    delays = [backoff_delay(3, 0.1, 10) for _ in range(200)]
+    assert all(0 <= d <= 0.4 for d in delays) and max(delays) > 0.2
+
+
+def test_retry_sleeps_and_filters_sync(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(retry_tool.time, "sleep", sleeps.append)
+    attempts = {"n": 0}
+
+    @retry(retry_time=4, base_delay=0.5, jitter=False, retry_on=ConnectionError)
+    def flaky():
+        attempts["n"] += 1
+        if attempts["n"] < 4:
+            raise ConnectionError("down")
+        return "ok"
+
+    assert flaky() == "ok"
+    assert sleeps == [0.5, 1.0, 2.0]
+
+    @retry(retry_time=4, base_delay=0, retry_on=ConnectionError)
+    def bad_input():
+        attempts["n"] += 1
+        raise ValueError("bad")
+
+    attempts["n"] = 0
+    with pytest.raises(ValueError):
+        bad_input()
+    assert attempts["n"] == 1
+
+    @retry(retry_time=3, base_delay=0, retry_if=lambda e: "429" in str(e))
+    def throttled():
+        attempts["n"] += 1
+        raise RuntimeError("500")
+
+    attempts["n"] = 0
+    with pytest.raises(RuntimeError):
+        throttled()
+    assert attempts["n"] == 1
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_retry_deadline_sync(monkeypatch):
+    clock = _Clock()
+    sleeps = []
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        clock.now += seconds
+
+    monkeypatch.setattr(retry_tool, "time", types.SimpleNamespace(monotonic=clock, sleep=sleep))
+    attempts = {"n": 0}
+
+    @retry(retry_time=100, base_delay=0.05, jitter=False, multiplier=1, deadline_s=0.12)
+    def always_fail():
+        attempts["n"] += 1
+        raise ConnectionError("down")
+
+    with pytest.raises(ConnectionError):
+        always_fail()
+    # 0s、0.05s、0.10s 各一次；再等 0.05s 会超过 0.12s 的期限，不再重试
+    assert attempts["n"] == 3
+    assert sleeps == [0.05, 0.05] and clock.now < 0.12
+
+
+@pytest.mark.asyncio
+async def test_retry_deadline_cancels_async_attempt():
+    attempts = {"n": 0}
+
+    @retry(retry_time=5, base_delay=0.01, deadline_s=0.1)
+    async def hang():
+        attempts["n"] += 1
+        await asyncio.sleep(10)
+
+    start = time.monotonic()
+    with pytest.raises(asyncio.TimeoutError):
+        await hang()
+    assert time.monotonic() - start < 1
+    assert attempts["n"] == 1
+
+
+def test_circuit_breaker_sync():
+    clock = _Clock()
+    breaker = CircuitBreaker("db", failure_threshold=0.5, min_calls=4, window=10, reset_timeout_s=30, clock=clock)
+    calls = {"n": 0, "fail": True}
+
+    @retry(retry_time=2, base_delay=0, circuit_breaker=breaker)
+    def query():
+        calls["n"] += 1
+        if calls["fail"]:
+            raise ConnectionError("down")
+        return "ok"
+
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            query()
+    assert breaker.state == OPEN and calls["n"] == 4
+    with pytest.raises(CircuitOpenError):
+        query()
+    assert calls["n"] == 4                  # 熔断期间不再调用下游
+
+    clock.now = 31
+    assert breaker.state == HALF_OPEN
+    calls["fail"] = False
+    assert query() == "ok"
+    assert breaker.state == CLOSED
+
+
+@pytest.mark.asyncio
+async def test_circuit_breaker_async_decorator():
+    clock = _Clock()
+    breaker = CircuitBreaker("embed", failure_threshold=1.0, min_calls=2, reset_timeout_s=5, clock=clock)
+
+    @breaker
+    async def embed(ok):
+        if not ok:
+            raise ConnectionError("down")
+        return "vec"
+
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            await embed(False)
+    with pytest.raises(CircuitOpenError):
+        await embed(True)
+    clock.now = 5
+    with pytest.raises(ConnectionError):
+        await embed(False)                  # 半开状态下试探失败，重新熔断
+    assert breaker.state == OPEN
+    clock.now = 10
+    assert await embed(True) == "vec"
+    assert breaker.state == CLOSED
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("wrap", ["retry", "decorator"])
+async def test_cancelled_half_open_trial_releases_slot(wrap):
+    clock = _Clock()
+    breaker = CircuitBreaker("db", failure_threshold=0.5, min_calls=1, reset_timeout_s=5, clock=clock)
+    breaker.record_failure()
+    clock.now = 5
+    assert breaker.state == HALF_OPEN
+
+    async def call(release):
+        await release.wait()
+        return "ok"
+
+    wrapped = retry(retry_time=2, base_delay=0, circuit_breaker=breaker)(call) if wrap == "retry" else breaker(call)
+    task = asyncio.ensure_future(wrapped(asyncio.Event()))
+    await asyncio.sleep(0)                  # 试探调用已占用半开名额
+    with pytest.raises(CircuitOpenError):
+        await wrapped(asyncio.Event())
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    clock.now = 1000
+    assert breaker.state == HALF_OPEN
+    release = asyncio.Event()
+    release.set()
+    assert await wrapped(release) == "ok"
+    assert breaker.state == CLOSED
+
+    # 外层 wait_for 超时同样释放名额
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    clock.now = 2000
+    with pytest.raises(asyncio.TimeoutError):
+        await asyncio.wait_for(wrapped(asyncio.Event()), 0.01)
+    release = asyncio.Event()
+    release.set()
+    assert await wrapped(release) == "ok"
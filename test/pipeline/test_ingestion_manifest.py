@@ -0,0 +1,60 @@
+import os
+import uuid
+
+from src.pipeline.ingestion_manifest import MODIFIED, NEW, UNCHANGED, IngestionManifest, file_sha256
+from src.tokenizer.record import IdentificationVersionMeta, Record, RecordMetaData
+
+
+def _records(doc_id, texts):
+    return [Record(id=str(uuid.uuid4()), content=t, metadata=RecordMetaData(
+        identification=IdentificationVersionMeta(doc_id=doc_id, chunk_id=str(i)))) for i, t in enumerate(texts)]
+
+
+def test_update_reuses_ids_and_tombstones_removed_chunks(tmp_path):
+    path = tmp_path / "a.txt"
+    path.write_text("v1", encoding="utf-8")
+    manifest = IngestionManifest(str(tmp_path / "manifest.json"))
+    assert manifest.check("a", str(path)) == NEW
+
+    first = _records("a", ["甲", "乙", "丙"])
+    assert manifest.update_document("a", str(path), file_sha256(str(path)), first) == []
+    assert manifest.check("a", str(path)) == UNCHANGED
+    assert first[0].metadata.identification.version == "1"
+    assert first[0].metadata.identification.hash == file_sha256(str(path))
+    assert first[0].metadata.processing.text_hash
+
+    path.write_text("v2 changed", encoding="utf-8")
+    assert manifest.check("a", str(path)) == MODIFIED
+    assert not manifest.is_content_unchanged("a", file_sha256(str(path)))
+
+    second = _records("a", ["甲", "丁", "丙"])
+    tombstones = manifest.update_document("a", str(path), file_sha256(str(path)), second)
+    assert [t.record_id for t in tombstones] == [first[1].id]
+    assert tombstones[0].reason == "modified"
+    assert second[0].id == first[0].id and second[2].id == first[2].id
+    assert second[1].id != first[1].id
+    assert second[0].metadata.identification.version == "2"
+    assert second[0].metadata.identification.id == second[0].id
+
+
+def test_touch_without_content_change_and_persistence(tmp_path):
+    path = tmp_path / "a.txt"
+    path.write_text("same", encoding="utf-8")
+    manifest_path = str(tmp_path / "manifest.json")
+    manifest = IngestionManifest(manifest_path)
+    manifest.update_document("a", str(path), file_sha256(str(path)), _records("a", ["x"]))
+
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert manifest.check("a", str(path)) == MODIFIED
+    assert manifest.is_content_unchanged("a", file_sha256(str(path)), str(path))
+    assert manifest.check("a", str(path)) == UNCHANGED
+
+    manifest.save()
+    reloaded = IngestionManifest(manifest_path)
+    assert reloaded.check("a", str(path)) == UNCHANGED
+    assert reloaded.get("a").chunks == manifest.get("a").chunks
+
+    tombstones = reloaded.remove_missing([])
+    assert [t.reason for t in tombstones] == ["deleted"]
+    assert len(reloaded) == 0
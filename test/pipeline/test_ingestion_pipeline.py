@@ -0,0 +1,159 @@
+import os
+import uuid
+
+import numpy as np
+import pytest
+
+from src.pipeline.ingestion_pipeline import IngestionPipeline, discover_files, ingest_directory
+from src.tokenizer.record import IdentificationVersionMeta, Record, RecordMetaData
+
+
+def _split_on_period(text):
+    return [s + "。" for s in text.split("。") if s.strip()]
+
+
+class _SentencePerChunkTokenizer:
+    """每个句子一个片段的替身切分器"""
+
+    def iter_tokenize_sentences(self, docs, batch_size=256):
+        for doc_id, sentences in docs:
+            for i, sentence in enumerate(sentences):
+                yield Record(id=f"{doc_id}#{i}", content=sentence, metadata=RecordMetaData(
+                    identification=IdentificationVersionMeta(doc_id=doc_id, chunk_id=str(i))))
+
+
+def _embed(texts):
+    return np.array([[len(t), 1.0] for t in texts], dtype=np.float32)
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    for i in range(12):
+        sub = tmp_path / f"d{i % 3}"
+        sub.mkdir(exist_ok=True)
+        (sub / f"f{i}.txt").write_text("第一句。第二句话。" * (i + 1), encoding="utf-8")
+    (tmp_path / "ignored.bin").write_bytes(b"\x00")
+    return tmp_path
+
+
+def test_ingest_directory_end_to_end(corpus):
+    received = []
+
+    def sink(records, embeddings):
+        assert len(records) == len(embeddings)
+        received.extend(zip(records, embeddings))
+
+    report = ingest_directory(str(corpus), sink, patterns=("*.txt",),
+                              tokenizer=_SentencePerChunkTokenizer(), embed_fn=_embed,
+                              sentence_splitter=_split_on_period,
+                              workers=2, queue_size=2, batch_size=5)
+
+    assert len(received) == sum(2 * (i + 1) for i in range(12))
+    assert report["stages"]["split"]["items"] == 12
+    assert report["stages"]["embed"]["items"] == len(received)
+    assert report["stages"]["split"]["queue_max"] <= 2
+
+    record, vector = received[0]
+    assert record.metadata.source_location.path.endswith(".txt")
+    assert record.metadata.document_info.size_bytes > 0
+    assert vector[0] == len(record.content)
+
+
+def test_sink_error_propagates(corpus):
+    def sink(records, embeddings):
+        raise RuntimeError("sink down")
+
+    pipeline = IngestionPipeline(sink, tokenizer=_SentencePerChunkTokenizer(), embed_fn=_embed,
+                                 sentence_splitter=_split_on_period, workers=1, queue_size=1, batch_size=1)
+    with pytest.raises(RuntimeError, match="sink down"):
+        pipeline.run(discover_files(str(corpus), ("*.txt",)), root=str(corpus))
+
+
+class _UuidTokenizer(_SentencePerChunkTokenizer):
+    """id 为随机 uuid 的替身切分器，用于验证增量模式沿用旧 id"""
+
+    def iter_tokenize_sentences(self, docs, batch_size=256):
+        for record in super().iter_tokenize_sentences(docs, batch_size):
+            yield Record(id=str(uuid.uuid4()), content=record.content, metadata=record.metadata)
+
+
+def test_incremental_ingest(tmp_path):
+    from src.pipeline.ingestion_manifest import IngestionManifest
+
+    root = tmp_path / "corpus"
+    root.mkdir()
+    for name in ("a", "b", "c"):
+        (root / f"{name}.txt").write_text(f"{name}一。{name}二。", encoding="utf-8")
+    manifest_path = str(tmp_path / "manifest.json")
+
+    def run():
+        received, deleted = [], []
+        report = ingest_directory(str(root), lambda records, embeddings: received.extend(records),
+                                  patterns=("*.txt",), tokenizer=_UuidTokenizer(), embed_fn=_embed,
+                                  sentence_splitter=_split_on_period, workers=1, batch_size=2,
+                                  manifest=IngestionManifest(manifest_path), on_tombstones=deleted.extend)
+        return received, deleted, report
+
+    first, deleted, _ = run()
+    assert len(first) == 6 and deleted == []
+    ids = {r.content: r.id for r in first}
+
+    received, deleted, report = run()
+    assert received == [] and deleted == []
+    assert report["stages"]["skip"]["items"] == 3
+
+    (root / "a.txt").write_text("a一。a三。", encoding="utf-8")
+    stat = os.stat(root / "a.txt")
+    os.utime(root / "a.txt", ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))  # 避免 mtime 精度不足
+    (root / "b.txt").unlink()
+    received, deleted, report = run()
+    assert sorted(r.content for r in received) == ["a一。", "a三。"]
+    assert {r.content: r.id for r in received}["a一。"] == ids["a一。"]
+    assert {(t.record_id, t.reason) for t in deleted} == {
+        (ids["a二。"], "modified"), (ids["b一。"], "deleted"), (ids["b二。"], "deleted")}
+    assert received[0].metadata.identification.version == "2"
+    assert report["stages"]["skip"]["items"] == 1
+
+
+class _LinkedUuidTokenizer(_SentencePerChunkTokenizer):
+    """与真实切分器一样按文档 link_chunks，id 为随机 uuid"""
+
+    def iter_tokenize_sentences(self, docs, batch_size=256):
+        from src.tokenizer.base_tokenizer import link_chunks
+
+        for doc_id, sentences in docs:
+            records = [Record(id=str(uuid.uuid4()), content=s, metadata=RecordMetaData(
+                identification=IdentificationVersionMeta(doc_id=doc_id, chunk_id=str(i))))
+                for i, s in enumerate(sentences)]
+            yield from link_chunks(records, parent_id=doc_id)
+
+
+def test_incremental_ingest_keeps_adjacency(tmp_path):
+    from src.pipeline.ingestion_manifest import IngestionManifest
+    from src.retrieval.context_assembler import ChunkGraph
+
+    path = tmp_path / "corpus" / "a.txt"
+    path.parent.mkdir()
+    path.write_text("甲。乙。丙。", encoding="utf-8")
+    manifest_path = str(tmp_path / "manifest.json")
+
+    def run():
+        received = []
+        ingest_directory(str(path.parent), lambda records, embeddings: received.extend(records),
+                         patterns=("*.txt",), tokenizer=_LinkedUuidTokenizer(), embed_fn=_embed,
+                         sentence_splitter=_split_on_period, workers=1,
+                         manifest=IngestionManifest(manifest_path), on_tombstones=lambda tombstones: None)
+        return received
+
+    first = {r.content: r.id for r in run()}
+    path.write_text("甲。丁。丙。", encoding="utf-8")
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    second = run()
+
+    a, x, c = second
+    assert (a.id, c.id) == (first["甲。"], first["丙。"])
+    assert (x.metadata.relations.prev_id, x.metadata.relations.next_id) == (a.id, c.id)
+    assert a.metadata.relations.next_id == x.id and c.metadata.relations.prev_id == x.id
+    graph = ChunkGraph(second)
+    assert graph.chain_end[graph.pos_of[a.id]] - graph.chain_start[graph.pos_of[a.id]] == 3
@@ -0,0 +1,116 @@
+import math
+
+import numpy as np
+import pytest
+
+from src.retrieval.bm25_index import BM25Index
+from src.retrieval.fusion import reciprocal_rank_fusion
+from src.retrieval.hybrid_retriever import HybridRetriever
+from src.retrieval.text_analyzer import make_analyzer
+from src.tokenizer.record import BusinessRetrievalMeta, QualityComplianceMeta, Record, RecordMetaData
+from src.vector_store.base_vector_store import SearchHit
+from src.vector_store.local_vector_store import LocalVectorStore
+
+DOCS = {
+    "phone": "智能手机型号 AB-1234 支持快速充电。",
+    "phone2": "这款手机的电池续航很长，手机拍照清晰。",
+    "river": "长江是亚洲第一长河，全长约6300公里。",
+    "coffee": "咖啡是世界上消费最广泛的饮品之一。",
+}
+
+
+@pytest.fixture
+def index():
+    idx = BM25Index(analyzer=make_analyzer(use_jieba=False))
+    idx.add(list(DOCS), list(DOCS.values()))
+    return idx
+
+
+def _reference_bm25(query, docs, analyzer, k1=1.2, b=0.75):
+    tokenized = {k: analyzer(v) for k, v in docs.items()}
+    avgdl = sum(len(t) for t in tokenized.values()) / len(tokenized)
+    scores = {}
+    for doc_id, tokens in tokenized.items():
+        score = 0.0
+        for term in set(analyzer(query)):
+            df = sum(term in t for t in tokenized.values())
+            tf = tokens.count(term)
+            if tf:
+                idf = math.log(1 + (len(docs) - df + 0.5) / (df + 0.5))
+                score += idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * len(tokens) / avgdl))
+        if score:
+            scores[doc_id] = score
+    return sorted(scores.items(), key=lambda kv: -kv[1])
+
+
+def test_scores_match_reference(index):
+    for query in ["手机电池", "长江", "AB-1234", "咖啡饮品 手机"]:
+        hits = index.search(query, top_k=10)
+        expected = _reference_bm25(query, DOCS, index.analyzer)
+        assert [h.id for h in hits] == [k for k, _ in expected]
+        assert np.allclose([h.score for h in hits], [v for _, v in expected], rtol=1e-5)
+
+
+def test_exact_product_code(index):
+    assert index.search("ab-1234")[0].id == "phone"
+    assert index.search("型号AB-1234")[0].id == "phone"
+    assert index.search("不存在的词 zz-9") == []
+
+
+def test_overwrite_delete_and_keywords(index):
+    index.add(["river"], ["黄河是中国第二长河。"])
+    assert index.search("长江") == []
+    assert index.search("黄河")[0].id == "river"
+
+    assert index.delete(["phone2", "missing"]) == 1
+    assert [h.id for h in index.search("手机")] == ["phone"]
+    assert len(index) == 3
+
+    index.add_records([Record(id="faq", content="常见问题汇总", metadata=RecordMetaData(
+        business=BusinessRetrievalMeta(keywords=["退款"])))])
+    assert index.search("退款")[0].id == "faq"
+    index.commit()
+    assert [h.id for h in index.search("手机")] == ["phone"]
+
+
+def test_reciprocal_rank_fusion():
+    dense = [SearchHit("a", 0.9), SearchHit("b", 0.8), SearchHit("c", 0.7)]
+    lexical = [SearchHit("c", 12.0), SearchHit("d", 3.0)]
+    fused = reciprocal_rank_fusion([dense, lexical], k=60)
+    assert [h.id for h in fused] == ["c", "a", "b", "d"]
+    assert fused[0].score == pytest.approx(1 / 63 + 1 / 61)
+    assert len(reciprocal_rank_fusion([dense, lexical], top_k=2)) == 2
+    with pytest.raises(ValueError):
+        reciprocal_rank_fusion([dense], weights=[1.0, 2.0])
+
+
+def test_hybrid_retriever_finds_code_missed_by_dense(index):
+    store = LocalVectorStore(dim=2)
+    store.add(["river", "coffee", "phone2", "phone"], np.array([[1, 0], [0.9, 0.1], [0.5, 0.5], [0, 1]]))
+    retriever = HybridRetriever(store, index, embed_fn=lambda texts: np.array([[1.0, 0.0]]), candidate_k=2)
+    hits = retriever.search("AB-1234", top_k=3)
+    assert "phone" in [h.id for h in hits]
+
+
+def test_allowed_mask_is_applied_before_top_k(index):
+    allowed = np.array([row_id == "phone2" for row_id in index.row_ids])
+    assert [h.id for h in index.search("手机 AB-1234", top_k=1, allowed=allowed)] == ["phone2"]
+    assert index.search("手机", top_k=3, allowed=np.zeros(2, dtype=bool)) == []
+
+
+def test_hybrid_filter_prefilters_lexical_leg():
+    lexical = BM25Index(analyzer=make_analyzer(use_jieba=False))
+    ids = [f"d{i}" for i in range(20)]
+    # 前 18 篇词项重复更多、BM25 得分更高，但都是 private
+    lexical.add(ids, ["AB-1234 " * (3 if i < 18 else 1) + "产品" for i in range(20)])
+    store = LocalVectorStore(dim=2)
+    store.add(ids, np.tile([[0.0, 1.0]], (20, 1)), metadata=[
+        RecordMetaData(quality=QualityComplianceMeta(visibility="private" if i < 18 else "public"))
+        for i in range(20)])
+
+    retriever = HybridRetriever(store, lexical, embed_fn=lambda texts: np.array([[1.0, 0.0]]), candidate_k=5,
+                                weights=(0.0, 1.0))
+    hits = retriever.search("AB-1234", top_k=5, filter="visibility = public")
+    # 向量一路权重为 0：得分全部来自词法一路，词法一路在过滤后仍召回两篇 public 文档
+    assert sorted(h.id for h in hits) == ["d18", "d19"]
+    assert sorted(h.score for h in hits) == pytest.approx([1 / 62, 1 / 61])
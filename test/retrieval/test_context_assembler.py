@@ -0,0 +1,127 @@
+import random
+
+import pytest
+
+from src.retrieval.context_assembler import ChunkGraph, ContextAssembler, estimate_tokens, format_context
+from src.tokenizer.base_tokenizer import link_chunks
+from src.tokenizer.record import Record, RecordMetaData, RelationStructureMeta
+from src.vector_store.base_vector_store import SearchHit
+
+
+def _doc(doc_id, n, tokens=10):
+    return list(link_chunks([Record(id=f"{doc_id}-{i}", content="字" * tokens, metadata=RecordMetaData())
+                             for i in range(n)], parent_id=doc_id))
+
+
+def _corpus(shuffle=False):
+    records = _doc("a", 6) + _doc("b", 3) + _doc("c", 1)
+    if shuffle:
+        random.Random(0).shuffle(records)
+    return records
+
+
+def test_link_chunks():
+    records = _doc("d", 3)
+    relations = [r.metadata.relations for r in records]
+    assert [(x.prev_id, x.next_id, x.parent_id) for x in relations] == [
+        (None, "d-1", "d"), ("d-0", "d-2", "d"), ("d-1", None, "d")]
+
+
+@pytest.mark.parametrize("shuffle", [False, True])
+def test_graph_layout_follows_links(shuffle):
+    graph = ChunkGraph(_corpus(shuffle))
+    a0 = graph.pos_of["a-0"]
+    assert graph.ids[a0:a0 + 6] == [f"a-{i}" for i in range(6)]
+    assert graph.chain_start[graph.pos_of["a-3"]] == a0 and graph.chain_end[graph.pos_of["a-3"]] == a0 + 6
+    assert graph.window_tokens(a0, a0 + 6) == 60
+    assert (graph.parent_pos == -1).all()
+
+
+def test_neighbor_expansion_merges_and_dedupes():
+    assembler = ContextAssembler(ChunkGraph(_corpus(shuffle=True)), window=1, token_budget=1000)
+    hits = [SearchHit("a-1", 0.9), SearchHit("a-2", 0.8), SearchHit("b-0", 0.7), SearchHit("a-5", 0.6),
+            SearchHit("missing", 0.5), SearchHit("a-2", 0.4)]
+    blocks = assembler.assemble(hits)
+
+    # a-1/a-2 的窗口 [a-0, a-3] 与 a-5 的窗口 [a-4, a-5] 首尾相接，合并为整篇 a
+    assert [b.record_ids for b in blocks] == [[f"a-{i}" for i in range(6)], ["b-0", "b-1"]]
+    assert blocks[0].hit_ids == ["a-1", "a-2", "a-5"] and blocks[0].score == 0.9
+    assert blocks[0].tokens == 60 and blocks[0].parent_id == "a"
+    assert blocks[1].text == "字" * 10 + "\n" + "字" * 10
+
+
+def test_windows_do_not_cross_documents():
+    assembler = ContextAssembler(ChunkGraph(_corpus()), window=2, token_budget=1000, order="document")
+    blocks = assembler.assemble([SearchHit("b-0", 1.0), SearchHit("a-5", 0.5), SearchHit("c-0", 0.2)])
+    assert [b.record_ids for b in blocks] == [["a-3", "a-4", "a-5"], ["b-0", "b-1", "b-2"], ["c-0"]]
+
+
+def test_token_budget_shrinks_around_best_hit():
+    assembler = ContextAssembler(ChunkGraph(_corpus()), window=2, token_budget=45)
+    blocks = assembler.assemble([SearchHit("a-3", 0.9), SearchHit("b-1", 0.5)])
+
+    assert [b.record_ids for b in blocks] == [["a-2", "a-3", "a-4", "a-5"]]
+    assert sum(b.tokens for b in blocks) <= 45
+    assert assembler.assemble([SearchHit("a-3", 0.9)], token_budget=5) == []
+
+
+def test_parent_mode():
+    parent = Record(id="sec", content="章节全文", metadata=RecordMetaData())
+    children = list(link_chunks([Record(id=f"p{i}", content="小片段", metadata=RecordMetaData())
+                                 for i in range(3)], parent_id="sec"))
+    graph = ChunkGraph([parent] + children + _doc("a", 4))
+    assembler = ContextAssembler(graph, mode="parent", token_budget=1000)
+
+    blocks = assembler.assemble([SearchHit("p0", 0.9), SearchHit("p2", 0.8), SearchHit("a-1", 0.5)])
+    # 父节点是片段时取父片段；父节点是文档ID时取整条文档链
+    assert [b.record_ids for b in blocks] == [["sec"], [f"a-{i}" for i in range(4)]]
+    assert blocks[0].hit_ids == ["p0", "p2"]
+
+
+def test_batched_fetch():
+    records = _corpus()
+    contents = {r.id: f"<{r.id}>" for r in records}
+    calls = []
+
+    def fetch(ids):
+        calls.append(list(ids))
+        return [contents[i] for i in ids]
+
+    assembler = ContextAssembler(ChunkGraph(records, keep_content=False), window=1, fetch=fetch)
+    results = assembler.assemble_batch([[SearchHit("a-0", 1.0)], [SearchHit("a-1", 1.0), SearchHit("c-0", 0.1)]])
+
+    assert len(calls) == 1 and sorted(calls[0]) == ["a-0", "a-1", "a-2", "c-0"]
+    assert format_context(results[0]) == "<a-0>\n<a-1>"
+    assert [b.text for b in results[1]] == ["<a-0>\n<a-1>\n<a-2>", "<c-0>"]
+    with pytest.raises(ValueError):
+        ContextAssembler(ChunkGraph(records, keep_content=False))
+
+
+def test_batch_merge_keeps_queries_apart():
+    assembler = ContextAssembler(ChunkGraph(_corpus(shuffle=True)), window=1, token_budget=1000)
+    rng = random.Random(1)
+    ids = [r.id for r in _corpus()]
+    queries = [[SearchHit("a-1", 0.9)], [SearchHit("a-2", 0.8)], []] + [
+        [SearchHit(rng.choice(ids), rng.random()) for _ in range(rng.randint(1, 6))] for _ in range(20)]
+
+    results = assembler.assemble_batch(queries)
+    # 不同查询的重叠窗口不合并，整批结果与逐个查询一致
+    assert [b.record_ids for b in results[0]] == [["a-0", "a-1", "a-2"]]
+    assert [b.record_ids for b in results[1]] == [["a-1", "a-2", "a-3"]]
+    assert results[2] == []
+    assert results == [assembler.assemble(hits) for hits in queries]
+
+
+def test_broken_links_split_chains():
+    records = _doc("a", 4)
+    records[2].metadata.relations = RelationStructureMeta(prev_id="dropped", next_id="a-3", parent_id="a")
+    graph = ChunkGraph(records)
+    blocks = ContextAssembler(graph, window=3).assemble([SearchHit("a-0", 1.0)])
+    assert blocks[0].record_ids == ["a-0", "a-1"]
+
+
+def test_estimate_tokens():
+    assert estimate_tokens("长江流域。") == 5
+    assert estimate_tokens("RAG pipeline 2024") == 5
+    assert estimate_tokens("长江 RAG") == 2 + 1
+    assert estimate_tokens("") == 0
@@ -0,0 +1,106 @@
+import numpy as np
+
+from src.retrieval.bm25_index import BM25Index
+from src.retrieval.hybrid_retriever import HybridRetriever
+from src.retrieval.retrieval_cache import CachedRetriever, RetrievalCache, filter_key, normalize_query
+from src.retrieval.text_analyzer import make_analyzer
+from src.vector_store.base_vector_store import SearchHit
+from src.vector_store.local_vector_store import LocalVectorStore
+
+
+class _Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _hits(*ids):
+    return [SearchHit(id=i, score=1.0) for i in ids]
+
+
+def test_normalization_and_filter_key():
+    assert normalize_query("  怎么  退款？ ") == normalize_query("怎么 退款") == "怎么 退款"
+    assert normalize_query("ＡＢ-1234") == "ab-1234"
+    assert filter_key("domain=finance AND visibility != private") \
+        == filter_key("domain = finance and visibility != 'private'")
+    assert filter_key(None) == ""
+
+
+def test_lru_ttl_and_version():
+    clock = _Clock()
+    cache = RetrievalCache(max_entries=2, ttl_s=10, clock=clock)
+    cache.put("a", 5, _hits("1"), version=1)
+    cache.put("b", 5, _hits("2"), version=1)
+    assert cache.get("a", 5, version=1)[0].id == "1"
+    cache.put("c", 5, _hits("3"), version=1)             # 淘汰最久未使用的 b
+    assert cache.get("b", 5, version=1) is None
+    assert cache.get("a", 5, version=1) is not None
+    assert cache.get("a", 3, version=1) is None           # top_k 不同不命中
+    assert cache.get("a", 5, filter="domain = x", version=1) is None
+
+    clock.now = 11
+    assert cache.get("a", 5, version=1) is None
+    assert cache.stats.expirations == 1 and cache.stats.evictions == 1
+
+    cache.put("a", 5, _hits("1"), version=1)
+    assert cache.get("a", 5, version=2) is None and len(cache) == 0
+    assert cache.stats.invalidations == 2
+
+    small = RetrievalCache(max_bytes=600)
+    for q in ("q1", "q2", "q3"):
+        small.put(q, 5, _hits("x", "y"))
+    assert 0 < len(small) < 3 and small.nbytes <= 600
+
+
+def test_semantic_hits():
+    cache = RetrievalCache(semantic_threshold=0.95)
+    cache.put("退款流程", 5, _hits("faq-1"), query_vector=np.array([1.0, 0.0]))
+    assert cache.get_similar(np.array([1.0, 0.1]), 5)[0].id == "faq-1"
+    assert cache.get_similar(np.array([0.5, 0.5]), 5) is None
+    assert cache.get_similar(np.array([1.0, 0.1]), 5, filter="domain = hr") is None
+    cache.put("退款流程", 5, _hits("faq-2"), query_vector=np.array([0.0, 1.0]))
+    assert cache.get_similar(np.array([1.0, 0.1]), 5) is None
+    assert cache.stats.semantic_hits == 1
+
+
+def test_cached_retriever_invalidates_on_index_change():
+    calls = []
+
+    def embed(texts):
+        calls.extend(texts)
+        return np.array([[1.0, 0.0] if "手机" in t else [0.0, 1.0] for t in texts], dtype=np.float32)
+
+    store = LocalVectorStore(dim=2)
+    store.add(["phone", "river"], np.array([[1, 0], [0, 1]], dtype=np.float32))
+    lexical = BM25Index(analyzer=make_analyzer(use_jieba=False))
+    lexical.add(["phone", "river"], ["智能手机", "长江"])
+    lexical.commit()
+    cached = CachedRetriever(HybridRetriever(store, lexical, embed_fn=embed, candidate_k=5))
+
+    assert cached.search("智能手机", 1)[0].id == "phone"
+    assert cached.search("智能手机？", 1)[0].id == "phone"
+    assert calls == ["智能手机"]                           # 精确命中不再编码查询
+
+    store.add(["phone2"], np.array([[1, 0.01]], dtype=np.float32))
+    lexical.add(["phone2"], ["智能手机 智能手机"])
+    lexical.delete(["phone"])
+    lexical.commit()
+    assert cached.search("智能手机", 1)[0].id == "phone2"
+    assert cached.cache.stats.as_dict()["hits"] == 1
+
+
+def test_cached_retriever_sees_lexical_only_add():
+    store = LocalVectorStore(dim=2)
+    store.add(["a", "b"], np.array([[1, 0], [0, 1]], dtype=np.float32))
+    lexical = BM25Index(analyzer=make_analyzer(use_jieba=False))
+    lexical.add(["a"], ["banana split"])
+    lexical.commit()
+    retriever = HybridRetriever(store, lexical, embed_fn=lambda texts: np.array([[0.0, 0.0]]), candidate_k=5,
+                                weights=(0.0, 1.0))
+    cached = CachedRetriever(retriever)
+
+    assert [h.id for h in cached.search("banana", 5) if h.score > 0] == ["a"]
+    lexical.add(["b"], ["banana bread"])                  # 只写词法索引、未显式 commit
+    assert sorted(h.id for h in cached.search("banana", 5) if h.score > 0) == ["a", "b"]
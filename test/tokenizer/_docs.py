@@ -0,0 +1,8 @@
+"""tokenizer 测试共用的语料"""
+
+DOCS = [
+    "手机很好用。手机拍照清晰。手机电池耐用。长江很长。长江流入东海。长江养育了人口。",
+    "咖啡提神。咖啡很香。",
+    "",
+    "长江三峡。长江大桥。手机信号。手机支付。咖啡馆。咖啡豆。咖啡机。",
+]
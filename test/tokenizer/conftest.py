@@ -0,0 +1,26 @@
+import numpy as np
+import pytest
+
+from src.embedding.embedding_cache import EmbeddingCache
+from src.embedding.model_registry import MODEL_REGISTRY
+from src.tokenizer.llamaindex_tokenizer import LlamaIndexSemanticTokenizer
+
+
+class _KeywordEmbeddingModel:
+    """按关键词计数生成向量的替身模型，语义断点可预测"""
+    keywords = ["手机", "长江", "咖啡"]
+
+    def encode(self, texts, batch_size=32, normalize_embeddings=True, convert_to_numpy=True):
+        vectors = np.array([[t.count(k) + 0.01 for k in self.keywords] for t in texts], dtype=np.float32)
+        return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+@pytest.fixture
+def keyword_tokenizer(tmp_path):
+    MODEL_REGISTRY.register_model(_KeywordEmbeddingModel(), name="keyword-test-model")
+    try:
+        yield LlamaIndexSemanticTokenizer(embed_model="keyword-test-model",
+                                          cache=EmbeddingCache(str(tmp_path)))
+    finally:
+        MODEL_REGISTRY.unload("keyword-test-model")
+
@@ -1,11 +1,15 @@
+import pytest
+
 from src.libs.record_time import record_time
 from src.tokenizer.llamaindex_tokenizer import LlamaIndexSemanticTokenizer
+from test.tokenizer._docs import DOCS
 
 
 @record_time
 def test_semantic_splitter_node_parser():
-    embed_model = r"E:\huggingface_cache\hub\models--BAAI--bge-large-zh-v1.5\bge-large-zh-v1.5"
-    tokenizer = LlamaIndexSemanticTokenizer(embed_model=embed_model, breakpoint_percentile_threshold=95)
+    # 需要真实模型：本地路径通过 RAG_EMBED_MODEL_PATH 指定，否则按 HuggingFace Hub ID 加载
+    pytest.importorskip("sentence_transformers")
+    tokenizer = LlamaIndexSemanticTokenizer(embed_model="BAAI/bge-large-zh-v1.5", breakpoint_percentile_threshold=95)
     # 这段文本在水果和交通工具之间有非常清晰的语义断点。
     text = (
         "智能手机是现代社会不可或缺的通信工具。它集成了电话、相机、网络浏览器等多种功能。"
@@ -30,4 +34,40 @@ def test_semantic_splitter_node_parser():
     # 3. 检查分割点是否正确
     assert "智能手机" in records[0].content
     assert "长江" in records[1].content
-    print("\n--- 中文测试通过 ---")
\ No newline at end of file
+    print("\n--- 中文测试通过 ---")
+
+@pytest.mark.parametrize("batch_size,sort_by_length", [(1, False), (3, True), (256, True)])
+def test_tokenize_many_matches_tokenize(keyword_tokenizer, batch_size, sort_by_length):
+    records = keyword_tokenizer.tokenize_many(DOCS, doc_ids=["a", "b", "c", "d"],
+                                              batch_size=batch_size, pool_size=4,
+                                              sort_by_length=sort_by_length)
+
+    for doc_id, text in zip("abcd", DOCS):
+        doc_records = [r for r in records if r.metadata.identification.doc_id == doc_id]
+        expected = [r.content for r in keyword_tokenizer.tokenize(text)]
+        assert [r.content for r in doc_records] == expected
+        assert [r.metadata.identification.chunk_id for r in doc_records] == \
+            [str(i) for i in range(len(expected))]
+        assert all(r.metadata.identification.id == r.id for r in doc_records)
+
+
+def test_tokenize_many_rejects_doc_id_length_mismatch(keyword_tokenizer):
+    with pytest.raises(ValueError, match="differ in length"):
+        keyword_tokenizer.tokenize_many(DOCS, doc_ids=["a"], pool_size=1)
+    with pytest.raises(ValueError, match="differ in length"):
+        keyword_tokenizer.tokenize_many(DOCS[:1], doc_ids=["a", "b"], pool_size=1)
+
+
+def test_records_are_linked(keyword_tokenizer):
+    records = keyword_tokenizer.tokenize_many(DOCS[:2], doc_ids=["a", "b"], pool_size=1)
+    doc_a = [r for r in records if r.metadata.identification.doc_id == "a"]
+    assert len(doc_a) > 1
+
+    relations = [r.metadata.relations for r in doc_a]
+    assert all(rel.parent_id == "a" for rel in relations)
+    assert [rel.prev_id for rel in relations] == [None] + [r.id for r in doc_a[:-1]]
+    assert [rel.next_id for rel in relations] == [r.id for r in doc_a[1:]] + [None]
+
+    single = keyword_tokenizer.tokenize(DOCS[0])
+    assert single[0].metadata.relations.next_id == single[1].id
+    assert single[1].metadata.relations.prev_id == single[0].id
@@ -0,0 +1,59 @@
+import uuid
+
+from src.tokenizer.record import (BusinessRetrievalMeta, DocumentInfoMeta, IdentificationVersionMeta,
+                                  ProcessingTraceMeta, QualityComplianceMeta, Record, RecordMetaData,
+                                  RelationStructureMeta, SourceLocationMeta)
+from src.tokenizer.record_batch import RecordBatch
+
+
+def _records():
+    first_id = uuid.uuid4().hex
+    return [
+        Record(id=first_id, content="智能手机是现代社会不可或缺的通信工具。", metadata=RecordMetaData(
+            identification=IdentificationVersionMeta(id=first_id, doc_id="doc-1", chunk_id="0", hash="abc"),
+            source_location=SourceLocationMeta(path="a.txt", offset=0, line_start=1, line_end=2),
+            processing=ProcessingTraceMeta(splitter="semantic", pipeline=["split", "embed"], text_hash="f" * 64),
+            quality=QualityComplianceMeta(pii=False, visibility="public", tags=["phone"]),
+            business=BusinessRetrievalMeta(domain="tech"),
+        )),
+        Record(id=uuid.uuid4().hex, content="长江是亚洲第一长河。", metadata=RecordMetaData(
+            identification=IdentificationVersionMeta(doc_id="doc-1", chunk_id="1"),
+            relations=RelationStructureMeta(prev_id="p", next_id="下一个"),
+        )),
+        Record(id="custom-id", content="", metadata=RecordMetaData(document_info=DocumentInfoMeta())),
+    ]
+
+
+def test_round_trip():
+    records = _records()
+    batch = RecordBatch.from_records(records)
+
+    assert len(batch) == 3
+    assert batch.to_records() == records
+    assert batch[-1] == records[-1]
+
+
+def test_columnar_access_without_materializing():
+    records = _records()
+    first_id = records[0].id
+    batch = RecordBatch.from_records(records)
+
+    codes, values = batch.codes("doc_id")
+    assert list(codes) == [0, 0, -1]
+    assert values == ["doc-1"]
+    assert batch.value_at("line_end", 0) == 2
+    assert batch.value_at("pii", 0) is False
+    assert batch.value_at("pii", 1) is None
+    assert batch.value_at("text_hash", 0) == "f" * 64
+    assert batch.value_at("hash", 1) is None
+    # 只有存在未列化字段的行才保存 JSON
+    assert set(batch.extras) == {0, 1, 2}
+    assert "doc-1" not in batch.extras[0] and first_id not in batch.extras[0]
+
+    view = batch.view(1)
+    assert view.id == records[1].id
+    assert view.content == "长江是亚洲第一长河。"
+    assert view.get("doc_id") == "doc-1"
+    assert view.metadata.relations.prev_id == "p"
+    assert view.get("next_id") is None  # 非 ASCII 的值保存在 extras 中
+    assert view.metadata.relations.next_id == "下一个"
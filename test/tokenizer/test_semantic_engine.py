@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+from llama_index.core import Document
+from llama_index.core.node_parser import SemanticSplitterNodeParser
+
+from src.tokenizer.semantic_engine import SemanticSplitterEngine
+from src.tokenizer.sentence_splitter import chinese_sentence_splitter
+from test.tokenizer._docs import DOCS
+
+TEXT = (
+    "智能手机是现代社会不可或缺的通信工具。它集成了电话、相机、网络浏览器等多种功能。"
+    "随着技术的发展，手机的计算能力甚至超过了十年前的个人电脑。"
+    "各大品牌每年都会发布新款旗舰机型以吸引消费者。"
+    "长江是亚洲第一长河，全长约6300公里。它发源于青藏高原，最终注入东海。"
+    "长江流域是中国经济最发达的地区之一，养育了数亿人口。"
+    "著名的三峡大坝就建在长江之上。"
+)
+
+
+def _parser(embed_model, buffer_size=1, threshold=95):
+    return SemanticSplitterNodeParser(embed_model=embed_model, buffer_size=buffer_size,
+                                      breakpoint_percentile_threshold=threshold,
+                                      sentence_splitter=chinese_sentence_splitter)
+
+
+@pytest.mark.parametrize("text", [TEXT] + DOCS)
+def test_engine_matches_llama_index_parser(keyword_tokenizer, text):
+    nodes = _parser(keyword_tokenizer.embed_model).get_nodes_from_documents([Document(text=text)])
+    records = keyword_tokenizer.tokenize(text)
+    assert [r.content for r in records] == [n.get_content() for n in nodes]
+    assert records[0].metadata.processing.splitter == "SemanticSplitterEngine"
+
+
+@pytest.mark.parametrize("buffer_size", [0, 1, 2])
+@pytest.mark.parametrize("threshold", [50, 80, 95])
+def test_chunks_match_for_random_embeddings(keyword_tokenizer, buffer_size, threshold):
+    rng = np.random.default_rng(buffer_size * 100 + threshold)
+    sentences = [f"第{i}句。" * int(rng.integers(1, 4)) for i in range(60)]
+    parser = _parser(keyword_tokenizer.embed_model, buffer_size, threshold)
+    engine = SemanticSplitterEngine(lambda texts: None, threshold, buffer_size)
+
+    groups = parser._build_sentence_groups(sentences)
+    assert engine.combine_sentences(sentences) == [g["combined_sentence"] for g in groups]
+
+    embeddings = rng.normal(size=(len(sentences), 8))
+    for group, vector in zip(groups, embeddings):
+        group["combined_sentence_embedding"] = vector.tolist()
+    expected = parser._build_node_chunks(groups, parser._calculate_distances_between_sentence_groups(groups))
+    assert engine.build_chunks(sentences, engine.distances(embeddings)) == expected
+
+
+def test_small_inputs():
+    calls = []
+    engine = SemanticSplitterEngine(lambda texts: calls.append(texts))
+    assert engine.split([]) == [""]
+    assert engine.split(["只有一句。"]) == ["只有一句。"]
+    assert calls == []
@@ -0,0 +1,34 @@
+import re
+
+from src.tokenizer.sentence_splitter import chinese_sentence_splitter, iter_sentence_spans
+
+
+def _legacy_splitter(text):
+    sentences = re.split(r'([。！？\n])', text)
+    sentences = ["".join(i) for i in zip(sentences[0::2], sentences[1::2])]
+    if len(sentences) * 2 < len(re.split(r'([。！？\n])', text)):
+        sentences.append(re.split(r'([。！？\n])', text)[-1])
+    return [s.strip() for s in sentences if s.strip()]
+
+
+def test_matches_legacy_splitter_on_plain_text():
+    text = ("智能手机是现代社会不可或缺的通信工具。它集成了电话、相机等多种功能！\n"
+            "  手机的计算能力超过了十年前的电脑吗？长江是亚洲第一长河\n\n没有结尾标点")
+    assert chinese_sentence_splitter(text) == _legacy_splitter(text)
+
+
+def test_spans_point_into_original_text():
+    text = "  他说：“今天下雨了。”我们改天再去吧！  "
+    spans = list(iter_sentence_spans(text))
+    assert [text[s:e] for s, e in spans] == ["他说：“今天下雨了。”", "我们改天再去吧！"]
+    assert spans[0][0] == 2
+
+
+def test_semicolon_ellipsis_and_brackets():
+    text = "第一项；第二项……真的吗？！（备注：见附录。）结束"
+    assert chinese_sentence_splitter(text) == ["第一项；", "第二项……", "真的吗？！", "（备注：见附录。）", "结束"]
+
+
+def test_empty_and_whitespace():
+    assert chinese_sentence_splitter("") == []
+    assert chinese_sentence_splitter(" \n\n ") == []
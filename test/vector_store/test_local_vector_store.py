@@ -0,0 +1,117 @@
+import numpy as np
+import pytest
+
+from src.vector_store.local_vector_store import LocalVectorStore
+
+
+def _clustered(n, dim, n_clusters=20, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(n_clusters, dim))
+    return (centers[rng.integers(0, n_clusters, n)] + 0.3 * rng.normal(size=(n, dim))).astype(np.float32)
+
+
+def _brute_force(vectors, query, k):
+    v = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    q = query / np.linalg.norm(query)
+    return list(np.argsort(-(v @ q))[:k])
+
+
+def test_exact_search_matches_brute_force():
+    vectors = _clustered(500, 16)
+    store = LocalVectorStore(dim=16, initial_capacity=8)
+    store.add([f"r{i}" for i in range(500)], vectors)
+
+    query = vectors[7] + 0.01
+    hits = store.search(query, top_k=5)
+    assert [h.id for h in hits] == [f"r{i}" for i in _brute_force(vectors, query, 5)]
+    assert hits[0].score >= hits[-1].score
+
+
+def test_delete_and_overwrite():
+    store = LocalVectorStore(dim=2)
+    store.add(["a", "b", "c"], np.array([[1, 0], [0, 1], [1, 1]], dtype=np.float32))
+    assert store.delete(["a", "missing"]) == 1
+    assert [h.id for h in store.search(np.array([1, 0]), top_k=3)] == ["c", "b"]
+
+    store.add(["b"], np.array([[1, 0.01]], dtype=np.float32))
+    assert len(store) == 2
+    assert store.search(np.array([1, 0]), top_k=1)[0].id == "b"
+
+    # 同一批内重复的 id 只保留最后一次出现，不留下孤立的存活行
+    store.add(["d", "c", "d"], np.array([[0, 1], [1, 1], [-1, 0]], dtype=np.float32))
+    assert len(store) == 3
+    assert int(store._alive[:store.size].sum()) == 3
+    assert store.search(np.array([-1, 0]), top_k=1)[0].id == "d"
+    assert store.delete(["d"]) == 1
+    assert [h.id for h in store.search(np.array([0, 1]), top_k=5)] == ["c", "b"]
+
+
+def test_ivf_n_probe_validated_and_clamped():
+    vectors = _clustered(200, 8)
+    store = LocalVectorStore(dim=8)
+    store.add([f"r{i}" for i in range(200)], vectors)
+    store.build_index(n_lists=4)
+    for n_probe in (0, -1):
+        with pytest.raises(ValueError, match="n_probe"):
+            store.search_batch(vectors[:2], top_k=3, mode="ivf", n_probe=n_probe)
+    assert [h.id for h in store.search(vectors[5], top_k=3, mode="ivf", n_probe=100)] == \
+        [h.id for h in store.search(vectors[5], top_k=3)]
+
+
+def test_ivf_recall_and_unindexed_tail():
+    vectors = _clustered(3000, 32)
+    ids = [f"r{i}" for i in range(3000)]
+    store = LocalVectorStore(dim=32)
+    store.add(ids[:2500], vectors[:2500])
+    store.build_index(n_lists=32)
+    store.add(ids[2500:], vectors[2500:])
+
+    queries = vectors[::97] + 0.05
+    exact = store.search_batch(queries, top_k=10)
+    approx = store.search_batch(queries, top_k=10, mode="ivf", n_probe=8)
+    recall = np.mean([len({h.id for h in a} & {h.id for h in e}) / 10 for a, e in zip(approx, exact)])
+    assert recall >= 0.9
+
+    # 建索引之后追加的行也能被检索到
+    assert store.search(vectors[2999], top_k=1, )[0].id == "r2999"
+    assert store.search_batch(vectors[2999:3000], top_k=1, mode="ivf", n_probe=1)[0][0].id == "r2999"
+
+
+def test_dim_mismatch():
+    store = LocalVectorStore(dim=4)
+    with pytest.raises(ValueError):
+        store.add(["a"], np.zeros((1, 3)))
+
+
+def test_filtered_search_matches_brute_force():
+    from src.tokenizer.record import BusinessRetrievalMeta, QualityComplianceMeta, Record, RecordMetaData
+
+    vectors = _clustered(2000, 16)
+    domains = ["finance", "devops", "hr", "legal"]
+    records = [Record(id=f"r{i}", content="", metadata=RecordMetaData(
+        business=BusinessRetrievalMeta(domain=domains[i % 4] if i % 50 else "rare"),
+        quality=QualityComplianceMeta(visibility="private" if i % 3 == 0 else "public")))
+        for i in range(2000)]
+    store = LocalVectorStore(dim=16)
+    store.add_records(records, vectors)
+    store.delete(["r1", "r2"])
+    store.build_index(n_lists=8)
+
+    def expected(query, allowed, k):
+        rows = [i for i in _brute_force(vectors, query, 2000) if allowed(i) and i not in (1, 2)]
+        return [f"r{i}" for i in rows[:k]]
+
+    query = vectors[11] + 0.01
+    common = lambda i: i % 50 and i % 4 == 0 and i % 3 != 0  # noqa: E731
+    rare = lambda i: not i % 50  # noqa: E731
+    # 宽松条件走全量打分 + 掩码，严格条件只对命中行打分
+    assert [h.id for h in store.search(query, 5, filter="visibility = public")] \
+        == expected(query, lambda i: i % 3 != 0, 5)
+    assert [h.id for h in store.search(query, 5, filter="visibility != private AND domain = finance")] \
+        == expected(query, common, 5)
+    assert [h.id for h in store.search(query, 50, filter="domain = rare")] == expected(query, rare, 50)
+    # ivf 模式下严格条件退化为对命中行精确检索，召回完整
+    assert [h.id for h in store.search(query, 50, mode="ivf", n_probe=1, filter="domain = rare")] \
+        == expected(query, rare, 50)
+    assert store.search(query, 5, filter="domain = unknown") == []
+    assert store.filter_ids(["r0", "r1", "r4", "zzz"], "visibility = public OR domain = rare") == ["r0", "r4"]
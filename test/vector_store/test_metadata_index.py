@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+from src.tokenizer.record import BusinessRetrievalMeta, DocumentInfoMeta, QualityComplianceMeta, RecordMetaData
+from src.vector_store.metadata_index import Field, MetadataIndex, RowSet, compile_filter, parse_filter
+
+
+def _meta(domain=None, visibility=None, lang=None, tags=None, pii=None):
+    return RecordMetaData(business=BusinessRetrievalMeta(domain=domain),
+                          quality=QualityComplianceMeta(visibility=visibility, tags=tags, pii=pii),
+                          document_info=DocumentInfoMeta(lang=lang))
+
+
+@pytest.fixture
+def index():
+    index = MetadataIndex()
+    index.add(0, [
+        _meta("finance", "public", "zh", ["faq"]),
+        _meta("finance", "private", "en", ["draft"], pii=True),
+        _meta("devops", "internal", "zh", ["faq", "draft"]),
+        None,
+        _meta("finance", None, "zh"),
+    ])
+    return index
+
+
+def test_parse_and_evaluate(index):
+    def rows(expr):
+        return np.flatnonzero(compile_filter(expr, index, index.n_rows)).tolist()
+
+    assert rows("visibility != private AND domain = finance") == [0, 4]
+    assert rows("lang IN (zh, 'en') AND NOT tags = draft") == [0, 4]
+    assert rows("(domain = devops OR pii = true) AND tags = draft") == [1, 2]
+    assert rows((Field("tags").contains("faq") & (Field("domain") != "devops"))) == [0]
+    assert rows(Field("visibility").exists()) == [0, 1, 2]
+    assert rows("domain = unknown") == []
+    with pytest.raises(ValueError):
+        parse_filter("domain = ")
+    with pytest.raises(KeyError):
+        rows("missing_field = x")
+
+
+def test_row_set_switches_to_bitmap():
+    dense, sparse = RowSet(), RowSet()
+    for row in range(0, 1000, 2):
+        dense.add(row)
+    sparse.add(5)
+    dense.optimize(1000)
+    sparse.optimize(1000)
+    assert dense.nbytes == 125 and sparse.nbytes == 4
+    # 位图在行数增长后自动补零
+    dense.add(1500)
+    mask = dense.mask(2000)
+    assert mask.sum() == 501 and mask[1500] and not mask[1001]
+    assert np.flatnonzero(sparse.mask(10)).tolist() == [5]
+
+
+def test_mask_is_read_only_and_add_optimizes():
+    row_set = RowSet()
+    for row in (3, 7):
+        row_set.add(row)
+    assert np.flatnonzero(row_set.mask(10)).tolist() == [3, 7]
+    # 读取不合并待写入行号，也不转换容器
+    assert row_set.nbytes == 8 and row_set._rows.size == 0 and row_set._bits is None
+
+    index = MetadataIndex()
+    index.add(0, [_meta("finance")] * 100 + [_meta("devops")] * 2000)
+    finance = index._sets["domain"]["finance"]
+    assert not finance._pending and finance._bits is not None
+    rows, bits = finance._rows, finance._bits
+    assert index.mask("domain", "finance").sum() == 100
+    assert finance._rows is rows and finance._bits is bits
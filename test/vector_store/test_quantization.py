@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+
+from src.vector_store.local_vector_store import LocalVectorStore
+from src.vector_store.quantization import Float16Codec, Int8Codec, PQCodec
+
+
+def _unit(n, dim, n_clusters=20, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(n_clusters, dim))
+    x = (centers[rng.integers(0, n_clusters, n)] + 0.5 * rng.normal(size=(n, dim))).astype(np.float32)
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+
+@pytest.mark.parametrize("codec, max_error", [
+    (Float16Codec(32), 1e-3),
+    (Int8Codec(32), 1e-2),
+    (PQCodec(32, m=8, n_iter=5), 0.5),
+])
+def test_codec_round_trip_and_asymmetric_score(codec, max_error):
+    x = _unit(2000, 32)
+    codes = codec.fit(x).encode(x)
+    assert codes.shape == (2000,) + codec.code_shape and codes.dtype == codec.dtype
+    decoded = codec.decode(codes)
+    assert np.mean(np.linalg.norm(decoded - x, axis=1)) < max_error
+
+    queries = _unit(3, 32, seed=1)
+    np.testing.assert_allclose(codec.score(queries, codes), queries @ decoded.T, rtol=1e-4, atol=1e-4)
+
+
+def test_pq_lookup_and_decode_paths_agree():
+    x = _unit(3000, 32)
+    codec = PQCodec(32, m=8, n_iter=3).fit(x)
+    codes = codec.encode(x)
+    queries = _unit(8, 32, seed=2)
+    batched = codec.score(queries, codes)                                # q * m >= dim：解码 + 矩阵乘法
+    single = np.vstack([codec.score(q[None], codes) for q in queries])   # 查表（ADC）
+    np.testing.assert_allclose(batched, single, rtol=1e-4, atol=1e-5)
+    np.testing.assert_allclose(batched, queries @ codec.decode(codes).T, rtol=1e-4, atol=1e-5)
+
+
+def _recall(store, vectors, queries, k=10, **kwargs):
+    exact = np.argsort(-(queries @ vectors.T), axis=1)[:, :k]
+    results = store.search_batch(queries, top_k=k, **kwargs)
+    return np.mean([len({int(h.id) for h in hits} & set(e)) / k for hits, e in zip(results, exact)])
+
+
+def test_quantize_store_and_rerank(tmp_path):
+    vectors = _unit(3000, 32)
+    queries = _unit(20, 32, seed=2)
+    store = LocalVectorStore(dim=32)
+    store.add([str(i) for i in range(2000)], vectors[:2000])
+    version = store.version
+
+    store.quantize("pq", full_precision_path=str(tmp_path / "full.f32"), m=4, n_iter=5)
+    assert store.version > version
+    assert store.vector_nbytes == 2000 * 4 + store.codec.nbytes
+    store.add([str(i) for i in range(2000, 3000)], vectors[2000:])   # 之后写入的向量同样编码
+
+    pq_recall = _recall(store, vectors, queries)
+    assert _recall(store, vectors, queries, rerank=100) > pq_recall
+    # 候选覆盖全部行时重排结果与精确检索一致
+    assert _recall(store, vectors, queries, rerank=3000) == 1.0
+    hits = store.search(queries[0], top_k=3, rerank=50)
+    assert hits[0].score == pytest.approx(float(vectors[int(hits[0].id)] @ queries[0]), rel=1e-5)
+
+    store.build_index(n_lists=16)
+    assert _recall(store, vectors, queries, mode="ivf", n_probe=16, rerank=100) > pq_recall
+    store.close()
+
+
+def test_int8_store_with_prefit_codec():
+    vectors = _unit(1000, 32)
+    store = LocalVectorStore(dim=32, codec=Int8Codec(32).fit(vectors))
+    store.add([str(i) for i in range(1000)], vectors)
+    assert store._vectors.dtype == np.int8
+    assert _recall(store, vectors, _unit(10, 32, seed=3)) >= 0.9
+    np.testing.assert_allclose(store.get_vector("5"), vectors[5], atol=0.02)
+    with pytest.raises(ValueError):
+        store.search(vectors[0], rerank=10)
+    with pytest.raises(ValueError):
+        LocalVectorStore(dim=32, codec=PQCodec(32))
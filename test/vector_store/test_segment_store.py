@@ -0,0 +1,195 @@
+import json
+
+import numpy as np
+
+from src.tokenizer.record import IdentificationVersionMeta, Record, RecordMetaData, QualityComplianceMeta
+from src.vector_store.local_vector_store import LocalVectorStore
+from src.vector_store import segment_store
+from src.vector_store.segment_store import SegmentStore
+
+
+def _records(prefix, n):
+    return [Record(id=f"{prefix}{i}", content=f"第{i}段内容：长江", metadata=RecordMetaData(
+        identification=IdentificationVersionMeta(doc_id=prefix, chunk_id=str(i)),
+        quality=QualityComplianceMeta(tags=["a", "b"])))
+        for i in range(n)]
+
+
+def _vectors(n, dim=4, seed=0):
+    return np.random.default_rng(seed).normal(size=(n, dim)).astype(np.float32)
+
+
+def test_append_reopen_and_lazy_read(tmp_path):
+    store = SegmentStore(str(tmp_path))
+    vectors = _vectors(5)
+    store.append(_records("a", 5), vectors)
+    store.append(_records("b", 3), _vectors(3, seed=1))
+
+    reopened = SegmentStore(str(tmp_path))
+    assert reopened.dim == 4
+    assert len(reopened.segments) == 2
+    assert len(reopened) == 8
+
+    record, vector = reopened.get("a2")
+    assert record.content == "第2段内容：长江"
+    assert record.metadata.identification.chunk_id == "2"
+    assert record.metadata.quality.tags == ["a", "b"]
+    np.testing.assert_array_equal(vector, vectors[2])
+    assert isinstance(reopened._segments[0].embeddings, np.memmap)
+
+
+def test_delete_overwrite_and_compact(tmp_path):
+    store = SegmentStore(str(tmp_path))
+    store.append(_records("a", 4), _vectors(4))
+    store.delete(["a1"])
+    updated = _records("a", 1)
+    updated[0].content = "更新后的内容"
+    store.append(updated, _vectors(1, seed=2))
+    store.append(_records("a", 2)[1:], _vectors(1, seed=3))  # 删除后重新写入 a1
+
+    assert len(store) == 4
+    assert store.get("a0")[0].content == "更新后的内容"
+    assert store.get("a1") is not None
+
+    merged = store.compact_async()
+    merged.join()
+    assert len(store.segments) == 1
+    assert len(store) == 4
+
+    reopened = SegmentStore(str(tmp_path))
+    assert sorted(r.id for r, _ in reopened.iter_records()) == ["a0", "a1", "a2", "a3"]
+    assert reopened.get("a0")[0].content == "更新后的内容"
+    assert len(list(tmp_path.glob("seg-*"))) == 1
+
+    store.delete(["a2", "a3"])
+    store.compact()
+    assert sorted(r.id for r, _ in SegmentStore(str(tmp_path)).iter_records()) == ["a0", "a1"]
+
+
+def test_load_vectors_into_local_store(tmp_path):
+    store = SegmentStore(str(tmp_path))
+    vectors = _vectors(10)
+    store.append(_records("a", 10), vectors)
+
+    local = LocalVectorStore(dim=4)
+    assert store.load_vectors(local, batch_size=3) == 10
+    assert local.search(vectors[6], top_k=1)[0].id == "a6"
+
+
+def test_iteration_survives_concurrent_compaction(tmp_path):
+    store = SegmentStore(str(tmp_path))
+    store.append(_records("a", 3), _vectors(3))
+    store.delete(["a0"])
+    store.append(_records("b", 2), _vectors(2, seed=1))
+
+    rows = store.iter_records()
+    first = next(rows)
+    store.compact()  # 遍历中替换段列表：迭代器继续使用自己的快照
+    assert [first[0].id] + [r.id for r, _ in rows] == ["a1", "a2", "b0", "b1"]
+    assert store.get("b1")[0].id == "b1" and len(store) == 4
+
+
+def test_compacted_segments_removed_after_last_reader(tmp_path):
+    store = SegmentStore(str(tmp_path))
+    store.append(_records("a", 3), _vectors(3))
+    store.append(_records("b", 2), _vectors(2, seed=1))
+
+    rows = store.iter_records()
+    next(rows)
+    store.compact()
+    # 迭代器仍在读取旧段：目录保留，记入回收列表
+    assert len(list(tmp_path.glob("seg-*"))) == 3
+    assert len(json.loads((tmp_path / "MANIFEST.json").read_text())["trash"]) == 2
+    assert len(list(rows)) == 4
+    assert len(list(tmp_path.glob("seg-*"))) == 1
+    assert json.loads((tmp_path / "MANIFEST.json").read_text())["trash"] == []
+
+
+def test_failed_segment_removal_is_retried_on_open(tmp_path, monkeypatch):
+    store = SegmentStore(str(tmp_path))
+    store.append(_records("a", 3), _vectors(3))
+    store.append(_records("b", 2), _vectors(2, seed=1))
+
+    rmtree = segment_store.shutil.rmtree
+
+    def _locked(path, **kwargs):
+        if "seg-" in str(path) and not str(path).endswith(".tmp"):  # 模拟 Windows 上仍被映射的段目录
+            raise PermissionError(f"{path} is in use")
+        rmtree(path, **kwargs)
+
+    monkeypatch.setattr(segment_store.shutil, "rmtree", _locked)
+    store.compact()
+    assert len(list(tmp_path.glob("seg-*"))) == 3
+    monkeypatch.undo()
+
+    reopened = SegmentStore(str(tmp_path))
+    assert len(list(tmp_path.glob("seg-*"))) == 1
+    assert len(reopened) == 5
+
+
+def test_random_operations_match_model(tmp_path):
+    rng = np.random.default_rng(0)
+    store = SegmentStore(str(tmp_path))
+    model = {}
+    for step in range(40):
+        op = rng.choice(["append", "append", "delete", "compact"])
+        if op == "append":
+            ids = [f"k{i}" for i in rng.integers(0, 30, size=rng.integers(1, 6))]  # 含段内重复
+            vectors = rng.normal(size=(len(ids), 4)).astype(np.float32)
+            store.append([Record(id=i, content=f"{i}@{step}", metadata=RecordMetaData()) for i in ids], vectors)
+            model.update((i, (f"{i}@{step}", v)) for i, v in zip(ids, vectors))
+        elif op == "delete":
+            ids = [f"k{i}" for i in rng.integers(0, 30, size=3)]
+            store.delete(ids)
+            for i in ids:
+                model.pop(i, None)
+        else:
+            store.compact()
+        for view in (store, SegmentStore(str(tmp_path))):
+            assert len(view) == len(model)
+            assert {r.id: r.content for r, _ in view.iter_records()} == {k: c for k, (c, _) in model.items()}
+        for k in [f"k{i}" for i in range(30)]:
+            got = store.get(k)
+            assert (got is None) == (k not in model)
+            if got is not None:
+                np.testing.assert_array_equal(got[1], model[k][1])
+
+
+def test_compact_streams_rows_and_lookups_skip_id_decoding(tmp_path, monkeypatch):
+    store = SegmentStore(str(tmp_path))
+    store.append(_records("a", 50), _vectors(50))
+    store.append(_records("a", 5), _vectors(5, seed=1))
+    store.delete(["a7", "a8"])
+
+    def _no_records(*args):
+        raise AssertionError("compact must not build Record objects")
+
+    monkeypatch.setattr(segment_store.Segment, "record", _no_records)
+    store.compact()
+    monkeypatch.undo()
+
+    decoded = []
+    decode = segment_store._Column.__getitem__
+    monkeypatch.setattr(segment_store._Column, "__getitem__", lambda self, i: decoded.append(i) or decode(self, i))
+    reopened = SegmentStore(str(tmp_path))
+    assert len(reopened) == 48 and decoded == []
+    record, vector = reopened.get("a3")
+    assert record.content == "第3段内容：长江" and len(decoded) == 3   # 只解码命中行的 id/content/meta
+    np.testing.assert_array_equal(vector, _vectors(5, seed=1)[3])
+    assert reopened.get("a7") is None
+
+
+def test_segments_without_id_index_are_upgraded(tmp_path):
+    store = SegmentStore(str(tmp_path))
+    store.append(_records("a", 3), _vectors(3))
+    store.append(_records("a", 1), _vectors(1, seed=1))
+    for path in [*tmp_path.glob("seg-*/ids.sorted.npy"), *tmp_path.glob("seg-*/ids.order.npy")]:
+        path.unlink()
+    manifest = json.loads((tmp_path / "MANIFEST.json").read_text())
+    del manifest["live"]
+    (tmp_path / "MANIFEST.json").write_text(json.dumps(manifest))
+
+    reopened = SegmentStore(str(tmp_path))
+    assert len(reopened) == 3
+    np.testing.assert_array_equal(reopened.get("a0")[1], _vectors(1, seed=1)[0])
+    assert len(list(tmp_path.glob("seg-*/ids.sorted.npy"))) == 2
@@ -0,0 +1,136 @@
+import numpy as np
+import pytest
+
+from src.pipeline.ingestion_manifest import Tombstone
+from src.pipeline.ingestion_pipeline import ingest_directory
+from src.tokenizer.record import (BusinessRetrievalMeta, DocumentInfoMeta, IdentificationVersionMeta,
+                                  QualityComplianceMeta, Record, RecordMetaData, SourceLocationMeta)
+from src.vector_store.vector_db_sink import (METADATA_COLUMNS, InMemoryVectorDB, InMemoryVectorDBSink, RowLimits,
+                                             VectorDBWriteError, check_row_limits, record_to_row, row_to_record)
+
+
+def _records(n, prefix="r"):
+    return [Record(id=f"{prefix}{i}", content=f"片段{i}", metadata=RecordMetaData(
+        identification=IdentificationVersionMeta(id=f"{prefix}{i}", doc_id="doc", chunk_id=str(i)),
+        source_location=SourceLocationMeta(path="a.txt", page=i),
+        quality=QualityComplianceMeta(score=0.5, pii=True, tags=["faq"]),
+        business=BusinessRetrievalMeta(domain="finance")))
+        for i in range(n)]
+
+
+def _vectors(n, dim=4):
+    return np.random.default_rng(0).normal(size=(n, dim)).astype(np.float32)
+
+
+def test_record_row_round_trip():
+    record = _records(3)[2]
+    row = record_to_row(record, _vectors(1)[0])
+
+    assert set(row) == {"id", "vector", "content"} | {c.name for c in METADATA_COLUMNS}
+    assert row["page"] == 2 and row["tags"] == ["faq"] and row["pii"] is True
+    assert row["url"] is None and row["size_bytes"] is None and row["keywords"] is None and row["verified"] is None
+
+    restored, vector = row_to_record(row)
+    assert restored == record
+    np.testing.assert_array_equal(vector, row["vector"])
+    assert row_to_record(record_to_row(Record(id="x", content="", metadata=RecordMetaData()), vector))[0] \
+        .metadata.quality is None
+
+    # False / 0 / -1 / "" / [] 是真实取值，不能与缺失（None）混同
+    falsy = Record(id="y", content="", metadata=RecordMetaData(
+        identification=IdentificationVersionMeta(id="y", version=""),
+        source_location=SourceLocationMeta(path="", page=0),
+        document_info=DocumentInfoMeta(title="", size_bytes=-1),
+        quality=QualityComplianceMeta(score=0.0, pii=False, verified=False, tags=[])))
+    assert row_to_record(record_to_row(falsy, vector))[0] == falsy
+    unknown = Record(id="z", content="", metadata=RecordMetaData(quality=QualityComplianceMeta(score=0.5)))
+    assert row_to_record(record_to_row(unknown, vector))[0].metadata.quality.pii is None
+
+
+def test_row_limits_reject_oversized_record_by_id():
+    limits = RowLimits(content_length=30, list_capacity=2)
+    sink = InMemoryVectorDBSink(batch_size=4, row_limits=limits)
+    records = _records(3)
+    records[1].content = "长" * 11                       # 33 字节
+    records[2].metadata.quality.tags = ["a", "b", "c"]
+    with pytest.raises(ValueError, match=r"'r1'.*content is 33 bytes > 30"):
+        sink(records[:2], _vectors(2))
+    with pytest.raises(ValueError, match=r"'r2'.*tags has 3 items > 2"):
+        check_row_limits(record_to_row(records[2], _vectors(1)[0]), limits)
+    sink(records[:1], _vectors(1))
+    sink.close()
+    # 被拒绝的调用不会留下任何行
+    assert list(sink.db.rows) == ["r0"]
+
+
+def test_batched_bounded_writes_and_tombstones():
+    db = InMemoryVectorDB(latency_s=0.005)
+    sink = InMemoryVectorDBSink(db, batch_size=16, max_in_flight=3)
+    vectors = _vectors(100)
+    records = _records(100)
+    for start in range(0, 100, 7):
+        sink(records[start:start + 7], vectors[start:start + 7])
+    sink.write_tombstones([Tombstone(record_id="r5", doc_id="doc", reason="modified")])
+    sink.close()
+
+    assert len(db) == 99 and "r5" not in db.rows
+    record, vector = db.get("r42")
+    assert record == records[42]
+    np.testing.assert_array_equal(vector, vectors[42])
+    assert db.requests == 7 + 1  # 6 个满批 + 1 个尾批 + 1 个删除
+    assert db.max_concurrent <= 3 and db.connections <= 3
+    assert sink.stats.rows_written == 100 and sink.stats.rows_deleted == 1
+    with pytest.raises(RuntimeError):
+        sink(records[:1], vectors[:1])
+
+
+def test_transient_failures_are_retried():
+    db = InMemoryVectorDB(failure_rate=0.3, seed=1)
+    with InMemoryVectorDBSink(db, batch_size=10, max_in_flight=2, retry_time=10, base_delay=0) as sink:
+        sink(_records(200), _vectors(200))
+
+    assert len(db) == 200
+    assert db.requests > 20
+    assert sink.stats.failed_requests == 0
+
+
+def test_permanent_failure_is_raised():
+    class _RejectingDB(InMemoryVectorDB):
+        def upsert(self, rows):
+            raise ValueError("schema mismatch")
+
+    sink = InMemoryVectorDBSink(_RejectingDB(), batch_size=5, max_in_flight=1, base_delay=0)
+    sink(_records(5), _vectors(5))
+    with pytest.raises(VectorDBWriteError):
+        sink.flush()
+    assert sink.stats.failed_requests == 1
+
+
+def _split_on_period(text):
+    return [s + "。" for s in text.split("。") if s.strip()]
+
+
+class _SentencePerChunkTokenizer:
+    def iter_tokenize_sentences(self, docs, batch_size=256):
+        for doc_id, sentences in docs:
+            for i, sentence in enumerate(sentences):
+                yield Record(id=f"{doc_id}#{i}", content=sentence, metadata=RecordMetaData(
+                    identification=IdentificationVersionMeta(doc_id=doc_id)))
+
+
+def test_pipeline_writes_through_sink(tmp_path):
+    for i in range(4):
+        (tmp_path / f"f{i}.txt").write_text("第一句。第二句。" * (i + 1), encoding="utf-8")
+
+    db = InMemoryVectorDB()
+    with InMemoryVectorDBSink(db, batch_size=4) as sink:
+        ingest_directory(str(tmp_path), sink, patterns=("*.txt",), tokenizer=_SentencePerChunkTokenizer(),
+                         embed_fn=lambda texts: np.ones((len(texts), 3), dtype=np.float32),
+                         sentence_splitter=_split_on_period, workers=1, batch_size=3,
+                         on_tombstones=sink.write_tombstones)
+
+    assert len(db) == 2 * (1 + 2 + 3 + 4)
+    assert db.dim == 3
+    record, vector = db.get(next(iter(db.rows)))
+    assert record.metadata.source_location.path.endswith(".txt")
+    assert vector.tolist() == [1.0, 1.0, 1.0]